@@ -59,6 +59,15 @@ DEFAULT_CONFIG = {
         "ramp_tolerance": 20.0,  # BPM爬坡时的容忍度（提速时）
     },
     
+    # BPM自动分组配置（V11.3 一维最优划分）
+    "bpm_grouping": {
+        "enabled": True,  # False 时回退旧的贪心分组 + 小组合并
+        "min_group_size": 5,  # 软约束：只有BPM孤立区间才允许更小的组
+        "max_group_size": None,  # 单组上限（None=不限，后续按时长切Set）
+        "half_double": True,  # 半速/倍速：70-180 以外的零散曲目折叠后落入某组 BPM 范围时并入该组（成批的慢歌保持原速自成一组）
+        "objective": "groups",  # "groups"=组数最少 | "variance"=组内BPM方差最小
+    },
+    
     # Set分割配置（方案C：混合策略 - 基于音乐结构的智能分割）
     "split": {
         "target_duration_minutes": 90.0,  # 目标Set时长（分钟）
@@ -122,6 +131,11 @@ DEFAULT_CONFIG = {
         "respect_sort_order": True,  # 是否尊重排序顺序（只检测不调整）
     },
     
+    # 排序后处理微调（会改变主排序结果，默认关闭）
+    "sequence_refine": {
+        "key_swaps": False,  # 全局调性优化：相邻 2 位内交换以改善调性衔接
+    },
+    
     # 日志配置
     "logging": {
         "show_context_tracks": 0,  # 【OOM修复】不显示上下文，减少输出（原值：3）
@@ -5,13 +5,34 @@ Core: Audio DNA Mapping (V11.0)
 ================================
 Centralized logic for mapping raw analysis data to high-level musical dimensions.
 Used by Mashup Intelligence, Aesthetic Curator, and Set Sorter.
+
+[V12.4] DNA Vectors: 每首歌的 DNA 维度只算一次，按固定布局 (DNA_FIELDS) 存成 float32 向量，
+随 analysis 一起缓存（analysis['dna_vector'] 为普通 list，可直接写回 JSON 缓存）；
+大规模扫描用 dna_affinity_matrix 对向量矩阵做成对亲和力计算。
 """
 
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence
 
-def map_dna_features(analysis: Dict) -> Dict:
-    """[V11.0] 将缓存中的低级音频特征映射到标准化的 DNA 维度"""
-    dna = analysis.copy()
+import numpy as np
+
+# [V12.4] 向量布局（字段名 -> 列号）；布局变化时递增 DNA_LAYOUT_VERSION，旧缓存自动重算
+DNA_FIELDS = (
+    'timbre_low', 'timbre_mid', 'timbre_high',
+    'swing_dna', 'groove_density', 'rhythmic_complexity',
+    'stability', 'valence', 'arousal', 'data_confidence',
+    'phrase_32',  # 是否有 32 小节乐句标记 (1.0 / 0.0)
+)
+DNA_FIELD_INDEX = {name: i for i, name in enumerate(DNA_FIELDS)}
+# 缓存字段缺失（None）时的回退值，与 map_dna_features / calculate_dna_affinity 的默认值一致
+DNA_DEFAULTS = {'timbre_low': 0.5, 'timbre_mid': 0.3, 'timbre_high': 0.2, 'swing_dna': 0.5,
+                'groove_density': 0.5, 'rhythmic_complexity': 1.0, 'stability': 1.0, 'valence': 0.5,
+                'arousal': 0.5, 'data_confidence': 1.0, 'phrase_32': 0.0}
+DNA_LAYOUT_VERSION = 1
+DNA_AFFINITY_BLOCK = 1024  # 成对计算的分块行数，控制临时矩阵内存
+
+def _derived_dna(analysis: Dict) -> Dict:
+    """DNA 派生维度（map_dna_features 与向量化共用同一套公式）"""
+    dna = {}
     
     # 1. 音色 DNA (Timbre) - 基于 MFCC
     mfcc = analysis.get('energy_profile', {}).get('mfcc_mean', [])
@@ -48,8 +69,79 @@ def map_dna_features(analysis: Dict) -> Dict:
     
     return dna
 
+def map_dna_features(analysis: Dict) -> Dict:
+    """[V11.0] 将缓存中的低级音频特征映射到标准化的 DNA 维度"""
+    dna = analysis.copy()
+    dna.update(_derived_dna(analysis))
+    return dna
+
+def dna_vector(analysis: Dict, refresh: bool = False) -> np.ndarray:
+    """
+    [V12.4] 单曲 DNA 向量（float32，布局见 DNA_FIELDS）
+    首次调用时计算并写入 analysis['dna_vector'] / analysis['dna_layout']，之后直接复用；
+    分析结果被原地更新（如 Sonic Worker 注入新字段）后需以 refresh=True 重算。
+    """
+    cached = analysis.get('dna_vector')
+    if not refresh and cached is not None and analysis.get('dna_layout') == DNA_LAYOUT_VERSION:
+        return np.asarray(cached, dtype=np.float32)
+    derived = _derived_dna(analysis)
+    derived['phrase_32'] = 1.0 if analysis.get('phrase_markers', {}).get('bars_32', []) else 0.0
+    vec = np.array([DNA_DEFAULTS[name] if derived[name] is None else derived[name] for name in DNA_FIELDS],
+                   dtype=np.float32)
+    analysis['dna_vector'] = vec.tolist()
+    analysis['dna_layout'] = DNA_LAYOUT_VERSION
+    return vec
+
+def dna_matrix(analyses: Sequence[Dict]) -> np.ndarray:
+    """[V12.4] 批量取 DNA 向量，返回 (N, len(DNA_FIELDS)) 的 float32 矩阵"""
+    if not analyses:
+        return np.zeros((0, len(DNA_FIELDS)), dtype=np.float32)
+    return np.stack([dna_vector(a) for a in analyses])
+
+def dna_vector_to_dict(vec) -> Dict:
+    """[V12.4] 向量 -> DNA 维度字典（可直接交给 calculate_dna_affinity）"""
+    d = {name: float(vec[i]) for i, name in enumerate(DNA_FIELDS)}
+    d['phrase_markers'] = {'bars_32': [1]} if d.pop('phrase_32') > 0.5 else {}
+    return d
+
+def dna_affinity_matrix(vecs_a: np.ndarray, vecs_b: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    [V12.4] calculate_dna_affinity 的向量化版本
+    Args:
+        vecs_a: (Na, D) DNA 向量矩阵
+        vecs_b: (Nb, D) DNA 向量矩阵；None 表示与 vecs_a 自身两两计算
+    Returns:
+        (Na, Nb) float32 亲和力得分 (0-100)，与逐对 calculate_dna_affinity 的分数一致（float32 精度）
+    """
+    a = np.asarray(vecs_a, dtype=np.float32)
+    b = a if vecs_b is None else np.asarray(vecs_b, dtype=np.float32)
+    out = np.empty((len(a), len(b)), dtype=np.float32)
+    ti = [DNA_FIELD_INDEX['timbre_low'], DNA_FIELD_INDEX['timbre_mid'], DNA_FIELD_INDEX['timbre_high']]
+    sw, va, ar, ph = (DNA_FIELD_INDEX[k] for k in ('swing_dna', 'valence', 'arousal', 'phrase_32'))
+    tb = b[:, ti]
+    for start in range(0, len(a), DNA_AFFINITY_BLOCK):
+        blk = a[start:start + DNA_AFFINITY_BLOCK]
+        # A. 音色 (25) —— 三维距离
+        diff = blk[:, None, ti] - tb[None, :, :]
+        timbre_dist = np.sqrt((diff * diff).sum(axis=2))
+        score = np.maximum(0.0, 1.0 - timbre_dist * 2.0) * 25
+        # B. 律动 (25)
+        score += np.maximum(0.0, 1.0 - np.abs(blk[:, None, sw] - b[None, :, sw])) * 25
+        # C. 情感轨迹 (30 / 15 / -10)
+        e_dist = np.sqrt((blk[:, None, va] - b[None, :, va]) ** 2 + (blk[:, None, ar] - b[None, :, ar]) ** 2)
+        score += np.where(e_dist < 0.15, 30.0, np.where(e_dist < 0.4, 15.0, -10.0))
+        # D. 结构 (20)
+        score += np.where((blk[:, None, ph] > 0.5) & (b[None, :, ph] > 0.5), 20.0, 0.0)
+        out[start:start + len(blk)] = np.maximum(0.0, score)
+    return out
+
 def calculate_dna_affinity(dna1: Dict, dna2: Dict) -> Tuple[float, List[str]]:
     """计算两个 DNA 之间的亲和力得分 (0-100)"""
+    # [V12.4] 也接受 dna_vector 产出的向量
+    if isinstance(dna1, np.ndarray):
+        dna1 = dna_vector_to_dict(dna1)
+    if isinstance(dna2, np.ndarray):
+        dna2 = dna_vector_to_dict(dna2)
     score = 0.0
     tags = []
     
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Constraint-Aware BPM Partitioning (V11.3)
+================================================
+BPM 分组的一维最优划分（替代启发式贪心 + 小组合并）。
+
+- 排序后的 BPM 序列上做 DP，每组满足：BPM 跨度 <= max_span、组大小 <= max_size
+- min_size 为软约束：只有当某段 BPM 孤立到无法凑够时才允许小组（优先级最高的代价项）
+- 半速/倍速等价：超出 [fold_low, fold_high) 的 BPM 先按原速分组，能自成一组的保持原速
+  （< 70 BPM 的抒情慢歌不会因倍速被塞进 ~130 BPM 组）；零散曲目折叠后落入某组现有 BPM 范围时才并入该组
+- 目标：'groups' = 组数最少（组内方差决胜）；'variance' = 组内平方误差 + 每组固定代价
+复杂度 O(N·W)，W 为单组可覆盖的最大曲目数：受 max_span 约束，并以 max_size（未指定时为 DEFAULT_WINDOW）封顶，
+同一 BPM 段挤满上千首时也不会退化成 O(N²)。
+"""
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+FOLD_LOW = 70.0
+FOLD_HIGH = 180.0
+# 未指定 max_size 时单组最多覆盖的曲目数：4 个满额 Set（max_songs=60），更大的同速段本来也要切成多个 Set
+DEFAULT_WINDOW = 240
+
+
+def fold_bpm(bpm: float, fold_low: float = FOLD_LOW, fold_high: float = FOLD_HIGH) -> float:
+    """半速/倍速折叠：70 BPM 的 Trap ≈ 140，174 以上的 DnB 半速 ≈ 87"""
+    if not bpm or bpm <= 0:
+        return bpm
+    while bpm < fold_low:
+        bpm *= 2.0
+    while bpm >= fold_high:
+        bpm /= 2.0
+    return bpm
+
+
+def group_start_bounds(bpms: List[float], max_span: float, window: int) -> List[int]:
+    """
+    [V13.1] 以第 j 首（不含）结尾的组最早可以从哪一首开始（下标 j-1）：
+    跨度约束用双指针推进（与逐对比较 bpms[j-1] - bpms[i] > max_span 口径一致），再以 window 封顶，
+    保证 j - start <= window
+    """
+    starts = []
+    lo = 0
+    for j in range(1, len(bpms) + 1):
+        while bpms[j - 1] - bpms[lo] > max_span:
+            lo += 1
+        starts.append(max(lo, j - window))
+    return starts
+
+
+def partition_sorted_bpms(bpms: List[float], max_span: float = 25.0, min_size: int = 5,
+                          max_size: Optional[int] = None, objective: str = 'groups',
+                          group_penalty: Optional[float] = None) -> List[int]:
+    """
+    [V11.3] 对已升序的 BPM 序列求最优切点
+    Returns:
+        每组的结束下标（不含），最后一个为 len(bpms)
+    """
+    n = len(bpms)
+    if n == 0:
+        return []
+    starts = group_start_bounds(bpms, max_span, max_size or DEFAULT_WINDOW)
+    min_size = max(1, min(min_size, n))
+    if group_penalty is None:
+        group_penalty = max_span * max_span
+
+    prefix = [0.0]
+    prefix_sq = [0.0]
+    for b in bpms:
+        prefix.append(prefix[-1] + b)
+        prefix_sq.append(prefix_sq[-1] + b * b)
+
+    def sse(i: int, j: int) -> float:
+        cnt = j - i
+        s = prefix[j] - prefix[i]
+        return (prefix_sq[j] - prefix_sq[i]) - s * s / cnt
+
+    inf = (float('inf'), float('inf'), float('inf'))
+    cost: List[Tuple[float, float, float]] = [inf] * (n + 1)
+    back = [0] * (n + 1)
+    cost[0] = (0, 0, 0.0)
+    for j in range(1, n + 1):
+        best, best_i = inf, j - 1
+        for i in range(starts[j - 1], j):
+            prev = cost[i]
+            size = j - i
+            small = prev[0] + (1 if size < min_size else 0)
+            err = sse(i, j)
+            if objective == 'variance':
+                cand = (small, 0, prev[2] + err + group_penalty)
+            else:
+                cand = (small, prev[1] + 1, prev[2] + err)
+            if cand < best:
+                best, best_i = cand, i
+        cost[j] = best
+        back[j] = best_i
+
+    cuts = []
+    j = n
+    while j > 0:
+        cuts.append(j)
+        j = back[j]
+    return cuts[::-1]
+
+
+def _partition_keyed(keyed: List[Tuple[float, Dict]], max_span: float, min_size: int,
+                     max_size: Optional[int], objective: str) -> List[List[Tuple[float, Dict]]]:
+    """对 (BPM, 曲目) 列表做最优划分，返回按 BPM 升序的各组"""
+    if not keyed:
+        return []
+    keyed = sorted(keyed, key=lambda x: x[0])
+    cuts = partition_sorted_bpms([b for b, _ in keyed], max_span=max_span, min_size=min_size,
+                                 max_size=max_size, objective=objective)
+    groups = []
+    start = 0
+    for end in cuts:
+        groups.append(keyed[start:end])
+        start = end
+    return groups
+
+
+def partition_tracks_by_bpm(tracks: List[Dict], max_span: float = 25.0, min_size: int = 5,
+                            max_size: Optional[int] = None, half_double: bool = True,
+                            objective: str = 'groups') -> List[List[Dict]]:
+    """
+    [V11.3] 按 BPM 最优分组
+    无 BPM 的曲目放入中速组（均值 100-130），与旧逻辑一致。
+    Returns:
+        List[List[Dict]]: 分组结果，组间与组内均按（折叠后）BPM 升序
+    """
+    if not tracks:
+        return []
+    with_bpm = [t for t in tracks if t.get('bpm') and t.get('bpm') > 0]
+    without_bpm = [t for t in tracks if not t.get('bpm') or t.get('bpm') <= 0]
+    if not with_bpm:
+        return [list(tracks)]
+
+    if half_double:
+        native = [(t['bpm'], t) for t in with_bpm if FOLD_LOW <= t['bpm'] < FOLD_HIGH]
+        outside = [(t['bpm'], t) for t in with_bpm if not FOLD_LOW <= t['bpm'] < FOLD_HIGH]
+    else:
+        native, outside = [(t['bpm'], t) for t in with_bpm], []
+
+    keyed_groups = _partition_keyed(native, max_span, min_size, max_size, objective)
+    # 主区间外的曲目先按原速分组：能凑够 min_size 的（如一批 < 70 BPM 的慢歌）自成一组；
+    # 凑不够的零散曲目才尝试半速/倍速，且折叠后的 BPM 必须落在某个主区间组的现有范围内（不拉宽组跨度）
+    outside_groups = []
+    for group in _partition_keyed(outside, max_span, min_size, max_size, objective):
+        if len(group) >= min_size:
+            outside_groups.append(group)
+            continue
+        leftovers = []
+        for bpm, t in group:
+            folded = fold_bpm(bpm)
+            target = None
+            for native_group in keyed_groups:
+                if (native_group[0][0] <= folded <= native_group[-1][0]
+                        and (max_size is None or len(native_group) < max_size)):
+                    target = native_group
+                    break
+            if target is None:
+                leftovers.append((bpm, t))
+            else:
+                target.insert(bisect_right([b for b, _ in target], folded), (folded, t))
+        if leftovers:
+            outside_groups.append(leftovers)
+    keyed_groups.extend(outside_groups)
+    keyed_groups.sort(key=lambda group: group[0][0])
+
+    groups = [[t for _, t in group] for group in keyed_groups]
+
+    if without_bpm:
+        mid_group_idx = 0
+        for i, group in enumerate(keyed_groups):
+            avg_bpm = sum(b for b, _ in group) / len(group)
+            if 100 <= avg_bpm <= 130:
+                mid_group_idx = i
+                break
+        groups[mid_group_idx].extend(without_bpm)
+    return groups
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Spatial Candidate Index (V11.8)
+======================================
+enhanced_harmonic_sort 每轮候选池的空间预筛选。
+
+每首歌映射为一个特征向量：
+- BPM（半速/倍速折叠到 [70, 140)，每 4 BPM ≈ 1 单位）
+- 能量（每 10 点 ≈ 1 单位）
+- Camelot 轮盘位置（sin/cos，A/B 调式微小偏移，T 字混音的同号换调式距离很近）
+- 音色（brightness / tonal_balance_low）
+
+在其上建 KD-Tree（纯 Python，无第三方依赖），支持惰性删除：
+已用曲目在被查询访问到时才摘除，并沿父链维护子树存活计数，死子树整体跳过。
+每轮只取最近的 K 首进入完整评分，单轮代价约 O(K log N)，与歌单规模基本无关。
+"""
+
+import heapq
+import math
+from typing import Callable, Dict, List, Optional
+
+try:
+    from key_codes import UNKNOWN_KEY_CODE, code_is_major, code_number, key_code
+    HAS_KEY_CODES = True
+except ImportError:
+    HAS_KEY_CODES = False
+
+FOLD_LOW = 70.0
+FOLD_HIGH = 140.0
+BPM_SCALE = 4.0
+ENERGY_SCALE = 10.0
+KEY_RADIUS = 1.5
+MODE_OFFSET = 0.3
+TIMBRE_SCALE = 2.0
+
+
+def _fold_bpm(bpm: float) -> float:
+    if not bpm or bpm <= 0:
+        return 0.0
+    while bpm < FOLD_LOW:
+        bpm *= 2.0
+    while bpm >= FOLD_HIGH:
+        bpm /= 2.0
+    return bpm
+
+
+def _camelot(key):
+    """返回 (轮盘号 1-12, 'A'/'B')，无法解析返回 None"""
+    if HAS_KEY_CODES:
+        code = key_code(key)
+        if code == UNKNOWN_KEY_CODE:
+            return None
+        return code_number(code), 'B' if code_is_major(code) else 'A'
+    if not key or key == "未知":
+        return None
+    k = str(key).strip().upper()
+    if not k:
+        return None
+    # Open Key: 1m-12m / 1d-12d（与 convert_open_key_to_camelot 同口径：1m → 1A）
+    if k[-1] in ('A', 'B', 'M', 'D'):
+        try:
+            num = int(k[:-1])
+        except ValueError:
+            return None
+        if 1 <= num <= 12:
+            return num, 'A' if k[-1] in ('A', 'M') else 'B'
+    return None
+
+
+def track_embedding(track: Dict) -> List[float]:
+    """[V11.8] 曲目特征向量"""
+    bpm = _fold_bpm(track.get('bpm', 0) or 0) / BPM_SCALE
+    energy = (track.get('energy', 50) or 50) / ENERGY_SCALE
+    cam = _camelot(track.get('key', ''))
+    if cam:
+        angle = 2 * math.pi * (cam[0] - 1) / 12.0
+        radius = KEY_RADIUS + (MODE_OFFSET if cam[1] == 'B' else 0.0)
+        kx, ky = radius * math.cos(angle), radius * math.sin(angle)
+    else:
+        kx, ky = 0.0, 0.0  # 未知调性放在圆心：到所有调性等距
+    brightness = (track.get('brightness', 0.5) or 0.5) * TIMBRE_SCALE
+    low = (track.get('tonal_balance_low', 0.5) or 0.5) * TIMBRE_SCALE
+    return [bpm, energy, kx, ky, brightness, low]
+
+
+class _Node:
+    __slots__ = ('idx', 'dim', 'left', 'right', 'parent', 'alive', 'self_alive')
+
+    def __init__(self, idx: int, dim: int):
+        self.idx = idx
+        self.dim = dim
+        self.left = None
+        self.right = None
+        self.parent = None
+        self.alive = 1          # 子树（含自身）存活数
+        self.self_alive = True
+
+
+class TrackFeatureIndex:
+    """[V11.8] 带惰性删除的 KD-Tree 候选索引"""
+
+    def __init__(self, tracks: List[Dict], is_dead: Optional[Callable[[Dict], bool]] = None):
+        self.tracks = tracks
+        self.points = [track_embedding(t) for t in tracks]
+        self.is_dead = is_dead or (lambda t: bool(t.get('_used')))
+        self._node_of: Dict[int, _Node] = {}
+        self.root = self._build(list(range(len(tracks))), None)
+
+    def _build(self, ids: List[int], parent: Optional[_Node]) -> Optional[_Node]:
+        if not ids:
+            return None
+        pts = self.points
+        dims = len(pts[ids[0]])
+        # 选取跨度最大的维度切分
+        dim = max(range(dims), key=lambda d: max(pts[i][d] for i in ids) - min(pts[i][d] for i in ids))
+        ids.sort(key=lambda i: pts[i][dim])
+        mid = len(ids) // 2
+        node = _Node(ids[mid], dim)
+        node.parent = parent
+        self._node_of[ids[mid]] = node
+        node.left = self._build(ids[:mid], node)
+        node.right = self._build(ids[mid + 1:], node)
+        node.alive = 1 + (node.left.alive if node.left else 0) + (node.right.alive if node.right else 0)
+        return node
+
+    def __len__(self) -> int:
+        return self.root.alive if self.root else 0
+
+    def remove_index(self, idx: int):
+        node = self._node_of.get(idx)
+        if node is None or not node.self_alive:
+            return
+        node.self_alive = False
+        while node is not None:
+            node.alive -= 1
+            node = node.parent
+
+    def revive_index(self, idx: int):
+        """[V13.1] 撤销删除（如现场模式撤销已播）：恢复自身并沿父链加回存活计数"""
+        node = self._node_of.get(idx)
+        if node is None or node.self_alive:
+            return
+        node.self_alive = True
+        while node is not None:
+            node.alive += 1
+            node = node.parent
+
+    def nearest(self, track: Dict, k: int) -> List[Dict]:
+        """返回与 track 特征最近的 k 首存活曲目（按距离升序）"""
+        if self.root is None or k <= 0:
+            return []
+        q = track_embedding(track)
+        heap: List = []  # 最大堆（存负距离）
+
+        # 先近后远递归下钻，死子树整体跳过；树深 O(log N)
+        def visit(node: Optional[_Node]):
+            if node is None or node.alive <= 0:
+                return
+            p = self.points[node.idx]
+            diff = q[node.dim] - p[node.dim]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            visit(near)
+            if node.self_alive:
+                t = self.tracks[node.idx]
+                if self.is_dead(t):
+                    self.remove_index(node.idx)
+                else:
+                    d = sum((a - b) ** 2 for a, b in zip(q, p))
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, node.idx))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, node.idx))
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+        visit(self.root)
+        return [self.tracks[i] for _, i in sorted(heap, key=lambda x: (-x[0], x[1]))]
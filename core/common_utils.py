@@ -2,6 +2,12 @@ import json
 import os
 from pathlib import Path
 
+try:
+    from key_codes import ADVANCED_HARMONIC_TABLE, ADVANCED_HARMONIC_REASONS, UNKNOWN_KEY_CODE, key_code
+    HAS_KEY_CODES = True
+except ImportError:
+    HAS_KEY_CODES = False
+
 CACHE_FILE = Path(r"d:\anti\song_analysis_cache.json")
 
 def verify_file_exists(p):
@@ -89,6 +95,13 @@ def _keys_compatible(c1, c2):
     return (0, "Incompatible")
 
 def get_advanced_harmonic_score(k1, k2):
+    if HAS_KEY_CODES:
+        # [V12.0] 统一编码查表（key_code 已覆盖 DjmdKey / 音名 / Camelot / Open Key）
+        c1, c2 = key_code(k1), key_code(k2)
+        if c1 == UNKNOWN_KEY_CODE or c2 == UNKNOWN_KEY_CODE:
+            return (0, f"Unknown Key Format ({getattr(k1, 'Name', k1)}|{getattr(k2, 'Name', k2)})")
+        score = int(ADVANCED_HARMONIC_TABLE[c1, c2])
+        return (score, ADVANCED_HARMONIC_REASONS[score])
     m = _camelot_map()
     
     # 【V5.2 HOTFIX】安全提取 key 字符串：处理 DjmdKey 对象
@@ -11,6 +11,10 @@
 - Boiler Room / Mixmag Set分析
 """
 
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set
+
 # ============================================================================
 # 风格兼容性矩阵（专业DJ知识）
 # ============================================================================
@@ -623,28 +627,155 @@ def get_transition_bridge(genre_from: str, genre_to: str) -> list:
     return []
 
 
+_CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf]')
+_JAPANESE_CHAR_RE = re.compile(r'[\u3040-\u309f\u30a0-\u30ff]')
+_KOREAN_CHAR_RE = re.compile(r'[\uac00-\ud7af\u1100-\u11ff]')
+
+
 def has_chinese_characters(text: str) -> bool:
     """检查文本是否包含中文字符"""
-    import re
     # 匹配中文字符（包括简体和繁体）
-    chinese_pattern = re.compile(r'[\u4e00-\u9fff\u3400-\u4dbf]')
-    return bool(chinese_pattern.search(text))
+    return bool(_CHINESE_CHAR_RE.search(text))
 
 
 def has_japanese_characters(text: str) -> bool:
     """检查文本是否包含日文字符（平假名、片假名）"""
-    import re
-    # 匹配日文平假名和片假名
-    japanese_pattern = re.compile(r'[\u3040-\u309f\u30a0-\u30ff]')
-    return bool(japanese_pattern.search(text))
+    return bool(_JAPANESE_CHAR_RE.search(text))
 
 
 def has_korean_characters(text: str) -> bool:
     """检查文本是否包含韩文字符"""
-    import re
-    # 匹配韩文字符
-    korean_pattern = re.compile(r'[\uac00-\ud7af\u1100-\u11ff]')
-    return bool(korean_pattern.search(text))
+    return bool(_KOREAN_CHAR_RE.search(text))
+
+
+# ============================================================================
+# 风格识别自动机（V12.1）
+# ============================================================================
+
+class _AhoCorasick:
+    """多模式串匹配自动机：一次扫描找出文本中出现的全部模式串"""
+
+    def __init__(self, patterns: List[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.out: List[List[int]] = [[]]
+        for pid, pat in enumerate(patterns):
+            state = 0
+            for ch in pat:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = nxt
+                state = nxt
+            self.out[state].append(pid)
+        # BFS 构建失配指针，并把失配链上的输出合并到当前状态
+        queue = list(self.goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find_all(self, text: str) -> Set[int]:
+        goto, fail, out = self.goto, self.fail, self.out
+        found: Set[int] = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+ELECTRONIC_KEYWORDS = ['remix', 'edit', 'bootleg', 'flip', 'rework', 'mix']
+
+
+class _GenreVocabulary:
+    """
+    全部歌手/关键词词表编译成一个自动机，每个模式串记录它在各检测步骤中的角色：
+    华语歌手 / 日语歌手 / K-Pop 关键词 / 风格关键词（按 GENRE_KEYWORDS 顺序的最小序号）/
+    remix 类关键词 / 华语子风格加分（保留重复词的多次计分）
+    """
+
+    def __init__(self):
+        self.patterns: List[str] = []
+        self._pid: Dict[str, int] = {}
+        self.chinese_artist: Set[int] = set()
+        self.japanese_artist: Set[int] = set()
+        self.kpop: Set[int] = set()
+        self.electronic: Set[int] = set()
+        self.genre_rank: Dict[int, int] = {}
+        self.genre_order: List[str] = []
+        self.subgenre_order: List[str] = list(CHINESE_SUBGENRES.keys())
+        self.subgenre_weights: Dict[int, List[tuple]] = {}
+
+        for artist in CHINESE_ARTISTS:
+            self._add(artist, self.chinese_artist)
+        for artist in JAPANESE_ARTISTS:
+            self._add(artist, self.japanese_artist)
+        for keyword in GENRE_KEYWORDS.get('kpop', []):
+            self._add(keyword, self.kpop)
+        for genre, keywords in GENRE_KEYWORDS.items():
+            if genre in ['kpop', 'jpop', 'chinese_pop']:
+                continue
+            rank = len(self.genre_order)
+            self.genre_order.append(genre)
+            for keyword in keywords:
+                pid = self._add(keyword)
+                if pid is not None and pid not in self.genre_rank:
+                    self.genre_rank[pid] = rank
+        for keyword in ELECTRONIC_KEYWORDS:
+            self._add(keyword, self.electronic)
+        for si, info in enumerate(CHINESE_SUBGENRES.values()):
+            for words, weight in ((info.get('keywords', []), 10), (info.get('artists', []), 5)):
+                for w in words:
+                    pid = self._add(w)
+                    if pid is not None:
+                        self.subgenre_weights.setdefault(pid, []).append((si, weight))
+        self.automaton = _AhoCorasick(self.patterns)
+
+    def _add(self, word: str, role: Set[int] = None):
+        w = word.lower()
+        if not w:
+            return None
+        pid = self._pid.get(w)
+        if pid is None:
+            pid = len(self.patterns)
+            self._pid[w] = pid
+            self.patterns.append(w)
+        if role is not None:
+            role.add(pid)
+        return pid
+
+
+_VOCAB = None
+
+
+def _vocabulary() -> _GenreVocabulary:
+    global _VOCAB
+    if _VOCAB is None:
+        _VOCAB = _GenreVocabulary()
+    return _VOCAB
+
+
+def reset_genre_vocabulary():
+    """修改词表常量后调用，重建自动机并清空识别缓存"""
+    global _VOCAB
+    _VOCAB = None
+    _subgenre_from_text.cache_clear()
+    _detect_genre_normalized.cache_clear()
 
 
 def detect_chinese_subgenre(filename: str, title: str = '') -> str:
@@ -654,30 +785,22 @@ def detect_chinese_subgenre(filename: str, title: str = '') -> str:
     Returns:
         子风格名称，如 'chinese_traditional', 'chinese_rnb', 'chinese_hiphop' 等
     """
-    text = f"{filename} {title}".lower()
-    
-    # 按优先级检测子风格
-    subgenre_scores = {}
-    
-    for subgenre, info in CHINESE_SUBGENRES.items():
-        score = 0
-        
-        # 关键词匹配
-        for keyword in info.get('keywords', []):
-            if keyword.lower() in text:
-                score += 10
-        
-        # 歌手匹配
-        for artist in info.get('artists', []):
-            if artist.lower() in text:
-                score += 5
-        
-        if score > 0:
-            subgenre_scores[subgenre] = score
+    return _subgenre_from_text(f"{filename} {title}".lower())
+
+
+@lru_cache(maxsize=65536)
+def _subgenre_from_text(text: str) -> str:
+    vocab = _vocabulary()
+    # 关键词每命中一个 +10，歌手 +5（同一子风格词表内的重复词重复计分）
+    scores = [0] * len(vocab.subgenre_order)
+    for pid in vocab.automaton.find_all(text):
+        for si, weight in vocab.subgenre_weights.get(pid, ()):
+            scores[si] += weight
     
-    # 返回得分最高的子风格
-    if subgenre_scores:
-        return max(subgenre_scores, key=subgenre_scores.get)
+    # 返回得分最高的子风格（同分取词表中靠前者）
+    best = max(range(len(scores)), key=lambda i: scores[i]) if scores else -1
+    if best >= 0 and scores[best] > 0:
+        return vocab.subgenre_order[best]
     
     # 默认返回华语流行
     return 'chinese_pop'
@@ -721,48 +844,54 @@ def detect_genre_from_filename(filename: str) -> str:
     7. 风格关键词 → 对应风格
     8. remix/edit → house
     9. 默认 → electronic
-    """
-    name_lower = filename.lower()
     
+    【V12.1】所有词表一次自动机扫描，按小写文件名缓存结果
+    """
+    return _detect_genre_normalized(filename.lower())
+
+
+def detect_genres_batch(filenames: Iterable[str]) -> List[str]:
+    """批量检测整个曲库的风格（重复文件名只识别一次），结果与输入顺序对齐"""
+    return [_detect_genre_normalized(f.lower()) for f in filenames]
+
+
+@lru_cache(maxsize=65536)
+def _detect_genre_normalized(name_lower: str) -> str:
     # 1. 检查中文字符（最可靠的华语检测）
-    if has_chinese_characters(filename):
+    if has_chinese_characters(name_lower):
         # 进一步检测华语子风格
-        return detect_chinese_subgenre(filename)
+        return detect_chinese_subgenre(name_lower)
+    
+    vocab = _vocabulary()
+    found = vocab.automaton.find_all(name_lower)
     
     # 2. 检查华语歌手
-    for artist in CHINESE_ARTISTS:
-        if artist.lower() in name_lower:
-            return detect_chinese_subgenre(filename)
+    if found & vocab.chinese_artist:
+        return detect_chinese_subgenre(name_lower)
     
     # 3. 检查日文字符
-    if has_japanese_characters(filename):
+    if has_japanese_characters(name_lower):
         return 'jpop'
     
     # 4. 检查日语歌手
-    for artist in JAPANESE_ARTISTS:
-        if artist.lower() in name_lower:
-            return 'jpop'
+    if found & vocab.japanese_artist:
+        return 'jpop'
     
     # 5. 检查韩文字符
-    if has_korean_characters(filename):
+    if has_korean_characters(name_lower):
         return 'kpop'
     
     # 6. 检查K-Pop关键词
-    for keyword in GENRE_KEYWORDS.get('kpop', []):
-        if keyword.lower() in name_lower:
-            return 'kpop'
-    
-    # 7. 检查其他风格关键词
-    for genre, keywords in GENRE_KEYWORDS.items():
-        if genre in ['kpop', 'jpop', 'chinese_pop']:
-            continue  # 已经检查过
-        for keyword in keywords:
-            if keyword.lower() in name_lower:
-                return genre
+    if found & vocab.kpop:
+        return 'kpop'
+    
+    # 7. 检查其他风格关键词（GENRE_KEYWORDS 中靠前的风格优先）
+    ranks = [vocab.genre_rank[pid] for pid in found if pid in vocab.genre_rank]
+    if ranks:
+        return vocab.genre_order[min(ranks)]
     
     # 8. 检查remix/edit关键词（通常是electronic/house）
-    electronic_keywords = ['remix', 'edit', 'bootleg', 'flip', 'rework', 'mix']
-    if any(kw in name_lower for kw in electronic_keywords):
+    if found & vocab.electronic:
         return 'house'
     
     # 9. 默认
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Global Optimization Engine (V11.4)
+=========================================
+跨 Set 全局优化：在相邻 Set 之间移动/交换曲目，修复最弱过渡并平衡 Set 时长。
+
+- 边分数：调性 + BPM + 能量（权重取 ACTIVE_PROFILE），超出 max_bpm_jump / min_key_score 额外惩罚
+- 增量评估：任何移动只影响被移出/插入位置两侧的 2-3 条边 + 两个 Set 的时长，O(1) 求 delta
+- 评估顺序：相邻 Set 对按奇偶轮次分批（同一批内互不共享 Set），逐对评估并落地。
+  评分是纯 Python 计算、全程持有 GIL，线程池没有加速；每对的计算量（数百条边）又远小于
+  进程池序列化曲目 dict 的开销，因此串行执行
+- 预算：time_budget 秒 / max_rounds 轮 / 单轮改进低于 min_improvement 即停止
+
+被 enhanced_harmonic_set_sorter.create_enhanced_harmonic_sets 的 Phase 3 调用。
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from harmonic_utils import get_key_compatibility_flexible
+except ImportError:
+    def get_key_compatibility_flexible(current_key, next_key): return 50
+
+DEFAULT_TIME_BUDGET = 5.0      # 秒
+DEFAULT_MAX_ROUNDS = 50
+DEFAULT_MIN_IMPROVEMENT = 0.5  # 单轮总代价下降低于此值时停止
+WEAK_EDGES_PER_SET = 6         # 每个 Set 只围绕最弱的若干条过渡生成候选
+W_DURATION = 0.5               # 时长偏离均值每分钟的代价
+BPM_JUMP_PENALTY = 30.0
+KEY_FLOOR_PENALTY = 20.0
+DEFAULT_DURATION = 180
+
+
+class _Scorer:
+    """边代价（100 - 过渡分 + 硬约束惩罚），按曲目 id 缓存"""
+
+    def __init__(self, config: Dict):
+        self.max_bpm_jump = config.get('max_bpm_jump', 8.0)
+        self.min_key_score = config.get('min_key_score', 60.0)
+        weights = {}
+        profile = config.get('active_profile')
+        if profile is not None and hasattr(profile, 'weights'):
+            weights = profile.weights or {}
+        # 各 Profile 的 bpm_match 为 100-150 量级，key_match 为 0.5-1.0 倍率，这里归一到相对权重
+        w_bpm = float(weights.get('bpm_match', 100)) / 100.0
+        w_key = float(weights.get('key_match', 1.0))
+        w_energy = float(weights.get('energy_match', 15)) / 15.0
+        total = w_bpm + w_key + w_energy
+        self.w_bpm = w_bpm / total
+        self.w_key = w_key / total
+        self.w_energy = w_energy / total
+        self._cache: Dict[Tuple[int, int], float] = {}
+
+    def edge(self, a: Dict, b: Dict) -> float:
+        k = (id(a), id(b))
+        v = self._cache.get(k)
+        if v is not None:
+            return v
+        key_score = get_key_compatibility_flexible(a.get('key', '') or '', b.get('key', '') or '')
+        bpm_a, bpm_b = a.get('bpm', 0) or 0, b.get('bpm', 0) or 0
+        bpm_diff = abs(bpm_a - bpm_b) if bpm_a and bpm_b else 0.0
+        bpm_score = max(0.0, 100.0 - bpm_diff * 5.0)
+        energy_diff = abs((a.get('energy', 50) or 50) - (b.get('energy', 50) or 50))
+        energy_score = max(0.0, 100.0 - energy_diff * 2.0)
+        score = key_score * self.w_key + bpm_score * self.w_bpm + energy_score * self.w_energy
+        cost = 100.0 - score
+        if bpm_diff > self.max_bpm_jump:
+            cost += BPM_JUMP_PENALTY
+        if key_score < self.min_key_score:
+            cost += KEY_FLOOR_PENALTY
+        self._cache[k] = cost
+        return cost
+
+
+def _duration(track: Dict) -> float:
+    return track.get('duration', DEFAULT_DURATION) or DEFAULT_DURATION
+
+
+def _remove_delta(seq: List[Dict], i: int, sc: _Scorer) -> float:
+    """摘除 seq[i] 的边代价变化"""
+    d = 0.0
+    has_prev, has_next = i > 0, i + 1 < len(seq)
+    if has_prev:
+        d -= sc.edge(seq[i - 1], seq[i])
+    if has_next:
+        d -= sc.edge(seq[i], seq[i + 1])
+    if has_prev and has_next:
+        d += sc.edge(seq[i - 1], seq[i + 1])
+    return d
+
+
+def _insert_delta(seq: List[Dict], pos: int, x: Dict, sc: _Scorer) -> float:
+    """把 x 插到 seq[pos] 之前的边代价变化"""
+    d = 0.0
+    has_prev, has_next = pos > 0, pos < len(seq)
+    if has_prev:
+        d += sc.edge(seq[pos - 1], x)
+    if has_next:
+        d += sc.edge(x, seq[pos])
+    if has_prev and has_next:
+        d -= sc.edge(seq[pos - 1], seq[pos])
+    return d
+
+
+def _replace_delta(seq: List[Dict], i: int, x: Dict, sc: _Scorer) -> float:
+    """用 x 替换 seq[i] 的边代价变化（交换的一侧）"""
+    d = 0.0
+    if i > 0:
+        d += sc.edge(seq[i - 1], x) - sc.edge(seq[i - 1], seq[i])
+    if i + 1 < len(seq):
+        d += sc.edge(x, seq[i + 1]) - sc.edge(seq[i], seq[i + 1])
+    return d
+
+
+def _duration_cost(total_seconds: float, mean_seconds: float) -> float:
+    return abs(total_seconds - mean_seconds) / 60.0 * W_DURATION
+
+
+def _weak_positions(seq: List[Dict], sc: _Scorer, k: int) -> List[int]:
+    """最弱过渡两端的曲目下标"""
+    if len(seq) < 2:
+        return list(range(len(seq)))
+    edges = sorted(range(len(seq) - 1), key=lambda i: sc.edge(seq[i], seq[i + 1]), reverse=True)[:k]
+    positions = set()
+    for i in edges:
+        positions.add(i)
+        positions.add(i + 1)
+    return sorted(positions)
+
+
+def _best_move_for_pair(a: List[Dict], b: List[Dict], dur_a: float, dur_b: float, mean_dur: float,
+                        sc: _Scorer, min_size: int, max_size: int) -> Optional[Tuple[float, tuple]]:
+    """
+    评估相邻 Set (a, b) 之间的所有候选移动，返回 (delta, move)；delta < 0 表示改进
+    move: ('move', src, i, pos) 或 ('swap', i, j)，src 0=a→b，1=b→a
+    """
+    best: Optional[Tuple[float, tuple]] = None
+    base_dur = _duration_cost(dur_a, mean_dur) + _duration_cost(dur_b, mean_dur)
+    weak_a = _weak_positions(a, sc, WEAK_EDGES_PER_SET)
+    weak_b = _weak_positions(b, sc, WEAK_EDGES_PER_SET)
+
+    # 1. 单曲移动（弱边端点 → 对方任意位置）
+    for src, (s_seq, d_seq, weak) in enumerate(((a, b, weak_a), (b, a, weak_b))):
+        if len(s_seq) <= min_size or len(d_seq) >= max_size:
+            continue
+        for i in weak:
+            x = s_seq[i]
+            rem = _remove_delta(s_seq, i, sc)
+            xd = _duration(x)
+            if src == 0:
+                dur_cost = _duration_cost(dur_a - xd, mean_dur) + _duration_cost(dur_b + xd, mean_dur)
+            else:
+                dur_cost = _duration_cost(dur_a + xd, mean_dur) + _duration_cost(dur_b - xd, mean_dur)
+            dur_delta = dur_cost - base_dur
+            for pos in range(len(d_seq) + 1):
+                delta = rem + _insert_delta(d_seq, pos, x, sc) + dur_delta
+                if best is None or delta < best[0]:
+                    best = (delta, ('move', src, i, pos))
+
+    # 2. 交换（双方弱边端点互换）
+    for i in weak_a:
+        xa = a[i]
+        for j in weak_b:
+            xb = b[j]
+            delta = _replace_delta(a, i, xb, sc) + _replace_delta(b, j, xa, sc)
+            shift = _duration(xb) - _duration(xa)
+            delta += _duration_cost(dur_a + shift, mean_dur) + _duration_cost(dur_b - shift, mean_dur) - base_dur
+            if best is None or delta < best[0]:
+                best = (delta, ('swap', i, j))
+    return best
+
+
+def _apply_move(a: List[Dict], b: List[Dict], move: tuple):
+    if move[0] == 'move':
+        _, src, i, pos = move
+        s_seq, d_seq = (a, b) if src == 0 else (b, a)
+        x = s_seq.pop(i)
+        d_seq.insert(pos, x)
+    else:
+        _, i, j = move
+        a[i], b[j] = b[j], a[i]
+
+
+def optimize_global_sets(sets: List[List[Dict]], config: Dict, progress_logger=None) -> int:
+    """
+    [V11.4] 跨 Set 全局优化（原地修改 sets）
+    Args:
+        sets: 各 Set 的曲目列表
+        config: max_bpm_jump / min_key_score / active_profile，
+                可选 time_budget / max_rounds / min_improvement / min_songs / max_songs
+    Returns:
+        被改动的 Set 数量
+    """
+    if not sets or len(sets) < 2:
+        return 0
+    # Dual Mode：Set 0 是 Boutique 精选，与后续 Live Set 存在重叠曲目，不参与跨 Set 移动
+    first = 1 if any(isinstance(t, dict) and t.get('is_boutique_start') for t in sets[0]) else 0
+    indices = list(range(first, len(sets)))
+    if len(indices) < 2:
+        return 0
+
+    sc = _Scorer(config)
+    time_budget = config.get('time_budget', DEFAULT_TIME_BUDGET)
+    max_rounds = config.get('max_rounds', DEFAULT_MAX_ROUNDS)
+    min_improvement = config.get('min_improvement', DEFAULT_MIN_IMPROVEMENT)
+    min_size = config.get('min_songs', 1)
+    max_size = config.get('max_songs', 10 ** 6)
+
+    durations = {idx: sum(_duration(t) for t in sets[idx]) for idx in indices}
+    mean_dur = sum(durations.values()) / len(indices)
+    changed = set()
+    started = time.time()
+    total_gain = 0.0
+    rounds = 0
+
+    while rounds < max_rounds and time.time() - started < time_budget:
+        rounds += 1
+        round_gain = 0.0
+        # 奇偶分批：同一批的 Set 对互不重叠，每对的最优移动互不影响
+        for parity in (0, 1):
+            for k in range(parity, len(indices) - 1, 2):
+                p, q = indices[k], indices[k + 1]
+                result = _best_move_for_pair(sets[p], sets[q], durations[p], durations[q],
+                                             mean_dur, sc, min_size, max_size)
+                if not result or result[0] >= -1e-6:
+                    continue
+                delta, move = result
+                _apply_move(sets[p], sets[q], move)
+                durations[p] = sum(_duration(t) for t in sets[p])
+                durations[q] = sum(_duration(t) for t in sets[q])
+                changed.update((p, q))
+                round_gain -= delta
+            if time.time() - started >= time_budget:
+                break
+        total_gain += round_gain
+        if round_gain < min_improvement:
+            break
+
+    if progress_logger and changed:
+        try:
+            progress_logger.log(
+                f"[全局优化] {rounds} 轮，代价下降 {total_gain:.1f}，改动 {len(changed)} 个 Set "
+                f"({time.time() - started:.2f}s)", console=False)
+        except Exception:
+            pass
+    return len(changed)
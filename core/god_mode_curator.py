@@ -11,6 +11,18 @@ sys.path.insert(0, str(current_dir))
 
 from skills.mashup_intelligence.scripts.core import SonicMatcher
 
+sys.path.insert(0, str(Path(__file__).parent))
+try:
+    # [V12.8] 种子 → 全库检索索引
+    from sonic_index import SonicSimilarityIndex, track_view
+    HAS_SONIC_INDEX = True
+except ImportError:
+    HAS_SONIC_INDEX = False
+
+    def track_view(key, entry):
+        path = entry.get('file_path') or key
+        return {'track_info': {'title': os.path.basename(path), 'file_path': path}, 'analysis': entry.get('analysis', {}) or {}}
+
 class GodModeCurator:
     """The Strongest Brain (V34.0) - Multidimensional Point-Cloud Curator"""
     
@@ -19,10 +31,14 @@ class GodModeCurator:
         with open(cache_path, 'r', encoding='utf-8') as f:
             self.cache = json.load(f)
         self.matcher = SonicMatcher()
+        self.index = SonicSimilarityIndex(self.cache, self.matcher) if HAS_SONIC_INDEX else None
         print(f"🧠 [X-Ray] Engine Online. Library Size: {len(self.cache)} tracks.")
 
-    def find_matches(self, seed_query: str, limit: int = 5) -> List[Dict]:
+    def find_matches(self, seed_query: str, limit: int = 5, bpm_window: float = None,
+                     harmonic_only: bool = False) -> List[Dict]:
         """Find the best God-Mode matches for a seed track"""
+        if self.index is not None:
+            return self._find_matches_indexed(seed_query, limit, bpm_window, harmonic_only)
         
         # 1. Identify seed track
         seed_key = None
@@ -53,7 +69,7 @@ class GodModeCurator:
             target_god = target_analysis.get('god_mode_details', {})
             
             # Use the V33.7 Axiom Matcher
-            score, reasons = self.matcher.calculate_bonus(seed_analysis, target_analysis)
+            score, reasons = self.matcher.calculate_bonus(track_view(seed_key, seed_data), track_view(key, target_data))
             
             # Enhanced X-Ray Metrics: Deep DNA Similarity
             dna_synergy_score = 0.0
@@ -89,6 +105,33 @@ class GodModeCurator:
         matches.sort(key=lambda x: x['score'], reverse=True)
         return matches[:limit]
 
+    def _find_matches_indexed(self, seed_query: str, limit: int, bpm_window: float = None,
+                              harmonic_only: bool = False) -> List[Dict]:
+        """[V12.8] 索引检索：向量化算出确定分，只有拨弦互补可能触发的候选才逐首 calculate_bonus"""
+        row = self.index.find_seed(seed_query)
+        if row is None:
+            print(f"❌ Seed track not found: {seed_query}")
+            return []
+
+        seed_key = self.index.keys[row]
+        seed_analysis = self.index.views[row]['analysis']
+        print(f"🎯 Seed Target: {os.path.basename(seed_key)}")
+        print(f"🧬 Seed DNA Alpha: {seed_analysis.get('sonic_dna', [])[:5]}...")
+
+        matches = []
+        for m in self.index.query(row, limit, bpm_window=bpm_window, harmonic_only=harmonic_only):
+            key = self.index.keys[m['row']]
+            matches.append({
+                "file": key,
+                "name": os.path.basename(key),
+                "score": m['score'],
+                "reasons": m['reasons'],
+                "shared_dna": m['shared_dna'],
+                "similarity": m['similarity'],
+                "god_details": self.index.views[m['row']]['analysis'].get('god_mode_details', {})
+            })
+        return matches
+
     def generate_xray_report(self, seed_query: str, limit: int = 5):
         """Generate a human-readable X-Ray Curation Report"""
         results = self.find_matches(seed_query, limit)
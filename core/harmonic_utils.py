@@ -7,6 +7,13 @@
 
 from functools import lru_cache
 
+# 【V12.0】统一整数调性编码 + 预计算兼容表
+try:
+    from key_codes import KEY_COMPAT_ROWS, key_code
+    HAS_KEY_CODES = True
+except ImportError:
+    HAS_KEY_CODES = False
+
 # Camelot轮盘兼容规则（快速查找字典，用于简单场景）
 CAMELOT_COMPATIBLE_DICT = {
     '1A': ['1A', '12A', '2A', '1B'],
@@ -147,6 +154,9 @@ def get_key_compatibility_flexible(current_key: str, next_key: str) -> int:
     if not current_key or current_key == "未知" or not next_key or next_key == "未知":
         return 50  # 未知调性给中等分数，允许使用
     
+    if HAS_KEY_CODES:
+        return KEY_COMPAT_ROWS[key_code(current_key)][key_code(next_key)]
+    
     # Open Key System兼容：自动转换Open Key格式到Camelot格式
     current_key = convert_open_key_to_camelot(current_key)
     next_key = convert_open_key_to_camelot(next_key)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Incremental Re-Sort (V11.1)
+==================================
+播放列表小幅变动时的增量修复，避免整条流水线（分组/全排序/平滑/全局优化）重跑。
+
+流程：
+1. 每次完整生成后持久化该播放列表的 Set 排列、各曲目阶段 (assigned_phase) 与相邻过渡分 (playlist_order_cache.json)
+2. 下次运行时对比成员差异 (新增/移除)
+3. 差异足够小时：移除曲目直接拼接 (splice)，新增曲目按最便宜插入 (cheapest insertion) 落位
+4. 仅在被改动位置附近做有限步的局部搜索 (Or-opt 重定位)，尽量不打乱 DJ 已排练好的顺序
+5. 保留曲目沿用快照中的阶段，新插入曲目继承所在位置前一首（Set 开头则后一首）的阶段
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cache_manager import DEFAULT_CACHE_PATH
+
+# 与分析缓存放在同一目录，不写进源码树
+DEFAULT_STORE_FILE = Path(DEFAULT_CACHE_PATH).with_name("playlist_order_cache.json")
+
+# 成员变动超过该比例 (或绝对数量) 时放弃增量修复，走完整流水线
+MAX_CHANGE_RATIO = 0.10
+MAX_CHANGE_ABS = 20
+# 局部搜索：每个改动位置左右窗口大小 & 最大轮数
+LOCAL_SEARCH_WINDOW = 4
+LOCAL_SEARCH_PASSES = 3
+
+
+def track_key(track: Dict) -> str:
+    """曲目唯一标识：标准化后的文件路径（与全局去重口径一致）"""
+    return str(track.get('file_path', '')).lower().replace('\\', '/')
+
+
+class PlaylistOrderStore:
+    """[V11.1] 播放列表排列快照的读写（原子化保存，与分析缓存同一套路）"""
+
+    def __init__(self, store_file: Optional[Path] = None):
+        self.store_file = Path(store_file) if store_file else DEFAULT_STORE_FILE
+        self._data = None
+
+    def _load_all(self) -> Dict:
+        if self._data is not None:
+            return self._data
+        self._data = {}
+        if self.store_file.exists():
+            try:
+                with open(self.store_file, 'r', encoding='utf-8') as f:
+                    self._data = json.load(f) or {}
+            except Exception as e:
+                print(f"  [增量排序] 读取排列快照失败: {e}")
+                self._data = {}
+        return self._data
+
+    def load(self, playlist_key: str) -> Optional[Dict]:
+        return self._load_all().get(playlist_key)
+
+    def save(self, playlist_key: str, sets: List[List[Dict]], signature: Dict,
+             score_fn: Callable[[Dict, Dict], float]) -> bool:
+        """保存排列快照：每个 Set 的曲目 key 序列 + 阶段 + 相邻过渡分"""
+        snapshot_sets = []
+        for set_tracks in sets:
+            members = [t for t in set_tracks if isinstance(t, dict) and not t.get('is_bridge')]
+            if not members:
+                continue
+            keys = [track_key(t) for t in members]
+            scores = [round(float(score_fn(members[i], members[i + 1])), 2) for i in range(len(members) - 1)]
+            phases = [t.get('assigned_phase') for t in members]
+            snapshot_sets.append({'tracks': keys, 'phases': phases, 'scores': scores})
+
+        data = self._load_all()
+        data[playlist_key] = {
+            'saved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'signature': signature,
+            'sets': snapshot_sets,
+        }
+        return self._save_atomic(data)
+
+    def _save_atomic(self, data: Dict) -> bool:
+        self.store_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=str(self.store_file.parent), prefix="order_temp_", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.store_file)
+            return True
+        except Exception as e:
+            print(f"  [增量排序] 保存排列快照失败: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+
+def diff_membership(snapshot: Dict, tracks: List[Dict]) -> Tuple[List[Dict], set, int]:
+    """
+    对比快照与当前播放列表成员
+    Returns:
+        (新增曲目列表, 被移除的 key 集合, 快照内曲目总数)
+    """
+    previous_keys = set()
+    for s in snapshot.get('sets', []):
+        previous_keys.update(s.get('tracks', []))
+    current = {}
+    for t in tracks:
+        k = track_key(t)
+        if k and k not in current:
+            current[k] = t
+    added = [t for k, t in current.items() if k not in previous_keys]
+    removed = {k for k in previous_keys if k not in current}
+    return added, removed, len(previous_keys)
+
+
+def is_small_change(n_added: int, n_removed: int, n_previous: int,
+                    max_ratio: float = MAX_CHANGE_RATIO, max_abs: int = MAX_CHANGE_ABS) -> bool:
+    """差异是否小到值得增量修复（无变化也算，直接复用旧排列）"""
+    if n_previous <= 0:
+        return False
+    changed = n_added + n_removed
+    return changed <= max_abs and changed <= n_previous * max_ratio
+
+
+class _EdgeScorer:
+    """相邻过渡分缓存：快照中未被打断的边直接复用旧分数，新边才调用 score_fn"""
+
+    def __init__(self, score_fn: Callable[[Dict, Dict], float], cached: Dict[Tuple[str, str], float]):
+        self.score_fn = score_fn
+        self.cache = dict(cached)
+
+    def __call__(self, a: Dict, b: Dict) -> float:
+        k = (track_key(a), track_key(b))
+        v = self.cache.get(k)
+        if v is None:
+            v = float(self.score_fn(a, b))
+            self.cache[k] = v
+        return v
+
+
+def _insertion_gain(seq: List[Dict], pos: int, track: Dict, edge: _EdgeScorer) -> float:
+    """把 track 插到 seq[pos] 之前的分数增量（越大越好）"""
+    prev_t = seq[pos - 1] if pos > 0 else None
+    next_t = seq[pos] if pos < len(seq) else None
+    gain = 0.0
+    if prev_t is not None:
+        gain += edge(prev_t, track)
+    if next_t is not None:
+        gain += edge(track, next_t)
+    if prev_t is not None and next_t is not None:
+        gain -= edge(prev_t, next_t)
+    # 头尾只有一条边，用平均分补齐，避免所有新曲目都被推到 Set 两端
+    if prev_t is None or next_t is None:
+        gain -= 50.0
+    return gain
+
+
+def _removal_gain(seq: List[Dict], idx: int, edge: _EdgeScorer) -> float:
+    """把 seq[idx] 摘出后的分数增量"""
+    prev_t = seq[idx - 1] if idx > 0 else None
+    next_t = seq[idx + 1] if idx + 1 < len(seq) else None
+    gain = 0.0
+    if prev_t is not None:
+        gain -= edge(prev_t, seq[idx])
+    if next_t is not None:
+        gain -= edge(seq[idx], next_t)
+    if prev_t is not None and next_t is not None:
+        gain += edge(prev_t, next_t)
+    if prev_t is None or next_t is None:
+        gain += 50.0
+    return gain
+
+
+def _local_search(seq: List[Dict], touched: set, edge: _EdgeScorer,
+                  window: int = LOCAL_SEARCH_WINDOW, passes: int = LOCAL_SEARCH_PASSES) -> int:
+    """
+    有限步 Or-opt：只允许“新插入的曲目”在自身附近窗口内重定位，
+    已排练的曲目相对顺序保持不变。返回改进次数。
+    """
+    moves = 0
+    for _ in range(passes):
+        improved = False
+        for idx in range(len(seq)):
+            t = seq[idx]
+            if track_key(t) not in touched:
+                continue
+            base = _removal_gain(seq, idx, edge)
+            rest = seq[:idx] + seq[idx + 1:]
+            best_pos, best_delta = None, 1e-6
+            lo = max(0, idx - window)
+            hi = min(len(rest), idx + window)
+            for pos in range(lo, hi + 1):
+                if pos == idx:
+                    continue
+                delta = base + _insertion_gain(rest, pos, t, edge)
+                if delta > best_delta:
+                    best_pos, best_delta = pos, delta
+            if best_pos is not None:
+                rest.insert(best_pos, t)
+                seq[:] = rest
+                moves += 1
+                improved = True
+        if not improved:
+            break
+    return moves
+
+
+def _inherit_phases(seq: List[Dict], touched: set) -> None:
+    """新插入曲目继承前一首保留曲目的阶段（位于 Set 开头时取后一首）"""
+    for idx, t in enumerate(seq):
+        if track_key(t) not in touched:
+            continue
+        phase = None
+        for j in list(range(idx - 1, -1, -1)) + list(range(idx + 1, len(seq))):
+            if track_key(seq[j]) not in touched and seq[j].get('assigned_phase'):
+                phase = seq[j]['assigned_phase']
+                break
+        if phase:
+            t['assigned_phase'] = phase
+
+
+def repair_sets(snapshot: Dict, tracks: List[Dict], score_fn: Callable[[Dict, Dict], float],
+                max_set_size: int = 60) -> Optional[List[List[Dict]]]:
+    """
+    [V11.1] 基于快照修复 Set 排列
+    - 移除：直接拼接前后两首（旧边分数由快照提供）
+    - 新增：在所有 Set 的所有缝隙中找最便宜插入位置（已满的 Set 跳过）
+    - 局部搜索：仅针对新曲目做窗口内 Or-opt
+    - 阶段：保留曲目恢复快照中的 assigned_phase，新曲目继承相邻曲目的阶段
+    Returns:
+        修复后的 sets；若快照无法映射到当前曲目（或是不含阶段的旧版快照）则返回 None
+    """
+    by_key = {}
+    for t in tracks:
+        k = track_key(t)
+        if k and k not in by_key:
+            by_key[k] = t
+
+    cached_edges = {}
+    sets = []
+    for s in snapshot.get('sets', []):
+        keys = s.get('tracks', [])
+        scores = s.get('scores', [])
+        phases = s.get('phases')
+        if phases is None or len(phases) != len(keys):
+            return None
+        for i in range(min(len(keys) - 1, len(scores))):
+            cached_edges[(keys[i], keys[i + 1])] = scores[i]
+        seq = []
+        for k, phase in zip(keys, phases):
+            t = by_key.get(k)
+            if t is None:
+                continue
+            if phase:
+                t['assigned_phase'] = phase
+            seq.append(t)
+        if seq:
+            sets.append(seq)
+    if not sets:
+        return None
+
+    edge = _EdgeScorer(score_fn, cached_edges)
+    added, _, _ = diff_membership(snapshot, tracks)
+
+    touched = set()
+    for t in added:
+        best = None  # (gain, set_idx, pos)
+        for s_idx, seq in enumerate(sets):
+            if len(seq) >= max_set_size:
+                continue
+            for pos in range(len(seq) + 1):
+                g = _insertion_gain(seq, pos, t, edge)
+                if best is None or g > best[0]:
+                    best = (g, s_idx, pos)
+        if best is None:
+            # 所有 Set 都已满：追加到最短的 Set 末尾
+            s_idx = min(range(len(sets)), key=lambda i: len(sets[i]))
+            best = (0.0, s_idx, len(sets[s_idx]))
+        _, s_idx, pos = best
+        sets[s_idx].insert(pos, t)
+        touched.add(track_key(t))
+
+    if touched:
+        for seq in sets:
+            _local_search(seq, touched, edge)
+            _inherit_phases(seq, touched)
+
+    # 回填过渡分，供报告/后续流程使用
+    for seq in sets:
+        for i in range(1, len(seq)):
+            seq[i]['_transition_score'] = edge(seq[i - 1], seq[i])
+
+    return sets
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Canonical Key Codes (V12.0)
+==================================
+调性的统一整数编码与预计算兼容矩阵。
+
+- 编码：Camelot 1A..12B → 0..23（code = (号-1)*2 + (A=0 / B=1)），无法识别 → 24 (UNKNOWN_KEY_CODE)
+- 解析一次：Camelot / Open Key (1m-12m, 1d-12d，与 convert_open_key_to_camelot 相同口径) /
+  音名（"A Minor"、"F#m"、"Bb" 等）/ Rekordbox DjmdKey 对象，均在加载时折算为整数
+- 所有兼容规则都是 25×25 的 NumPy 表，按 [当前, 下一首] 查表；
+  对候选数组可直接 KEY_COMPAT_TABLE[cur_code, codes] 向量化取分
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+N_KEYS = 24
+UNKNOWN_KEY_CODE = 24
+
+_CAMELOT_RE = re.compile(r'^(\d{1,2})([AB])$', re.IGNORECASE)
+_OPEN_KEY_RE = re.compile(r'^(\d{1,2})([md])$', re.IGNORECASE)
+
+# 音名 → Camelot（与 common_utils._camelot_map 相同，并补充等音写法）
+NAME_TO_CAMELOT = {
+    "C Major": "8B", "G Major": "9B", "D Major": "10B", "A Major": "11B", "E Major": "12B", "B Major": "1B",
+    "F# Major": "2B", "C# Major": "3B", "G# Major": "4B", "D# Major": "5B", "A# Major": "6B", "F Major": "7B",
+    "A Minor": "8A", "E Minor": "9A", "B Minor": "10A", "F# Minor": "11A", "C# Minor": "12A", "G# Minor": "1A",
+    "D# Minor": "2A", "A# Minor": "3A", "F Minor": "4A", "C Minor": "5A", "G Minor": "6A", "D Minor": "7A",
+    "C": "8B", "G": "9B", "D": "10B", "A": "11B", "E": "12B", "B": "1B",
+    "F#": "2B", "Gb": "2B", "C#": "3B", "Db": "3B", "G#": "4B", "Ab": "4B",
+    "D#": "5B", "Eb": "5B", "A#": "6B", "Bb": "6B", "F": "7B",
+    "Am": "8A", "Em": "9A", "Bm": "10A", "F#m": "11A", "Gbm": "11A", "C#m": "12A", "Dbm": "12A",
+    "G#m": "1A", "Abm": "1A", "D#m": "2A", "Ebm": "2A", "A#m": "3A", "Bbm": "3A",
+    "Fm": "4A", "Cm": "5A", "Gm": "6A", "Dm": "7A",
+}
+
+
+def _code(num: int, letter: str) -> int:
+    return (num - 1) * 2 + (0 if letter.upper() == 'A' else 1)
+
+
+def code_number(code: int) -> int:
+    """Camelot 号 1-12（未知返回 0）"""
+    return code // 2 + 1 if 0 <= code < N_KEYS else 0
+
+
+def code_is_major(code: int) -> bool:
+    return 0 <= code < N_KEYS and code % 2 == 1
+
+
+def camelot_name(code: int) -> str:
+    if not 0 <= code < N_KEYS:
+        return "未知"
+    return f"{code_number(code)}{'B' if code_is_major(code) else 'A'}"
+
+
+@lru_cache(maxsize=4096)
+def _parse_key_str(key: str) -> int:
+    k = key.strip()
+    if not k or k == "未知":
+        return UNKNOWN_KEY_CODE
+    m = _CAMELOT_RE.match(k)
+    if m:
+        num = int(m.group(1))
+        return _code(num, m.group(2)) if 1 <= num <= 12 else UNKNOWN_KEY_CODE
+    m = _OPEN_KEY_RE.match(k)
+    if m:
+        num = int(m.group(1))
+        if not 1 <= num <= 12:
+            return UNKNOWN_KEY_CODE
+        return _code(num, 'A' if m.group(2).lower() == 'm' else 'B')
+    cam = NAME_TO_CAMELOT.get(k)
+    if cam is None:
+        cleaned = k.replace(" Major", "").replace(" Minor", "").replace("maj", "").replace("min", "m").strip()
+        cam = NAME_TO_CAMELOT.get(cleaned)
+    if cam is None:
+        return UNKNOWN_KEY_CODE
+    return _code(int(cam[:-1]), cam[-1])
+
+
+def key_code(key) -> int:
+    """任意调性表示 → 0..23 / UNKNOWN_KEY_CODE"""
+    if key is None:
+        return UNKNOWN_KEY_CODE
+    if isinstance(key, (int, np.integer)) and not isinstance(key, bool):
+        # 数据库内部 ID 等整数一律视为未知（与 convert_open_key_to_camelot 一致）
+        return UNKNOWN_KEY_CODE
+    if hasattr(key, 'Name'):  # Rekordbox DjmdKey
+        key = key.Name
+        if not key:
+            return UNKNOWN_KEY_CODE
+    if not isinstance(key, str):
+        try:
+            key = str(key)
+        except Exception:
+            return UNKNOWN_KEY_CODE
+    return _parse_key_str(key)
+
+
+def track_key_code(track: Dict) -> int:
+    """曲目的调性编码：加载时写入 track['_key_code']，key 字段变化后自动重算"""
+    key = track.get('key')
+    code = track.get('_key_code')
+    if code is None or track.get('_key_code_src') != key:
+        code = key_code(key)
+        track['_key_code'] = code
+        track['_key_code_src'] = key
+    return code
+
+
+def assign_key_codes(tracks: Iterable[Dict]) -> np.ndarray:
+    """批量写入调性编码，返回与 tracks 对齐的 int8 数组"""
+    return np.fromiter((track_key_code(t) for t in tracks), dtype=np.int8)
+
+
+# ---------- 预计算规则表 ----------
+def _circle_distance(a: int, b: int) -> int:
+    direct = abs(a - b)
+    return min(direct, 12 - direct)
+
+
+def _flexible_rule(a: int, b: int) -> int:
+    """get_key_compatibility_flexible 的 T 字混音 + 5 度圈评分"""
+    n1, n2 = code_number(a), code_number(b)
+    same_mode = code_is_major(a) == code_is_major(b)
+    if n1 == n2:
+        return 100  # 同调 / 同号换调式
+    diff = _circle_distance(n1, n2)
+    if diff == 1:
+        return 95 if same_mode else 85
+    if diff == 2:
+        return 85 if same_mode else 75
+    if diff <= 4:
+        return 70 if same_mode else 60
+    if diff == 5:
+        return 45 if same_mode else 35
+    return 30 if same_mode else 20
+
+
+def _advanced_rule(a: int, b: int) -> int:
+    """common_utils._keys_compatible：同调 100 / 同调式相邻 80 / 相对大小调 60 / 其余 0"""
+    if a == b:
+        return 100
+    n1, n2 = code_number(a), code_number(b)
+    if code_is_major(a) == code_is_major(b) and _circle_distance(n1, n2) == 1:
+        return 80
+    if n1 == n2:
+        return 60
+    return 0
+
+
+def _build_table(rule, unknown_value: int, dtype=np.int16) -> np.ndarray:
+    table = np.full((N_KEYS + 1, N_KEYS + 1), unknown_value, dtype=dtype)
+    for a in range(N_KEYS):
+        for b in range(N_KEYS):
+            table[a, b] = rule(a, b)
+    table.setflags(write=False)
+    return table
+
+
+KEY_COMPAT_TABLE = _build_table(_flexible_rule, 50)
+ADVANCED_HARMONIC_TABLE = _build_table(_advanced_rule, 0)
+# 5 度圈距离（0-6），未知为 -1
+KEY_DISTANCE_TABLE = _build_table(lambda a, b: _circle_distance(code_number(a), code_number(b)), -1, dtype=np.int8)
+
+ADVANCED_HARMONIC_REASONS = {100: "Perfect Match", 80: "Harmonic Neighbor", 60: "Relative Major/Minor", 0: "Incompatible"}
+
+# 纯 Python 行表：逐个标量查表时比 NumPy 标量索引快
+KEY_COMPAT_ROWS: List[List[int]] = KEY_COMPAT_TABLE.tolist()
+
+
+def key_compatibility(a, b) -> int:
+    """标量版：两个调性（任意表示）的 T 字混音兼容分"""
+    return KEY_COMPAT_ROWS[key_code(a)][key_code(b)]
+
+
+def compat_scores(code: int, codes, table: Optional[np.ndarray] = None) -> np.ndarray:
+    """向量版：一个调性对候选调性编码数组的兼容分"""
+    table = KEY_COMPAT_TABLE if table is None else table
+    return table[code, np.asarray(codes, dtype=np.intp)]
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Live Next-Track Engine (V11.9)
+=====================================
+现场模式"下一首放什么"的限时查询（不再整条流水线重跑）。
+
+- 常驻：歌单的曲目特征、标题身份索引、KD-Tree 候选索引、过渡分缓存（同一对只算一次）
+- 输入：正在播放的曲目、已播历史、剩余时间
+- 输出：按得分排序的 top-N 候选，硬截止时间内必定返回（默认 50ms）
+- 随时可停（anytime），时间越多排序越好：
+    1. 近邻候选打分：过渡分（调性/BPM/能量）+ 按剩余时间推算的能量阶段贴合度 + Remix 同歌拦截
+    2. 一步前瞻：按基础分从高到低为每个候选加上"它之后最好能接什么"的分数（后继取阶段 1 的头部候选），
+       避免把自己逼进死角
+    3. 扩大候选范围至全部未播曲目（大歌单才有此阶段），新候选补做前瞻
+第 1 阶段与完整排序器单轮贪心使用同一套核心指标，质量可比。
+
+[V13.1]
+- 排序器通过 score_fn 注入单轮贪心所用的完整候选评分（_calculate_candidate_score），
+  未注入时退回内置的调性/BPM/能量轻量过渡分；前瞻只估计"下一步能否接得上"，始终用缓存的轻量过渡分
+- 前瞻加分只在同样拿到加分的候选之间比较：截止时按基础分排序后完整前瞻过的前缀按总分排在前，
+  其余按基础分随后；第 3 阶段未完成时沿用阶段 2 的排名；第 1 阶段来不及打分的近邻按轻量过渡分垫底，
+  保证返回 top_n 条
+- 已播集合按差量同步：新播曲目在索引里惰性摘除，撤销的曲目直接复活节点，
+  同步代价只与已播曲目数有关，不再每次查询 O(N) 重建
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+try:
+    from harmonic_utils import get_key_compatibility_flexible
+except ImportError:
+    def get_key_compatibility_flexible(current_key, next_key): return 50
+
+try:
+    from candidate_index import TrackFeatureIndex
+except ImportError:
+    TrackFeatureIndex = None
+
+try:
+    from title_identity import TitleIdentityIndex
+except ImportError:
+    TitleIdentityIndex = None
+
+DEFAULT_DEADLINE_MS = 50.0
+DEFAULT_TOP_N = 10
+DEFAULT_SET_MINUTES = 90.0
+DEFAULT_DURATION = 180
+NEAREST_K = 60            # 第 1 阶段近邻候选数
+LOOKAHEAD_K = 20          # 前瞻的后继池大小（阶段 1 基础分前若干名）
+LOOKAHEAD_WEIGHT = 0.3
+ENERGY_BAND_PENALTY = 0.5  # 能量超出阶段区间每点扣分
+REMIX_PENALTY = 10000.0
+INDEX_MIN_TRACKS = 200    # 小歌单直接全量打分
+SAFETY_FRACTION = 0.15    # 截止时间预留比例
+SAFETY_MAX_MS = 8.0
+
+# 与 enhanced_harmonic_set_sorter.get_energy_phase_target 的备选硬分配一致
+PHASE_BANDS = (
+    (0.20, 30, 55, "Warm-up"),
+    (0.40, 50, 70, "Build-up"),
+    (0.75, 65, 85, "Peak"),
+    (0.90, 70, 90, "Sustain"),
+    (1.01, 45, 70, "Cool-down"),
+)
+
+
+def bpm_compatibility(current_bpm: float, next_bpm: float) -> int:
+    """与排序器 get_bpm_compatibility_flexible 相同的分档"""
+    if not current_bpm or not next_bpm:
+        return 60
+    diff = abs(current_bpm - next_bpm)
+    for limit, score in ((2, 100), (4, 90), (6, 80), (8, 70), (12, 60), (16, 50), (20, 40)):
+        if diff <= limit:
+            return score
+    return 30
+
+
+def phase_band(progress: float) -> Tuple[int, int, str]:
+    for limit, lo, hi, name in PHASE_BANDS:
+        if progress <= limit:
+            return lo, hi, name
+    return PHASE_BANDS[-1][1:]
+
+
+# score_fn(current, cand, band, placed) -> float；placed 为已播曲目（含 current），按播放顺序
+ScoreFn = Callable[[Dict, Dict, Tuple[int, int, str], List[Dict]], float]
+
+
+def _duration(track: Dict) -> float:
+    return track.get('duration', DEFAULT_DURATION) or DEFAULT_DURATION
+
+
+class _Deadline:
+    __slots__ = ('end',)
+
+    def __init__(self, budget_ms: float):
+        # 预留一部分时间给排序与结果组装，保证整体不超过截止时间
+        budget_ms = max(0.0, budget_ms)
+        budget_ms -= min(budget_ms * SAFETY_FRACTION, SAFETY_MAX_MS)
+        self.end = time.perf_counter() + budget_ms / 1000.0
+
+    def expired(self) -> bool:
+        return time.perf_counter() >= self.end
+
+
+class LiveSequencer:
+    """[V11.9] 常驻内存的现场选歌引擎（一个歌单一个实例）"""
+
+    def __init__(self, tracks: List[Dict], set_minutes: float = DEFAULT_SET_MINUTES,
+                 score_fn: Optional[ScoreFn] = None):
+        self.source = tracks  # 调用方传入的原列表，用于判断常驻实例是否仍对应同一份歌单
+        self.tracks = list(tracks)
+        self.set_minutes = set_minutes
+        self.score_fn = score_fn
+        self._pos = {id(t): i for i, t in enumerate(self.tracks)}
+        self._by_id = {id(t): t for t in self.tracks}
+        self._pair_cache: Dict[Tuple[int, int], float] = {}
+        self._played = bytearray(len(self.tracks))
+        self._played_set: Set[int] = set()
+        self._identity = TitleIdentityIndex(self.tracks) if TitleIdentityIndex else None
+        self._index = None
+        if TrackFeatureIndex is not None and len(self.tracks) > INDEX_MIN_TRACKS:
+            self._index = TrackFeatureIndex(self.tracks, is_dead=lambda t: self._played[self._pos[id(t)]] == 1)
+
+    # ---------- 打分 ----------
+    def pair_score(self, a: Dict, b: Dict) -> float:
+        """过渡分 0-100（权重同增量修复 _incremental_pair_score），按曲目对缓存"""
+        k = (id(a), id(b))
+        v = self._pair_cache.get(k)
+        if v is None:
+            key_score = get_key_compatibility_flexible(a.get('key', '') or '', b.get('key', '') or '')
+            bpm_score = bpm_compatibility(a.get('bpm', 0) or 0, b.get('bpm', 0) or 0)
+            energy_diff = abs((a.get('energy', 50) or 50) - (b.get('energy', 50) or 50))
+            energy_score = max(0, 100 - energy_diff * 2)
+            v = key_score * 0.5 + bpm_score * 0.35 + energy_score * 0.15
+            self._pair_cache[k] = v
+        return v
+
+    def _base_score(self, current: Dict, cand: Dict, band: Tuple[int, int, str], guard,
+                    placed: List[Dict]) -> float:
+        if self.score_fn is not None:
+            # 排序器的完整评分已含能量阶段贴合度
+            score = float(self.score_fn(current, cand, band, placed))
+        else:
+            score = self.pair_score(current, cand)
+            energy = cand.get('energy', 50) or 50
+            lo, hi, _ = band
+            if energy < lo:
+                score -= (lo - energy) * ENERGY_BAND_PENALTY
+            elif energy > hi:
+                score -= (energy - hi) * ENERGY_BAND_PENALTY
+        if guard is not None and guard.collides(cand):
+            score -= REMIX_PENALTY
+        return score
+
+    # ---------- 查询 ----------
+    def _sync_played(self, current: Optional[Dict], history: Sequence[Dict]):
+        """按差量同步已播集合：代价 O(已播数)，撤销的曲目在索引中复活"""
+        played = set()
+        for t in list(history) + ([current] if current else []):
+            i = self._pos.get(id(t))
+            if i is not None:
+                played.add(i)
+        for i in self._played_set - played:
+            self._played[i] = 0
+            if self._index is not None:
+                self._index.revive_index(i)
+        for i in played - self._played_set:
+            self._played[i] = 1  # 索引中惰性摘除
+        self._played_set = played
+
+    def _unplayed(self) -> List[Dict]:
+        return [t for i, t in enumerate(self.tracks) if not self._played[i]]
+
+    def suggest_next(self, current: Dict, history: Sequence[Dict] = (), time_remaining_minutes: Optional[float] = None,
+                     top_n: int = DEFAULT_TOP_N, deadline_ms: float = DEFAULT_DEADLINE_MS) -> List[Dict]:
+        """
+        [V11.9] 限时返回下一首候选
+        Args:
+            current: 正在播放的曲目
+            history: 已播曲目（不含 current），按播放顺序
+            time_remaining_minutes: Set 剩余时间；None 时按 set_minutes 与已播时长推算
+            top_n: 返回条数
+            deadline_ms: 硬截止时间（毫秒）
+        Returns:
+            [{'track', 'score', 'stage', 'phase'}]，score 降序；stage 为截止前完成到的阶段 (0-3)
+        """
+        deadline = _Deadline(deadline_ms)
+        self._sync_played(current, history)
+
+        played_seconds = sum(_duration(t) for t in history) + _duration(current) / 2.0
+        if time_remaining_minutes is None:
+            total = self.set_minutes * 60.0
+        else:
+            total = played_seconds + max(0.0, time_remaining_minutes) * 60.0
+        progress = min(1.0, played_seconds / total) if total > 0 else 1.0
+        band = phase_band(progress)
+
+        guard = None
+        if self._identity is not None:
+            guard = self._identity.new_set_guard()
+            for t in history:
+                guard.mark(t)
+            guard.mark(current)
+
+        placed = list(history) + [current]
+        scores: Dict[int, float] = {}      # 基础分
+        bonus: Dict[int, float] = {}       # 前瞻加分
+
+        def score_all(cands: List[Dict]) -> bool:
+            for c in cands:
+                k = id(c)
+                if k in scores:
+                    continue
+                scores[k] = self._base_score(current, c, band, guard, placed)
+                if deadline.expired():
+                    return False
+            return True
+
+        def by_base() -> List[int]:
+            return sorted(scores, key=scores.__getitem__, reverse=True)
+
+        def ranked() -> List[Tuple[int, float]]:
+            """基础分顺序中已完整前瞻的前缀按总分排序在前，其余保持基础分顺序"""
+            order = by_base()
+            n = 0
+            while n < len(order) and order[n] in bonus:
+                n += 1
+            head = sorted(((k, scores[k] + bonus[k]) for k in order[:n]), key=lambda kv: kv[1], reverse=True)
+            return head + [(k, scores[k]) for k in order[n:]]
+
+        def lookahead(follow: List[Dict]) -> bool:
+            """按基础分从高到低为每个已打分候选补上"之后最好能接什么"的加分，逐个可中断"""
+            for k in by_base():
+                if k in bonus:
+                    continue
+                cand = self._by_id[k]
+                best_follow = None
+                for f in follow:
+                    if f is cand:
+                        continue
+                    v = self.pair_score(cand, f)
+                    if best_follow is None or v > best_follow:
+                        best_follow = v
+                    if deadline.expired():
+                        # 前瞻不完整的候选不记加分，保持与未前瞻候选同一口径
+                        return False
+                bonus[k] = (best_follow or 0.0) * LOOKAHEAD_WEIGHT
+                if deadline.expired():
+                    return False
+            return True
+
+        # 阶段 1：近邻候选（无索引时即全量）
+        stage = 0
+        if self._index is not None:
+            first = self._index.nearest(current, max(NEAREST_K, top_n * 3))
+        else:
+            first = self._unplayed()
+        result = None
+        if score_all(first):
+            stage = 1
+            # 阶段 2：一步前瞻（中途截止时只有完整前瞻的前缀按总分排序）
+            # 后继池固定为阶段 1 基础分前 LOOKAHEAD_K+1 名，所有候选按同一池子、同一轻量过渡分计算加分
+            follow = [self._by_id[k] for k in by_base()[:LOOKAHEAD_K + 1]]
+            if lookahead(follow):
+                stage = 2
+                # 阶段 3：扩展到全部未播曲目并补做前瞻；未完成时返回阶段 2 的排名
+                result = ranked()
+                if self._index is None or (score_all(self._unplayed()) and lookahead(follow)):
+                    stage = 3
+                    result = None
+
+        if result is None:
+            result = ranked()
+        if len(result) < top_n:
+            # 第 1 阶段被截止打断：未打分的近邻按轻量过渡分补足
+            rest = [c for c in first if id(c) not in scores]
+            rest.sort(key=lambda c: self.pair_score(current, c), reverse=True)
+            result += [(id(c), self.pair_score(current, c)) for c in rest[:top_n - len(result)]]
+        return [
+            {'track': self._by_id[k], 'score': round(v, 2), 'stage': stage, 'phase': band[2]}
+            for k, v in result[:top_n]
+        ]
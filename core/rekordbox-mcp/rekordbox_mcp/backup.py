@@ -0,0 +1,194 @@
+"""
+Incremental Database Backups
+
+Deduplicated, content-addressed backups of master.db (and its WAL).
+
+Each file is split into fixed-size chunks that are stored once under their
+hash, so a backup costs one sequential read plus only the chunks that changed
+since the previous backup. SQLCipher encrypts page by page, so unchanged pages
+stay byte-identical and deduplicate. A backup whose files have not changed
+since the latest one is skipped. Old manifests are pruned by a retention policy
+and chunks no longer referenced by any manifest are deleted.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+BACKUP_DIR_NAME = "rekordbox_mcp_backups"
+CHUNK_SIZE = 256 * 1024
+DEFAULT_KEEP = 10
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name + ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class IncrementalBackup:
+    """Chunk store plus one JSON manifest per backup."""
+
+    def __init__(self, root: Path, keep: int = DEFAULT_KEEP, chunk_size: int = CHUNK_SIZE):
+        self.root = Path(root)
+        self.keep = keep
+        self.chunk_size = chunk_size
+        self.chunk_dir = self.root / "chunks"
+        self.manifest_dir = self.root / "manifests"
+
+    # ---------- manifests ----------
+    def list(self) -> List[Dict[str, Any]]:
+        """Backups, oldest first."""
+        if not self.manifest_dir.is_dir():
+            return []
+        manifests = []
+        for path in sorted(self.manifest_dir.glob("*.json")):
+            try:
+                manifests.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable backup manifest {path}: {e}")
+        return manifests
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        manifests = self.list()
+        return manifests[-1] if manifests else None
+
+    # ---------- chunks ----------
+    def _chunk_path(self, digest: str) -> Path:
+        return self.chunk_dir / digest[:2] / digest
+
+    def _store_file(self, path: Path) -> Dict[str, Any]:
+        chunks = []
+        new_chunks = 0
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(self.chunk_size)
+                if not block:
+                    break
+                digest = hashlib.blake2b(block, digest_size=20).hexdigest()
+                chunks.append(digest)
+                target = self._chunk_path(digest)
+                if target.exists():
+                    continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Compress only when it helps (encrypted pages do not shrink)
+                packed = zlib.compress(block, 1)
+                data = b"z" + packed if len(packed) < len(block) else b"r" + block
+                _atomic_write(target, data)
+                new_chunks += 1
+        st = os.stat(path)
+        return {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "chunks": chunks,
+            "new_chunks": new_chunks,
+        }
+
+    def _read_chunk(self, digest: str) -> bytes:
+        data = self._chunk_path(digest).read_bytes()
+        return zlib.decompress(data[1:]) if data[:1] == b"z" else data[1:]
+
+    # ---------- backup / restore ----------
+    def create(self, db_file: Path, reason: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Back up db_file and its WAL (if present).
+
+        Returns:
+            The new manifest, the latest manifest when nothing changed since
+            it was taken, or None when db_file does not exist.
+        """
+        db_file = Path(db_file)
+        if not db_file.is_file():
+            return None
+        files = [db_file]
+        wal = db_file.with_name(db_file.name + "-wal")
+        if wal.is_file() and wal.stat().st_size > 0:
+            files.append(wal)
+
+        stamp = {p.name: [p.stat().st_size, p.stat().st_mtime_ns] for p in files}
+        latest = self.latest()
+        if latest is not None and latest.get("stamp") == stamp:
+            logger.info(f"Database unchanged since backup {latest['id']}; skipping new backup")
+            return latest
+
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        backup_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        manifest = {
+            "id": backup_id,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "reason": reason,
+            "source": str(db_file),
+            "stamp": stamp,
+            "files": {p.name: self._store_file(p) for p in files},
+        }
+        _atomic_write(
+            self.manifest_dir / f"{backup_id}.json",
+            json.dumps(manifest, indent=1).encode("utf-8"),
+        )
+        new_chunks = sum(f["new_chunks"] for f in manifest["files"].values())
+        total_chunks = sum(len(f["chunks"]) for f in manifest["files"].values())
+        logger.info(
+            f"Database backup {backup_id} created ({new_chunks}/{total_chunks} new chunks)"
+        )
+        self.prune()
+        return manifest
+
+    def restore(self, backup_id: str, dest_dir: Path) -> List[Path]:
+        """Rebuild the files of a backup into dest_dir; returns the written paths."""
+        manifest_path = self.manifest_dir / f"{backup_id}.json"
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        dest_dir = Path(dest_dir)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        written = []
+        for name, info in manifest["files"].items():
+            target = dest_dir / name
+            with open(target, "wb") as f:
+                for digest in info["chunks"]:
+                    f.write(self._read_chunk(digest))
+            written.append(target)
+        return written
+
+    def prune(self) -> int:
+        """Apply the retention policy; returns the number of chunks deleted."""
+        manifests = self.list()
+        expired = manifests[:-self.keep] if self.keep > 0 else []
+        for manifest in expired:
+            try:
+                (self.manifest_dir / f"{manifest['id']}.json").unlink()
+            except OSError as e:
+                logger.warning(f"Failed to remove backup {manifest['id']}: {e}")
+        if not expired:
+            return 0
+
+        live = {
+            digest
+            for manifest in manifests[len(expired):]
+            for info in manifest["files"].values()
+            for digest in info["chunks"]
+        }
+        removed = 0
+        for path in self.chunk_dir.glob("*/*"):
+            if path.name not in live:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+        logger.info(f"Pruned {len(expired)} old backups ({removed} chunks)")
+        return removed
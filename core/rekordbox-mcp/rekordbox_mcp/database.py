@@ -6,15 +6,73 @@ Handles connection to and interaction with the encrypted rekordbox SQLite databa
 
 import os
 import asyncio
+import functools
+import threading
 from pathlib import Path
 from typing import Optional, List, Dict, Any, Union
-from datetime import datetime
 
 import pyrekordbox
 from pyrekordbox import Rekordbox6Database
+from pyrekordbox.db6.aux_files import MasterPlaylistXml
+from pyrekordbox.db6.tables import (
+    DjmdArtist,
+    DjmdContent,
+    DjmdGenre,
+    DjmdHistory,
+    DjmdSongHistory,
+    DjmdSongPlaylist,
+)
 from loguru import logger
+from sqlalchemy import and_, func, or_
 
+from .backup import BACKUP_DIR_NAME, IncrementalBackup
+from .executor import (
+    DEFAULT_READ_TIMEOUT,
+    DEFAULT_READERS,
+    DEFAULT_WRITE_TIMEOUT,
+    DatabaseExecutor,
+)
 from .models import Track, Playlist, SearchOptions, HistorySession, HistoryTrack, HistoryStats
+from .search_index import INDEX_FILE_NAME, SearchIndex
+from .snapshot import LibrarySnapshot, LibraryView, file_stamp, get_snapshot, table_state
+
+
+# analyze_library group_by -> (snapshot column, is numeric)
+GROUP_COLUMNS = {
+    "genre": ("genre", False),
+    "key": ("key", False),
+    "year": ("release_year", True),
+    "artist": ("artist", False),
+    "rating": ("rating", True),
+}
+
+# Number of entries in the ranked history lists
+HISTORY_TOP_N = 10
+
+# Search fields answered from the search index
+QUERY_FIELDS = ("title", "artist", "genre")
+
+# Above this many index hits a filter is left to the (early-exiting) scan
+MAX_INDEX_CANDIDATES = 2000
+
+# Operations accepted by apply_playlist_batch
+BATCH_OPERATIONS = ("create_playlist", "add_tracks", "remove_track", "delete_playlist")
+
+
+def _reader(method):
+    """Run a blocking read method on the executor's reader pool."""
+    @functools.wraps(method)
+    async def run(self, *args, **kwargs):
+        return await self._executor().read(method, self, *args, **kwargs)
+    return run
+
+
+def _writer(method):
+    """Run a blocking mutation on the executor's single writer thread."""
+    @functools.wraps(method)
+    async def run(self, *args, **kwargs):
+        return await self._executor().write(method, self, *args, **kwargs)
+    return run
 
 
 class RekordboxDatabase:
@@ -23,11 +81,33 @@ class RekordboxDatabase:
     
     Handles connection and querying operations on the encrypted
     rekordbox SQLite database using pyrekordbox.
+    
+    Database work never runs on the event loop: reads are served by a small
+    pool of reader connections, mutations by a single serialized writer, each
+    call with a timeout (see executor.DatabaseExecutor).
     """
     
-    def __init__(self):
+    def __init__(
+        self,
+        readers: int = DEFAULT_READERS,
+        read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+        write_timeout: Optional[float] = DEFAULT_WRITE_TIMEOUT,
+    ):
         self.db: Optional[Rekordbox6Database] = None
+        self.executor: Optional[DatabaseExecutor] = None
+        self.readers = readers
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
         self.database_path: Optional[Path] = None
+        self.snapshot: Optional[LibrarySnapshot] = None
+        self.search_index: Optional[SearchIndex] = None
+        self._indexed_version: Optional[int] = None
+        self._indexed_reloads: Optional[int] = None
+        self._indexed_usn = 0
+        self._index_lock = threading.Lock()
+        self._history_stats_cache: Dict[str, Any] = {}
+        self._history_stats_lock = threading.Lock()
+        self.backup_keep = 10
         self._connected = False
     
     async def connect(self, database_path: Optional[Path] = None) -> None:
@@ -48,11 +128,30 @@ class RekordboxDatabase:
             
             # Initialize pyrekordbox database connection
             # Note: This will handle the SQLCipher decryption automatically
-            self.db = Rekordbox6Database()
+            await asyncio.to_thread(self._shutdown_executor)
+            self.db = await asyncio.to_thread(Rekordbox6Database)
+            self.snapshot = get_snapshot(self.db, self._master_db_file())
+            self.executor = DatabaseExecutor(
+                self.db.engine,
+                readers=self.readers,
+                read_timeout=self.read_timeout,
+                write_timeout=self.write_timeout,
+            )
             
             # Test connection by getting a simple count
-            content = self.db.get_content()
-            content_count = len(list(content))  # Convert Query to list
+            content_count = await self.get_track_count()
+            
+            # Open the full-text index and bring it up to date with the library
+            if self.search_index:
+                self.search_index.close()
+            try:
+                self.search_index = await asyncio.to_thread(SearchIndex, self.database_path / INDEX_FILE_NAME)
+            except Exception as e:
+                # e.g. SQLite built without FTS5: searches keep scanning the snapshot
+                logger.warning(f"Search index unavailable, using full scans: {e}")
+                self.search_index = None
+            self._indexed_version = self._indexed_reloads = None
+            await self._sync_search_index()
             logger.info(f"Successfully connected! Found {content_count} tracks in database.")
             
             self._connected = True
@@ -78,6 +177,111 @@ class RekordboxDatabase:
         
         return base_path
     
+    def _master_db_file(self) -> Optional[Path]:
+        """Locate master.db, whose mtime gates snapshot refreshes."""
+        db_dir = getattr(self.db, 'db_directory', None)
+        candidates = [Path(db_dir) / "master.db"] if db_dir else []
+        if self.database_path:
+            candidates += [
+                self.database_path / "master.db",
+                self.database_path / "rekordbox" / "master.db",
+            ]
+        for path in candidates:
+            if path.is_file():
+                return path
+        return None
+    
+    def _executor(self) -> DatabaseExecutor:
+        if not self.db or not self.executor:
+            raise RuntimeError("Database not connected")
+        return self.executor
+    
+    def _session(self):
+        """The calling reader thread's session, else the pyrekordbox (writer) session."""
+        session = self.executor.session() if self.executor else None
+        return session if session is not None else self.db.session
+    
+    def _library(self) -> LibraryView:
+        """
+        The current content/playlist view, refreshed if master.db changed.
+        
+        Views are immutable, so callers read them without holding a lock;
+        take one view per call and use it throughout.
+        """
+        if not self.db:
+            raise RuntimeError("Database not connected")
+        return self.snapshot.refresh(self._session())
+    
+    def _indexed(self, library: LibraryView) -> Optional[SearchIndex]:
+        """
+        The search index, synced with the library if its content changed.
+        
+        Between full snapshot loads only rows whose rb_local_usn moved past
+        the last sync are re-indexed; after a full load (name table change,
+        hard delete, first connect) the whole library is diffed.
+        """
+        index = self.search_index
+        if index is None:
+            return None
+        if self._indexed_version == library.content_version:
+            return index
+        
+        text, usn, deleted = library.text, library.numeric["usn"], library.numeric["deleted"]
+        
+        def fields(i):
+            return (text["title"][i], text["artist"][i], text["album"][i], text["genre"][i], text["file_path"][i])
+        
+        with self._index_lock:
+            # Another reader may have synced meanwhile, possibly from a newer
+            # view; the index never moves back to an older one
+            if self._indexed_version is not None and self._indexed_version >= library.content_version:
+                return index
+            try:
+                if self._indexed_reloads == library.content_reloads:
+                    changed = (usn > self._indexed_usn).nonzero()[0].tolist()
+                    index.remove(text["id"][i] for i in changed if deleted[i])
+                    index.update({text["id"][i]: fields(i) for i in changed if not deleted[i]})
+                else:
+                    index.sync({text["id"][i]: fields(i) for i in library.active_rows().tolist()})
+                self._indexed_version = library.content_version
+                self._indexed_reloads = library.content_reloads
+                self._indexed_usn = int(usn.max()) if len(usn) else 0
+            except Exception as e:
+                logger.warning(f"Search index sync failed, scanning instead: {e}")
+                self._indexed_version = self._indexed_reloads = None
+                return None
+        return index
+    
+    def _index_rows(self, library: LibraryView, filters) -> Optional[List[int]]:
+        """
+        Candidate rows for (text, fields) substring filters, from the search index.
+        
+        Returns None when no filter could be answered from the index.
+        """
+        index = self._indexed(library)
+        if index is None:
+            return None
+        rows = None
+        for text, fields in filters:
+            if not text:
+                continue
+            keys = index.search(text, fields, max_results=MAX_INDEX_CANDIDATES)
+            if keys is None:
+                continue
+            row_of = library.row_of
+            found = {row_of[key] for key in keys if key in row_of}
+            rows = found if rows is None else rows & found
+        return sorted(rows) if rows is not None else None
+    
+    @_reader
+    def _sync_search_index(self) -> None:
+        self._indexed(self._library())
+    
+    def _shutdown_executor(self, wait: bool = True) -> None:
+        if self.executor:
+            self.executor.shutdown(wait=wait)
+            self.executor = None
+    
     async def is_connected(self) -> bool:
         """Check if database connection is active."""
         return self._connected and self.db is not None
@@ -86,6 +290,11 @@ class RekordboxDatabase:
         """Properly close the database connection."""
         if self.db:
             try:
+                # Let queued writes finish before closing the session
+                await asyncio.to_thread(self._shutdown_executor)
+                if self.search_index:
+                    self.search_index.close()
+                    self.search_index = None
                 self.db.close()
                 logger.info("Database connection closed")
             except Exception as e:
@@ -98,21 +307,18 @@ class RekordboxDatabase:
         """Cleanup when object is destroyed."""
         if self.db:
             try:
+                self._shutdown_executor(wait=False)
                 self.db.close()
             except Exception:
                 pass  # Ignore errors during cleanup
     
-    async def get_track_count(self) -> int:
+    @_reader
+    def get_track_count(self) -> int:
         """Get total number of active (non-deleted) tracks in the database."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        # Filter out soft-deleted tracks
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-        return len(active_content)
+        return len(self._library())
     
-    async def search_tracks(self, options: SearchOptions) -> List[Track]:
+    @_reader
+    def search_tracks(self, options: SearchOptions) -> List[Track]:
         """
         Search for tracks based on the provided options.
         
@@ -122,65 +328,17 @@ class RekordboxDatabase:
         Returns:
             List of matching tracks
         """
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        # Get all content from database, filtering out soft-deleted tracks
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-        
-        # Apply filters
-        filtered_tracks = []
-        
-        for content in active_content:
-            # Get extracted field values for filtering
-            artist_name = getattr(content, 'ArtistName', '') or ""
-            genre_name = getattr(content, 'GenreName', '') or ""
-            key_name = getattr(content, 'KeyName', '') or ""
-            bpm_value = (getattr(content, 'BPM', 0) or 0) / 100.0
-            rating_value = getattr(content, 'Rating', 0) or 0
-            
-            # Apply text-based filters
-            if options.query and not any([
-                options.query.lower() in str(content.Title or "").lower(),
-                options.query.lower() in artist_name.lower(),
-                options.query.lower() in genre_name.lower(),
-            ]):
-                continue
-            
-            if options.artist and options.artist.lower() not in artist_name.lower():
-                continue
-            
-            if options.title and options.title.lower() not in str(content.Title or "").lower():
-                continue
-            
-            if options.genre and options.genre.lower() not in genre_name.lower():
-                continue
-            
-            if options.key and options.key != key_name:
-                continue
-            
-            # Apply numeric filters
-            if options.bpm_min and bpm_value < options.bpm_min:
-                continue
-            
-            if options.bpm_max and bpm_value > options.bpm_max:
-                continue
-            
-            if options.rating_min and rating_value < options.rating_min:
-                continue
-            
-            # Convert to our Track model
-            track = self._content_to_track(content)
-            filtered_tracks.append(track)
-            
-            # Apply limit
-            if len(filtered_tracks) >= options.limit:
-                break
-        
-        return filtered_tracks
+        library = self._library()
+        rows = self._index_rows(library, [
+            (options.query, QUERY_FIELDS),
+            (options.title, ("title",)),
+            (options.artist, ("artist",)),
+            (options.genre, ("genre",)),
+        ])
+        return library.tracks(library.search(options, rows))
     
-    async def get_track_by_id(self, track_id: str) -> Optional[Track]:
+    @_reader
+    def get_track_by_id(self, track_id: str) -> Optional[Track]:
         """
         Get a specific track by its ID.
         
@@ -190,81 +348,35 @@ class RekordboxDatabase:
         Returns:
             Track object if found, None otherwise
         """
-        if not self.db:
-            raise RuntimeError("Database not connected")
+        library = self._library()
         
         try:
-            # Get all content and find by ID, filtering out soft-deleted tracks
-            all_content = list(self.db.get_content())
-            active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-            content_id = int(track_id)
-            
-            # Find content by ID
-            for content in active_content:
-                if content.ID == content_id:
-                    return self._content_to_track(content)
-            
-            return None
+            row = library.find(str(int(track_id)))
+            return library.track(row) if row is not None else None
         except (ValueError, Exception):
             return None
     
     
-    async def get_playlists(self) -> List[Playlist]:
+    @_reader
+    def get_playlists(self) -> List[Playlist]:
         """
         Get all playlists from the database.
         
         Returns:
             List of playlist objects
         """
-        if not self.db:
-            raise RuntimeError("Database not connected")
+        library = self._library()
         
         try:
-            # Get all playlists, filtering out soft-deleted ones
-            all_playlists = list(self.db.get_playlist())
-            active_playlists = [p for p in all_playlists if getattr(p, 'rb_local_deleted', 0) == 0]
-            
-            playlists = []
-            for playlist in active_playlists:
-                # Get track count for this playlist
-                try:
-                    playlist_songs = list(self.db.get_playlist_songs(PlaylistID=playlist.ID))
-                    # Filter out soft-deleted song-playlist relationships
-                    active_songs = [s for s in playlist_songs if getattr(s, 'rb_local_deleted', 0) == 0]
-                    track_count = len(active_songs)
-                except Exception:
-                    track_count = 0
-                
-                # Check if this is a smart playlist
-                is_smart = getattr(playlist, 'is_smart_playlist', False) or False
-                smart_criteria = None
-                if is_smart and hasattr(playlist, 'SmartList') and playlist.SmartList:
-                    smart_criteria = str(playlist.SmartList)
-                
-                # Check if this is a folder (has children)
-                is_folder = getattr(playlist, 'is_folder', False) or False
-                if not is_folder and hasattr(playlist, 'Attribute'):
-                    # Attribute 1 seems to indicate folders
-                    is_folder = playlist.Attribute == 1
-                
-                playlists.append(Playlist(
-                    id=str(playlist.ID),
-                    name=playlist.Name or "",
-                    track_count=track_count,
-                    created_date=getattr(playlist, 'created_at', '') or "",
-                    modified_date=getattr(playlist, 'updated_at', '') or "",
-                    is_folder=is_folder,
-                    is_smart_playlist=is_smart,
-                    smart_criteria=smart_criteria,
-                    parent_id=str(playlist.ParentID) if playlist.ParentID and playlist.ParentID != "root" else None
-                ))
-            
-            return playlists
+            # Playlists and their track counts come from the snapshot; folders
+            # are Attribute 1 and smart playlists Attribute 4
+            return library.playlist_models()
         except Exception as e:
             logger.error(f"Failed to get playlists: {e}")
             return []
     
-    async def get_playlist_tracks(self, playlist_id: str) -> List[Track]:
+    @_reader
+    def get_playlist_tracks(self, playlist_id: str) -> List[Track]:
         """
         Get all tracks in a specific playlist.
         
@@ -274,129 +386,78 @@ class RekordboxDatabase:
         Returns:
             List of tracks in the playlist
         """
-        if not self.db:
-            raise RuntimeError("Database not connected")
+        library = self._library()
         
         try:
             # Handle potential non-integer playlist IDs
             try:
-                pid = int(playlist_id)
+                pid = str(int(playlist_id))
             except ValueError:
                 logger.warning(f"Playlist ID '{playlist_id}' is not an integer. Attempting query anyway.")
-                pid = playlist_id
-
-            # Get song-playlist relationships for this playlist
-            playlist_songs = list(self.db.get_playlist_songs(PlaylistID=pid))
-            # Filter out soft-deleted relationships
-            active_songs = [s for s in playlist_songs if getattr(s, 'rb_local_deleted', 0) == 0]
-            
-            # Get all content to match against
-            all_content = list(self.db.get_content())
-            active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
+                pid = str(playlist_id)
             
-            # Create a lookup for faster access
-            content_lookup = {str(c.ID): c for c in active_content}
-            
-            # Build tracks list maintaining playlist order
-            tracks = []
-            # Sort by TrackNo to maintain playlist order
-            sorted_songs = sorted(active_songs, key=lambda x: getattr(x, 'TrackNo', 0))
-            
-            for song_playlist in sorted_songs:
-                content_id = str(song_playlist.ContentID)
-                if content_id in content_lookup:
-                    track = self._content_to_track(content_lookup[content_id])
-                    tracks.append(track)
-            
-            return tracks
+            return library.tracks(library.playlist_rows(pid))
             
         except Exception as e:
             logger.error(f"Failed to get playlist tracks for playlist {playlist_id}: {e}")
             return []
     
-    async def get_most_played_tracks(self, limit: int = 20) -> List[Track]:
+    @_reader
+    def get_most_played_tracks(self, limit: int = 20) -> List[Track]:
         """Get the most played tracks."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
+        library = self._library()
         # Sort by play count descending
-        sorted_content = sorted(active_content, key=lambda x: getattr(x, 'DJPlayCount', 0) or 0, reverse=True)
-        
-        return [self._content_to_track(content) for content in sorted_content[:limit]]
+        return library.tracks(library.top(("play_count",), limit))
     
-    async def get_top_rated_tracks(self, limit: int = 20) -> List[Track]:
+    @_reader
+    def get_top_rated_tracks(self, limit: int = 20) -> List[Track]:
         """Get the highest rated tracks."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
+        library = self._library()
         # Sort by rating descending, then by play count
-        sorted_content = sorted(active_content, key=lambda x: (getattr(x, 'Rating', 0) or 0, getattr(x, 'DJPlayCount', 0) or 0), reverse=True)
-        
-        return [self._content_to_track(content) for content in sorted_content[:limit]]
+        return library.tracks(library.top(("rating", "play_count"), limit))
     
-    async def get_unplayed_tracks(self, limit: int = 50) -> List[Track]:
+    @_reader
+    def get_unplayed_tracks(self, limit: int = 50) -> List[Track]:
         """Get tracks that have never been played."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-        # Filter tracks with 0 play count
-        unplayed = [content for content in active_content if (getattr(content, 'DJPlayCount', 0) or 0) == 0]
-        
-        return [self._content_to_track(content) for content in unplayed[:limit]]
+        library = self._library()
+        return library.tracks(library.unplayed(limit))
     
-    async def search_tracks_by_filename(self, filename: str) -> List[Track]:
+    @_reader
+    def search_tracks_by_filename(self, filename: str) -> List[Track]:
         """Search tracks by filename."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-        filename_lower = filename.lower()
-        
-        matching_tracks = []
-        for content in active_content:
-            file_path = getattr(content, 'Location', '') or getattr(content, 'FolderPath', '') or ""
-            if filename_lower in file_path.lower():
-                matching_tracks.append(self._content_to_track(content))
-        
-        return matching_tracks
+        library = self._library()
+        rows = self._index_rows(library, [(filename, ("file_path",))])
+        return library.tracks(library.path_contains(filename, rows))
     
-    async def analyze_library(self, group_by: str, aggregate_by: str, top_n: int) -> Dict[str, Any]:
+    @_reader
+    def analyze_library(self, group_by: str, aggregate_by: str, top_n: int) -> Dict[str, Any]:
         """Analyze library with grouping and aggregation."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
+        library = self._library()
         
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-        groups = {}
+        rows = library.active_rows()
+        play_counts = library.numeric["play_count"][rows].tolist()
+        lengths = library.numeric["length"][rows].tolist()
         
-        for content in active_content:
-            # Get grouping key
-            if group_by == "genre":
-                key = getattr(content, 'GenreName', '') or "Unknown"
-            elif group_by == "key":
-                key = getattr(content, 'KeyName', '') or "Unknown"
-            elif group_by == "year":
-                key = str(getattr(content, 'ReleaseYear', '') or "Unknown")
-            elif group_by == "artist":
-                key = getattr(content, 'ArtistName', '') or "Unknown"
-            elif group_by == "rating":
-                key = str(getattr(content, 'Rating', 0) or 0)
-            else:
-                key = "Unknown"
-            
+        # Get grouping keys
+        column, numeric = GROUP_COLUMNS.get(group_by, (None, False))
+        if column is None:
+            keys = ["Unknown"] * len(rows)
+        elif group_by == "rating":
+            keys = [str(v) for v in library.numeric[column][rows].tolist()]
+        elif numeric:
+            keys = [str(v or "Unknown") for v in library.numeric[column][rows].tolist()]
+        else:
+            values = library.text[column]
+            keys = [values[i] or "Unknown" for i in rows.tolist()]
+        
+        groups = {}
+        for key, play_count, length in zip(keys, play_counts, lengths):
             if key not in groups:
                 groups[key] = {"count": 0, "playCount": 0, "totalTime": 0}
             
             groups[key]["count"] += 1
-            groups[key]["playCount"] += getattr(content, 'DJPlayCount', 0) or 0
-            groups[key]["totalTime"] += getattr(content, 'Length', 0) or 0
+            groups[key]["playCount"] += play_count
+            groups[key]["totalTime"] += length
         
         # Sort by the requested aggregation
         sorted_groups = sorted(groups.items(), key=lambda x: x[1][aggregate_by], reverse=True)
@@ -408,20 +469,16 @@ class RekordboxDatabase:
             "total_groups": len(groups)
         }
     
-    async def validate_track_ids(self, track_ids: List[str]) -> Dict[str, Any]:
+    @_reader
+    def validate_track_ids(self, track_ids: List[str]) -> Dict[str, Any]:
         """Validate track IDs."""
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-        existing_ids = {str(content.ID) for content in active_content}
+        library = self._library()
         
         valid = []
         invalid = []
         
         for track_id in track_ids:
-            if track_id in existing_ids:
+            if library.find(track_id) is not None:
                 valid.append(track_id)
             else:
                 invalid.append(track_id)
@@ -434,28 +491,27 @@ class RekordboxDatabase:
             "invalid_count": len(invalid)
         }
 
-    async def get_library_stats(self) -> Dict[str, Any]:
+    @_reader
+    def get_library_stats(self) -> Dict[str, Any]:
         """
         Get comprehensive library statistics.
         
         Returns:
             Dictionary containing various statistics
         """
-        if not self.db:
-            raise RuntimeError("Database not connected")
-        
-        all_content = list(self.db.get_content())
-        active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
+        library = self._library()
+        rows = library.active_rows()
         
         # Calculate statistics
-        total_tracks = len(active_content)
-        total_playtime = sum(getattr(c, 'Length', 0) or 0 for c in active_content)
-        avg_bpm = sum((getattr(c, 'BPM', 0) or 0) / 100.0 for c in active_content) / total_tracks if total_tracks > 0 else 0
+        total_tracks = len(rows)
+        total_playtime = int(library.numeric["length"][rows].sum())
+        avg_bpm = int(library.numeric["bpm"][rows].sum()) / 100.0 / total_tracks if total_tracks > 0 else 0
         
         # Genre distribution
         genres = {}
-        for content in active_content:
-            genre = getattr(content, 'GenreName', '') or "Unknown"
+        genre_names = library.text["genre"]
+        for i in rows.tolist():
+            genre = genre_names[i] or "Unknown"
             genres[genre] = genres.get(genre, 0) + 1
         
         return {
@@ -467,85 +523,8 @@ class RekordboxDatabase:
             "connection_status": "connected"
         }
     
-    def _content_to_track(self, content) -> Track:
-        """
-        Convert pyrekordbox content object to our Track model.
-        
-        Args:
-            content: pyrekordbox content object
-            
-        Returns:
-            Track model instance
-        """
-        # Handle BPM - it's stored as integer * 100 in the database
-        bpm_value = getattr(content, 'BPM', 0) or 0
-        bpm_float = float(bpm_value) / 100.0 if bpm_value else 0.0
-        
-        # Handle artist - it might be an object or string
-        artist_name = ""
-        if hasattr(content, 'ArtistName'):
-            artist_name = content.ArtistName or ""
-        elif hasattr(content, 'Artist'):
-            artist_obj = content.Artist
-            if hasattr(artist_obj, 'Name'):
-                artist_name = artist_obj.Name or ""
-            else:
-                artist_name = str(artist_obj) if artist_obj else ""
-        
-        # Handle key - it might be an object
-        key_name = ""
-        if hasattr(content, 'KeyName'):
-            key_name = content.KeyName or ""
-        elif hasattr(content, 'Key'):
-            key_obj = content.Key
-            if hasattr(key_obj, 'Name'):
-                key_name = key_obj.Name or ""
-            else:
-                key_name = str(key_obj) if key_obj else ""
-        
-        # Handle album - it might be an object
-        album_name = ""
-        if hasattr(content, 'AlbumName'):
-            album_name = content.AlbumName or ""
-        elif hasattr(content, 'Album'):
-            album_obj = content.Album
-            if hasattr(album_obj, 'Name'):
-                album_name = album_obj.Name or ""
-            else:
-                album_name = str(album_obj) if album_obj else ""
-        
-        # Handle genre - it might be an object
-        genre_name = ""
-        if hasattr(content, 'GenreName'):
-            genre_name = content.GenreName or ""
-        elif hasattr(content, 'Genre'):
-            genre_obj = content.Genre
-            if hasattr(genre_obj, 'Name'):
-                genre_name = genre_obj.Name or ""
-            else:
-                genre_name = str(genre_obj) if genre_obj else ""
-        
-        return Track(
-            id=str(content.ID),
-            content_uuid=getattr(content, 'UUID', None),
-            title=content.Title or "",
-            artist=artist_name,
-            album=album_name,
-            genre=genre_name,
-            bpm=bpm_float,
-            key=key_name,
-            rating=int(getattr(content, 'Rating', 0) or 0),
-            play_count=int(getattr(content, 'DJPlayCount', 0) or 0),
-            length=int(getattr(content, 'Length', 0) or 0),
-            file_path=getattr(content, 'Location', '') or getattr(content, 'FolderPath', '') or "",
-            date_added=getattr(content, 'DateCreated', '') or "",
-            date_modified=getattr(content, 'StockDate', '') or "",
-            bitrate=int(getattr(content, 'BitRate', 0) or 0),
-            sample_rate=int(getattr(content, 'SampleRate', 0) or 0),
-            comments=getattr(content, 'Commnt', '') or ""
-        )
-    
-    async def get_history_sessions(self, include_folders: bool = False) -> List[HistorySession]:
+    @_reader
+    def get_history_sessions(self, include_folders: bool = False) -> List[HistorySession]:
         """
         Get all DJ history sessions from the database.
         
@@ -559,48 +538,28 @@ class RekordboxDatabase:
             raise RuntimeError("Database not connected")
         
         try:
-            # Get all histories, filtering out soft-deleted ones
-            all_histories = list(self.db.get_history())
-            active_histories = [h for h in all_histories if getattr(h, 'rb_local_deleted', 0) == 0]
+            rows = self._history_session_query().all()
             
             sessions = []
-            for history in active_histories:
+            for history_id, name, parent_id, attribute, date_created, track_count, total_seconds in rows:
                 # Filter by type: Attribute 1 = folder, Attribute 0 = session
-                is_folder = history.Attribute == 1
+                is_folder = attribute == 1
                 
                 if not include_folders and is_folder:
                     continue
                 
-                # Get track count for sessions
-                track_count = 0
-                duration_minutes = None
-                if not is_folder:
-                    try:
-                        history_songs = list(self.db.get_history_songs(HistoryID=history.ID))
-                        active_songs = [s for s in history_songs if getattr(s, 'rb_local_deleted', 0) == 0]
-                        track_count = len(active_songs)
-                        
-                        # Calculate duration if we have tracks
-                        if active_songs:
-                            all_content = list(self.db.get_content())
-                            content_lookup = {str(c.ID): c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0}
-                            
-                            total_seconds = 0
-                            for song in active_songs:
-                                content_id = str(song.ContentID)
-                                if content_id in content_lookup:
-                                    track_length = getattr(content_lookup[content_id], 'Length', 0) or 0
-                                    total_seconds += track_length
-                            duration_minutes = round(total_seconds / 60) if total_seconds > 0 else None
-                    except Exception:
-                        track_count = 0
+                # Folders carry no tracks of their own
+                if is_folder:
+                    track_count, duration_minutes = 0, None
+                else:
+                    duration_minutes = round(total_seconds / 60) if total_seconds > 0 else None
                 
                 sessions.append(HistorySession(
-                    id=str(history.ID),
-                    name=history.Name or "",
-                    parent_id=str(history.ParentID) if history.ParentID and history.ParentID != "root" else None,
+                    id=str(history_id),
+                    name=name or "",
+                    parent_id=str(parent_id) if parent_id and parent_id != "root" else None,
                     is_folder=is_folder,
-                    date_created=history.DateCreated,
+                    date_created=date_created,
                     track_count=track_count,
                     duration_minutes=duration_minutes
                 ))
@@ -611,7 +570,47 @@ class RekordboxDatabase:
             logger.error(f"Failed to get history sessions: {e}")
             return []
     
-    async def get_session_tracks(self, session_id: str) -> List[HistoryTrack]:
+    def _history_session_query(self):
+        """
+        Active history entries with their track count and total track length.
+        
+        One GROUP BY over djmdSongHistory (left-joined to active content for
+        the lengths) replaces a per-session song query and content reload.
+        """
+        session = self._session()
+        totals = (
+            session.query(
+                DjmdSongHistory.HistoryID.label("history_id"),
+                func.count(DjmdSongHistory.ID).label("track_count"),
+                func.coalesce(func.sum(DjmdContent.Length), 0).label("total_seconds"),
+            )
+            .outerjoin(
+                DjmdContent,
+                and_(
+                    DjmdContent.ID == DjmdSongHistory.ContentID,
+                    DjmdContent.rb_local_deleted == 0,
+                ),
+            )
+            .filter(DjmdSongHistory.rb_local_deleted == 0)
+            .group_by(DjmdSongHistory.HistoryID)
+            .subquery()
+        )
+        return (
+            session.query(
+                DjmdHistory.ID,
+                DjmdHistory.Name,
+                DjmdHistory.ParentID,
+                DjmdHistory.Attribute,
+                DjmdHistory.DateCreated,
+                func.coalesce(totals.c.track_count, 0),
+                func.coalesce(totals.c.total_seconds, 0),
+            )
+            .outerjoin(totals, totals.c.history_id == DjmdHistory.ID)
+            .filter(DjmdHistory.rb_local_deleted == 0)
+        )
+    
+    @_reader
+    def get_session_tracks(self, session_id: str) -> List[HistoryTrack]:
         """
         Get all tracks from a specific DJ history session.
         
@@ -621,50 +620,39 @@ class RekordboxDatabase:
         Returns:
             List of tracks in the session with performance context
         """
-        if not self.db:
-            raise RuntimeError("Database not connected")
+        library = self._library()
         
         try:
-            # Get songs for this session
-            history_songs = list(self.db.get_history_songs(HistoryID=int(session_id)))
-            active_songs = [s for s in history_songs if getattr(s, 'rb_local_deleted', 0) == 0]
-            
-            # Get all content to match against
-            all_content = list(self.db.get_content())
-            active_content = [c for c in all_content if getattr(c, 'rb_local_deleted', 0) == 0]
-            content_lookup = {str(c.ID): c for c in active_content}
+            # Session entries in play order; track metadata comes from the snapshot
+            history_songs = (
+                self._session().query(DjmdSongHistory.ContentID, DjmdSongHistory.TrackNo)
+                .filter(
+                    DjmdSongHistory.HistoryID == str(int(session_id)),
+                    DjmdSongHistory.rb_local_deleted == 0,
+                )
+                .order_by(DjmdSongHistory.TrackNo)
+            )
             
             # Build tracks list maintaining session order
             tracks = []
-            sorted_songs = sorted(active_songs, key=lambda x: x.TrackNo)
-            
-            for song in sorted_songs:
-                content_id = str(song.ContentID)
-                if content_id in content_lookup:
-                    content = content_lookup[content_id]
-                    
-                    # Extract track info using same logic as _content_to_track
-                    bmp_value = getattr(content, 'BPM', 0) or 0
-                    bpm_float = float(bmp_value) / 100.0 if bmp_value else 0.0
-                    
-                    artist_name = getattr(content, 'ArtistName', '') or ""
-                    album_name = getattr(content, 'AlbumName', '') or ""
-                    genre_name = getattr(content, 'GenreName', '') or ""
-                    key_name = getattr(content, 'KeyName', '') or ""
-                    
-                    tracks.append(HistoryTrack(
-                        id=str(content.ID),
-                        title=content.Title or "",
-                        artist=artist_name,
-                        album=album_name,
-                        genre=genre_name,
-                        bpm=bpm_float,
-                        key=key_name,
-                        length=int(getattr(content, 'Length', 0) or 0),
-                        track_number=song.TrackNo,
-                        history_id=session_id,
-                        play_order=song.TrackNo
-                    ))
+            for content_id, track_no in history_songs:
+                row = library.find(content_id)
+                if row is None:
+                    continue
+                track = library.track(row)
+                tracks.append(HistoryTrack(
+                    id=track.id,
+                    title=track.title,
+                    artist=track.artist,
+                    album=track.album,
+                    genre=track.genre,
+                    bpm=track.bpm,
+                    key=track.key,
+                    length=track.length,
+                    track_number=track_no,
+                    history_id=session_id,
+                    play_order=track_no
+                ))
             
             return tracks
             
@@ -672,10 +660,15 @@ class RekordboxDatabase:
             logger.error(f"Failed to get session tracks for session {session_id}: {e}")
             return []
     
-    async def get_history_stats(self) -> HistoryStats:
+    @_reader
+    def get_history_stats(self) -> HistoryStats:
         """
         Get comprehensive statistics about DJ history sessions.
         
+        All figures are aggregate queries over djmdSongHistory joined to
+        content. The result is cached until master.db changes and the history
+        or content tables actually moved.
+        
         Returns:
             Statistics about all history sessions
         """
@@ -683,44 +676,129 @@ class RekordboxDatabase:
             raise RuntimeError("Database not connected")
         
         try:
-            # Get all sessions (not folders)
-            sessions = await self.get_history_sessions(include_folders=False)
-            
-            # Calculate basic stats
-            total_sessions = len(sessions)
-            total_tracks_played = sum(s.track_count for s in sessions)
-            total_minutes = sum(s.duration_minutes for s in sessions if s.duration_minutes)
-            total_hours_played = total_minutes / 60 if total_minutes > 0 else 0.0
-            avg_session_length = total_minutes / total_sessions if total_sessions > 0 else 0.0
-            
-            # Group sessions by month
-            sessions_by_month = {}
-            for session in sessions:
-                if session.date_created:
-                    try:
-                        # Extract year-month from date string
-                        date_part = session.date_created[:7]  # "2025-08"
-                        sessions_by_month[date_part] = sessions_by_month.get(date_part, 0) + 1
-                    except:
-                        pass
-            
-            # For more detailed stats, we'd need to analyze all tracks
-            # This is a basic implementation
-            return HistoryStats(
-                total_sessions=total_sessions,
-                total_tracks_played=total_tracks_played,
-                total_hours_played=round(total_hours_played, 1),
-                sessions_by_month=sessions_by_month,
-                avg_session_length=round(avg_session_length, 1),
-                favorite_genres=[],  # Would require analyzing all session tracks
-                most_played_track=None  # Would require counting track occurrences
-            )
+            # Reader threads share the cache; concurrent callers wait for one computation
+            with self._history_stats_lock:
+                cache = self._history_stats_cache
+                stamp = file_stamp(self.snapshot.db_file)
+                if cache and stamp is not None and stamp == cache["stamp"]:
+                    return cache["stats"].model_copy(deep=True)
+                
+                session = self._session()
+                state = tuple(table_state(session, t) for t in (DjmdHistory, DjmdSongHistory, DjmdContent))
+                if cache and state == cache["state"]:
+                    cache["stamp"] = stamp
+                    return cache["stats"].model_copy(deep=True)
+                
+                stats = self._compute_history_stats()
+                self._history_stats_cache = {"stamp": stamp, "state": state, "stats": stats}
+                return stats.model_copy(deep=True)
             
         except Exception as e:
             logger.error(f"Failed to get history stats: {e}")
             return HistoryStats()
     
-    async def create_playlist(self, name: str, parent_id: Optional[str] = None) -> str:
+    def _history_plays(self, *columns):
+        """Query over active history rows of active sessions (folders excluded)."""
+        return (
+            self._session().query(*columns)
+            .select_from(DjmdSongHistory)
+            .join(DjmdHistory, DjmdHistory.ID == DjmdSongHistory.HistoryID)
+            .filter(
+                DjmdSongHistory.rb_local_deleted == 0,
+                DjmdHistory.rb_local_deleted == 0,
+                or_(DjmdHistory.Attribute.is_(None), DjmdHistory.Attribute != 1),
+            )
+        )
+    
+    def _compute_history_stats(self) -> HistoryStats:
+        # Per-session totals (same aggregate as get_history_sessions)
+        total_sessions = 0
+        total_tracks_played = 0
+        total_minutes = 0
+        sessions_by_month: Dict[str, int] = {}
+        minutes_by_month: Dict[str, int] = {}
+        for _, _, _, attribute, date_created, track_count, total_seconds in self._history_session_query():
+            if attribute == 1:
+                continue
+            minutes = round(total_seconds / 60) if total_seconds > 0 else 0
+            total_sessions += 1
+            total_tracks_played += track_count
+            total_minutes += minutes
+            if date_created:
+                # Extract year-month from date string, e.g. "2025-08"
+                month = str(date_created)[:7]
+                sessions_by_month[month] = sessions_by_month.get(month, 0) + 1
+                minutes_by_month[month] = minutes_by_month.get(month, 0) + minutes
+        
+        plays = func.count(DjmdSongHistory.ID)
+        
+        # Play counts per track (metadata kept for tracks since removed from the library)
+        top_tracks = [
+            {"id": str(cid), "title": title or "", "artist": artist or "", "play_count": count}
+            for cid, title, artist, count in (
+                self._history_plays(DjmdContent.ID, DjmdContent.Title, DjmdArtist.Name, plays)
+                .join(DjmdContent, DjmdContent.ID == DjmdSongHistory.ContentID)
+                .outerjoin(DjmdContent.Artist)
+                .group_by(DjmdContent.ID)
+                .order_by(plays.desc(), DjmdContent.ID)
+                .limit(HISTORY_TOP_N)
+            )
+        ]
+        
+        # Play counts per genre and artist, unlabelled tracks left out
+        def ranked(name_column, relationship, label):
+            query = (
+                self._history_plays(name_column, plays)
+                .join(DjmdContent, DjmdContent.ID == DjmdSongHistory.ContentID)
+                .join(relationship)
+                .filter(name_column.isnot(None), name_column != "")
+                .group_by(name_column)
+                .order_by(plays.desc(), name_column)
+                .limit(HISTORY_TOP_N)
+            )
+            return [{label: name, "play_count": count} for name, count in query]
+        
+        favorite_genres = ranked(DjmdGenre.Name, DjmdContent.Genre, "genre")
+        favorite_artists = ranked(DjmdArtist.Name, DjmdContent.Artist, "artist")
+        
+        # BPM change between consecutive tracks of a session (BPM is stored * 100)
+        sequence = (
+            self._history_plays(
+                DjmdContent.BPM.label("bpm"),
+                func.lag(DjmdContent.BPM).over(
+                    partition_by=DjmdSongHistory.HistoryID,
+                    order_by=DjmdSongHistory.TrackNo,
+                ).label("prev_bpm"),
+            )
+            .join(DjmdContent, DjmdContent.ID == DjmdSongHistory.ContentID)
+            .subquery()
+        )
+        transitions, avg_delta = (
+            self._session().query(
+                func.count(),
+                func.avg(func.abs(sequence.c.bpm - sequence.c.prev_bpm)),
+            )
+            .filter(sequence.c.bpm > 0, sequence.c.prev_bpm > 0)
+            .one()
+        )
+        
+        return HistoryStats(
+            total_sessions=total_sessions,
+            total_tracks_played=total_tracks_played,
+            total_hours_played=round(total_minutes / 60, 1) if total_minutes > 0 else 0.0,
+            sessions_by_month=sessions_by_month,
+            hours_by_month={month: round(minutes / 60, 1) for month, minutes in minutes_by_month.items()},
+            avg_session_length=round(total_minutes / total_sessions, 1) if total_sessions > 0 else 0.0,
+            most_played_track=top_tracks[0] if top_tracks else None,
+            top_tracks=top_tracks,
+            favorite_genres=favorite_genres,
+            favorite_artists=favorite_artists,
+            avg_transition_bpm_delta=round(avg_delta / 100.0, 2) if transitions else None,
+            transitions_analyzed=transitions or 0,
+        )
+    
+    @_writer
+    def create_playlist(self, name: str, parent_id: Optional[str] = None) -> str:
         """
         Create a new playlist.
         
@@ -736,7 +814,7 @@ class RekordboxDatabase:
         
         try:
             # Create backup before mutation
-            await self._create_backup()
+            self._create_backup()
             
             # Create playlist using pyrekordbox
             playlist = self.db.create_playlist(
@@ -750,6 +828,7 @@ class RekordboxDatabase:
             
             # Commit changes
             self.db.commit()
+            self.snapshot.mark_dirty()
             
             # Handle different return types
             if hasattr(playlist, 'ID'):
@@ -766,11 +845,11 @@ class RekordboxDatabase:
         except Exception as e:
             logger.error(f"Failed to create playlist '{name}': {e}")
             # Rollback on error
-            if hasattr(self.db, 'rollback'):
-                self.db.rollback()
+            self._rollback()
             raise RuntimeError(f"Failed to create playlist: {str(e)}")
     
-    async def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> Dict[str, Any]:
+    @_writer
+    def add_tracks_to_playlist(self, playlist_id: str, track_ids: List[str]) -> Dict[str, Any]:
         """
         Add multiple tracks to a playlist.
         
@@ -786,7 +865,7 @@ class RekordboxDatabase:
         
         try:
             # Create backup before mutation
-            await self._create_backup()
+            self._create_backup()
             
             results = {
                 "added": [],
@@ -811,6 +890,7 @@ class RekordboxDatabase:
             
             # Commit all changes
             self.db.commit()
+            self.snapshot.mark_dirty()
             
             logger.info(f"Batch add to playlist {playlist_id}: {len(results['added'])} added, {len(results['failed'])} failed")
             return results
@@ -818,11 +898,11 @@ class RekordboxDatabase:
         except Exception as e:
             logger.error(f"Failed to add tracks to playlist {playlist_id}: {e}")
             # Rollback on error
-            if hasattr(self.db, 'rollback'):
-                self.db.rollback()
+            self._rollback()
             raise RuntimeError(f"Failed to add tracks to playlist: {str(e)}")
 
-    async def add_track_to_playlist(self, playlist_id: str, track_id: str) -> bool:
+    @_writer
+    def add_track_to_playlist(self, playlist_id: str, track_id: str) -> bool:
         """
         Add a track to an existing playlist.
         
@@ -838,7 +918,7 @@ class RekordboxDatabase:
         
         try:
             # Create backup before mutation
-            await self._create_backup()
+            self._create_backup()
             
             # Verify playlist and track exist
             playlist_int_id = int(playlist_id)
@@ -849,6 +929,7 @@ class RekordboxDatabase:
             
             # Commit changes
             self.db.commit()
+            self.snapshot.mark_dirty()
             
             logger.info(f"Added track {track_id} to playlist {playlist_id}")
             return True
@@ -856,11 +937,11 @@ class RekordboxDatabase:
         except Exception as e:
             logger.error(f"Failed to add track {track_id} to playlist {playlist_id}: {e}")
             # Rollback on error
-            if hasattr(self.db, 'rollback'):
-                self.db.rollback()
+            self._rollback()
             raise RuntimeError(f"Failed to add track to playlist: {str(e)}")
     
-    async def remove_track_from_playlist(self, playlist_id: str, track_id: str) -> bool:
+    @_writer
+    def remove_track_from_playlist(self, playlist_id: str, track_id: str) -> bool:
         """
         Remove a track from a playlist.
         
@@ -876,16 +957,17 @@ class RekordboxDatabase:
         
         try:
             # Create backup before mutation
-            await self._create_backup()
+            self._create_backup()
             
-            # Remove track from playlist using pyrekordbox
+            # pyrekordbox removes by song-playlist entry, not by content ID
             playlist_int_id = int(playlist_id)
-            track_int_id = int(track_id)
+            song = self._playlist_song(playlist_id, track_id)
             
-            self.db.remove_from_playlist(playlist_int_id, track_int_id)
+            self.db.remove_from_playlist(playlist_int_id, song)
             
             # Commit changes
             self.db.commit()
+            self.snapshot.mark_dirty()
             
             logger.info(f"Removed track {track_id} from playlist {playlist_id}")
             return True
@@ -893,11 +975,11 @@ class RekordboxDatabase:
         except Exception as e:
             logger.error(f"Failed to remove track {track_id} from playlist {playlist_id}: {e}")
             # Rollback on error
-            if hasattr(self.db, 'rollback'):
-                self.db.rollback()
+            self._rollback()
             raise RuntimeError(f"Failed to remove track from playlist: {str(e)}")
     
-    async def delete_playlist(self, playlist_id: str) -> bool:
+    @_writer
+    def delete_playlist(self, playlist_id: str) -> bool:
         """
         Delete a playlist.
         
@@ -912,7 +994,7 @@ class RekordboxDatabase:
         
         try:
             # Create backup before mutation
-            await self._create_backup()
+            self._create_backup()
             
             # Delete playlist using pyrekordbox
             playlist_int_id = int(playlist_id)
@@ -920,6 +1002,7 @@ class RekordboxDatabase:
             
             # Commit changes
             self.db.commit()
+            self.snapshot.mark_dirty()
             
             logger.info(f"Deleted playlist {playlist_id}")
             return True
@@ -927,45 +1010,169 @@ class RekordboxDatabase:
         except Exception as e:
             logger.error(f"Failed to delete playlist {playlist_id}: {e}")
             # Rollback on error
-            if hasattr(self.db, 'rollback'):
-                self.db.rollback()
+            self._rollback()
             raise RuntimeError(f"Failed to delete playlist: {str(e)}")
     
-    async def _create_backup(self) -> None:
+    @_writer
+    def apply_playlist_batch(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Apply many playlist mutations in one transaction, with one backup.
+        
+        Operations run in order. A playlist created earlier in the batch can be
+        addressed by later operations through its "ref" instead of an ID:
+        
+            {"op": "create_playlist", "name": "Set 1", "parent_id": None, "ref": "set1"}
+            {"op": "add_tracks", "playlist_ref": "set1", "track_ids": ["123", "456"]}
+            {"op": "remove_track", "playlist_id": "789", "track_id": "123"}
+            {"op": "delete_playlist", "playlist_id": "789"}
+        
+        The batch is all-or-nothing: if any operation fails, everything is
+        rolled back and nothing is committed.
+        
+        Args:
+            operations: List of operation dictionaries
+            
+        Returns:
+            Per-operation results, the created playlist IDs by ref and the backup ID
+        """
+        if not self.db:
+            raise RuntimeError("Database not connected")
+        
+        # Validate the whole batch before touching the database
+        for index, operation in enumerate(operations):
+            op = operation.get("op")
+            if op not in BATCH_OPERATIONS:
+                raise ValueError(f"Operation {index}: unknown op '{op}' (expected one of {BATCH_OPERATIONS})")
+            if op == "create_playlist" and not str(operation.get("name") or "").strip():
+                raise ValueError(f"Operation {index}: playlist name cannot be empty")
+            if op != "create_playlist" and not (operation.get("playlist_id") or operation.get("playlist_ref")):
+                raise ValueError(f"Operation {index}: playlist_id or playlist_ref is required")
+        
+        backup = self._create_backup(reason=f"batch of {len(operations)} operations")
+        
+        created: Dict[str, str] = {}
+        results = []
+        
+        def resolve(operation: Dict[str, Any]) -> str:
+            ref = operation.get("playlist_ref")
+            if ref is not None:
+                if ref not in created:
+                    raise ValueError(f"Unknown playlist_ref '{ref}'")
+                return created[ref]
+            return str(operation["playlist_id"])
+        
+        index, op = 0, None
+        try:
+            for index, operation in enumerate(operations):
+                op = operation["op"]
+                if op == "create_playlist":
+                    parent_id = operation.get("parent_id")
+                    if operation.get("parent_ref") is not None:
+                        parent_id = resolve({"playlist_ref": operation["parent_ref"]})
+                    playlist = self.db.create_playlist(
+                        name=str(operation["name"]).strip(),
+                        parent=parent_id if parent_id and parent_id != "root" else None
+                    )
+                    playlist_id = str(playlist.ID)
+                    if operation.get("ref") is not None:
+                        created[operation["ref"]] = playlist_id
+                    results.append({"op": op, "playlist_id": playlist_id})
+                elif op == "add_tracks":
+                    playlist_id = resolve(operation)
+                    track_ids = [str(t) for t in operation.get("track_ids", [])]
+                    for track_id in track_ids:
+                        self.db.add_to_playlist(int(playlist_id), int(track_id))
+                    results.append({"op": op, "playlist_id": playlist_id, "added": len(track_ids)})
+                elif op == "remove_track":
+                    playlist_id = resolve(operation)
+                    song = self._playlist_song(playlist_id, operation["track_id"])
+                    self.db.remove_from_playlist(int(playlist_id), song)
+                    results.append({"op": op, "playlist_id": playlist_id, "track_id": str(operation["track_id"])})
+                elif op == "delete_playlist":
+                    playlist_id = resolve(operation)
+                    self.db.delete_playlist(int(playlist_id))
+                    results.append({"op": op, "playlist_id": playlist_id})
+            
+            # Commit all changes at once
+            self.db.commit()
+            self.snapshot.mark_dirty()
+            
+        except Exception as e:
+            logger.error(f"Playlist batch failed at operation {index} ({op}): {e}")
+            # Rollback on error
+            self._rollback()
+            raise RuntimeError(f"Playlist batch failed at operation {index} ({op}): {str(e)}")
+        
+        logger.info(f"Applied playlist batch: {len(results)} operations in one transaction")
+        return {
+            "results": results,
+            "created_playlists": created,
+            "operation_count": len(results),
+            "backup_id": backup["id"] if backup else None,
+        }
+    
+    def _rollback(self) -> None:
+        """
+        Roll back uncommitted changes, including masterPlaylists6.xml.
+        
+        pyrekordbox's create_playlist / delete_playlist also edit the in-memory
+        masterPlaylists6.xml, which a session rollback does not undo; left in
+        place, those edits would be written out by the next commit. The file on
+        disk matches the last commit, so it is reloaded from there.
+        """
+        if hasattr(self.db, 'rollback'):
+            self.db.rollback()
+        playlist_xml = getattr(self.db, 'playlist_xml', None)
+        if playlist_xml is not None and playlist_xml.modified:
+            try:
+                self.db.playlist_xml = MasterPlaylistXml(path=playlist_xml.path)
+            except Exception as e:
+                logger.error(f"Failed to reload masterPlaylists6.xml after rollback: {e}")
+                raise
+    
+    def _playlist_song(self, playlist_id: str, track_id: str):
+        """The active song-playlist entry of a track in a playlist."""
+        song = (
+            self.db.session.query(DjmdSongPlaylist)
+            .filter(
+                DjmdSongPlaylist.PlaylistID == str(int(playlist_id)),
+                DjmdSongPlaylist.ContentID == str(int(track_id)),
+                DjmdSongPlaylist.rb_local_deleted == 0,
+            )
+            .order_by(DjmdSongPlaylist.TrackNo)
+            .first()
+        )
+        if song is None:
+            raise ValueError(f"Track {track_id} is not in playlist {playlist_id}")
+        return song
+    
+    def _create_backup(self, reason: str = "") -> Optional[Dict[str, Any]]:
         """
         Create a backup of the database before performing mutations.
+        
+        Backups are incremental and deduplicated (see backup.IncrementalBackup):
+        only changed chunks of master.db are stored, a database unchanged since
+        the last backup is not backed up again, and only the newest
+        backup_keep backups are retained.
+        
+        Returns:
+            The backup manifest, or None if no backup could be made
         """
         if not self.database_path:
-            return
+            return None
         
         try:
-            import shutil
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            db_file = self.snapshot.db_file if self.snapshot else None
+            if db_file is None:
+                db_file = self._master_db_file()
+            if db_file is None:
+                logger.warning(f"No master.db found for backup under {self.database_path}")
+                return None
             
-            # Try different database file patterns
-            possible_files = [
-                self.database_path / "master.db",
-                self.database_path / "rekordbox" / "master.db",
-                *list(self.database_path.glob("**/master.db")),
-                *list(self.database_path.glob("**/*.db"))
-            ]
-            
-            db_file = None
-            for file_path in possible_files:
-                if file_path.exists() and file_path.is_file():
-                    db_file = file_path
-                    break
-            
-            if db_file:
-                backup_path = self.database_path / f"master_backup_{timestamp}.db"
-                shutil.copy2(db_file, backup_path)
-                logger.info(f"Database backup created: {backup_path}")
-            else:
-                # List available files for debugging
-                all_files = list(self.database_path.rglob("*"))
-                db_files = [f for f in all_files if f.suffix == '.db']
-                logger.warning(f"No database file found for backup. Available .db files: {db_files}")
+            store = IncrementalBackup(self.database_path / BACKUP_DIR_NAME, keep=self.backup_keep)
+            return store.create(db_file, reason=reason)
             
         except Exception as e:
             logger.warning(f"Failed to create database backup: {e}")
+            return None
     
@@ -0,0 +1,149 @@
+"""
+Database Executor
+
+Runs blocking SQLAlchemy / SQLCipher work off the event loop.
+
+Reads go to a small thread pool. Each reader thread owns its own SQLAlchemy
+session (and therefore its own SQLite connection), so parallel tool calls get
+parallel read throughput. Writes go to a single writer thread that owns the
+pyrekordbox session, so mutations stay serialized.
+
+Every call has a timeout and honours cancellation: a queued call is dropped,
+and a running read is stopped by interrupting its SQLite connection. A running
+write is never interrupted; it finishes (commit or rollback) on its own.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from loguru import logger
+from sqlalchemy.orm import Session
+
+
+DEFAULT_READERS = 4
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_WRITE_TIMEOUT = 120.0
+
+
+class _Job:
+    """A submitted call and the connection it runs on (for interrupts)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.abandoned = False
+        self.connection = None
+        # Interrupts must not land on the connection once it is handed back
+        self._lock = threading.Lock()
+
+    def attach(self, connection) -> bool:
+        """Record the connection the call runs on; False if it was already cancelled."""
+        with self._lock:
+            if self.abandoned:
+                return False
+            self.connection = connection
+            return True
+
+    def detach(self) -> None:
+        with self._lock:
+            self.connection = None
+
+    def interrupt(self) -> None:
+        with self._lock:
+            self.abandoned = True
+            if self.connection is not None:
+                try:
+                    self.connection.interrupt()
+                except Exception as e:
+                    logger.warning(f"Failed to interrupt {self.name}: {e}")
+
+
+class DatabaseExecutor:
+    """Reader pool plus a single serialized writer."""
+
+    def __init__(
+        self,
+        engine,
+        readers: int = DEFAULT_READERS,
+        read_timeout: Optional[float] = DEFAULT_READ_TIMEOUT,
+        write_timeout: Optional[float] = DEFAULT_WRITE_TIMEOUT,
+    ):
+        self.engine = engine
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="rekordbox-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rekordbox-write")
+        self._local = threading.local()
+        self._sessions: List[Session] = []
+        self._sessions_lock = threading.Lock()
+
+    # ---------- sessions ----------
+    def session(self) -> Optional[Session]:
+        """The calling reader thread's session, or None outside the reader pool."""
+        return getattr(self._local, "session", None)
+
+    def _reader_session(self) -> Session:
+        session = self.session()
+        if session is None:
+            session = Session(bind=self.engine, autoflush=False)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def _run_read(self, job: _Job, fn: Callable, args, kwargs) -> Any:
+        session = self._reader_session()
+        try:
+            # Check out the connection up front so the call can be interrupted
+            if not job.attach(session.connection().connection.dbapi_connection):
+                raise RuntimeError(f"{job.name} cancelled")
+            return fn(*args, **kwargs)
+        finally:
+            # Detach before the connection can serve the next call on this thread
+            job.detach()
+            # End the read transaction so the next call sees fresh data
+            session.close()
+
+    # ---------- submission ----------
+    async def read(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run fn on the reader pool."""
+        job = _Job(getattr(fn, "__name__", "read"))
+        future = self._readers.submit(self._run_read, job, fn, args, kwargs)
+        return await self._wait(job, future, timeout if timeout is not None else self.read_timeout, True)
+
+    async def write(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run fn on the writer thread; writes run one at a time, in submission order."""
+        job = _Job(getattr(fn, "__name__", "write"))
+        future = self._writer.submit(fn, *args, **kwargs)
+        return await self._wait(job, future, timeout if timeout is not None else self.write_timeout, False)
+
+    async def _wait(self, job: _Job, future, timeout: Optional[float], interruptible: bool) -> Any:
+        waiter = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # Nobody will collect the result any more
+            waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+            if future.cancel():
+                logger.info(f"Dropped queued database call {job.name}")
+            elif interruptible:
+                logger.warning(f"Interrupting database read {job.name}")
+                job.interrupt()
+            else:
+                logger.warning(f"Database write {job.name} is still running; it will complete on its own")
+            if isinstance(e, asyncio.TimeoutError):
+                raise TimeoutError(f"Database call {job.name} timed out after {timeout}s")
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop both pools and close the reader sessions."""
+        self._readers.shutdown(wait=wait, cancel_futures=True)
+        self._writer.shutdown(wait=wait)
+        with self._sessions_lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
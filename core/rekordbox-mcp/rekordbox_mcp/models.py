@@ -144,9 +144,14 @@ class HistoryStats(BaseModel):
     total_tracks_played: int = Field(0, ge=0, description="Total tracks across all sessions")
     total_hours_played: float = Field(0.0, ge=0, description="Total hours of DJ sets")
     most_played_track: Optional[Dict[str, Any]] = Field(None, description="Most played track across sessions")
+    top_tracks: List[Dict[str, Any]] = Field(default_factory=list, description="Top tracks by play count")
     favorite_genres: List[Dict[str, Any]] = Field(default_factory=list, description="Top genres by play count")
+    favorite_artists: List[Dict[str, Any]] = Field(default_factory=list, description="Top artists by play count")
     sessions_by_month: Dict[str, int] = Field(default_factory=dict, description="Sessions grouped by month")
+    hours_by_month: Dict[str, float] = Field(default_factory=dict, description="Hours played grouped by month")
     avg_session_length: float = Field(0.0, ge=0, description="Average session length in minutes")
+    avg_transition_bpm_delta: Optional[float] = Field(None, ge=0, description="Average BPM change between consecutive tracks")
+    transitions_analyzed: int = Field(0, ge=0, description="Track-to-track transitions with known BPM on both sides")
 
 
 class SearchOptions(BaseModel):
@@ -0,0 +1,237 @@
+"""
+Track Search Index
+
+Local SQLite FTS5 shadow index over track title, artist, album, genre and file
+path, so substring search does not scan the whole collection.
+
+Two FTS5 tables index the same documents:
+
+- trigram: SQLite's trigram tokenizer (character 3-grams) answers any query
+  of 3+ characters as an indexed substring match, which covers prefixes too
+  and works in any script.
+- grams: CJK runs (Han, kana, Hangul) pre-split into character unigrams and
+  bigrams, for the 1-2 character queries common with Chinese, Japanese and
+  Korean titles.
+
+Other 1-2 character queries are not answered (search returns None) and
+callers scan instead. Results are candidate keys: callers re-check them with
+their own substring test, so search semantics do not change. Documents sync
+by diffing the caller's current key -> fields mapping, so only changed rows
+are rewritten, and the index file persists between runs.
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+
+
+FIELDS = ("title", "artist", "album", "genre", "file_path")
+INDEX_FILE_NAME = "rekordbox_mcp_search.db"
+SCHEMA_VERSION = "1"
+
+# Letters of CJK scripts (kana punctuation such as U+30FB is left out)
+CJK_RUN = re.compile(
+    "[\u1100-\u11ff\u3041-\u3096\u309d-\u309f\u30a1-\u30fa\u30fc-\u30ff"
+    "\u3131-\u318e\u31f0-\u31ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7a3"
+    "\uf900-\ufaff\uff66-\uff9f\U00020000-\U0002fa1f]+"
+)
+
+
+def cjk_grams(text: str) -> str:
+    """Space-separated unigrams and bigrams of the CJK runs in text."""
+    tokens: List[str] = []
+    for run in CJK_RUN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return " ".join(tokens)
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """FTS5 index of documents: key -> one lower-cased string per field."""
+
+    def __init__(self, path: Union[str, Path] = ":memory:", fields: Sequence[str] = FIELDS):
+        self.path = str(path)
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Tuple[str, ...]] = {}
+        self._ids: Dict[str, int] = {}
+        self._keys: Dict[int, str] = {}
+        try:
+            self._conn = self._open(self.path)
+        except sqlite3.Error as e:
+            logger.warning(f"Search index at {self.path} unusable ({e}); using an in-memory index")
+            self.path = ":memory:"
+            self._conn = self._open(self.path)
+        self._load()
+
+    # ---------- storage ----------
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        row = conn.execute("SELECT value FROM meta WHERE name = 'schema'").fetchone()
+        expected = f"{SCHEMA_VERSION}:{','.join(self.fields)}"
+        if row is None or row[0] != expected:
+            # New file, or written by another version: rebuild from scratch
+            with conn:
+                for table in ("docs", "trigram", "grams"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute("DELETE FROM meta")
+                columns = ", ".join(self.fields)
+                conn.execute("CREATE TABLE docs (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL)")
+                conn.execute(f"CREATE VIRTUAL TABLE trigram USING fts5({columns}, tokenize='trigram')")
+                conn.execute(f"CREATE VIRTUAL TABLE grams USING fts5({columns}, tokenize='unicode61')")
+                conn.execute("INSERT INTO meta VALUES ('schema', ?)", (expected,))
+        return conn
+
+    def _load(self) -> None:
+        columns = ", ".join(f"t.{name}" for name in self.fields)
+        rows = self._conn.execute(
+            f"SELECT d.id, d.key, {columns} FROM docs d JOIN trigram t ON t.rowid = d.id"
+        )
+        for doc_id, key, *values in rows:
+            self._ids[key] = doc_id
+            self._keys[doc_id] = key
+            self._docs[key] = tuple(values)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._docs
+
+    def keys(self) -> List[str]:
+        return list(self._docs)
+
+    def get_meta(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, value))
+
+    # ---------- sync ----------
+    def _normalize(self, values: Sequence[Optional[str]]) -> Tuple[str, ...]:
+        return tuple((value or "").lower() for value in values)
+
+    def _write(self, upserts: Dict[str, Tuple[str, ...]], removals: Iterable[str]) -> None:
+        conn = self._conn
+        with conn:
+            for key in removals:
+                doc_id = self._ids.pop(key)
+                del self._keys[doc_id], self._docs[key]
+                conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+                conn.execute("DELETE FROM trigram WHERE rowid = ?", (doc_id,))
+                conn.execute("DELETE FROM grams WHERE rowid = ?", (doc_id,))
+            if not upserts:
+                return
+            marks = ", ".join("?" * (len(self.fields) + 1))
+            trigram_rows, gram_rows = [], []
+            for key, values in upserts.items():
+                doc_id = self._ids.get(key)
+                if doc_id is None:
+                    doc_id = conn.execute("INSERT INTO docs (key) VALUES (?)", (key,)).lastrowid
+                    self._ids[key] = doc_id
+                    self._keys[doc_id] = key
+                else:
+                    conn.execute("DELETE FROM trigram WHERE rowid = ?", (doc_id,))
+                    conn.execute("DELETE FROM grams WHERE rowid = ?", (doc_id,))
+                self._docs[key] = values
+                trigram_rows.append((doc_id, *values))
+                gram_rows.append((doc_id, *(cjk_grams(value) for value in values)))
+            conn.executemany(f"INSERT INTO trigram (rowid, {', '.join(self.fields)}) VALUES ({marks})", trigram_rows)
+            conn.executemany(f"INSERT INTO grams (rowid, {', '.join(self.fields)}) VALUES ({marks})", gram_rows)
+
+    def sync(self, docs: Dict[str, Sequence[Optional[str]]]) -> Dict[str, int]:
+        """Make the index hold exactly docs; only changed documents are rewritten."""
+        with self._lock:
+            current = self._docs
+            upserts = {}
+            for key, values in docs.items():
+                values = self._normalize(values)
+                if current.get(key) != values:
+                    upserts[key] = values
+            removals = [key for key in current if key not in docs]
+            added = sum(1 for key in upserts if key not in current)
+            if upserts or removals:
+                self._write(upserts, removals)
+        if upserts or removals:
+            logger.debug(
+                f"Search index synced: {added} added, {len(upserts) - added} updated, {len(removals)} removed"
+            )
+        return {"added": added, "updated": len(upserts) - added, "removed": len(removals)}
+
+    def update(self, docs: Dict[str, Sequence[Optional[str]]]) -> int:
+        """Add or replace the given documents; returns the number rewritten."""
+        with self._lock:
+            upserts = {}
+            for key, values in docs.items():
+                values = self._normalize(values)
+                if self._docs.get(key) != values:
+                    upserts[key] = values
+            if upserts:
+                self._write(upserts, ())
+        return len(upserts)
+
+    def remove(self, keys: Iterable[str]) -> int:
+        with self._lock:
+            removals = [key for key in set(keys) if key in self._docs]
+            if removals:
+                self._write({}, removals)
+        return len(removals)
+
+    # ---------- search ----------
+    def search(
+        self,
+        text: str,
+        fields: Optional[Sequence[str]] = None,
+        max_results: Optional[int] = None,
+    ) -> Optional[List[str]]:
+        """
+        Keys of documents whose fields may contain text (case-insensitive).
+
+        Args:
+            text: Substring to look for
+            fields: Fields to search (default: all)
+            max_results: Give up (return None) when more documents match;
+                for such broad queries a scan that stops early is cheaper
+
+        Returns:
+            Candidate keys in insertion order, or None when the query is too
+            short to be answered from the index (1-2 non-CJK characters) or
+            matches more than max_results documents.
+        """
+        needle = (text or "").lower()
+        if not needle:
+            return None
+        if len(needle) >= 3:
+            table = "trigram"
+        elif CJK_RUN.fullmatch(needle):
+            table = "grams"
+        else:
+            return None
+        columns = " ".join(fields or self.fields)
+        query = f"{{{columns}}} : {_phrase(needle)}"
+        limit = -1 if max_results is None else max_results + 1
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH ? ORDER BY rowid LIMIT ?", (query, limit)
+            ).fetchall()
+            if max_results is not None and len(rows) > max_results:
+                return None
+            keys = self._keys
+            return [keys[doc_id] for (doc_id,) in rows if doc_id in keys]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
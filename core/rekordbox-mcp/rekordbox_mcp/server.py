@@ -22,6 +22,8 @@ mcp = FastMCP("Rekordbox Database MCP Server")
 # Global database instance
 db: Optional[RekordboxDatabase] = None
 _db_initialized = False
+# Parallel tool calls must not initialize the database twice
+_db_init_lock = asyncio.Lock()
 
 
 class ServerConfig(BaseModel):
@@ -348,6 +350,9 @@ async def connect_database(database_path: Optional[str] = None) -> Dict[str, str
     global db
     
     try:
+        if db:
+            # Release the previous connection's worker threads
+            await db.disconnect()
         db = RekordboxDatabase()
         path = Path(database_path) if database_path else None
         await db.connect(database_path=path)
@@ -747,6 +752,61 @@ async def delete_playlist(playlist_id: str) -> Dict[str, Any]:
         }
 
 
+@mcp.tool(
+    annotations={
+        "readOnlyHint": False,
+        "destructiveHint": True,
+        "idempotentHint": False
+    }
+)
+async def batch_playlist_operations(operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Apply many playlist changes at once, in a single transaction with a single backup.
+
+    Use this instead of repeated create/add/remove calls when writing several
+    playlists (e.g. a batch of generated sets). Operations run in order and the
+    batch is all-or-nothing.
+
+    ⚠️ CAUTION: This modifies your rekordbox database!
+
+    Args:
+        operations: List of operations, each one of:
+            {"op": "create_playlist", "name": str, "parent_id": str (optional), "ref": str (optional)}
+            {"op": "add_tracks", "playlist_id" or "playlist_ref": str, "track_ids": [str]}
+            {"op": "remove_track", "playlist_id" or "playlist_ref": str, "track_id": str}
+            {"op": "delete_playlist", "playlist_id": str}
+            A "ref" names a playlist created earlier in the batch so later
+            operations can use it as "playlist_ref" (or "parent_ref").
+
+    Returns:
+        Result of the batch, including created playlist IDs by ref
+    """
+    await ensure_database_connected()
+
+    try:
+        # Prevent deletion of smart playlists for safety
+        deletions = {str(o.get("playlist_id")) for o in operations if o.get("op") == "delete_playlist"}
+        if deletions:
+            smart = [p.id for p in await db.get_playlists() if p.id in deletions and p.is_smart_playlist]
+            if smart:
+                return {
+                    "status": "error",
+                    "message": f"Cannot delete smart playlists - they are managed by rekordbox: {smart}"
+                }
+
+        result = await db.apply_playlist_batch(operations)
+        return {
+            "status": "success",
+            "message": f"Applied {result['operation_count']} playlist operations in one transaction",
+            **result
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to apply playlist batch: {str(e)}"
+        }
+
+
 @mcp.resource("file://database-status")
 async def database_status() -> str:
     """Get the current database connection status."""
@@ -764,6 +824,16 @@ async def ensure_database_connected():
     """Ensure database is connected, initialize if not."""
     global db, _db_initialized
     
+    if _db_initialized and db and await db.is_connected():
+        return
+    
+    async with _db_init_lock:
+        await _initialize_database()
+
+
+async def _initialize_database():
+    global db, _db_initialized
+    
     if _db_initialized and db and await db.is_connected():
         return
     
@@ -0,0 +1,534 @@
+"""
+Library Snapshot
+
+Process-wide, change-aware in-memory copy of the rekordbox content, playlist
+and song-playlist tables, held column by column.
+
+A refresh only touches the encrypted database when master.db (or its WAL) has
+changed on disk. Even then the local USN counter is compared first. Changed
+content rows are then pulled by rb_local_usn, and the small playlist tables are
+re-read only when their own row count or USN moved.
+
+Each refresh that changes anything publishes a new immutable LibraryView, so
+readers never wait on each other and only briefly on a refresh.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+from pyrekordbox.db6.tables import (
+    AgentRegistry,
+    DjmdAlbum,
+    DjmdArtist,
+    DjmdContent,
+    DjmdGenre,
+    DjmdKey,
+    DjmdPlaylist,
+    DjmdSongPlaylist,
+)
+from sqlalchemy import Integer, cast, func
+
+from .models import Playlist, SearchOptions, Track
+
+
+# DJPlayCount is not declared as an integer column in every pyrekordbox release
+PLAY_COUNT = func.coalesce(cast(DjmdContent.DJPlayCount, Integer), 0)
+
+# (column name, SQL expression) loaded for every content row
+CONTENT_COLUMNS = (
+    ("id", DjmdContent.ID),
+    ("uuid", DjmdContent.UUID),
+    ("title", DjmdContent.Title),
+    ("artist", DjmdArtist.Name),
+    ("album", DjmdAlbum.Name),
+    ("genre", DjmdGenre.Name),
+    ("key", DjmdKey.ScaleName),
+    ("file_path", DjmdContent.FolderPath),
+    ("date_added", DjmdContent.DateCreated),
+    ("date_modified", DjmdContent.StockDate),
+    ("comments", DjmdContent.Commnt),
+    ("bpm", DjmdContent.BPM),
+    ("rating", DjmdContent.Rating),
+    ("play_count", PLAY_COUNT),
+    ("length", DjmdContent.Length),
+    ("bitrate", DjmdContent.BitRate),
+    ("sample_rate", DjmdContent.SampleRate),
+    ("release_year", DjmdContent.ReleaseYear),
+    ("deleted", DjmdContent.rb_local_deleted),
+    ("usn", DjmdContent.rb_local_usn),
+)
+TEXT_COLUMNS = tuple(name for name, _ in CONTENT_COLUMNS[:11])
+NUMERIC_COLUMNS = tuple(name for name, _ in CONTENT_COLUMNS[11:])
+
+# Lower-cased copies kept for substring search
+SEARCH_COLUMNS = ("title", "artist", "genre", "file_path")
+
+# Tables whose names are joined into content rows; a change there reloads content
+NAME_TABLES = (DjmdArtist, DjmdAlbum, DjmdGenre, DjmdKey)
+
+
+def file_stamp(db_file: Optional[Path]) -> Optional[Tuple]:
+    """(mtime_ns, size) of master.db and its WAL; None when the file is unknown."""
+    if db_file is None:
+        return None
+    stamp = []
+    for path in (db_file, db_file.with_name(db_file.name + "-wal")):
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def table_state(session, table) -> Tuple[int, int]:
+    """(row count, max rb_local_usn) of a table, including soft-deleted rows."""
+    count, usn = session.query(
+        func.count(), func.coalesce(func.max(table.rb_local_usn), 0)
+    ).select_from(table).one()
+    return int(count or 0), int(usn or 0)
+
+
+class LibraryView:
+    """
+    One generation of the snapshot's columns.
+
+    Views are never modified once published: a refresh builds a new view and
+    swaps it in. Readers take the current view once and use it without
+    locking, while a refresh runs next to them.
+    """
+
+    def __init__(
+        self,
+        text: Dict[str, List[str]],
+        numeric: Dict[str, np.ndarray],
+        lower: Dict[str, List[str]],
+        row_of: Dict[str, int],
+        playlists: List[Dict[str, Any]],
+        playlist_tracks: Dict[str, List[str]],
+        playlist_counts: Dict[str, int],
+        content_version: int = 0,
+        content_reloads: int = 0,
+    ):
+        self.text = text
+        self.numeric = numeric
+        self.lower = lower
+        self.row_of = row_of
+        self.playlists = playlists
+        self.playlist_tracks = playlist_tracks
+        self.playlist_counts = playlist_counts
+        self.content_version = content_version  # bumped whenever content rows change
+        self.content_reloads = content_reloads  # full content loads (incremental updates excluded)
+        self._active = np.flatnonzero(numeric["deleted"] == 0)
+
+    @classmethod
+    def empty(cls) -> "LibraryView":
+        return cls(
+            text={name: [] for name in TEXT_COLUMNS},
+            numeric={name: np.zeros(0, dtype=np.int64) for name in NUMERIC_COLUMNS},
+            lower={name: [] for name in SEARCH_COLUMNS},
+            row_of={},
+            playlists=[],
+            playlist_tracks={},
+            playlist_counts={},
+        )
+
+    def with_playlists(self, playlists, playlist_tracks, playlist_counts) -> "LibraryView":
+        return LibraryView(
+            self.text, self.numeric, self.lower, self.row_of,
+            playlists, playlist_tracks, playlist_counts,
+            self.content_version, self.content_reloads,
+        )
+
+    # ---------- row access ----------
+    def __len__(self) -> int:
+        return len(self.active_rows())
+
+    def active_rows(self) -> np.ndarray:
+        """Positions of non-deleted content rows, in load order."""
+        return self._active
+
+    def find(self, content_id: str) -> Optional[int]:
+        """Row of an active track, or None."""
+        i = self.row_of.get(str(content_id))
+        if i is None or self.numeric["deleted"][i] != 0:
+            return None
+        return i
+
+    def track(self, i: int) -> Track:
+        """Build the Track model for a row (BPM is stored as integer * 100)."""
+        text, num = self.text, self.numeric
+        bpm = int(num["bpm"][i])
+        return Track(
+            id=text["id"][i],
+            content_uuid=text["uuid"][i] or None,
+            title=text["title"][i],
+            artist=text["artist"][i],
+            album=text["album"][i],
+            genre=text["genre"][i],
+            bpm=float(bpm) / 100.0 if bpm else 0.0,
+            key=text["key"][i],
+            rating=int(num["rating"][i]),
+            play_count=int(num["play_count"][i]),
+            length=int(num["length"][i]),
+            file_path=text["file_path"][i],
+            date_added=text["date_added"][i],
+            date_modified=text["date_modified"][i],
+            bitrate=int(num["bitrate"][i]),
+            sample_rate=int(num["sample_rate"][i]),
+            comments=text["comments"][i],
+        )
+
+    def tracks(self, rows: Iterable[int]) -> List[Track]:
+        return [self.track(int(i)) for i in rows]
+
+    # ---------- queries ----------
+    def search(self, options: SearchOptions, rows: Optional[Iterable[int]] = None) -> List[int]:
+        """
+        Rows matching the search options, in load order, up to options.limit.
+
+        rows optionally narrows the scan to candidate rows (e.g. from the
+        search index); the filters are still checked on each of them.
+        """
+        num = self.numeric
+        mask = num["deleted"] == 0
+        if rows is not None:
+            candidates = np.zeros(len(mask), dtype=bool)
+            candidates[np.fromiter(rows, dtype=np.intp)] = True
+            mask &= candidates
+        if options.bpm_min:
+            mask &= num["bpm"] >= options.bpm_min * 100
+        if options.bpm_max:
+            mask &= num["bpm"] <= options.bpm_max * 100
+        if options.rating_min:
+            mask &= num["rating"] >= options.rating_min
+
+        lower, keys = self.lower, self.text["key"]
+        query = options.query.lower() if options.query else None
+        artist = options.artist.lower() if options.artist else None
+        title = options.title.lower() if options.title else None
+        genre = options.genre.lower() if options.genre else None
+
+        matches = []
+        for i in np.flatnonzero(mask):
+            if query and not (
+                query in lower["title"][i] or query in lower["artist"][i] or query in lower["genre"][i]
+            ):
+                continue
+            if artist and artist not in lower["artist"][i]:
+                continue
+            if title and title not in lower["title"][i]:
+                continue
+            if genre and genre not in lower["genre"][i]:
+                continue
+            if options.key and options.key != keys[i]:
+                continue
+            matches.append(int(i))
+            if len(matches) >= options.limit:
+                break
+        return matches
+
+    def path_contains(self, text: str, rows: Optional[Iterable[int]] = None) -> List[int]:
+        needle = text.lower()
+        paths, deleted = self.lower["file_path"], self.numeric["deleted"]
+        if rows is None:
+            rows = self.active_rows()
+        return [int(i) for i in rows if deleted[i] == 0 and needle in paths[i]]
+
+    def top(self, columns: Tuple[str, ...], limit: int) -> np.ndarray:
+        """Active rows sorted by the given numeric columns descending (stable)."""
+        rows = self.active_rows()
+        keys = [-self.numeric[name][rows] for name in reversed(columns)]
+        return rows[np.lexsort(keys)][:limit]
+
+    def unplayed(self, limit: int) -> np.ndarray:
+        rows = self.active_rows()
+        return rows[self.numeric["play_count"][rows] == 0][:limit]
+
+    def playlist_rows(self, playlist_id: str) -> List[int]:
+        """Active content rows of a playlist, in playlist order."""
+        rows = []
+        for cid in self.playlist_tracks.get(str(playlist_id), ()):
+            i = self.find(cid)
+            if i is not None:
+                rows.append(i)
+        return rows
+
+    def playlist_models(self) -> List[Playlist]:
+        result = []
+        for p in self.playlists:
+            is_smart = p["attribute"] == 4
+            result.append(Playlist(
+                id=p["id"],
+                name=p["name"],
+                track_count=self.playlist_counts.get(p["id"], 0),
+                created_date=p["created_at"] or "",
+                modified_date=p["updated_at"] or "",
+                is_folder=p["attribute"] == 1,
+                is_smart_playlist=is_smart,
+                smart_criteria=str(p["smart_list"]) if is_smart and p["smart_list"] else None,
+                parent_id=p["parent_id"] if p["parent_id"] and p["parent_id"] != "root" else None,
+            ))
+        return result
+
+
+
+class LibrarySnapshot:
+    """
+    Columnar copy of djmdContent, djmdPlaylist and djmdSongPlaylist.
+
+    Content rows are addressed by position. Soft-deleted rows stay in place
+    with their deleted flag set, so positions are stable across incremental
+    refreshes.
+
+    The columns are published as immutable LibraryView objects (copy-on-write):
+    the lock is held only while checking for changes and building and swapping
+    in a new view, never while callers read one.
+    """
+
+    def __init__(self, db, db_file: Optional[Path] = None):
+        self.db = db
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple] = None
+        self._local_usn: Optional[int] = None
+        self._dirty = True
+        self.loads = 0  # full + incremental refreshes that queried the database
+        self._view = LibraryView.empty()
+        self._content_state: Optional[Tuple[int, int]] = None
+        self._names_state: Optional[Tuple] = None
+        self._playlist_state: Optional[Tuple] = None
+
+    @property
+    def view(self) -> LibraryView:
+        """The current view, as of the last refresh."""
+        return self._view
+
+    @property
+    def content_version(self) -> int:
+        return self._view.content_version
+
+    @property
+    def content_reloads(self) -> int:
+        return self._view.content_reloads
+
+    # ---------- change detection ----------
+    def mark_dirty(self) -> None:
+        """Force a USN check on the next read (used after our own commits)."""
+        with self._lock:
+            self._dirty = True
+
+    def _read_local_usn(self, session) -> Optional[int]:
+        # Same value as Rekordbox6Database.get_local_usn, read on the given session
+        try:
+            return int(
+                session.query(AgentRegistry.int_1)
+                .filter(AgentRegistry.registry_id == "localUpdateCount")
+                .scalar()
+            )
+        except Exception:
+            return None
+
+    def refresh(self, session=None) -> LibraryView:
+        """
+        Bring the snapshot up to date and return the current view; a no-op
+        while master.db is unchanged.
+
+        Queries run on session (a reader-pool session) or, by default, on the
+        pyrekordbox session.
+        """
+        with self._lock:
+            stamp = file_stamp(self.db_file)
+            if not self._dirty and stamp is not None and stamp == self._stamp:
+                return self._view
+            if session is None:
+                session = self.db.session
+            usn = self._read_local_usn(session)
+            if not self._dirty and usn is not None and usn == self._local_usn:
+                self._stamp = stamp
+                return self._view
+
+            view = self._refresh_content(session, self._view)
+            view = self._refresh_playlists(session, view)
+            self._view = view
+            self._stamp = stamp
+            self._local_usn = usn
+            self._dirty = False
+            return view
+
+    # ---------- content ----------
+    def _content_rows(self, session, min_usn: Optional[int] = None):
+        query = (
+            session.query(*(expr for _, expr in CONTENT_COLUMNS))
+            .select_from(DjmdContent)
+            .outerjoin(DjmdContent.Artist)
+            .outerjoin(DjmdContent.Album)
+            .outerjoin(DjmdContent.Genre)
+            .outerjoin(DjmdContent.Key)
+        )
+        if min_usn is not None:
+            query = query.filter(func.coalesce(DjmdContent.rb_local_usn, 0) > min_usn)
+        return query.all()
+
+    def _names_state_now(self, session) -> Tuple:
+        return tuple(table_state(session, table) for table in NAME_TABLES)
+
+    def _refresh_content(self, session, view: LibraryView) -> LibraryView:
+        state = table_state(session, DjmdContent)
+        names = self._names_state_now(session)
+        if state == self._content_state and names == self._names_state:
+            return view
+        reloads = view.content_reloads
+        if self._content_state is None or names != self._names_state:
+            columns = self._load_content(self._content_rows(session))
+            reloads += 1
+        else:
+            seen_usn = self._content_state[1]
+            columns = self._apply_content(view, self._content_rows(session, min_usn=seen_usn))
+            # Hard deletes are invisible to USN deltas; fall back to a full load
+            if len(columns[3]) != state[0]:
+                columns = self._load_content(self._content_rows(session))
+                reloads += 1
+        self._content_state = state
+        self._names_state = names
+        self.loads += 1
+        return LibraryView(
+            *columns, view.playlists, view.playlist_tracks, view.playlist_counts,
+            view.content_version + 1, reloads,
+        )
+
+    def _load_content(self, rows: List[Tuple]) -> Tuple:
+        columns = list(zip(*rows)) if rows else [()] * len(CONTENT_COLUMNS)
+        n_text = len(TEXT_COLUMNS)
+        text = {
+            name: [value or "" for value in col]
+            for name, col in zip(TEXT_COLUMNS, columns[:n_text])
+        }
+        # Identifiers keep their string form (e.g. "12345") as the row key
+        text["id"] = [str(value) for value in columns[0]]
+        numeric = {
+            name: np.fromiter((int(v or 0) for v in col), dtype=np.int64, count=len(col))
+            for name, col in zip(NUMERIC_COLUMNS, columns[n_text:])
+        }
+        lower = {name: [v.lower() for v in text[name]] for name in SEARCH_COLUMNS}
+        row_of = {cid: i for i, cid in enumerate(text["id"])}
+        logger.debug(f"Library snapshot loaded {len(row_of)} content rows")
+        return text, numeric, lower, row_of
+
+    def _apply_content(self, view: LibraryView, rows: List[Tuple]) -> Tuple:
+        if not rows:
+            return view.text, view.numeric, view.lower, view.row_of
+        # Copy-on-write: the published view keeps its columns untouched
+        text = {name: list(col) for name, col in view.text.items()}
+        numeric = {name: col.copy() for name, col in view.numeric.items()}
+        lower = {name: list(col) for name, col in view.lower.items()}
+        row_of = dict(view.row_of)
+        n_text = len(TEXT_COLUMNS)
+        appended: Dict[str, List[int]] = {name: [] for name in NUMERIC_COLUMNS}
+        for row in rows:
+            cid = str(row[0])
+            texts = [value or "" for value in row[:n_text]]
+            texts[0] = cid
+            numbers = [int(v or 0) for v in row[n_text:]]
+            i = row_of.get(cid)
+            if i is None:
+                row_of[cid] = len(text["id"])
+                for name, value in zip(TEXT_COLUMNS, texts):
+                    text[name].append(value)
+                for name in SEARCH_COLUMNS:
+                    lower[name].append(text[name][-1].lower())
+                for name, value in zip(NUMERIC_COLUMNS, numbers):
+                    appended[name].append(value)
+            else:
+                for name, value in zip(TEXT_COLUMNS, texts):
+                    text[name][i] = value
+                for name in SEARCH_COLUMNS:
+                    lower[name][i] = text[name][i].lower()
+                for name, value in zip(NUMERIC_COLUMNS, numbers):
+                    numeric[name][i] = value
+        if appended["usn"]:
+            for name, values in appended.items():
+                numeric[name] = np.concatenate(
+                    [numeric[name], np.asarray(values, dtype=np.int64)]
+                )
+        logger.debug(f"Library snapshot applied {len(rows)} changed content rows")
+        return text, numeric, lower, row_of
+
+    # ---------- playlists ----------
+    def _refresh_playlists(self, session, view: LibraryView) -> LibraryView:
+        state = (table_state(session, DjmdPlaylist), table_state(session, DjmdSongPlaylist))
+        if state == self._playlist_state:
+            return view
+        playlists = (
+            session.query(
+                DjmdPlaylist.ID,
+                DjmdPlaylist.Name,
+                DjmdPlaylist.ParentID,
+                DjmdPlaylist.Attribute,
+                DjmdPlaylist.SmartList,
+                DjmdPlaylist.created_at,
+                DjmdPlaylist.updated_at,
+            )
+            .filter(DjmdPlaylist.rb_local_deleted == 0)
+            .all()
+        )
+        songs = (
+            session.query(
+                DjmdSongPlaylist.PlaylistID,
+                DjmdSongPlaylist.ContentID,
+                DjmdSongPlaylist.TrackNo,
+            )
+            .filter(DjmdSongPlaylist.rb_local_deleted == 0)
+            .all()
+        )
+        playlists = [
+            {
+                "id": str(pid),
+                "name": name or "",
+                "parent_id": str(parent) if parent is not None else None,
+                "attribute": attribute,
+                "smart_list": smart_list,
+                "created_at": created,
+                "updated_at": updated,
+            }
+            for pid, name, parent, attribute, smart_list, created, updated in playlists
+        ]
+        members: Dict[str, List[Tuple[int, str]]] = {}
+        for pid, cid, track_no in songs:
+            members.setdefault(str(pid), []).append((track_no or 0, str(cid)))
+        # Stable sort keeps load order among equal TrackNo values
+        playlist_tracks = {
+            pid: [cid for _, cid in sorted(entries, key=lambda e: e[0])]
+            for pid, entries in members.items()
+        }
+        playlist_counts = {pid: len(cids) for pid, cids in playlist_tracks.items()}
+        self._playlist_state = state
+        self.loads += 1
+        return view.with_playlists(playlists, playlist_tracks, playlist_counts)
+
+
+_SNAPSHOTS: Dict[Any, LibrarySnapshot] = {}
+_SNAPSHOTS_LOCK = threading.Lock()
+
+
+def get_snapshot(db, db_file: Optional[Path] = None) -> LibrarySnapshot:
+    """
+    Process-wide snapshot for a database file.
+
+    Reconnecting to the same master.db reuses the columns already loaded; only
+    the database handle is swapped.
+    """
+    key = str(db_file) if db_file is not None else id(db)
+    with _SNAPSHOTS_LOCK:
+        snapshot = _SNAPSHOTS.get(key)
+        if snapshot is None:
+            snapshot = LibrarySnapshot(db, db_file)
+            _SNAPSHOTS[key] = snapshot
+        elif snapshot.db is not db:
+            snapshot.db = db
+            snapshot.mark_dirty()
+        return snapshot
@@ -0,0 +1,8 @@
+"""Tests run from a source checkout: put the rekordbox_mcp package on sys.path."""
+
+import sys
+from pathlib import Path
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+if str(PACKAGE_ROOT) not in sys.path:
+    sys.path.insert(0, str(PACKAGE_ROOT))
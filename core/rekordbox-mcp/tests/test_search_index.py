@@ -0,0 +1,152 @@
+"""SearchIndex candidates are a superset of a plain substring scan."""
+
+import random
+
+import pytest
+
+from rekordbox_mcp.search_index import CJK_RUN, FIELDS, SearchIndex
+
+WORDS = [
+    "Deep", "HOUSE", "techno", "Remix", "feat.", "Club Mix", "Édit", "Ü-Bahn",
+    "周杰伦", "晴天", "稻香", "夜曲", "邓紫棋", "光年之外", "电音", "混音版",
+    "さくら", "ヨルシカ", "米津玄師", "Lemon", "ｱﾆﾒ", "アイドル",
+    "아이유", "좋은 날", "방탄소년단", "다이너마이트",
+    "12\"", "(Original)", "DJ", "O'Neil", "%", "_",
+]
+
+
+def _random_docs(n, seed):
+    rng = random.Random(seed)
+
+    def text():
+        return rng.choice(["", " ", "-", "/"]).join(rng.sample(WORDS, rng.randint(0, 4)))
+
+    docs = {}
+    for i in range(n):
+        values = [text() for _ in FIELDS]
+        values[-1] = "/Music/" + values[-1] + ".mp3"
+        if rng.random() < 0.1:
+            values[rng.randrange(len(values))] = None
+        docs[str(1000 + i)] = values
+    return docs
+
+
+def _scan(docs, needle, fields=FIELDS):
+    needle = needle.lower()
+    positions = [FIELDS.index(name) for name in fields]
+    return {
+        key for key, values in docs.items()
+        if any(needle in (values[p] or "").lower() for p in positions)
+    }
+
+
+def _queries(docs, seed, count=300):
+    """Substrings of indexed values: 1-2 character CJK ones and 3+ character ones."""
+    rng = random.Random(seed)
+    texts = [value for values in docs.values() for value in values if value]
+    queries = []
+    while len(queries) < count:
+        value = rng.choice(texts)
+        size = rng.choice([1, 2, 3, 4, 6])
+        if len(value) < size:
+            continue
+        start = rng.randrange(len(value) - size + 1)
+        query = value[start:start + size]
+        if size < 3 and not CJK_RUN.fullmatch(query):
+            continue
+        queries.append(rng.choice([query, query.upper(), query.swapcase()]))
+    return queries
+
+
+@pytest.fixture(scope="module")
+def docs():
+    return _random_docs(400, seed=7)
+
+
+@pytest.fixture(scope="module")
+def index(docs):
+    index = SearchIndex()
+    index.sync(docs)
+    yield index
+    index.close()
+
+
+def test_candidates_cover_substring_scan(index, docs):
+    for query in _queries(docs, seed=11):
+        candidates = index.search(query)
+        assert candidates is not None, query
+        assert set(candidates) >= _scan(docs, query), query
+
+
+@pytest.mark.parametrize("query", ["周", "晴天", "ヨ", "玄師", "아", "이유", "ｱﾆ", "光年之外", "年之"])
+def test_short_cjk_queries(index, docs, query):
+    expected = _scan(docs, query)
+    assert expected
+    assert set(index.search(query)) >= expected
+
+
+def test_field_restricted_search(index, docs):
+    for fields in (("title",), ("artist", "genre"), ("file_path",)):
+        for query in _queries(docs, seed=13, count=100):
+            candidates = index.search(query, fields=fields)
+            assert set(candidates) >= _scan(docs, query, fields), (query, fields)
+
+
+def test_short_non_cjk_queries_are_not_answered(index):
+    for query in ("d", "DJ", "é", "12", "%", "_", "周a", "a晴"):
+        assert index.search(query) is None
+    assert index.search("") is None
+
+
+def test_max_results(index, docs):
+    broad = _scan(docs, ".mp3")
+    assert len(broad) > len(docs) // 2
+    assert index.search(".mp3", max_results=len(broad) - 1) is None
+    assert set(index.search(".mp3", max_results=len(broad))) == broad
+
+
+def test_sync_update_remove(docs):
+    index = SearchIndex()
+    assert index.sync(docs) == {"added": len(docs), "updated": 0, "removed": 0}
+    assert index.sync(docs) == {"added": 0, "updated": 0, "removed": 0}
+
+    changed = dict(docs)
+    first, second = list(docs)[:2]
+    changed[first] = ["光年之外 Remix", None, None, None, "/Music/new.mp3"]
+    del changed[second]
+    changed["new"] = ["아이유 좋은 날", "아이유", "", "K-Pop", "/Music/iu.flac"]
+    assert index.sync(changed) == {"added": 1, "updated": 1, "removed": 1}
+    assert second not in index and "new" in index and len(index) == len(changed)
+    for query in ("光年", "new.mp3", "좋은", "아이유", "k-pop"):
+        assert set(index.search(query)) >= _scan(changed, query), query
+    assert "new" in index.search("이유")
+    for query in _queries(docs, seed=17, count=50):
+        assert second not in index.search(query), query
+
+    assert index.update({"new": ["Lemon", "米津玄師", "", "", "/Music/lemon.mp3"]}) == 1
+    assert index.update({"new": ["Lemon", "米津玄師", "", "", "/Music/lemon.mp3"]}) == 0
+    assert "new" not in index.search("이유")
+    assert "new" in index.search("玄師")
+    assert index.remove(["new", "missing"]) == 1
+    assert "new" not in index.search("玄師")
+    index.close()
+
+
+def test_index_file_persists(tmp_path, docs):
+    path = tmp_path / "search.db"
+    index = SearchIndex(path)
+    index.sync(docs)
+    index.set_meta("content_version", "3")
+    index.close()
+
+    reopened = SearchIndex(path)
+    assert len(reopened) == len(docs) and reopened.get_meta("content_version") == "3"
+    assert reopened.sync(docs) == {"added": 0, "updated": 0, "removed": 0}
+    for query in ("晴天", "ヨル", "remix", "방탄"):
+        assert set(reopened.search(query)) >= _scan(docs, query), query
+    reopened.close()
+
+    # Another field layout rebuilds the file instead of reading stale columns
+    narrow = SearchIndex(path, fields=("title",))
+    assert len(narrow) == 0
+    narrow.close()
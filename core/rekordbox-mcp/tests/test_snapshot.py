@@ -0,0 +1,368 @@
+"""LibrarySnapshot answers read-only queries like the SQL it replaced."""
+
+import random
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyrekordbox")
+
+from pyrekordbox.db6 import tables
+from pyrekordbox.db6.tables import (
+    AgentRegistry,
+    DjmdAlbum,
+    DjmdArtist,
+    DjmdContent,
+    DjmdGenre,
+    DjmdKey,
+    DjmdPlaylist,
+    DjmdSongPlaylist,
+)
+from sqlalchemy import Integer, MetaData, cast, create_engine, func, or_
+from sqlalchemy.orm import Session, contains_eager
+
+from rekordbox_mcp.models import SearchOptions
+from rekordbox_mcp.snapshot import LibrarySnapshot, file_stamp, get_snapshot
+
+# Case variants stay ASCII: SQLite LIKE only folds ASCII, str.lower() folds everything
+TITLES = ["Deep House", "deep house dub", "TECHNO", "100% Pure", "under_score", "晴天", "夜曲 Remix", "ヨルシカ", "아이유"]
+NAMES = ["Artist A", "artist b", "DJ Snake", "周杰伦", "Daft_Punk"]
+KEYS = ["Am", "C", "F#m", "8A"]
+
+
+class LocalDb:
+    """The part of Rekordbox6Database the snapshot uses: its session."""
+
+    def __init__(self, session):
+        self.session = session
+
+
+# ---------- the SQL queries the snapshot replaced ----------
+PLAY_COUNT = func.coalesce(cast(DjmdContent.DJPlayCount, Integer), 0)
+
+
+def _contains(column, text):
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+def _content_query(session, *columns):
+    return (
+        session.query(DjmdContent, *columns)
+        .outerjoin(DjmdContent.Artist)
+        .outerjoin(DjmdContent.Album)
+        .outerjoin(DjmdContent.Genre)
+        .outerjoin(DjmdContent.Key)
+        .options(
+            contains_eager(DjmdContent.Artist),
+            contains_eager(DjmdContent.Album),
+            contains_eager(DjmdContent.Genre),
+            contains_eager(DjmdContent.Key),
+        )
+        .filter(DjmdContent.rb_local_deleted == 0)
+    )
+
+
+def _sql_search(session, options):
+    query = _content_query(session)
+    if options.query:
+        query = query.filter(or_(
+            _contains(DjmdContent.Title, options.query),
+            _contains(DjmdArtist.Name, options.query),
+            _contains(DjmdGenre.Name, options.query),
+        ))
+    if options.artist:
+        query = query.filter(_contains(DjmdArtist.Name, options.artist))
+    if options.title:
+        query = query.filter(_contains(DjmdContent.Title, options.title))
+    if options.genre:
+        query = query.filter(_contains(DjmdGenre.Name, options.genre))
+    if options.key:
+        query = query.filter(DjmdKey.ScaleName == options.key)
+    bpm = func.coalesce(DjmdContent.BPM, 0)
+    if options.bpm_min:
+        query = query.filter(bpm >= options.bpm_min * 100)
+    if options.bpm_max:
+        query = query.filter(bpm <= options.bpm_max * 100)
+    if options.rating_min:
+        query = query.filter(func.coalesce(DjmdContent.Rating, 0) >= options.rating_min)
+    return [str(content.ID) for content in query.limit(options.limit)]
+
+
+def _sql_playlist(session, pid):
+    rows = (
+        _content_query(session, DjmdSongPlaylist.TrackNo)
+        .join(DjmdSongPlaylist, DjmdSongPlaylist.ContentID == DjmdContent.ID)
+        .filter(DjmdSongPlaylist.PlaylistID == pid, DjmdSongPlaylist.rb_local_deleted == 0)
+        .order_by(func.coalesce(DjmdSongPlaylist.TrackNo, 0))
+    )
+    return [str(content.ID) for content, _ in rows]
+
+
+# ---------- fixtures ----------
+STAMP = datetime(2024, 1, 1, 12, 0)
+
+
+def _row(table, **values):
+    """A table row; pyrekordbox's DateTime columns cannot bind None."""
+    for column in table.__table__.columns:
+        if isinstance(column.type, tables.DateTime):
+            values.setdefault(column.name, STAMP)
+    return table(**values)
+
+
+def _create_schema(engine):
+    """
+    pyrekordbox's tables with NULL allowed outside the primary keys, as in
+    rekordbox's own master.db (pyrekordbox declares the columns NOT NULL).
+    """
+    metadata = MetaData()
+    for table in tables.Base.metadata.sorted_tables:
+        copy = table.to_metadata(metadata)
+        for column in copy.columns:
+            column.nullable = not column.primary_key
+    metadata.create_all(engine)
+
+
+def _bump_usn(session):
+    registry = session.get(AgentRegistry, "localUpdateCount")
+    registry.int_1 += 1
+    return registry.int_1
+
+
+def _build_library(session, n, seed):
+    rng = random.Random(seed)
+    session.add(_row(AgentRegistry, registry_id="localUpdateCount", int_1=1))
+    for table, names in ((DjmdArtist, NAMES), (DjmdAlbum, NAMES[:3]), (DjmdGenre, TITLES[:4]), (DjmdKey, KEYS)):
+        for i, name in enumerate(names):
+            name_column = "ScaleName" if table is DjmdKey else "Name"
+            session.add(_row(table, ID=str(i + 1), rb_local_usn=1, **{name_column: name}))
+
+    def ref(names):
+        return rng.choice([None] + [str(i + 1) for i in range(len(names))])
+
+    for i in range(n):
+        session.add(_row(
+            DjmdContent,
+            ID=str(5000 + i),
+            UUID=f"uuid-{i}",
+            Title=rng.choice(TITLES + [None]),
+            ArtistID=ref(NAMES),
+            AlbumID=ref(NAMES[:3]),
+            GenreID=ref(TITLES[:4]),
+            KeyID=ref(KEYS),
+            FolderPath=rng.choice([None, f"/Music/{rng.choice(TITLES + NAMES)}/{i}.mp3"]),
+            BPM=rng.choice([None, 0, rng.randint(60, 180) * 100, rng.randint(6000, 18000)]),
+            Rating=rng.choice([None, 0, 1, 2, 3, 4, 5]),
+            DJPlayCount=rng.choice([None, "0", str(rng.randint(0, 40))]),
+            Length=rng.randint(60, 600),
+            rb_local_deleted=1 if rng.random() < 0.1 else 0,
+            rb_local_usn=rng.randint(1, 50),
+        ))
+    for p in range(3):
+        session.add(_row(DjmdPlaylist, ID=str(100 + p), Name=f"List {p}", ParentID="root",
+                         Attribute=0, rb_local_deleted=0, rb_local_usn=1))
+        members = rng.sample(range(n), 15) + [0, 0]  # the same track may appear twice
+        for no, i in enumerate(rng.sample(members, len(members)), start=1):
+            session.add(_row(
+                DjmdSongPlaylist, ID=f"{p}-{no}", PlaylistID=str(100 + p), ContentID=str(5000 + i), TrackNo=no,
+                rb_local_deleted=1 if no % 7 == 0 else 0, rb_local_usn=1,
+            ))
+    session.commit()
+
+
+@pytest.fixture()
+def session():
+    engine = create_engine("sqlite://")
+    _create_schema(engine)
+    session = Session(engine)
+    _build_library(session, 300, seed=3)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _options(seed, count):
+    rng = random.Random(seed)
+    words = TITLES + NAMES + ["deep", "HOUSE", "%", "_", "ap", "周"]
+    for _ in range(count):
+        yield SearchOptions(
+            query=rng.choice(["", rng.choice(words)]),
+            artist=rng.choice([None, rng.choice(NAMES)[1:4]]),
+            title=rng.choice([None, None, rng.choice(words)]),
+            genre=rng.choice([None, None, rng.choice(TITLES[:4]).upper()[:4]]),
+            key=rng.choice([None, None, rng.choice(KEYS)]),
+            bpm_min=rng.choice([None, 90, 120.5]),
+            bpm_max=rng.choice([None, 130, 175]),
+            rating_min=rng.choice([None, 0, 3]),
+            limit=rng.choice([5, 50, 1000]),
+        )
+
+
+def _columns_by_id(view):
+    """Every row's text and numeric values keyed by content ID (positions may differ)."""
+    result = {}
+    for cid, i in view.row_of.items():
+        result[cid] = (
+            tuple(col[i] for col in view.text.values()),
+            tuple(int(col[i]) for col in view.numeric.values()),
+            tuple(col[i] for col in view.lower.values()),
+        )
+    return result
+
+
+# ---------- equivalence with the old SQL ----------
+def test_search_matches_sql(session):
+    view = LibrarySnapshot(LocalDb(session)).refresh()
+    for options in _options(seed=5, count=300):
+        rows = view.search(options)
+        assert [view.text["id"][i] for i in rows] == _sql_search(session, options), options
+
+
+def test_lookups_match_sql(session):
+    view = LibrarySnapshot(LocalDb(session)).refresh()
+    active = _content_query(session).all()
+    assert len(view) == len(active)
+
+    for content in active[:50]:
+        track = view.track(view.find(content.ID))
+        assert (track.title, track.artist, track.album, track.genre, track.key) == (
+            content.Title or "", content.ArtistName or "", content.AlbumName or "",
+            content.GenreName or "", content.KeyName or "",
+        )
+        assert track.bpm == (content.BPM or 0) / 100.0
+        assert track.play_count == int(content.DJPlayCount or 0)
+        assert track.file_path == (content.FolderPath or "")
+    deleted = session.query(DjmdContent.ID).filter(DjmdContent.rb_local_deleted == 1).first()
+    assert deleted is not None and view.find(deleted.ID) is None
+    assert view.find("missing") is None
+
+    for text in ("house", "%", "/music/", "晴"):
+        expected = [str(c.ID) for c in _content_query(session).filter(_contains(DjmdContent.FolderPath, text))]
+        assert [view.text["id"][i] for i in view.path_contains(text)] == expected
+
+    unplayed = [str(c.ID) for c in _content_query(session).filter(PLAY_COUNT == 0).limit(40)]
+    assert [view.text["id"][i] for i in view.unplayed(40)] == unplayed
+
+    # ORDER BY leaves ties to SQLite, so compare the sort keys
+    by_plays = _content_query(session).order_by(PLAY_COUNT.desc()).limit(30).all()
+    assert [int(view.numeric["play_count"][i]) for i in view.top(("play_count",), 30)] == [
+        int(c.DJPlayCount or 0) for c in by_plays
+    ]
+    by_rating = (
+        _content_query(session)
+        .order_by(func.coalesce(DjmdContent.Rating, 0).desc(), PLAY_COUNT.desc())
+        .limit(30)
+        .all()
+    )
+    assert [
+        (int(view.numeric["rating"][i]), int(view.numeric["play_count"][i]))
+        for i in view.top(("rating", "play_count"), 30)
+    ] == [(c.Rating or 0, int(c.DJPlayCount or 0)) for c in by_rating]
+
+
+def test_playlists_match_sql(session):
+    view = LibrarySnapshot(LocalDb(session)).refresh()
+    models = {p.id: p for p in view.playlist_models()}
+    assert set(models) == {"100", "101", "102"}
+    for pid, model in models.items():
+        expected = _sql_playlist(session, pid)
+        assert [view.text["id"][i] for i in view.playlist_rows(pid)] == expected
+        active_entries = session.query(DjmdSongPlaylist).filter(
+            DjmdSongPlaylist.PlaylistID == pid, DjmdSongPlaylist.rb_local_deleted == 0
+        ).count()
+        assert model.track_count == active_entries
+        assert model.parent_id is None and not model.is_folder
+
+
+# ---------- change detection ----------
+def test_unchanged_database_is_not_requeried(session):
+    snapshot = LibrarySnapshot(LocalDb(session))
+    view = snapshot.refresh()
+    loads = snapshot.loads
+    assert snapshot.refresh() is view and snapshot.loads == loads
+
+    snapshot.mark_dirty()
+    assert snapshot.refresh() is view and snapshot.loads == loads  # tables unchanged
+
+
+def test_incremental_refresh_matches_full_load(session):
+    snapshot = LibrarySnapshot(LocalDb(session))
+    old = snapshot.refresh()
+    old_columns = _columns_by_id(old)
+    assert snapshot.content_reloads == 1
+
+    usn = _bump_usn(session) + 100
+    first = session.get(DjmdContent, "5000")
+    first.Title, first.BPM, first.DJPlayCount, first.rb_local_usn = "Brand New", 12800, "7", usn
+    second = session.get(DjmdContent, "5001")
+    second.rb_local_deleted, second.rb_local_usn = 1, usn
+    session.add(_row(DjmdContent, ID="9999", Title="Added 新歌", ArtistID="4", BPM=14000,
+                                 rb_local_deleted=0, rb_local_usn=usn))
+    session.commit()
+
+    view = snapshot.refresh()
+    assert snapshot.content_reloads == 1 and view.content_version == old.content_version + 1
+    assert _columns_by_id(view) == _columns_by_id(LibrarySnapshot(LocalDb(session)).refresh())
+    assert view.track(view.find("5000")).title == "Brand New"
+    assert view.find("5001") is None
+    assert view.track(view.find("9999")).artist == "周杰伦"
+    for options in _options(seed=9, count=100):
+        assert [view.text["id"][i] for i in view.search(options)] == _sql_search(session, options)
+    # Copy-on-write: the view published before the refresh is untouched
+    assert _columns_by_id(old) == old_columns and old.find("9999") is None
+
+
+def test_hard_delete_and_renamed_artist_reload_content(session):
+    snapshot = LibrarySnapshot(LocalDb(session))
+    snapshot.refresh()
+
+    session.delete(session.get(DjmdContent, "5002"))
+    _bump_usn(session)
+    session.commit()
+    view = snapshot.refresh()
+    assert snapshot.content_reloads == 2 and "5002" not in view.row_of
+
+    artist = session.get(DjmdArtist, "1")
+    artist.Name, artist.rb_local_usn = "Renamed", 99
+    _bump_usn(session)
+    session.commit()
+    view = snapshot.refresh()
+    assert snapshot.content_reloads == 3
+    assert _columns_by_id(view) == _columns_by_id(LibrarySnapshot(LocalDb(session)).refresh())
+    renamed = [c.ID for c in _content_query(session).filter(DjmdContent.ArtistID == "1")]
+    assert renamed and all(view.track(view.find(cid)).artist == "Renamed" for cid in renamed)
+
+
+def test_playlist_change_keeps_content(session):
+    snapshot = LibrarySnapshot(LocalDb(session))
+    old = snapshot.refresh()
+
+    session.add(_row(DjmdSongPlaylist, ID="new", PlaylistID="100", ContentID="5010", TrackNo=0,
+                     rb_local_deleted=0, rb_local_usn=50))
+    _bump_usn(session)
+    session.commit()
+    view = snapshot.refresh()
+    assert view.content_version == old.content_version and view.text is old.text
+    assert [view.text["id"][i] for i in view.playlist_rows("100")] == _sql_playlist(session, "100")
+    assert view.playlist_rows("100")[0] == view.find("5010")
+
+
+def test_file_stamp_and_shared_snapshot(tmp_path, session):
+    db_file = tmp_path / "master.db"
+    assert file_stamp(None) is None
+    assert file_stamp(db_file) == (None, None)
+    db_file.write_bytes(b"x")
+    stamp = file_stamp(db_file)
+    db_file.with_name("master.db-wal").write_bytes(b"wal")
+    assert file_stamp(db_file) != stamp
+
+    first, second = LocalDb(session), LocalDb(session)
+    snapshot = get_snapshot(first, db_file)
+    view = snapshot.refresh()
+    loads = snapshot.loads
+    assert snapshot.refresh() is view and snapshot.loads == loads  # same stamp: no query at all
+
+    # Reconnecting to the same file keeps the loaded columns and swaps the handle
+    assert get_snapshot(second, db_file) is snapshot and snapshot.db is second
+    assert snapshot.refresh() is view
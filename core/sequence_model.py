@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Track Sequence Model (V11.5)
+===================================
+排序后处理（调性微调 / 能量曲线修正 / 曲线重排）共用的序列对象。
+
+- 缓存每条相邻边的过渡分 (edges[i] = score(tracks[i], tracks[i+1]))，同一对曲目只算一次
+- 缓存每个位置的阶段惩罚 (phase[i] = phase_fn(tracks[i], i, n))
+- move / swap / reverse 的目标函数增量 O(1) 求出（边部分）；
+  move / reverse 会平移区间内曲目的位置，若提供 phase_fn 则阶段部分为 O(区间长度)，
+  后处理均只在 2-3 个位置的小窗口内移动，实际仍是常数级
+- 目标函数 = Σ 边分数 - Σ 阶段惩罚（越大越好）
+- [V13.1] 同一个序列对象贯穿排序后的各道工序（调性微调 → 追加备选 → 能量曲线 → BPM 平滑），
+  extend / reorder 在原列表上改动并复用边分缓存
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+EdgeFn = Callable[[Dict, Dict], float]
+PhaseFn = Callable[[Dict, int, int], float]
+
+
+class TrackSequence:
+    """[V11.5] 带边分/阶段惩罚缓存的曲目序列"""
+
+    def __init__(self, tracks: List[Dict], edge_fn: EdgeFn, phase_fn: Optional[PhaseFn] = None,
+                 symmetric: bool = True):
+        self.tracks = list(tracks)
+        self.edge_fn = edge_fn
+        self.phase_fn = phase_fn
+        self.symmetric = symmetric  # 边分数与方向无关时 reverse 的内部边无需重算
+        self._pair_cache: Dict[Tuple[int, int], float] = {}
+        n = len(self.tracks)
+        self.edges = [self.pair(self.tracks[i], self.tracks[i + 1]) for i in range(n - 1)]
+        self.phase = [self._phase_at(t, i) for i, t in enumerate(self.tracks)] if phase_fn else [0.0] * n
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def __getitem__(self, idx):
+        return self.tracks[idx]
+
+    # ---------- 基础打分 ----------
+    def pair(self, a: Dict, b: Dict) -> float:
+        k = (id(a), id(b))
+        v = self._pair_cache.get(k)
+        if v is None:
+            v = float(self.edge_fn(a, b))
+            self._pair_cache[k] = v
+        return v
+
+    def _phase_at(self, track: Dict, pos: int) -> float:
+        return float(self.phase_fn(track, pos, len(self.tracks))) if self.phase_fn else 0.0
+
+    def total(self) -> float:
+        return sum(self.edges) - sum(self.phase)
+
+    def weakest_edges(self, k: int) -> List[int]:
+        """分数最低的 k 条边（返回左端下标）"""
+        return sorted(range(len(self.edges)), key=lambda i: self.edges[i])[:k]
+
+    def _edge_or_zero(self, i: int) -> float:
+        return self.edges[i] if 0 <= i < len(self.edges) else 0.0
+
+    def _link(self, a: Optional[Dict], b: Optional[Dict]) -> float:
+        return self.pair(a, b) if a is not None and b is not None else 0.0
+
+    def _at(self, i: int) -> Optional[Dict]:
+        return self.tracks[i] if 0 <= i < len(self.tracks) else None
+
+    # ---------- 增量评估 ----------
+    def delta_swap(self, i: int, j: int) -> float:
+        """交换 i、j 两个位置的目标函数增量"""
+        if i == j:
+            return 0.0
+        if i > j:
+            i, j = j, i
+        t = self.tracks
+        ti, tj = t[i], t[j]
+        if j == i + 1:
+            old = self._edge_or_zero(i - 1) + self.edges[i] + self._edge_or_zero(j)
+            new = self._link(self._at(i - 1), tj) + self.pair(tj, ti) + self._link(ti, self._at(j + 1))
+        else:
+            old = (self._edge_or_zero(i - 1) + self._edge_or_zero(i)
+                   + self._edge_or_zero(j - 1) + self._edge_or_zero(j))
+            new = (self._link(self._at(i - 1), tj) + self._link(tj, self._at(i + 1))
+                   + self._link(self._at(j - 1), ti) + self._link(ti, self._at(j + 1)))
+        d = new - old
+        if self.phase_fn:
+            d -= (self._phase_at(tj, i) + self._phase_at(ti, j)) - (self.phase[i] + self.phase[j])
+        return d
+
+    def delta_move(self, i: int, j: int) -> float:
+        """把位置 i 的曲目移动到位置 j（移动后它的下标为 j）的目标函数增量"""
+        if i == j:
+            return 0.0
+        t = self.tracks
+        x = t[i]
+        prev_i, next_i = self._at(i - 1), self._at(i + 1)
+        # 摘除
+        d = -self._edge_or_zero(i - 1) - self._edge_or_zero(i) + self._link(prev_i, next_i)
+        # 插入：在摘除后的序列中，x 落在 j 之前/之后两首之间
+        if j > i:
+            left, right = t[j], self._at(j + 1)
+        else:
+            left, right = self._at(j - 1), t[j]
+        d += self._link(left, x) + self._link(x, right) - self._link(left, right)
+        if self.phase_fn:
+            lo, hi = min(i, j), max(i, j)
+            old = sum(self.phase[lo:hi + 1])
+            order = self._moved_slice(i, j)
+            new = sum(self._phase_at(tr, lo + k) for k, tr in enumerate(order))
+            d -= new - old
+        return d
+
+    def delta_reverse(self, i: int, j: int) -> float:
+        """反转区间 [i, j]（2-opt）的目标函数增量"""
+        if i >= j:
+            return 0.0
+        t = self.tracks
+        d = (self._link(self._at(i - 1), t[j]) + self._link(t[i], self._at(j + 1))
+             - self._edge_or_zero(i - 1) - self._edge_or_zero(j))
+        if not self.symmetric:
+            inner_old = sum(self.edges[i:j])
+            inner_new = sum(self.pair(t[k + 1], t[k]) for k in range(i, j))
+            d += inner_new - inner_old
+        if self.phase_fn:
+            old = sum(self.phase[i:j + 1])
+            new = sum(self._phase_at(t[j - k], i + k) for k in range(j - i + 1))
+            d -= new - old
+        return d
+
+    # ---------- 落地操作（仅刷新受影响的缓存） ----------
+    def _moved_slice(self, i: int, j: int) -> List[Dict]:
+        t = self.tracks
+        if j > i:
+            return t[i + 1:j + 1] + [t[i]]
+        return [t[i]] + t[j:i]
+
+    def _refresh(self, lo: int, hi: int):
+        """刷新 [lo, hi] 内曲目的阶段惩罚及其两侧边"""
+        t = self.tracks
+        n = len(t)
+        for e in range(max(0, lo - 1), min(n - 1, hi + 1)):
+            self.edges[e] = self.pair(t[e], t[e + 1])
+        if self.phase_fn:
+            for p in range(max(0, lo), min(n, hi + 1)):
+                self.phase[p] = self._phase_at(t[p], p)
+
+    def swap(self, i: int, j: int):
+        if i == j:
+            return
+        self.tracks[i], self.tracks[j] = self.tracks[j], self.tracks[i]
+        self._refresh(i, i)
+        self._refresh(j, j)
+
+    def move(self, i: int, j: int):
+        if i == j:
+            return
+        lo, hi = min(i, j), max(i, j)
+        self.tracks[lo:hi + 1] = self._moved_slice(i, j)
+        self._refresh(lo, hi)
+
+    def reverse(self, i: int, j: int):
+        if i >= j:
+            return
+        self.tracks[i:j + 1] = self.tracks[i:j + 1][::-1]
+        if self.symmetric and not self.phase_fn:
+            self.edges[i:j] = self.edges[i:j][::-1]
+            self._refresh(i, i)
+            self._refresh(j, j)
+        else:
+            self._refresh(i, j)
+
+    def extend(self, tracks: List[Dict]):
+        """[V13.1] 在末尾追加曲目（只计算新增的边）"""
+        if not tracks:
+            return
+        start = len(self.tracks)
+        self.tracks.extend(tracks)
+        n = len(self.tracks)
+        self.edges.extend(self.pair(self.tracks[i], self.tracks[i + 1]) for i in range(max(0, start - 1), n - 1))
+        if self.phase_fn:
+            # 阶段惩罚依赖序列长度，整体重算
+            self.phase = [self._phase_at(t, i) for i, t in enumerate(self.tracks)]
+        else:
+            self.phase.extend([0.0] * len(tracks))
+
+    def reorder(self, tracks: List[Dict]):
+        """[V13.1] 整体换成新的排列（同一批曲目），在原列表上赋值，边分走缓存"""
+        self.tracks[:] = tracks
+        n = len(self.tracks)
+        self.edges = [self.pair(self.tracks[i], self.tracks[i + 1]) for i in range(n - 1)]
+        self.phase = [self._phase_at(t, i) for i, t in enumerate(self.tracks)] if self.phase_fn else [0.0] * n
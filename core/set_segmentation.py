@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Set Segmentation DP (V11.2)
+==================================
+Master 模式下对全局排序结果做最优切分（替代逐段贪心 + ±5 窗口的 Pivot 搜索）。
+
+目标函数（对所有 Set 求和，越小越好）：
+- 切分代价：切点处 _transition_score 越高越好（与旧 Pivot 逻辑一致：切点两侧仍需衔接）
+- 时长偏差：每个 Set 时长与 target_duration_minutes 的偏差（分钟）
+- 数量惩罚：低于期望首数的 Set 额外扣分
+约束：每个 Set 首数在 [min_songs, max_songs]；无可行解时自动放宽下限。
+复杂度 O(N·W)，W = max_songs - min_songs + 1。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+W_CUT = 0.5           # 切点 (100 - transition_score) 的权重
+W_DURATION = 2.0      # 每偏离 1 分钟的代价
+W_SIZE = 3.0          # 每少于期望首数 1 首的代价
+RELAXED_PENALTY = 500.0  # 违反 min_songs 时（仅在无可行解时允许）的惩罚
+
+DEFAULT_DURATION = 180
+
+
+def _prefix_durations(tracks: List[Dict]) -> List[float]:
+    prefix = [0.0]
+    for t in tracks:
+        prefix.append(prefix[-1] + (t.get('duration', DEFAULT_DURATION) or DEFAULT_DURATION))
+    return prefix
+
+
+def _cut_cost(tracks: List[Dict], j: int) -> float:
+    """在 tracks[j-1] 与 tracks[j] 之间切分的代价"""
+    if j >= len(tracks):
+        return 0.0
+    score = tracks[j].get('_transition_score', 50)
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        score = 50.0
+    return (100.0 - score) * W_CUT
+
+
+def segment_tracks_dp(tracks: List[Dict], min_songs: int, max_songs: int,
+                      target_seconds: float, target_songs: Optional[int] = None) -> List[int]:
+    """
+    [V11.2] 动态规划求全局最优切点
+    Args:
+        tracks: 全局排序后的曲目
+        min_songs / max_songs: 每个 Set 的首数约束
+        target_seconds: 目标时长（秒）
+        target_songs: 期望最少首数（低于则惩罚），默认 min_songs
+    Returns:
+        切点列表（不含 0，含 len(tracks)），如 [32, 65, 100]
+    """
+    n = len(tracks)
+    if n == 0:
+        return []
+    min_songs = max(1, int(min_songs))
+    max_songs = max(min_songs, int(max_songs))
+    if n <= max_songs:
+        return [n]
+    target_songs = target_songs if target_songs is not None else min_songs
+    prefix = _prefix_durations(tracks)
+    inf = float('inf')
+
+    def solve(lo: int, hi: int, relaxed: bool) -> Optional[List[int]]:
+        cost = [inf] * (n + 1)
+        back = [-1] * (n + 1)
+        cost[0] = 0.0
+        first = 1 if relaxed else lo
+        for j in range(first, n + 1):
+            best, best_i = inf, -1
+            cut = _cut_cost(tracks, j)
+            # i 为上一个切点：Set = tracks[i:j]
+            for size in range(first, hi + 1):
+                i = j - size
+                if i < 0:
+                    break
+                if cost[i] == inf:
+                    continue
+                dev_min = abs((prefix[j] - prefix[i]) - target_seconds) / 60.0
+                seg = dev_min * W_DURATION + max(0, target_songs - size) * W_SIZE
+                if size < lo:
+                    seg += RELAXED_PENALTY + (lo - size) * W_SIZE
+                c = cost[i] + seg + cut
+                if c < best:
+                    best, best_i = c, i
+            cost[j] = best
+            back[j] = best_i
+        if cost[n] == inf:
+            return None
+        cuts = []
+        j = n
+        while j > 0:
+            cuts.append(j)
+            j = back[j]
+        return cuts[::-1]
+
+    return solve(min_songs, max_songs, relaxed=False) or solve(min_songs, max_songs, relaxed=True) or [n]
+
+
+def _tail_score(track: Dict) -> float:
+    """Boutique 截断点的"完结感"评分（与旧逻辑一致）"""
+    score = 0
+    phase = track.get('assigned_phase', '')
+    if phase == 'Cool-down':
+        score += 20
+    elif phase == 'Intense':
+        score += 10  # 强力收尾
+    if track.get('is_bridge'):
+        score -= 50  # 不建议在桥接曲结束
+    return score
+
+
+def select_boutique_cut(tracks: List[Dict], min_target: int = 30, max_target: int = 45,
+                        target_seconds: Optional[float] = None) -> Tuple[int, float]:
+    """
+    [V11.2] Boutique 精选截断：在 [min_target, max_target] 内选最佳 Outro 点
+    代价 = -完结感评分 + 时长偏差（仅作同分时的决胜项）
+    Returns:
+        (截断首数, 完结感评分)
+    """
+    n = len(tracks)
+    if n <= max_target:
+        return n, 0.0
+    prefix = _prefix_durations(tracks)
+    best_cut, best_cost, best_score = max_target, float('inf'), -9999.0
+    for i in range(min(n, min_target), min(n, max_target) + 1):
+        score = _tail_score(tracks[i - 1])
+        cost = -score
+        if target_seconds:
+            cost += abs(prefix[i] - target_seconds) / 60.0 * 0.01
+        if cost < best_cost:
+            best_cut, best_cost, best_score = i, cost, score
+    return best_cut, best_score
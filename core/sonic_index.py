@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Sonic Similarity Index (V12.8)
+=====================================
+GodModeCurator 种子 → 全库检索的常驻索引（曲库加载后建一次，之后每次查询毫秒级）。
+
+- 嵌入：每首歌的 DNA 向量（audio_dna.dna_vector），按列标准化后 L2 归一，
+  余弦相似度 = 一次矩阵-向量乘（精确，无近似）；同分时按相似度排序
+- 倒排：God-Mode hardware 标签 → 曲目行，种子只遍历自己的标签即可得到全库共享标签数
+- Sonic DNA 规则族（拨弦 / 东方拨弦 / 断奏说唱 / 功夫 / 匪帮 / 激进）预存为布尔列：
+  规则 2-4 可直接向量化得到精确加分；只有规则 1（拨弦互补）还取决于 Ballad/Urban 与唤醒度，
+  以 +30 作为上界
+- 过滤：BPM 窗口、调性和声兼容（可选）
+- 重排：上界不低于当前第 limit 名精确分的候选，才按上界从高到低分批（每批 RERANK_CHUNK 首）
+  交给 SonicMatcher.calculate_bonus 精确计算；结果与逐首全量计算的排序一致
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from audio_dna import dna_matrix
+    HAS_DNA_VECTOR = True
+except ImportError:
+    HAS_DNA_VECTOR = False
+
+try:
+    from key_codes import ADVANCED_HARMONIC_TABLE, UNKNOWN_KEY_CODE, key_code
+    HAS_KEY_CODES = True
+except ImportError:
+    HAS_KEY_CODES = False
+
+BASE_SCORE = 50.0
+HARDWARE_WEIGHT = 15.0
+BPM_PENALTY_GAP = 10.0
+BPM_PENALTY = 20.0
+DEFAULT_BPM = 120.0
+RERANK_CHUNK = 300
+
+# calculate_bonus 的规则分值
+PLUCK_SYNERGY_MAX = 30.0
+STACCATO_BONUS = 15.0
+KUNGFU_GANGSTA_BONUS = 25.0
+AGGRESSIVE_BONUS = 15.0
+
+KUNGFU_TAGS = ("Kung_Fu_Vibe", "Oriental_Percussion")
+GANGSTA_TAGS = ("Gangsta_Flow", "West_Coast")
+
+
+def hardware_tags(god_details: Dict) -> List[str]:
+    """God-Mode hardware 维度的标签（小写去重，保持首次出现顺序）"""
+    tags = []
+    for h in (god_details or {}).get('hardware', []) or []:
+        if isinstance(h, dict) and h.get('tag'):
+            tag = str(h['tag']).lower()
+            if tag not in tags:
+                tags.append(tag)
+    return tags
+
+
+def track_view(key: str, entry: Dict) -> Dict:
+    """缓存条目 → calculate_bonus 读取的曲目结构（标题取文件名，供标题启发式标签使用）"""
+    path = entry.get('file_path') or key
+    return {
+        'track_info': {'title': os.path.basename(path), 'file_path': path},
+        'analysis': entry.get('analysis', {}) or {},
+    }
+
+
+class SonicSimilarityIndex:
+    """[V12.8] 种子 → 全库的 X-Ray 检索索引"""
+
+    def __init__(self, cache: Dict[str, Dict], matcher):
+        self.matcher = matcher
+        self.keys: List[str] = list(cache.keys())
+        self.views: List[Dict] = [track_view(k, cache[k]) for k in self.keys]
+        self._row_of = {k: i for i, k in enumerate(self.keys)}
+        self._search_text = [(k.lower(), str(cache[k].get('file_path', '') or '').lower()) for k in self.keys]
+        n = len(self.keys)
+        analyses = [v['analysis'] for v in self.views]
+
+        bpm = np.empty(n, dtype=np.float64)
+        for i, a in enumerate(analyses):
+            value = a.get('bpm', DEFAULT_BPM)
+            bpm[i] = DEFAULT_BPM if value is None else value
+        self.bpm = bpm
+        self.key_codes = (np.array([key_code(a.get('key')) for a in analyses], dtype=np.intp)
+                          if HAS_KEY_CODES else None)
+
+        # 倒排：hardware 标签 -> 行号
+        self.hardware: List[List[str]] = [hardware_tags(a.get('god_mode_details', {})) for a in analyses]
+        postings: Dict[str, List[int]] = {}
+        for i, tags in enumerate(self.hardware):
+            for tag in tags:
+                postings.setdefault(tag, []).append(i)
+        self.postings = {tag: np.array(rows, dtype=np.intp) for tag, rows in postings.items()}
+
+        # Sonic DNA 规则族（与 calculate_bonus 相同口径：神经标签 + 标题启发式标签）
+        pluck = set(matcher.YAMNET_PLUCK_TAGS)
+        families = {name: np.zeros(n, dtype=bool) for name in
+                    ('oriental', 'pizzicato', 'staccato', 'kungfu', 'gangsta', 'aggressive', 'aggressive_or_numetal')}
+        for i, view in enumerate(self.views):
+            tags = set(view['analysis'].get('sonic_dna', []) + matcher.get_sonic_tags(view['track_info']['title']))
+            families['oriental'][i] = "Oriental_Pluck" in tags or bool(tags & pluck)
+            families['pizzicato'][i] = "Pizzicato_Pluck" in tags or bool(tags & pluck)
+            families['staccato'][i] = "Staccato_Rap" in tags
+            families['kungfu'][i] = any(t in tags for t in KUNGFU_TAGS)
+            families['gangsta'][i] = any(t in tags for t in GANGSTA_TAGS)
+            families['aggressive'][i] = "Aggressive_Flow" in tags
+            families['aggressive_or_numetal'][i] = "Aggressive_Flow" in tags or "Nu_Metal_Rap" in tags
+        self.families = families
+
+        # 嵌入：DNA 向量按列标准化后归一，余弦 = 点积
+        if HAS_DNA_VECTOR and n:
+            emb = dna_matrix(analyses).astype(np.float32)
+            emb -= emb.mean(axis=0)
+            std = emb.std(axis=0)
+            emb /= np.where(std > 1e-6, std, 1.0)
+            norms = np.linalg.norm(emb, axis=1, keepdims=True)
+            self.embeddings = emb / np.where(norms > 1e-9, norms, 1.0)
+        else:
+            self.embeddings = None
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    # ---------- 种子定位 ----------
+    def find_seed(self, query: str) -> Optional[int]:
+        """与原逐条扫描同口径：键完全相同优先，否则按缓存顺序取第一个路径/键包含查询串的曲目"""
+        row = self._row_of.get(query)
+        if row is not None:
+            return row
+        q = query.lower()
+        for i, (key, path) in enumerate(self._search_text):
+            if q in path or q in key:
+                return i
+        return None
+
+    # ---------- 向量化打分 ----------
+    def similarity(self, row: int) -> np.ndarray:
+        if self.embeddings is None:
+            return np.zeros(len(self.keys), dtype=np.float32)
+        return self.embeddings @ self.embeddings[row]
+
+    def hardware_overlap(self, row: int) -> np.ndarray:
+        counts = np.zeros(len(self.keys), dtype=np.int32)
+        for tag in self.hardware[row]:
+            counts[self.postings[tag]] += 1
+        return counts
+
+    def _bonus_bounds(self, row: int):
+        """规则 2-4 的精确加分，以及规则 1 可能触发的行（其加分 ∈ {-15, +2, +30}）"""
+        f = self.families
+        exact = np.zeros(len(self.keys), dtype=np.float64)
+        if f['staccato'][row]:
+            exact[f['staccato']] += STACCATO_BONUS
+        has_kungfu = f['kungfu'] | f['kungfu'][row]
+        has_gangsta = f['gangsta'] | f['gangsta'][row]
+        exact[has_kungfu & has_gangsta] += KUNGFU_GANGSTA_BONUS
+        if f['aggressive'][row]:
+            exact[f['aggressive_or_numetal']] += AGGRESSIVE_BONUS
+        synergy = (f['oriental'][row] & f['pizzicato']) | (f['pizzicato'][row] & f['oriental'])
+        return exact, synergy
+
+    def query(self, row: int, limit: int = 5, bpm_window: Optional[float] = None,
+              harmonic_only: bool = False, chunk: int = RERANK_CHUNK) -> List[Dict]:
+        """
+        种子行 → 前 limit 名
+        Args:
+            bpm_window: 只保留与种子 BPM 相差不超过该值的曲目（None 为不过滤，仅按原规则扣分）
+            harmonic_only: 只保留与种子同调/相邻/关系大小调（或调性未知）的曲目
+        Returns:
+            [{'row', 'score', 'reasons', 'shared_dna', 'similarity'}]，按 (分数, 相似度) 降序
+        """
+        n = len(self.keys)
+        alive = np.ones(n, dtype=bool)
+        alive[row] = False
+        bpm_gap = np.abs(self.bpm[row] - self.bpm)
+        if bpm_window is not None:
+            alive &= bpm_gap <= bpm_window
+        if harmonic_only and self.key_codes is not None and self.key_codes[row] != UNKNOWN_KEY_CODE:
+            codes = self.key_codes
+            alive &= (ADVANCED_HARMONIC_TABLE[codes[row], codes] > 0) | (codes == UNKNOWN_KEY_CODE)
+        rows = np.flatnonzero(alive)
+        if not len(rows) or limit <= 0:
+            return []
+
+        base = BASE_SCORE + HARDWARE_WEIGHT * self.hardware_overlap(row) - BPM_PENALTY * (bpm_gap > BPM_PENALTY_GAP)
+        exact_bonus, synergy = self._bonus_bounds(row)
+        sim = self.similarity(row)
+
+        # 确定分：规则 1 不可能触发的行；待定行：上界 = 确定部分 + 30
+        score = base + exact_bonus
+        known = rows[~synergy[rows]]
+        pending = rows[synergy[rows]]
+        resolved: Dict[int, tuple] = {}
+
+        def kth_score(candidates: np.ndarray) -> float:
+            if len(candidates) < limit:
+                return -np.inf
+            return -float(np.partition(-score[candidates], limit - 1)[limit - 1])
+
+        pending = pending[np.lexsort((pending, -sim[pending], -(score[pending] + PLUCK_SYNERGY_MAX)))]
+        done = known
+        pos = 0
+        while pos < len(pending):
+            threshold = kth_score(done)
+            if score[pending[pos]] + PLUCK_SYNERGY_MAX < threshold:
+                break  # 剩余待定行的上界都低于第 limit 名，不可能进入结果
+            batch = pending[pos:pos + chunk]
+            for r in batch:
+                bonus, reasons = self.matcher.calculate_bonus(self.views[row], self.views[r])
+                resolved[int(r)] = (bonus, reasons)
+                score[r] = base[r] + bonus
+            done = np.concatenate([done, batch])
+            pos += len(batch)
+
+        top = done[np.lexsort((done, -sim[done], -score[done]))][:limit]
+        seed_hw = set(self.hardware[row])
+        results = []
+        for r in top:
+            r = int(r)
+            if r in resolved:
+                reasons = resolved[r][1]
+            else:
+                _, reasons = self.matcher.calculate_bonus(self.views[row], self.views[r])
+            results.append({
+                'row': r,
+                'score': round(float(score[r]), 1),
+                'reasons': reasons,
+                'shared_dna': [t for t in self.hardware[r] if t in seed_hw],
+                'similarity': round(float(sim[r]), 3),
+            })
+        return results
@@ -9,6 +9,7 @@
 import os
 import sys
 import hashlib
+import bisect
 import yaml
 from pathlib import Path
 
@@ -2773,7 +2774,88 @@ def deep_analyze_track(file_path: str, db_bpm: Optional[float] = None, detect_dr
     except Exception as e:
         return None
 
-def strict_bpm_dj_sort(tracks: list, max_bpm_diff: float = 12.0) -> list:
+def _strict_bpm_tier(bpm_diff: float) -> float:
+    """BPM兼容性得分（40%权重）- 优先选择BPM接近的"""
+    if bpm_diff <= 2:
+        return 40
+    elif bpm_diff <= 5:
+        return 35
+    elif bpm_diff <= 8:
+        return 30
+    elif bpm_diff <= 12:
+        return 25
+    return 10 - 50  # 超过12但仍在允许范围内，且大幅扣分
+
+
+def _strict_candidate_score(current_track: dict, track: dict, bpm_diff: float) -> float:
+    """候选得分：BPM(40) + 调性(30%) + 能量渐进(30)"""
+    score = _strict_bpm_tier(bpm_diff)
+    
+    # 调性兼容性（30%权重）
+    key_score = get_key_compatibility(
+        current_track.get('key', ''),
+        track.get('key', '')
+    )
+    score += key_score * 0.3
+    
+    # 能量渐进（30%权重）- 允许适度的能量变化
+    energy_diff = track.get('energy', 0) - current_track.get('energy', 0)
+    if -10 <= energy_diff <= 10:  # 允许小幅波动
+        score += 30
+    elif 10 < energy_diff <= 20:  # 适度上升
+        score += 25
+    elif -20 <= energy_diff < -10:  # 适度下降
+        score += 20
+    else:
+        score += 10  # 大幅变化扣分
+    return score
+
+
+class _BpmLaneIndex:
+    """
+    【V11.7】BPM有序候选索引（bisect）
+    - 直通车道：|bpm - 当前| <= 限制
+    - 半速/倍速车道：在同一有序数组上以 2×/0.5× 为中心查询，O(log N) 定位
+    - 从中心向两侧扩展，按有效BPM差递增访问；配合得分上界提前停止
+    """
+
+    def __init__(self, tracks: list):
+        self.tracks = tracks
+        order = sorted((i for i, t in enumerate(tracks) if t.get('bpm')), key=lambda i: tracks[i].get('bpm', 0))
+        self.bpms = [tracks[i].get('bpm', 0) for i in order]
+        self.ids = order
+
+    def remove(self, idx: int):
+        bpm = self.tracks[idx].get('bpm', 0)
+        if not bpm:
+            return
+        pos = bisect.bisect_left(self.bpms, bpm)
+        while pos < len(self.ids) and self.ids[pos] != idx:
+            pos += 1
+        if pos < len(self.ids):
+            self.bpms.pop(pos)
+            self.ids.pop(pos)
+
+    def outward(self, center: float, window: float):
+        """按 |bpm - center| 递增依次产出 (距离, 原始下标)，只覆盖 [center-window, center+window]"""
+        hi = bisect.bisect_left(self.bpms, center)
+        lo = hi - 1
+        n = len(self.bpms)
+        while lo >= 0 or hi < n:
+            if hi >= n or (lo >= 0 and center - self.bpms[lo] <= self.bpms[hi] - center):
+                dist = center - self.bpms[lo]
+                idx = self.ids[lo]
+                lo -= 1
+            else:
+                dist = self.bpms[hi] - center
+                idx = self.ids[hi]
+                hi += 1
+            if dist > window:
+                return
+            yield dist, idx
+
+
+def strict_bpm_dj_sort(tracks: list, max_bpm_diff: float = 12.0, half_double: bool = True) -> list:
     """
     严格BPM限制的专业DJ排序算法
     确保相邻歌曲BPM跨度不超过max_bpm_diff
@@ -2781,9 +2863,13 @@ def strict_bpm_dj_sort(tracks: list, max_bpm_diff: float = 12.0) -> list:
     Parameters:
     - tracks: 歌曲列表
     - max_bpm_diff: 最大BPM跨度（默认12）
+    - half_double: 【V11.7】直通车道无候选时，先尝试半速/倍速车道（有效跨度同样<=max_bpm_diff）再放宽到15
     
     Returns:
     - 排序后的歌曲列表
+    
+    【V11.7】候选查询走 BPM 有序索引 + 得分上界剪枝，万首级 "全部 120-130" 歌单
+    也只需访问最接近当前BPM的少量候选；同分时仍按原列表顺序先到先得。
     """
     
     if not tracks:
@@ -2794,104 +2880,117 @@ def strict_bpm_dj_sort(tracks: list, max_bpm_diff: float = 12.0) -> list:
         track['_index'] = i
         track['_used'] = False
     
+    n = len(tracks)
+    alive = [True] * n
+    first_alive = 0
+    remaining_count = n
+    lane_index = _BpmLaneIndex(tracks)
+    key_counts = {}
+    for t in tracks:
+        k = t.get('key', '')
+        key_counts[k] = key_counts.get(k, 0) + 1
+    
+    def take(idx: int):
+        nonlocal remaining_count, first_alive
+        alive[idx] = False
+        remaining_count -= 1
+        lane_index.remove(idx)
+        k = tracks[idx].get('key', '')
+        key_counts[k] -= 1
+        if not key_counts[k]:
+            del key_counts[k]
+        while first_alive < n and not alive[first_alive]:
+            first_alive += 1
+    
     sorted_tracks = []
-    remaining_tracks = tracks.copy()
     
     # 选择起始点：最低BPM + 低能量
-    start_track = min(remaining_tracks, 
-                     key=lambda t: (t.get('energy', 0), t.get('bpm', 0)))
+    start_idx = min(range(n), key=lambda i: (tracks[i].get('energy', 0), tracks[i].get('bpm', 0)))
+    start_track = tracks[start_idx]
     sorted_tracks.append(start_track)
-    remaining_tracks.remove(start_track)
+    take(start_idx)
     
     current_track = start_track
     max_iterations = len(tracks) * 5  # 增加迭代次数，因为限制更严格
     iteration = 0
     
-    while remaining_tracks and iteration < max_iterations:
+    def best_in_lane(center: float, scale: float, limit: float, key_bonus: float):
+        """
+        车道内最优候选：有效BPM差 = |bpm - center| * scale <= limit
+        返回 (排序键, 原始下标, 有效BPM差)，排序键越小越好
+        """
+        best = None
+        for dist, idx in lane_index.outward(center, limit / scale):
+            bpm_diff = dist * scale
+            # 上界：BPM档位 + 调性最高分 + 能量满分；后续候选BPM差只会更大，
+            # 上界不超过当前最优分时已不可能胜出（同分比BPM差），可提前停止
+            if best is not None:
+                bound = _strict_bpm_tier(bpm_diff) + key_bonus + 30
+                if bound < -best[0][0] or (bound <= -best[0][0] and bpm_diff > best[2]):
+                    break
+            score = _strict_candidate_score(current_track, tracks[idx], bpm_diff)
+            rank = (-score, bpm_diff, idx)
+            if best is None or rank < best[0]:
+                best = (rank, idx, bpm_diff)
+        return best
+    
+    while remaining_count and iteration < max_iterations:
         iteration += 1
-        
-        # 找到所有BPM跨度在限制内的候选歌曲
-        valid_candidates = []
-        for track in remaining_tracks:
-            if strict_bpm_check(current_track.get('bpm', 0), 
-                               track.get('bpm', 0), 
-                               max_bpm_diff):
-                valid_candidates.append(track)
-        
-        # 如果找不到BPM跨度在限制内的歌曲，尝试放宽限制（但不超过15）
-        if not valid_candidates and max_bpm_diff < 15:
-            for track in remaining_tracks:
-                if strict_bpm_check(current_track.get('bpm', 0), 
-                                   track.get('bpm', 0), 
-                                   15.0):
-                    valid_candidates.append(track)
-        
-        # 如果还是没有候选，使用所有剩余歌曲（但标记为警告）
-        if not valid_candidates:
-            valid_candidates = remaining_tracks[:min(10, len(remaining_tracks))]
-        
-        # 计算每个候选的得分
-        candidates = []
-        for track in valid_candidates:
-            score = 0
-            
-            # BPM兼容性（40%权重）- 优先选择BPM接近的
-            bpm_diff = abs(current_track.get('bpm', 0) - track.get('bpm', 0))
-            if bpm_diff <= 2:
-                score += 40
-            elif bpm_diff <= 5:
-                score += 35
-            elif bpm_diff <= 8:
-                score += 30
-            elif bpm_diff <= 12:
-                score += 25
-            else:
-                score += 10  # 超过12但仍在允许范围内
-            
-            # 调性兼容性（30%权重）
-            key_score = get_key_compatibility(
-                current_track.get('key', ''),
-                track.get('key', '')
-            )
-            score += key_score * 0.3
-            
-            # 能量渐进（30%权重）- 允许适度的能量变化
-            energy_diff = track.get('energy', 0) - current_track.get('energy', 0)
-            if -10 <= energy_diff <= 10:  # 允许小幅波动
-                score += 30
-            elif 10 < energy_diff <= 20:  # 适度上升
-                score += 25
-            elif -20 <= energy_diff < -10:  # 适度下降
-                score += 20
-            else:
-                score += 10  # 大幅变化扣分
-            
-            # 如果BPM跨度超过12，大幅扣分
-            if bpm_diff > 12:
-                score -= 50
-            
-            candidates.append((score, track, bpm_diff))
+        current_bpm = current_track.get('bpm', 0)
+        current_key = current_track.get('key', '')
+        key_bonus = max(get_key_compatibility(current_key, k) for k in key_counts) * 0.3
+        
+        best = None
+        lane = None
+        if current_bpm:
+            # 找到所有BPM跨度在限制内的候选歌曲
+            best = best_in_lane(current_bpm, 1.0, max_bpm_diff, key_bonus)
+            # 半速/倍速车道
+            if best is None and half_double:
+                for lane_name, center, scale in (('double', current_bpm * 2, 0.5), ('half', current_bpm / 2, 2.0)):
+                    cand = best_in_lane(center, scale, max_bpm_diff, key_bonus)
+                    if cand is not None and (best is None or cand[0] < best[0]):
+                        best, lane = cand, lane_name
+            # 如果找不到BPM跨度在限制内的歌曲，尝试放宽限制（但不超过15）
+            if best is None and max_bpm_diff < 15:
+                best = best_in_lane(current_bpm, 1.0, 15.0, key_bonus)
+        
+        # 如果还是没有候选，使用剩余歌曲中的前10首（但标记为警告）
+        if best is None:
+            picked = 0
+            idx = first_alive
+            while idx < n and picked < 10:
+                if alive[idx]:
+                    picked += 1
+                    bpm_diff = abs(current_bpm - tracks[idx].get('bpm', 0))
+                    score = _strict_candidate_score(current_track, tracks[idx], bpm_diff)
+                    rank = (-score, bpm_diff, idx)
+                    if best is None or rank < best[0]:
+                        best = (rank, idx, bpm_diff)
+                idx += 1
         
         # 如果没有候选，退出
-        if not candidates:
+        if best is None:
             break
         
-        # 按得分排序，优先选择得分高的
-        candidates.sort(key=lambda x: (x[0], -x[2]), reverse=True)  # 得分高，BPM差小
-        best_score, best_track, bpm_diff = candidates[0]
+        _, best_idx, bpm_diff = best
+        best_track = tracks[best_idx]
         
         # 如果得分太低且BPM跨度超过12，标记警告
         if bpm_diff > max_bpm_diff:
             best_track['_bpm_warning'] = True
             best_track['_bpm_diff'] = bpm_diff
+        if lane:
+            best_track['_bpm_lane'] = lane  # 半速/倍速衔接，供报告提示
         
         # 添加到排序列表
         sorted_tracks.append(best_track)
-        remaining_tracks.remove(best_track)
+        take(best_idx)
         current_track = best_track
     
     # 如果还有剩余歌曲，按BPM和调性兼容性添加到末尾
-    if remaining_tracks:
+    if remaining_count:
+        remaining_tracks = [tracks[i] for i in range(n) if alive[i]]
         remaining_tracks.sort(key=lambda t: (
             abs(current_track.get('bpm', 0) - t.get('bpm', 0)),
             -get_key_compatibility(current_track.get('key', ''), t.get('key', ''))
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""core 模块测试：与排序器一样把 core/ 放进 sys.path，按模块名直接导入"""
+
+import sys
+from pathlib import Path
+
+CORE_DIR = Path(__file__).resolve().parent.parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""bpm_partition：DP 窗口有界，且窗口内结果与不设上限的原始 DP 一致"""
+
+import random
+
+import pytest
+
+from bpm_partition import (DEFAULT_WINDOW, group_start_bounds, partition_sorted_bpms,
+                           partition_tracks_by_bpm)
+
+
+def _unbounded_partition(bpms, max_span=25.0, min_size=5, objective='groups'):
+    """[V11.3] 原始实现：每个结束点回看跨度内的全部起点（O(N²)）"""
+    n = len(bpms)
+    min_size = max(1, min(min_size, n))
+    group_penalty = max_span * max_span
+    prefix, prefix_sq = [0.0], [0.0]
+    for b in bpms:
+        prefix.append(prefix[-1] + b)
+        prefix_sq.append(prefix_sq[-1] + b * b)
+    inf = (float('inf'),) * 3
+    cost, back = [inf] * (n + 1), [0] * (n + 1)
+    cost[0] = (0, 0, 0.0)
+    lo = 0
+    for j in range(1, n + 1):
+        while bpms[j - 1] - bpms[lo] > max_span:
+            lo += 1
+        best, best_i = inf, j - 1
+        for i in range(lo, j):
+            prev = cost[i]
+            cnt = j - i
+            s = prefix[j] - prefix[i]
+            err = (prefix_sq[j] - prefix_sq[i]) - s * s / cnt
+            small = prev[0] + (1 if cnt < min_size else 0)
+            if objective == 'variance':
+                cand = (small, 0, prev[2] + err + group_penalty)
+            else:
+                cand = (small, prev[1] + 1, prev[2] + err)
+            if cand < best:
+                best, best_i = cand, i
+        cost[j], back[j] = best, best_i
+    cuts, j = [], n
+    while j > 0:
+        cuts.append(j)
+        j = back[j]
+    return cuts[::-1]
+
+
+def _dense_band(n, seed=1):
+    rng = random.Random(seed)
+    return sorted(rng.uniform(120, 130) for _ in range(n))
+
+
+def test_start_bounds_never_exceed_window():
+    bpms = _dense_band(3000)
+    starts = group_start_bounds(bpms, 25.0, DEFAULT_WINDOW)
+    assert all(j - start <= DEFAULT_WINDOW for j, start in enumerate(starts, 1))
+    # DP 内层总迭代数 = Σ(j - start) <= N·W，而不是 N²/2
+    assert sum(j - start for j, start in enumerate(starts, 1)) <= len(bpms) * DEFAULT_WINDOW
+
+
+def test_start_bounds_respect_span():
+    bpms = [100.0, 101.0, 110.0, 126.0, 127.0, 140.0]
+    starts = group_start_bounds(bpms, 25.0, 100)
+    assert starts == [0, 0, 0, 1, 2, 3]
+
+
+def test_dense_band_groups_are_capped():
+    bpms = _dense_band(3000)
+    cuts = partition_sorted_bpms(bpms)
+    sizes = [end - start for start, end in zip([0] + cuts[:-1], cuts)]
+    assert cuts[-1] == len(bpms)
+    assert max(sizes) <= DEFAULT_WINDOW
+    assert len(cuts) == -(-len(bpms) // DEFAULT_WINDOW)
+
+
+@pytest.mark.parametrize('objective', ['groups', 'variance'])
+@pytest.mark.parametrize('seed', range(8))
+def test_matches_unbounded_dp_within_window(seed, objective):
+    rng = random.Random(seed)
+    n = rng.randint(1, DEFAULT_WINDOW)
+    bpms = sorted(round(rng.uniform(60, 180), rng.choice([0, 1, 2])) for _ in range(n))
+    max_span = rng.choice([10.0, 18.0, 25.0])
+    min_size = rng.choice([1, 3, 5])
+    assert partition_sorted_bpms(bpms, max_span=max_span, min_size=min_size, objective=objective) == \
+        _unbounded_partition(bpms, max_span=max_span, min_size=min_size, objective=objective)
+
+
+def test_explicit_max_size_caps_groups():
+    bpms = _dense_band(100)
+    cuts = partition_sorted_bpms(bpms, max_size=30)
+    sizes = [end - start for start, end in zip([0] + cuts[:-1], cuts)]
+    assert max(sizes) <= 30 and len(cuts) == 4
+
+
+def test_half_double_folds_only_strays_into_existing_range():
+    tracks = [{'bpm': b} for b in (136, 138, 140, 141, 142, 143)]
+    slow = [{'bpm': b} for b in (40, 42, 43, 44, 45)]
+    stray = {'bpm': 69.5}  # 主区间外 → 折叠后 139，落在 136-143 组内
+    groups = partition_tracks_by_bpm(tracks + slow + [stray], min_size=5)
+    by_first = {g[0]['bpm']: g for g in groups}
+    assert [t['bpm'] for t in by_first[40]] == [40, 42, 43, 44, 45]
+    assert stray in by_first[136]
+
+
+def test_half_double_disabled_keeps_native_bpm():
+    tracks = [{'bpm': b} for b in (136, 138, 140, 141, 142)] + [{'bpm': 69.0}]
+    groups = partition_tracks_by_bpm(tracks, min_size=5, half_double=False)
+    assert [[t['bpm'] for t in g] for g in groups] == [[69.0], [136, 138, 140, 141, 142]]
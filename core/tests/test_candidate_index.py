@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""candidate_index：KD-Tree 最近邻与暴力扫描一致，惰性删除/撤销后存活计数正确"""
+
+import random
+
+import pytest
+
+import candidate_index
+from candidate_index import TrackFeatureIndex, track_embedding
+
+KEYS = [f"{n}{m}" for n in range(1, 13) for m in 'AB'] + [f"{n}{m}" for n in range(1, 13) for m in 'md'] + ['', '未知']
+
+
+def _random_tracks(n, seed):
+    rng = random.Random(seed)
+    return [{'title': f'T{i}', 'bpm': rng.choice([0, rng.uniform(60, 180)]) if rng.random() < 0.05 else rng.uniform(60, 180),
+             'energy': rng.randint(20, 95), 'key': rng.choice(KEYS),
+             'brightness': rng.random(), 'tonal_balance_low': rng.random()} for i in range(n)]
+
+
+def _brute_distances(tracks, query, k, alive):
+    q = track_embedding(query)
+    ds = sorted(sum((a - b) ** 2 for a, b in zip(q, track_embedding(t))) for t in tracks if alive(t))
+    return ds[:k]
+
+
+def _distances(query, result):
+    q = track_embedding(query)
+    return [sum((a - b) ** 2 for a, b in zip(q, track_embedding(t))) for t in result]
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_nearest_matches_brute_force(seed):
+    tracks = _random_tracks(400, seed)
+    index = TrackFeatureIndex(tracks)
+    rng = random.Random(seed + 100)
+    for _ in range(30):
+        query = rng.choice(tracks)
+        k = rng.choice([1, 5, 30])
+        result = index.nearest(query, k)
+        assert _distances(query, result) == pytest.approx(_brute_distances(tracks, query, k, lambda t: True))
+
+
+def test_lazy_deletion_skips_used_tracks():
+    tracks = _random_tracks(300, seed=7)
+    index = TrackFeatureIndex(tracks)
+    rng = random.Random(8)
+    for step in range(250):
+        query = rng.choice(tracks)
+        result = index.nearest(query, 10)
+        assert all(not t.get('_used') for t in result)
+        assert _distances(query, result) == pytest.approx(
+            _brute_distances(tracks, query, 10, lambda t: not t.get('_used')))
+        if result:
+            result[0]['_used'] = True
+    assert len(index) >= sum(not t.get('_used') for t in tracks)
+
+
+def test_remove_and_revive_keep_alive_counts():
+    tracks = _random_tracks(200, seed=9)
+    index = TrackFeatureIndex(tracks, is_dead=lambda t: False)
+    removed = random.Random(10).sample(range(200), 80)
+    for i in removed:
+        index.remove_index(i)
+        index.remove_index(i)  # 重复删除无副作用
+    assert len(index) == 120
+    assert not {id(t) for t in index.nearest(tracks[0], 200)} & {id(tracks[i]) for i in removed}
+    for i in removed[:30]:
+        index.revive_index(i)
+        index.revive_index(i)
+    assert len(index) == 150
+    assert len(index.nearest(tracks[0], 500)) == 150
+
+
+def test_key_parse_matches_fallback_parser(monkeypatch):
+    # Camelot / Open Key 与旧解析一致（key_codes 额外支持音名，旧解析返回 None）
+    parsed = {k: candidate_index._camelot(k) for k in KEYS + ['8a', ' 11B ', '13A', '0A']}
+    monkeypatch.setattr(candidate_index, 'HAS_KEY_CODES', False)
+    for key, value in parsed.items():
+        assert candidate_index._camelot(key) == value
+
+
+def test_folded_bpm_and_unknown_key_embedding():
+    half = track_embedding({'bpm': 64, 'energy': 50, 'key': '8A'})
+    full = track_embedding({'bpm': 128, 'energy': 50, 'key': '8A'})
+    assert half == full
+    unknown = track_embedding({'bpm': 128, 'energy': 50, 'key': '未知'})
+    assert unknown[2:4] == [0.0, 0.0]
+    assert track_embedding({'bpm': 128, 'key': '8A'})[1] == 5.0
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""key_codes：每个 Camelot 调往返编码不变；查表结果与原字符串规则逐对一致"""
+
+import numpy as np
+import pytest
+
+import common_utils
+import harmonic_utils
+from key_codes import (KEY_COMPAT_TABLE, KEY_DISTANCE_TABLE, N_KEYS, NAME_TO_CAMELOT, UNKNOWN_KEY_CODE,
+                       assign_key_codes, camelot_name, code_is_major, code_number, compat_scores, key_code,
+                       key_compatibility, track_key_code)
+
+CAMELOT = [f"{n}{m}" for n in range(1, 13) for m in 'AB']
+OPEN_KEY = [f"{n}{m}" for n in range(1, 13) for m in 'md']
+UNKNOWN = ['', '未知', '13A', '0B', 'H', None]
+
+
+def test_every_camelot_key_round_trips():
+    codes = [key_code(k) for k in CAMELOT]
+    assert sorted(codes) == list(range(N_KEYS))
+    for key, code in zip(CAMELOT, codes):
+        assert camelot_name(code) == key
+        assert key_code(camelot_name(code)) == code
+        assert key_code(key.lower()) == code
+        assert code_number(code) == int(key[:-1])
+        assert code_is_major(code) == (key[-1] == 'B')
+
+
+def test_open_key_and_note_names_map_to_camelot():
+    for n in range(1, 13):
+        assert key_code(f"{n}m") == key_code(f"{n}A")
+        assert key_code(f"{n}d") == key_code(f"{n}B")
+    for name, cam in NAME_TO_CAMELOT.items():
+        assert key_code(name) == key_code(cam)
+
+
+def test_unknown_inputs():
+    for key in UNKNOWN + [7, np.int64(3)]:
+        assert key_code(key) == UNKNOWN_KEY_CODE
+    assert camelot_name(UNKNOWN_KEY_CODE) == "未知"
+
+    class DjmdKey:
+        def __init__(self, name):
+            self.Name = name
+
+    assert key_code(DjmdKey("8A")) == key_code("8A")
+    assert key_code(DjmdKey(None)) == UNKNOWN_KEY_CODE
+
+
+def test_flexible_table_matches_string_rule(monkeypatch):
+    flexible = harmonic_utils.get_key_compatibility_flexible
+    keys = CAMELOT + OPEN_KEY + UNKNOWN[:2]
+    flexible.cache_clear()
+    table = {(a, b): flexible(a, b) for a in keys for b in keys}
+    # 关闭编码后走原字符串规则；函数带 LRU 缓存，两次都要清空
+    monkeypatch.setattr(harmonic_utils, 'HAS_KEY_CODES', False)
+    flexible.cache_clear()
+    try:
+        for (a, b), score in table.items():
+            assert flexible(a, b) == score, (a, b)
+            if a and b and '未知' not in (a, b):
+                assert key_compatibility(a, b) == score
+    finally:
+        flexible.cache_clear()
+
+
+def test_advanced_table_matches_string_rule(monkeypatch):
+    keys = CAMELOT + list(NAME_TO_CAMELOT) + ['', None, 'Unknown']
+    table = {(a, b): common_utils.get_advanced_harmonic_score(a, b)[0] for a in keys for b in keys}
+    monkeypatch.setattr(common_utils, 'HAS_KEY_CODES', False)
+    for (a, b), score in table.items():
+        assert common_utils.get_advanced_harmonic_score(a, b)[0] == score, (a, b)
+
+
+def test_distance_table_is_circle_distance():
+    for a in CAMELOT:
+        for b in CAMELOT:
+            direct = abs(int(a[:-1]) - int(b[:-1]))
+            assert KEY_DISTANCE_TABLE[key_code(a), key_code(b)] == min(direct, 12 - direct)
+    assert KEY_DISTANCE_TABLE[UNKNOWN_KEY_CODE, 0] == -1
+
+
+def test_vector_lookup_matches_scalar():
+    tracks = [{'key': k} for k in CAMELOT + OPEN_KEY + ['', '未知', 'Am']]
+    codes = assign_key_codes(tracks)
+    for cur in CAMELOT:
+        scores = compat_scores(key_code(cur), codes)
+        assert scores.tolist() == [int(KEY_COMPAT_TABLE[key_code(cur), key_code(t['key'])]) for t in tracks]
+
+
+def test_track_key_code_follows_key_changes():
+    track = {'key': '8A'}
+    assert track_key_code(track) == key_code('8A')
+    track['key'] = '3B'
+    assert track_key_code(track) == key_code('3B')
+    assert track['_key_code'] == key_code('3B')
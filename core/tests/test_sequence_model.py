@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""sequence_model：增量目标函数与整条序列重算一致，缓存的边/阶段惩罚始终与当前排列同步"""
+
+import random
+
+import pytest
+
+from sequence_model import TrackSequence
+
+
+def _tracks(n, seed):
+    rng = random.Random(seed)
+    return [{'bpm': rng.uniform(90, 140), 'energy': rng.randint(20, 95)} for _ in range(n)]
+
+
+def _symmetric_edge(a, b):
+    return 100 - abs(a['bpm'] - b['bpm']) * 2 - abs(a['energy'] - b['energy']) * 0.5
+
+
+def _directed_edge(a, b):
+    # BPM 上升加分、下降扣分：方向相关
+    return _symmetric_edge(a, b) + (b['bpm'] - a['bpm']) * 0.8
+
+
+def _phase(track, pos, n):
+    return abs(track['energy'] - (30 + 60 * pos / max(n - 1, 1))) * 0.3
+
+
+def _fresh_total(tracks, edge_fn, phase_fn):
+    n = len(tracks)
+    total = sum(edge_fn(tracks[i], tracks[i + 1]) for i in range(n - 1))
+    if phase_fn:
+        total -= sum(phase_fn(t, i, n) for i, t in enumerate(tracks))
+    return total
+
+
+def _assert_in_sync(seq, edge_fn, phase_fn):
+    t = seq.tracks
+    assert seq.edges == pytest.approx([edge_fn(t[i], t[i + 1]) for i in range(len(t) - 1)])
+    if phase_fn:
+        assert seq.phase == pytest.approx([phase_fn(x, i, len(t)) for i, x in enumerate(t)])
+
+
+CONFIGS = [(_symmetric_edge, None, True), (_symmetric_edge, _phase, True),
+           (_directed_edge, None, False), (_directed_edge, _phase, False)]
+
+
+@pytest.mark.parametrize('edge_fn,phase_fn,symmetric', CONFIGS)
+def test_deltas_match_full_recompute(edge_fn, phase_fn, symmetric):
+    rng = random.Random(4)
+    seq = TrackSequence(_tracks(25, seed=1), edge_fn, phase_fn, symmetric=symmetric)
+    for _ in range(300):
+        op = rng.choice(['swap', 'move', 'reverse'])
+        i, j = rng.randrange(len(seq)), rng.randrange(len(seq))
+        if op == 'reverse' and i > j:
+            i, j = j, i
+        before = _fresh_total(seq.tracks, edge_fn, phase_fn)
+        delta = getattr(seq, 'delta_' + op)(i, j)
+        getattr(seq, op)(i, j)
+        after = _fresh_total(seq.tracks, edge_fn, phase_fn)
+        assert delta == pytest.approx(after - before)
+        assert seq.total() == pytest.approx(after)
+        _assert_in_sync(seq, edge_fn, phase_fn)
+
+
+def test_move_places_track_at_target_index():
+    tracks = _tracks(6, seed=2)
+    seq = TrackSequence(tracks, _symmetric_edge)
+    seq.move(1, 4)
+    assert seq.tracks == [tracks[0], tracks[2], tracks[3], tracks[4], tracks[1], tracks[5]]
+    seq.move(4, 0)
+    assert seq.tracks[0] is tracks[1]
+
+
+@pytest.mark.parametrize('phase_fn', [None, _phase])
+def test_extend_and_reorder_keep_caches_in_sync(phase_fn):
+    tracks = _tracks(20, seed=3)
+    seq = TrackSequence(tracks[:12], _directed_edge, phase_fn, symmetric=False)
+    seq.extend(tracks[12:])
+    _assert_in_sync(seq, _directed_edge, phase_fn)
+    shuffled = list(seq.tracks)
+    random.Random(5).shuffle(shuffled)
+    seq.reorder(shuffled)
+    assert seq.tracks == shuffled
+    _assert_in_sync(seq, _directed_edge, phase_fn)
+
+
+def test_each_pair_scored_once():
+    calls = []
+
+    def counting_edge(a, b):
+        calls.append((id(a), id(b)))
+        return _symmetric_edge(a, b)
+
+    seq = TrackSequence(_tracks(15, seed=6), counting_edge)
+    rng = random.Random(7)
+    for _ in range(200):
+        i, j = rng.randrange(15), rng.randrange(15)
+        seq.delta_swap(i, j)
+        seq.swap(i, j)
+    assert len(calls) == len(set(calls))
+
+
+def test_weakest_edges():
+    seq = TrackSequence(_tracks(10, seed=8), _symmetric_edge)
+    weakest = seq.weakest_edges(3)
+    assert sorted(seq.edges)[:3] == [seq.edges[i] for i in weakest]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""set_segmentation：DP 切分为全局最优且满足首数约束；Boutique 截断与原逐点扫描一致"""
+
+import random
+
+from set_segmentation import (RELAXED_PENALTY, W_DURATION, W_SIZE, _cut_cost, _prefix_durations,
+                              segment_tracks_dp, select_boutique_cut)
+
+
+def _random_tracks(n, seed):
+    rng = random.Random(seed)
+    phases = ['Warm-up', 'Build-up', 'Peak', 'Intense', 'Cool-down', '']
+    return [{'duration': rng.randint(120, 360), '_transition_score': rng.uniform(0, 100),
+             'assigned_phase': rng.choice(phases), 'is_bridge': rng.random() < 0.1} for _ in range(n)]
+
+
+def _total_cost(tracks, cuts, min_songs, target_seconds, target_songs):
+    prefix = _prefix_durations(tracks)
+    cost, start = 0.0, 0
+    for end in cuts:
+        size = end - start
+        cost += abs((prefix[end] - prefix[start]) - target_seconds) / 60.0 * W_DURATION
+        cost += max(0, target_songs - size) * W_SIZE
+        if size < min_songs:
+            cost += RELAXED_PENALTY + (min_songs - size) * W_SIZE
+        cost += _cut_cost(tracks, end)
+        start = end
+    return cost
+
+
+def _all_partitions(n, min_size, max_size, start=0):
+    if start == n:
+        yield []
+        return
+    for size in range(min_size, max_size + 1):
+        if start + size > n:
+            break
+        for rest in _all_partitions(n, min_size, max_size, start + size):
+            yield [start + size] + rest
+
+
+def test_dp_is_optimal_against_brute_force():
+    for seed in range(6):
+        tracks = _random_tracks(18, seed)
+        cuts = segment_tracks_dp(tracks, 3, 7, target_seconds=20 * 60)
+        best = min(_total_cost(tracks, p, 3, 20 * 60, 3) for p in _all_partitions(18, 3, 7))
+        assert abs(_total_cost(tracks, cuts, 3, 20 * 60, 3) - best) < 1e-9
+
+
+def test_dp_respects_size_bounds():
+    tracks = _random_tracks(300, seed=9)
+    cuts = segment_tracks_dp(tracks, 25, 45, target_seconds=90 * 60)
+    sizes = [end - start for start, end in zip([0] + cuts[:-1], cuts)]
+    assert cuts[-1] == 300
+    assert all(25 <= size <= 45 for size in sizes)
+
+
+def test_dp_relaxes_min_songs_when_infeasible():
+    tracks = _random_tracks(13, seed=2)  # 5-6 首一组无法恰好凑出 13 首
+    cuts = segment_tracks_dp(tracks, 5, 6, target_seconds=15 * 60)
+    sizes = [end - start for start, end in zip([0] + cuts[:-1], cuts)]
+    assert cuts[-1] == 13 and max(sizes) <= 6 and min(sizes) < 5
+
+
+def test_dp_short_input_is_one_set():
+    assert segment_tracks_dp([], 5, 10, 600) == []
+    assert segment_tracks_dp(_random_tracks(8, seed=1), 5, 10, 600) == [8]
+
+
+def _baseline_boutique_cut(tracks, min_target=30, max_target=45):
+    """原逐点扫描：完结感评分严格更高才替换"""
+    best_cut_idx, max_tail_score = max_target, -9999
+    for i in range(min(len(tracks), min_target), min(len(tracks), max_target + 1)):
+        track = tracks[i - 1]
+        score = 0
+        phase = track.get('assigned_phase', '')
+        if phase == 'Cool-down':
+            score += 20
+        elif phase == 'Intense':
+            score += 10
+        if track.get('is_bridge'):
+            score -= 50
+        if score > max_tail_score:
+            max_tail_score = score
+            best_cut_idx = i
+    return best_cut_idx, max_tail_score
+
+
+def test_boutique_cut_matches_baseline_scan():
+    for seed in range(20):
+        tracks = _random_tracks(80, seed)
+        assert select_boutique_cut(tracks) == _baseline_boutique_cut(tracks)
+
+
+def test_boutique_cut_duration_only_breaks_ties():
+    for seed in range(20):
+        tracks = _random_tracks(80, seed)
+        cut, score = select_boutique_cut(tracks, target_seconds=90 * 60)
+        assert 30 <= cut <= 45
+        assert score == _baseline_boutique_cut(tracks)[1]
+
+
+def test_boutique_cut_keeps_short_lists():
+    assert select_boutique_cut(_random_tracks(40, seed=0)) == (40, 0.0)
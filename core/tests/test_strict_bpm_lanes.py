@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""strict_bpm_dj_sort：half_double=False 时 BPM 车道索引与原逐首扫描输出一致"""
+
+import copy
+import random
+
+import pytest
+
+try:
+    import strict_bpm_multi_set_sorter as strict
+except (ImportError, SystemExit, AttributeError) as e:
+    # 模块顶层依赖 rekordbox_mcp（缺失时直接 sys.exit）与 librosa/numpy
+    pytest.skip(f"strict_bpm_multi_set_sorter 无法导入: {e!r}", allow_module_level=True)
+
+
+def _baseline_sort(tracks, max_bpm_diff=12.0):
+    """原实现：每一步扫描全部剩余曲目"""
+    get_key_compatibility = strict.get_key_compatibility
+    strict_bpm_check = strict.strict_bpm_check
+    if not tracks:
+        return []
+    for i, track in enumerate(tracks):
+        track['_index'] = i
+        track['_used'] = False
+    sorted_tracks = []
+    remaining_tracks = tracks.copy()
+    start_track = min(remaining_tracks, key=lambda t: (t.get('energy', 0), t.get('bpm', 0)))
+    sorted_tracks.append(start_track)
+    remaining_tracks.remove(start_track)
+    current_track = start_track
+    max_iterations = len(tracks) * 5
+    iteration = 0
+    while remaining_tracks and iteration < max_iterations:
+        iteration += 1
+        valid_candidates = [t for t in remaining_tracks
+                            if strict_bpm_check(current_track.get('bpm', 0), t.get('bpm', 0), max_bpm_diff)]
+        if not valid_candidates and max_bpm_diff < 15:
+            valid_candidates = [t for t in remaining_tracks
+                                if strict_bpm_check(current_track.get('bpm', 0), t.get('bpm', 0), 15.0)]
+        if not valid_candidates:
+            valid_candidates = remaining_tracks[:min(10, len(remaining_tracks))]
+        candidates = []
+        for track in valid_candidates:
+            score = 0
+            bpm_diff = abs(current_track.get('bpm', 0) - track.get('bpm', 0))
+            if bpm_diff <= 2:
+                score += 40
+            elif bpm_diff <= 5:
+                score += 35
+            elif bpm_diff <= 8:
+                score += 30
+            elif bpm_diff <= 12:
+                score += 25
+            else:
+                score += 10
+            score += get_key_compatibility(current_track.get('key', ''), track.get('key', '')) * 0.3
+            energy_diff = track.get('energy', 0) - current_track.get('energy', 0)
+            if -10 <= energy_diff <= 10:
+                score += 30
+            elif 10 < energy_diff <= 20:
+                score += 25
+            elif -20 <= energy_diff < -10:
+                score += 20
+            else:
+                score += 10
+            if bpm_diff > 12:
+                score -= 50
+            candidates.append((score, track, bpm_diff))
+        if not candidates:
+            break
+        candidates.sort(key=lambda x: (x[0], -x[2]), reverse=True)
+        best_score, best_track, bpm_diff = candidates[0]
+        if bpm_diff > max_bpm_diff:
+            best_track['_bpm_warning'] = True
+            best_track['_bpm_diff'] = bpm_diff
+        sorted_tracks.append(best_track)
+        remaining_tracks.remove(best_track)
+        current_track = best_track
+    if remaining_tracks:
+        remaining_tracks.sort(key=lambda t: (
+            abs(current_track.get('bpm', 0) - t.get('bpm', 0)),
+            -get_key_compatibility(current_track.get('key', ''), t.get('key', ''))
+        ))
+        sorted_tracks.extend(remaining_tracks)
+    return sorted_tracks
+
+
+KEYS = [f"{n}{m}" for n in range(1, 13) for m in 'AB'] + ['', '未知']
+
+
+def _camelot_compat(key1, key2):
+    """比默认简化版更细的调性分，让同分/近分情形更多样"""
+    if key1 not in KEYS[:24] or key2 not in KEYS[:24]:
+        return 50
+    n1, n2 = int(key1[:-1]), int(key2[:-1])
+    dist = min(abs(n1 - n2), 12 - abs(n1 - n2))
+    return max(0, 100 - dist * 20 - (15 if key1[-1] != key2[-1] else 0))
+
+
+def _random_tracks(n, seed, bpm_range=(90, 140), integer_bpm=True):
+    rng = random.Random(seed)
+    tracks = []
+    for i in range(n):
+        bpm = rng.randint(*bpm_range) if integer_bpm else round(rng.uniform(*bpm_range), 2)
+        if rng.random() < 0.03:
+            bpm = 0  # 无BPM
+        tracks.append({'title': f'T{i}', 'bpm': bpm, 'energy': rng.randint(20, 95), 'key': rng.choice(KEYS)})
+    return tracks
+
+
+def _outcome(tracks):
+    return [(t['_index'], t.get('_bpm_warning', False), t.get('_bpm_diff')) for t in tracks]
+
+
+@pytest.mark.parametrize('key_fn', [None, _camelot_compat])
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('bpm_range,integer_bpm', [((90, 140), True), ((60, 180), False), ((120, 130), True)])
+def test_lane_index_matches_full_scan(monkeypatch, key_fn, seed, bpm_range, integer_bpm):
+    if key_fn is not None:
+        monkeypatch.setattr(strict, 'get_key_compatibility', key_fn)
+    tracks = _random_tracks(150, seed, bpm_range, integer_bpm)
+    expected = _outcome(_baseline_sort(copy.deepcopy(tracks)))
+    actual = _outcome(strict.strict_bpm_dj_sort(copy.deepcopy(tracks), half_double=False))
+    assert actual == expected
+
+
+def test_sparse_bpms_use_relaxation_and_fallback():
+    tracks = [{'title': f'T{i}', 'bpm': bpm, 'energy': 50, 'key': '8A'}
+              for i, bpm in enumerate([70, 84, 98, 125, 126, 160, 175, 0])]
+    expected = _outcome(_baseline_sort(copy.deepcopy(tracks)))
+    assert _outcome(strict.strict_bpm_dj_sort(copy.deepcopy(tracks), half_double=False)) == expected
+
+
+def test_half_double_lane_marks_track():
+    tracks = [{'title': 'slow', 'bpm': 70, 'energy': 20, 'key': '8A'},
+              {'title': 'fast', 'bpm': 141, 'energy': 30, 'key': '8A'}]
+    out = strict.strict_bpm_dj_sort(tracks)
+    assert [t['title'] for t in out] == ['slow', 'fast']
+    assert out[1]['_bpm_lane'] == 'double' and not out[1].get('_bpm_warning')
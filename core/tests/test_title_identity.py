@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""title_identity：位图查表与原始逐对 is_remix_collision / _normalize_title 完全一致"""
+
+import random
+import re
+
+from title_identity import (IdentityGraph, TitleIdentityIndex, normalize_mashup_title, remix_tokens,
+                            tokens_collide)
+
+
+def _baseline_collision(track_a, track_b):
+    """[V7.5] 原始 Remix Guard 逐对比较"""
+    def tokenize(title):
+        t = title.lower()
+        for kw in ['feat', 'ft.', 'remix', 'edit', 'mix', 'bootleg', 'vip', 'dub', 'flip', 'refix', 'mashup']:
+            t = t.replace(kw, '')
+        t = re.sub(r'[\(\[].*?[\)\]]', '', t)
+        return set(w for w in t.split() if len(w) > 2)
+
+    tokens_a = tokenize(track_a.get('title', ''))
+    tokens_b = tokenize(track_b.get('title', ''))
+    if not tokens_a or not tokens_b:
+        return False
+    return len(tokens_a.intersection(tokens_b)) >= min(len(tokens_a), len(tokens_b)) * 0.8
+
+
+def _baseline_normalize(t):
+    """[V35.8] MashupIntelligence 原始同歌拦截标准化"""
+    if not t:
+        return ""
+    t = re.sub(r'\(.*?\)|\[.*?\]', '', str(t))
+    t = re.sub(r'[^\w\s]', '', t)
+    return t.lower().strip()
+
+
+WORDS = ['love', 'the', 'you', 'night', 'fire', 'dance', 'heart', 'city', 'dream', 'gold',
+         'hype', 'boy', 'foot', 'fungus', 'summer', 'rain', 'ab', 'x']
+SUFFIXES = ['', ' (Extended Mix)', ' [VIP]', ' feat. Someone', ' - Radio Edit', ' (Bootleg)']
+
+
+def _random_tracks(n, seed):
+    rng = random.Random(seed)
+    tracks = []
+    for _ in range(n):
+        words = rng.sample(WORDS, rng.randint(1, 5))
+        tracks.append({'title': ' '.join(w.capitalize() for w in words) + rng.choice(SUFFIXES)})
+    return tracks
+
+
+def test_tokens_match_baseline_tokenizer():
+    for i, t in enumerate(_random_tracks(200, seed=3)):
+        tokens = remix_tokens(t['title'])
+        for other in _random_tracks(5, seed=100 + i):
+            assert tokens_collide(tokens, remix_tokens(other['title'])) == _baseline_collision(t, other)
+
+
+def test_guard_matches_pairwise_collision():
+    tracks = _random_tracks(300, seed=7)
+    index = TitleIdentityIndex(tracks, graph=IdentityGraph())
+    rng = random.Random(11)
+    for _ in range(20):
+        guard = index.new_set_guard()
+        placed = rng.sample(tracks, 8)
+        for t in placed:
+            guard.mark(t)
+        for cand in tracks:
+            expected = any(_baseline_collision(cand, p) for p in placed)
+            assert guard.collides(cand) == expected
+
+
+def test_shared_graph_grows_incrementally():
+    graph = IdentityGraph()
+    first = _random_tracks(150, seed=1)
+    second = _random_tracks(150, seed=2)
+    TitleIdentityIndex(first, graph=graph)
+    index = TitleIdentityIndex(second + first, graph=graph)
+    guard = index.new_set_guard()
+    guard.mark(second[0])
+    for cand in second + first:
+        assert guard.collides(cand) == _baseline_collision(cand, second[0])
+
+
+def test_empty_caller_graph_is_used():
+    graph = IdentityGraph()
+    assert len(graph) == 0
+    TitleIdentityIndex([{'title': 'Hype Boy'}], graph=graph)
+    assert len(graph) == 1
+
+
+def test_tracks_outside_index_fall_back_to_pairwise():
+    index = TitleIdentityIndex([{'title': 'Summer Rain Dance'}], graph=IdentityGraph())
+    guard = index.new_set_guard()
+    late = {'title': 'Summer Rain Dance (Extended Mix)'}
+    guard.mark(late)
+    assert guard.collides({'title': 'Summer Rain Dance VIP'})
+    assert not guard.collides({'title': 'Golden City Heart'})
+
+
+def test_normalize_mashup_title_matches_baseline():
+    titles = [t['title'] for t in _random_tracks(100, seed=5)] + ['', 'Foot Fungus (Edit)', '夜空中最亮的星 [Live]']
+    for title in titles:
+        assert normalize_mashup_title(title) == _baseline_normalize(title)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""track_table：列值与 dict 原值逐首一致，已用标记/未用计数只经 mark_used 维护"""
+
+import random
+
+import numpy as np
+
+from key_codes import UNKNOWN_KEY_CODE, key_code
+from track_table import TrackTable
+
+
+def _random_tracks(n, seed):
+    rng = random.Random(seed)
+    keys = [f"{k}{m}" for k in range(1, 13) for m in 'AB'] + ['', '未知', 'F#m', None]
+    tracks = []
+    for _ in range(n):
+        tracks.append({
+            'bpm': rng.choice([rng.randint(80, 160), round(rng.uniform(80, 160), 3), None, '128.5', 'abc']),
+            'energy': rng.choice([rng.randint(0, 100), rng.uniform(0, 100), None, True]),
+            'key': rng.choice(keys),
+            '_style_block': rng.choice([None, '', 'house', 'pop', 'techno']),
+            '_used': rng.random() < 0.2,
+        })
+    return tracks
+
+
+def _expected(value, default):
+    if value is None or isinstance(value, bool):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def test_columns_match_dict_values():
+    tracks = _random_tracks(300, seed=1)
+    table = TrackTable(tracks)
+    assert table.tracks is tracks and len(table) == 300
+    for i, t in enumerate(tracks):
+        row = table.data[i]
+        assert row['bpm'] == _expected(t['bpm'], 0.0)
+        assert row['energy'] == _expected(t['energy'], 50.0)
+        assert row['key_code'] == key_code(t['key'])
+        if t['_style_block']:
+            assert table.style_blocks[t['_style_block']] == row['style_block']
+        else:
+            assert row['style_block'] == -1
+        assert row['used'] == t['_used']
+
+
+def test_numeric_columns_keep_exact_values():
+    tracks = [{'bpm': 127.999, 'energy': 61.25, 'key': '8A'}, {'bpm': 128, 'energy': 61, 'key': 'Am'}]
+    table = TrackTable(tracks)
+    assert table.column('bpm').tolist() == [127.999, 128.0]
+    bpm_diff = abs(table.column('bpm')[0] - table.column('bpm')[1])
+    assert bpm_diff == abs(127.999 - 128)
+    assert table.column('key_code').tolist() == [key_code('8A')] * 2
+
+
+def test_rows_and_column_selection():
+    tracks = _random_tracks(50, seed=2)
+    table = TrackTable(tracks)
+    stranger = {'bpm': 120}
+    rows = table.rows([tracks[5], stranger, tracks[0]])
+    assert rows.tolist() == [5, -1, 0]
+    assert table.row(stranger) == -1
+    picked = np.array([3, 7, 9])
+    assert table.column('energy', picked).tolist() == [table.data['energy'][r] for r in picked]
+
+
+def test_mark_used_maintains_counts_without_touching_dicts():
+    tracks = [{'bpm': 120, 'key': '8A'} for _ in range(10)]
+    table = TrackTable(tracks)
+    assert table.unused_count == 10
+    table.mark_used(tracks[2])
+    table.mark_used(tracks[2])  # 重复标记不重复计数
+    table.mark_used(tracks[4])
+    assert table.unused_count == 8
+    assert table.is_used(tracks[2]) and not table.is_used(tracks[3])
+    assert '_used' not in tracks[2]
+    table.mark_used(tracks[2], used=False)
+    assert table.unused_count == 9 and not table.is_used(tracks[2])
+    assert int((~table.column('used')).sum()) == table.unused_count
+
+
+def test_tracks_outside_table_use_dict_flag():
+    table = TrackTable([{'bpm': 120}])
+    extra = {'bpm': 124}
+    assert not table.is_used(extra)
+    table.mark_used(extra)
+    assert extra['_used'] is True and table.is_used(extra)
+    assert table.unused_count == 1
+
+
+def test_empty_table():
+    table = TrackTable([])
+    assert len(table) == 0 and table.unused_count == 0
+    assert table.column('key_code').tolist() == []
+
+
+def test_unparseable_key_is_unknown_code():
+    table = TrackTable([{'key': 'H minor'}, {}])
+    assert table.column('key_code').tolist() == [UNKNOWN_KEY_CODE, UNKNOWN_KEY_CODE]
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Title Identity Index (V11.6)
+===================================
+Remix Guard / Mashup 同歌判定的标题身份索引。
+
+- 标题只做一次标准化与分词（全局 LRU 缓存）
+- 每次排序建一个索引：相同词集合的曲目共用一个身份簇 ID，
+  通过倒排词表只比较共享词的簇对，预先算出“簇 → 冲突簇”邻接表
+- 每个 Set 维护一个已占用位图：放入一首歌时把它的簇及所有冲突簇置位，
+  候选检查变为 O(1) 查表，结果与逐对 is_remix_collision 完全一致
+- [V13.1] 冲突图在进程内按曲库共享、增量补边（同一曲库反复排序只处理新出现的词集合）；
+  候选簇用前缀过滤生成：冲突要求重叠 >= t，任取 (词数 - t + 1) 个词必有一个落在对方集合里，
+  因此只用文档频率最低的这几个词查倒排表，高频词（love / the / you …）不再拉出整条倒排链
+"""
+
+import math
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional
+
+REMIX_KEYWORDS = ['feat', 'ft.', 'remix', 'edit', 'mix', 'bootleg', 'vip', 'dub', 'flip', 'refix', 'mashup']
+COLLISION_RATIO = 0.8
+# 共享冲突图的簇数上限，超过后换一张新图（旧索引仍持有旧图，不受影响）
+MAX_GRAPH_CLUSTERS = 200000
+
+_BRACKETS_RE = re.compile(r'[\(\[].*?[\)\]]')
+_MASHUP_BRACKETS_RE = re.compile(r'\(.*?\)|\[.*?\]')
+_SYMBOLS_RE = re.compile(r'[^\w\s]')
+
+
+@lru_cache(maxsize=50000)
+def remix_tokens(title: str) -> FrozenSet[str]:
+    """Remix Guard 口径的标题词集合：去掉 feat/remix/edit 等关键词与括号内容，保留长度>2的词"""
+    t = (title or '').lower()
+    for kw in REMIX_KEYWORDS:
+        t = t.replace(kw, '')
+    t = _BRACKETS_RE.sub('', t)
+    return frozenset(w for w in t.split() if len(w) > 2)
+
+
+@lru_cache(maxsize=50000)
+def normalize_mashup_title(title: str) -> str:
+    """Mashup 同歌拦截口径：去括号内容与符号，小写"""
+    if not title:
+        return ""
+    t = _MASHUP_BRACKETS_RE.sub('', str(title))
+    t = _SYMBOLS_RE.sub('', t)
+    return t.lower().strip()
+
+
+def tokens_collide(tokens_a: FrozenSet[str], tokens_b: FrozenSet[str]) -> bool:
+    """核心词重叠 >= 较短一方的 80% 视为同一首歌（与 is_remix_collision 一致）"""
+    if not tokens_a or not tokens_b:
+        return False
+    return len(tokens_a & tokens_b) >= min(len(tokens_a), len(tokens_b)) * COLLISION_RATIO
+
+
+def _min_overlap(size: int) -> int:
+    """较短一方为 size 个词时判为冲突所需的最少重叠词数（与 tokens_collide 的浮点比较一致）"""
+    return math.ceil(size * COLLISION_RATIO)
+
+
+class IdentityGraph:
+    """
+    [V13.1] 身份簇冲突图（进程内共享，按新出现的词集合增量补边）
+
+    新簇 A 与已有簇 B 冲突需 |A∩B| >= t，t 由较短一方决定：
+    - |B| >= |A|：A 中任取 |A|-t+1 个词必有一个在 B 里 → 用 A 最稀有的前缀词查全量倒排表
+    - |B| <  |A|：B 的前缀词必有一个在 A 里 → 用 A 的全部词查“前缀倒排表”（只收录各簇前缀词，链很短）
+    两路候选再用 tokens_collide 精确校验，结果与全量两两比对一致
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cluster_by_tokens: Dict[FrozenSet[str], int] = {}
+        self.cluster_tokens: List[FrozenSet[str]] = []
+        self.conflicts: List[List[int]] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._prefix_postings: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.cluster_tokens)
+
+    def cluster_ids(self, token_sets: List[FrozenSet[str]]) -> List[int]:
+        """返回每个词集合的簇 ID，新词集合入图并补齐冲突边"""
+        with self._lock:
+            new_sets = []
+            seen = set()
+            for tokens in token_sets:
+                if tokens not in self.cluster_by_tokens and tokens not in seen:
+                    seen.add(tokens)
+                    new_sets.append(tokens)
+            if new_sets:
+                # 文档频率：已入图的簇 + 本批新词集合，用于挑选最稀有的前缀词
+                df: Dict[str, int] = {}
+                for tokens in new_sets:
+                    for w in tokens:
+                        df[w] = df.get(w, 0) + 1
+                for tokens in new_sets:
+                    self._add(tokens, df)
+            return [self.cluster_by_tokens[tokens] for tokens in token_sets]
+
+    def _add(self, tokens: FrozenSet[str], df: Dict[str, int]):
+        size = len(tokens)
+        postings = self._postings
+        prefix_len = size - _min_overlap(size) + 1
+        prefix = sorted(tokens, key=lambda w: (len(postings.get(w, ())) + df.get(w, 0), w))[:prefix_len]
+
+        cid = len(self.cluster_tokens)
+        cluster_tokens = self.cluster_tokens
+        hits = [cid]
+        checked = set()
+        for w in prefix:
+            for other in postings.get(w, ()):
+                if other not in checked and len(cluster_tokens[other]) >= size:
+                    checked.add(other)
+                    if tokens_collide(tokens, cluster_tokens[other]):
+                        hits.append(other)
+        for w in tokens:
+            for other in self._prefix_postings.get(w, ()):
+                if other not in checked and len(cluster_tokens[other]) < size:
+                    checked.add(other)
+                    if tokens_collide(tokens, cluster_tokens[other]):
+                        hits.append(other)
+
+        self.cluster_by_tokens[tokens] = cid
+        cluster_tokens.append(tokens)
+        self.conflicts.append(hits)
+        for other in hits[1:]:
+            self.conflicts[other].append(cid)
+        for w in tokens:
+            postings.setdefault(w, []).append(cid)
+        for w in prefix:
+            self._prefix_postings.setdefault(w, []).append(cid)
+
+
+_GRAPH: Optional[IdentityGraph] = None
+_GRAPH_LOCK = threading.Lock()
+
+
+def shared_identity_graph() -> IdentityGraph:
+    """[V13.1] 当前曲库共用的冲突图（超过 MAX_GRAPH_CLUSTERS 后重建）"""
+    global _GRAPH
+    with _GRAPH_LOCK:
+        if _GRAPH is None or len(_GRAPH) > MAX_GRAPH_CLUSTERS:
+            _GRAPH = IdentityGraph()
+        return _GRAPH
+
+
+class TitleIdentityIndex:
+    """[V11.6] 一次排序内的标题身份索引（[V13.1] 簇与冲突边来自共享冲突图）"""
+
+    def __init__(self, tracks: List[Dict], graph: Optional[IdentityGraph] = None):
+        if graph is None:  # 空图 len()==0 为假值，不能用 or
+            graph = shared_identity_graph()
+        self._cluster_of: Dict[int, int] = {}
+        indexed = []
+        for t in tracks:
+            tokens = remix_tokens(t.get('title', '') or '')
+            if not tokens:
+                self._cluster_of[id(t)] = -1  # 标题过短，无法判定，永不冲突
+                continue
+            indexed.append((t, tokens))
+        ids = graph.cluster_ids([tokens for _, tokens in indexed])
+        for (t, _), cid in zip(indexed, ids):
+            self._cluster_of[id(t)] = cid
+        # 冲突表与图共享；本索引之后入图的簇不会出现在本次排序里，位图只覆盖当前簇数
+        self.conflicts = graph.conflicts
+        self.n_clusters = len(graph)
+
+    def cluster_id(self, track: Dict) -> int:
+        return self._cluster_of.get(id(track), -1)
+
+    def new_set_guard(self) -> 'UsedIdentityGuard':
+        return UsedIdentityGuard(self)
+
+
+class UsedIdentityGuard:
+    """[V11.6] 单个 Set 的已占用身份位图"""
+
+    def __init__(self, index: TitleIdentityIndex):
+        self.index = index
+        self.blocked = bytearray(index.n_clusters)
+        # 索引外曲目（如中途补入的曲目）极少，退化为线性比对
+        self._placed_tokens: List[FrozenSet[str]] = []
+        self._extra_tokens: List[FrozenSet[str]] = []
+
+    def mark(self, track: Dict):
+        tokens = remix_tokens(track.get('title', '') or '')
+        self._placed_tokens.append(tokens)
+        cid = self.index.cluster_id(track)
+        if cid >= 0:
+            n = len(self.blocked)
+            for other in self.index.conflicts[cid]:
+                if other < n:
+                    self.blocked[other] = 1
+        elif tokens and id(track) not in self.index._cluster_of:
+            self._extra_tokens.append(tokens)
+
+    def collides(self, track: Dict) -> bool:
+        if id(track) not in self.index._cluster_of:
+            tokens = remix_tokens(track.get('title', '') or '')
+            return any(tokens_collide(tokens, other) for other in self._placed_tokens)
+        cid = self.index.cluster_id(track)
+        if cid >= 0 and self.blocked[cid]:
+            return True
+        if cid >= 0 and self._extra_tokens:
+            tokens = remix_tokens(track.get('title', '') or '')
+            return any(tokens_collide(tokens, other) for other in self._extra_tokens)
+        return False
@@ -1,6 +1,8 @@
 import os
 import sys
 import glob
+import json
+from pathlib import Path
 
 # Try to import pyrekordbox for DB access
 try:
@@ -9,8 +11,202 @@ try:
 except ImportError:
     HAS_PYREKORDBOX = False
 
+# [V13.0] FTS5 全文索引（与 rekordbox-mcp 共用 search_index 模块）
+_MCP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rekordbox-mcp")
+if _MCP_DIR not in sys.path:
+    sys.path.insert(0, _MCP_DIR)
+try:
+    from rekordbox_mcp.search_index import SearchIndex
+    HAS_SEARCH_INDEX = True
+except ImportError:
+    HAS_SEARCH_INDEX = False
+
+# [V13.1] 曲库快照直接复用 rekordbox-mcp 的 LibrarySnapshot（同一 master.db 在进程内只有一份列缓存）
+try:
+    from rekordbox_mcp.snapshot import get_snapshot
+    HAS_LIBRARY_SNAPSHOT = True
+except ImportError:
+    HAS_LIBRARY_SNAPSHOT = False
+
 SEARCH_ROOTS = [r"d:\anti", r"d:\song", r"d:\song\kpop", r"C:\Users\Administrator\Downloads"]
 
+# [V12.9] 进程级曲库快照：数据库只打开一次，master.db（及 WAL）变化后才按 USN 增量刷新
+# view 为快照当前的只读列视图；indexed 表示库索引已与该视图同步
+_DB_SNAPSHOT = {'snapshot': None, 'view': None, 'indexed': False}
+
+# [V13.0] 标题 / 文件名的 FTS5 影子索引（SQLite 文件，跨进程保留，只写入变化的行）：
+# - 库索引：曲目 ID -> 标题 + 路径，随曲库快照刷新按差异同步
+# - 文件索引：SEARCH_ROOTS 下的音频文件，按目录 mtime 增量同步（未变化的目录只 stat 不列举）
+# 索引只给出候选，命中判定仍用原来的子串 / 全等比较；查询过短（1-2 个非中日韩字符）时回退全量扫描
+AUDIO_EXTS = ('.mp3', '.flac', '.wav', '.m4a')
+# [V13.1] 索引文件放在用户缓存目录（Windows: %LOCALAPPDATA%），不写入源码目录
+INDEX_DIR = os.path.join(
+    os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'track_finder')
+_INDEXES = {}
+# 文件索引的目录状态与各目录已索引文件，首次同步时从索引读入，之后在内存中维护
+_FS_STATE = {'dirs': None, 'files_by_dir': None}
+
+
+def _library_view():
+    """返回曲库快照的当前视图（列：text / lower / numeric，行号即位置）；master.db 未变化时直接复用"""
+    snap = _DB_SNAPSHOT
+    if snap['snapshot'] is None:
+        # Silence irrelevant startup warnings
+        import logging
+        logging.getLogger('pyrekordbox').setLevel(logging.ERROR)
+        db = Rekordbox6Database()
+        db_dir = getattr(db, 'db_directory', None)
+        db_file = Path(db_dir) / "master.db" if db_dir else None
+        snap['snapshot'] = get_snapshot(db, db_file if db_file and db_file.is_file() else None)
+    view = snap['snapshot'].refresh()
+    if view is snap['view']:
+        return view
+
+    snap['view'], snap['indexed'] = view, False
+    index = _index('library')
+    if index is not None:
+        text = view.text
+        try:
+            index.sync({text['id'][i]: (text['title'][i], text['file_path'][i])
+                        for i in range(len(text['id'])) if text['title'][i]})
+            snap['indexed'] = True
+        except Exception as e:
+            print(f"  [INDEX_WARN] Library index sync failed: {e}")
+    return view
+
+
+def _index(name):
+    """进程内复用的索引（library: 标题+路径；files: 文件路径）；模块不可用时返回 None"""
+    if not HAS_SEARCH_INDEX:
+        return None
+    if name not in _INDEXES:
+        fields = ('title', 'file_path') if name == 'library' else ('file_path',)
+        try:
+            os.makedirs(INDEX_DIR, exist_ok=True)
+            _INDEXES[name] = SearchIndex(os.path.join(INDEX_DIR, f"track_{name}_index.db"), fields=fields)
+        except Exception as e:
+            print(f"  [INDEX_WARN] Search index unavailable: {e}")
+            _INDEXES[name] = None
+    return _INDEXES[name]
+
+
+def _db_candidates(kw_min, view):
+    """标题可能包含关键词的行号（升序）；索引无法回答时返回 None"""
+    index = _index('library')
+    if index is None or not _DB_SNAPSHOT['indexed']:
+        return None
+    keys = index.search(kw_min, ('title',))
+    if keys is None:
+        return None
+    row_of = view.row_of
+    return sorted(row_of[k] for k in keys if k in row_of)
+
+
+def _sync_file_index(index):
+    """
+    按目录 mtime 增量同步 SEARCH_ROOTS 下的音频文件
+    目录状态 {目录: [mtime_ns, 子目录名]} 存在索引的 meta 中；目录 mtime 不变时其文件列表与子目录都未变，只需一次 stat
+    """
+    if _FS_STATE['dirs'] is None:
+        try:
+            _FS_STATE['dirs'] = json.loads(index.get_meta('dirs') or '{}')
+        except ValueError:
+            _FS_STATE['dirs'] = {}
+        files_by_dir = {}
+        for path in index.keys():
+            files_by_dir.setdefault(os.path.dirname(path), set()).add(path)
+        _FS_STATE['files_by_dir'] = files_by_dir
+    state, files_by_dir = _FS_STATE['dirs'], _FS_STATE['files_by_dir']
+
+    new_state, rescanned = {}, {}
+    stack = [r for r in reversed(SEARCH_ROOTS) if os.path.isdir(r)]
+    while stack:
+        folder = stack.pop()
+        if folder in new_state:
+            continue
+        try:
+            mtime = os.stat(folder).st_mtime_ns
+        except OSError:
+            continue
+        old = state.get(folder)
+        if old and old[0] == mtime:
+            subdirs = old[1]
+        else:
+            subdirs, files = [], set()
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir():
+                                # 与 os.walk 一致：不进入目录符号链接
+                                if not entry.is_symlink():
+                                    subdirs.append(entry.name)
+                            elif entry.name.lower().endswith(AUDIO_EXTS):
+                                files.add(entry.path)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+            rescanned[folder] = files
+        new_state[folder] = [mtime, subdirs]
+        stack.extend(os.path.join(folder, d) for d in reversed(subdirs))
+
+    gone = [folder for folder in files_by_dir if folder not in new_state]
+    removed = [p for folder in gone for p in files_by_dir.pop(folder)]
+    added = {}
+    for folder, files in rescanned.items():
+        old_files = files_by_dir.get(folder, set())
+        removed.extend(old_files - files)
+        added.update({p: (p,) for p in files - old_files})
+        if files:
+            files_by_dir[folder] = files
+        else:
+            files_by_dir.pop(folder, None)
+    if removed:
+        index.remove(removed)
+    if added:
+        index.update(added)
+    if new_state != state:
+        index.set_meta('dirs', json.dumps(new_state))
+        _FS_STATE['dirs'] = new_state
+
+
+def _name_key(name):
+    """目录 / 文件名排序键：不分大小写，再按原名区分（不依赖文件系统的列举次序）"""
+    return name.lower(), name
+
+
+def _walk_order(root, path):
+    """有序遍历的次序：目录层级（每层按 _name_key），同目录内文件先于子目录"""
+    rel = os.path.relpath(os.path.dirname(path), root)
+    parts = () if rel == os.curdir else tuple(_name_key(part) for part in rel.split(os.sep))
+    return parts, _name_key(os.path.basename(path))
+
+
+def _fs_candidates(keyword):
+    """
+    文件索引 -> 按 SEARCH_ROOTS 顺序、有序遍历次序（_walk_order）排列的 [(root, path)]；索引无法回答时返回 None
+    与原逐根遍历一致：根目录互相包含时，同一文件会在每个根下各出现一次
+    """
+    index = _index('files')
+    if index is None:
+        return None
+    try:
+        _sync_file_index(index)
+    except Exception as e:
+        print(f"  [INDEX_WARN] File index sync failed: {e}")
+        return None
+    keys = index.search(keyword)
+    if keys is None:
+        return None
+    found = []
+    for root_dir in SEARCH_ROOTS:
+        prefix = os.path.join(root_dir, '')
+        under = [p for p in keys if p.startswith(prefix)]
+        found.extend((root_dir, p) for p in sorted(under, key=lambda p: _walk_order(root_dir, p)))
+    return found
+
 def smart_find_track(keyword, use_db=True, fuzzy=True):
     """
     智能搜歌工具
@@ -21,41 +217,36 @@ def smart_find_track(keyword, use_db=True, fuzzy=True):
     found_paths = []
     
     # Strategy 1: Rekordbox DB
-    if use_db and HAS_PYREKORDBOX:
+    if use_db and HAS_PYREKORDBOX and HAS_LIBRARY_SNAPSHOT:
         try:
-            # Silence irrelevant startup warnings
-            import logging
-            logging.getLogger('pyrekordbox').setLevel(logging.ERROR)
-            
-            db = Rekordbox6Database()
-            all_songs = db.get_content()
+            view = _library_view()
+            titles, text, bpms = view.lower['title'], view.text, view.numeric['bpm']
             
             kw_min = keyword.lower()
-            for song in all_songs:
-                if not song.Title: continue
+            candidates = _db_candidates(kw_min, view)
+            for i in (range(len(titles)) if candidates is None else candidates):
+                title = titles[i]
+                if not title: continue
                 
-                match = False
                 if fuzzy:
-                    if kw_min in song.Title.lower():
-                        match = True
+                    match = kw_min in title
                 else:
-                    if kw_min == song.Title.lower():
-                        match = True
+                    match = kw_min == title
                         
                 if match:
                     # 返回丰富数据：路径 + DB 元数据
-                    # pyrekordbox DjmdContent 原始属性通常为 Uppercase
                     # BPM 在 DB 中是整数 (BPM * 100)
-                    db_bpm = (song.BPM / 100.0) if hasattr(song, 'BPM') and song.BPM else None
-                    db_key = song.KeyName if hasattr(song, 'KeyName') else None
+                    path = text['file_path'][i] or None
+                    db_bpm = (int(bpms[i]) / 100.0) if bpms[i] else None
+                    db_key = text['key'][i] or None
                     
                     found_paths.append({
-                        "path": song.FolderPath,
+                        "path": path,
                         "db_bpm": db_bpm,
                         "db_key": db_key,
                         "source": "DB"
                     })
-                    print(f"  [DB_HIT] Found in Rekordbox: {song.FolderPath} (BPM: {db_bpm}, Key: {db_key})")
+                    print(f"  [DB_HIT] Found in Rekordbox: {path} (BPM: {db_bpm}, Key: {db_key})")
                             
         except Exception as e:
             print(f"  [DB_WARN] Rekordbox lookup failed: {e}")
@@ -65,11 +256,26 @@ def smart_find_track(keyword, use_db=True, fuzzy=True):
         
     # Strategy 2: Filesystem
     print(f"  [FS_SEARCH] Searching filesystem (Fallback)...")
+    candidates = _fs_candidates(keyword)
+    if candidates is not None:
+        for root_dir, path in candidates:
+            if keyword.lower() in os.path.basename(path).lower():
+                found_paths.append({
+                    "path": path,
+                    "db_bpm": None,
+                    "db_key": None,
+                    "source": "FS"
+                })
+                print(f"  [FS_HIT] Found on Disk: {path}")
+        return found_paths
+    
     for root_dir in SEARCH_ROOTS:
         if not os.path.exists(root_dir): continue
         
         for root, dirs, files in os.walk(root_dir):
-            for file in files:
+            # 显式排序：各平台（NTFS / ext4 / APFS）结果次序一致，并与文件索引的 _walk_order 相同
+            dirs.sort(key=_name_key)
+            for file in sorted(files, key=_name_key):
                 if not file.lower().endswith(('.mp3', '.flac', '.wav', '.m4a')):
                     continue
                 
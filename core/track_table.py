@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Core: Columnar Track Table (V12.5)
+===================================
+排序流水线的紧凑列式曲目表。
+
+- 标量特征存为一个 NumPy 结构化数组（每首歌一行，字段定长）：BPM / 能量 / 调性编码 /
+  风格段落编码 / 已使用标记
+- 表只引用调用方传入的曲目列表（不复制），行号即列表下标，用于把选中的行还原成 track dict
+- 排序热路径（候选预筛、候选评分的 BPM/能量/调性、已用计数）直接读列，不再逐首 .get()
+- 已用标记只存在 used 列中，排序期间不再写回 track['_used']
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    from key_codes import UNKNOWN_KEY_CODE, track_key_code
+    HAS_KEY_CODES = True
+except ImportError:
+    UNKNOWN_KEY_CODE = 24
+    HAS_KEY_CODES = False
+
+# (字段, dtype, 缺省值)；只收排序热路径实际读取的列。bpm/energy 用 float64，保证与 dict 中原值的差值/排序完全一致
+# 混音点等排序过程中会被改写的字段不入表，避免列与 dict 各存一份而失步
+TRACK_COLUMNS = (
+    ('bpm', 'f8', 0.0),
+    ('energy', 'f8', 50.0),
+    ('key_code', 'i1', UNKNOWN_KEY_CODE),
+    ('style_block', 'i2', -1),   # _style_block 的整数编码，无标记为 -1
+    ('used', '?', False),
+)
+TRACK_DTYPE = np.dtype([(name, dtype) for name, dtype, _ in TRACK_COLUMNS])
+
+
+def _scalar(value, default):
+    if value is None or isinstance(value, bool):
+        return default
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class TrackTable:
+    """[V12.5] 一次排序内的列式曲目表"""
+
+    def __init__(self, tracks: List[Dict]):
+        # 调用方的列表本身，排序期间不得增删
+        self.tracks = tracks
+        n = len(self.tracks)
+        self.data = np.zeros(n, dtype=TRACK_DTYPE)
+        self._row_of: Dict[int, int] = {id(t): i for i, t in enumerate(self.tracks)}
+        self.style_blocks: Dict[str, int] = {}
+
+        for name, _, default in TRACK_COLUMNS:
+            if name in ('key_code', 'style_block', 'used'):
+                continue
+            self.data[name] = [_scalar(t.get(name), default) for t in self.tracks]
+        if HAS_KEY_CODES:
+            self.data['key_code'] = [track_key_code(t) for t in self.tracks]
+        else:
+            self.data['key_code'] = UNKNOWN_KEY_CODE
+        self.data['style_block'] = [self._style_code(t.get('_style_block')) for t in self.tracks]
+        self.data['used'] = [bool(t.get('_used')) for t in self.tracks]
+        self._used = self.data['used']  # 字段视图，与 data 共享内存
+        self._unused = int(n - self._used.sum())
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def _style_code(self, block) -> int:
+        if not block:
+            return -1
+        code = self.style_blocks.get(block)
+        if code is None:
+            code = len(self.style_blocks)
+            self.style_blocks[block] = code
+        return code
+
+    # ---------- 行定位 ----------
+    def row(self, track: Dict) -> int:
+        """曲目所在行，不在表内返回 -1"""
+        return self._row_of.get(id(track), -1)
+
+    def rows(self, tracks: Iterable[Dict]) -> np.ndarray:
+        row_of = self._row_of
+        return np.fromiter((row_of.get(id(t), -1) for t in tracks), dtype=np.intp)
+
+    def column(self, name: str, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        col = self.data[name]
+        return col if rows is None else col[rows]
+
+    # ---------- 已使用标记 ----------
+    def is_used(self, track: Dict) -> bool:
+        """表内曲目读 used 列；不在表内的曲目退回 track['_used']"""
+        r = self._row_of.get(id(track))
+        return bool(track.get('_used')) if r is None else bool(self._used[r])
+
+    def mark_used(self, track: Dict, used: bool = True):
+        """[V13.1] 已用标记的唯一写入点：维护已用位与未用计数（表内曲目不写 track['_used']）"""
+        r = self._row_of.get(id(track))
+        if r is None:
+            track['_used'] = used
+            return
+        if bool(self._used[r]) == used:
+            return
+        self._used[r] = used
+        self._unused += -1 if used else 1
+
+    @property
+    def unused_count(self) -> int:
+        return self._unused
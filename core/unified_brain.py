@@ -19,6 +19,13 @@ import sys
 SKILLS_DIR = Path(__file__).parent.parent / "skills"
 sys.path.insert(0, str(SKILLS_DIR))
 
+# 【V11.5】后处理共用序列模型
+try:
+    from sequence_model import TrackSequence
+    from harmonic_utils import get_key_compatibility_flexible
+except ImportError:
+    TrackSequence = None
+
 # ============================================================
 # 第一层：核心工具 (来自 unified_expert_core)
 # ============================================================
@@ -717,8 +724,8 @@ class EnergyManager:
         return len([i for i in issues if 'error' in i]) == 0, issues
     
     @staticmethod
-    def reorder_for_curve(tracks: List[Dict]) -> List[Dict]:
-        """按能量曲线重新排序"""
+    def reorder_for_curve(tracks: List[Dict], refine: bool = False) -> List[Dict]:
+        """按能量曲线重新排序（refine=True 时再用序列模型在阶段区间内微调相邻调性/能量衔接，会改变原有排序结果，默认关闭）"""
         if not tracks or len(tracks) < 4:
             return tracks
         
@@ -741,7 +748,44 @@ class EnergyManager:
         
         result.extend(sorted(cool_down, key=lambda t: t.get('energy', 50), reverse=True))
         
+        if refine and TrackSequence is not None and len(result) >= 8:
+            result = EnergyManager._refine_curve(result)
         return result
+    
+    @staticmethod
+    def _phase_penalty(track: Dict, pos: int, n: int) -> float:
+        """位置所属阶段的能量越界量（与 validate_curve 的阶段划分一致）"""
+        if pos < n // 5:
+            phase = "Warm-up"
+        elif pos < 2 * n // 5:
+            phase = "Build-up"
+        elif pos < 4 * n // 5:
+            phase = "Peak"
+        else:
+            phase = "Cool-down"
+        config = EnergyManager.PHASES[phase]
+        energy = track.get('energy', 50)
+        return max(0, config["min"] - energy) + max(0, energy - config["max"])
+    
+    @staticmethod
+    def _refine_curve(tracks: List[Dict], max_distance: int = 2, passes: int = 2) -> List[Dict]:
+        """[V11.5] 基于序列模型的小窗口交换：调性分 - 能量落差 - 阶段越界惩罚"""
+        seq = TrackSequence(
+            tracks,
+            edge_fn=lambda a, b: get_key_compatibility_flexible(a.get('key', ''), b.get('key', ''))
+                                 - abs(a.get('energy', 50) - b.get('energy', 50)),
+            phase_fn=lambda t, pos, n: EnergyManager._phase_penalty(t, pos, n) * 2.0,
+        )
+        for _ in range(passes):
+            improved = False
+            for i in range(len(seq)):
+                for j in range(i + 1, min(len(seq), i + max_distance + 1)):
+                    if seq.delta_swap(i, j) > 1e-6:
+                        seq.swap(i, j)
+                        improved = True
+            if not improved:
+                break
+        return seq.tracks
 
 
 class BPMManager:
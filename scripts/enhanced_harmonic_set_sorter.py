@@ -14,10 +14,12 @@ import contextlib
 import hashlib
 import subprocess
 import shutil
+import time
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 import statistics
+import bisect
 from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -220,6 +222,8 @@ except ImportError:
         print(f"[WARN] 无法挂载 Set Blueprinter，将使用硬编码阶段")
 
 CACHE_FILE = Path(__file__).parent / "song_analysis_cache.json"
+# 【V11.1】播放列表排列快照，与分析缓存放在同一目录
+ORDER_STORE_FILE = CACHE_FILE.with_name("playlist_order_cache.json")
 # 分析器版本号（用于缓存失效控制）
 ANALYZER_VERSION = "v1.2-pro-dimensions"
 # 模型版本字典（用于缓存失效控制）
@@ -248,12 +252,98 @@ except Exception as e:
     print(f"警告: 无法加载 dj_rules.yaml，将使用默认值: {e}")
     DJ_RULES = {}
 
+# 【V13.1】风格冲突扣分的置信度门槛：加载时读一次（get_config() 每次都深拷贝并重读 yaml，不能放进候选评分）
+try:
+    GENRE_MIN_CONFIDENCE = float((DJ_RULES.get("genre_profile") or {}).get("min_confidence_for_sort", 0.85))
+except (TypeError, ValueError):
+    GENRE_MIN_CONFIDENCE = 0.85
+
 # 导入全局优化引擎
 try:
     from global_optimization_engine import optimize_global_sets
 except ImportError:
     def optimize_global_sets(sets, config, progress_logger=None): return 0
 
+# 【V11.1】增量重排：播放列表小幅变动时修复旧排列，而不是整条流水线重跑
+try:
+    from incremental_resort import PlaylistOrderStore, diff_membership, is_small_change, repair_sets
+    HAS_INCREMENTAL_RESORT = True
+except ImportError:
+    HAS_INCREMENTAL_RESORT = False
+
+
+# 【V11.2】Master 模式 DP 最优切分
+try:
+    from set_segmentation import segment_tracks_dp, select_boutique_cut
+    HAS_DP_SEGMENTATION = True
+except ImportError:
+    HAS_DP_SEGMENTATION = False
+
+# 【V11.3】BPM 一维最优分组（含半速/倍速折叠）
+try:
+    from bpm_partition import partition_tracks_by_bpm
+    HAS_BPM_PARTITION = True
+except ImportError:
+    HAS_BPM_PARTITION = False
+
+# 【V11.5】后处理共用序列模型（边分/阶段惩罚缓存 + O(1) 增量评估）
+try:
+    from sequence_model import TrackSequence
+    HAS_SEQUENCE_MODEL = True
+except ImportError:
+    HAS_SEQUENCE_MODEL = False
+
+# 【V11.6】标题身份索引（Remix Guard O(1) 查表）
+try:
+    from title_identity import TitleIdentityIndex, remix_tokens, tokens_collide
+    HAS_TITLE_IDENTITY = True
+except ImportError:
+    HAS_TITLE_IDENTITY = False
+
+# 【V11.8】空间候选索引（KD-Tree 预筛选每轮候选池）
+try:
+    from candidate_index import TrackFeatureIndex
+    HAS_CANDIDATE_INDEX = True
+except ImportError:
+    HAS_CANDIDATE_INDEX = False
+
+# 【V11.9】现场选歌引擎（限时返回下一首候选）
+try:
+    from live_sequencer import LiveSequencer
+    HAS_LIVE_SEQUENCER = True
+except ImportError:
+    HAS_LIVE_SEQUENCER = False
+
+# 【V12.4】DNA 向量（每首歌只算一次，随分析结果缓存）
+try:
+    from audio_dna import DNA_FIELD_INDEX, dna_vector
+    HAS_DNA_VECTOR = True
+except ImportError:
+    HAS_DNA_VECTOR = False
+
+# 【V12.0】统一整数调性编码（加载时解析一次，兼容规则为 25×25 预计算表）
+try:
+    from key_codes import (KEY_COMPAT_ROWS, KEY_COMPAT_TABLE, KEY_DISTANCE_TABLE, key_code,
+                           track_key_code, assign_key_codes)
+    HAS_KEY_CODES = True
+except ImportError:
+    HAS_KEY_CODES = False
+
+# numpy 单独探测一次；librosa 缺失不影响 numpy 路径
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# 【V12.5】列式曲目表（候选预筛与已用计数直接对列运算）
+try:
+    from track_table import TrackTable
+    HAS_TRACK_TABLE = True
+except ImportError:
+    HAS_TRACK_TABLE = False
+
 def _lock_file_handle(f):
     """跨平台文件锁（简单独占锁），避免并发写坏缓存"""
     try:
@@ -524,11 +614,9 @@ def cache_analysis(file_path, analysis, cache):
 
 try:
     import librosa
-    import numpy as np
     HAS_LIBROSA = True
 except ImportError:
     HAS_LIBROSA = False
-    np = None
 
 def convert_open_key_to_camelot(open_key: str) -> str:
     """
@@ -638,6 +726,19 @@ def auto_group_by_bpm(tracks: List[Dict], max_bpm_range: float = 25.0) -> List[L
     if not tracks:
         return []
     
+    # 【V11.3】优先使用约束感知的最优划分（跨度/组大小/半速倍速一次到位，无需事后合并小组）
+    if HAS_BPM_PARTITION:
+        grouping_cfg = DJ_RULES.get('bpm_grouping', {}) if DJ_RULES else {}
+        if grouping_cfg.get('enabled', True):
+            return partition_tracks_by_bpm(
+                tracks,
+                max_span=max_bpm_range,
+                min_size=grouping_cfg.get('min_group_size', 5),
+                max_size=grouping_cfg.get('max_group_size'),
+                half_double=grouping_cfg.get('half_double', True),
+                objective=grouping_cfg.get('objective', 'groups'),
+            )
+    
     # 过滤掉没有BPM的歌曲，单独处理
     tracks_with_bpm = [t for t in tracks if t.get('bpm') and t.get('bpm') > 0]
     tracks_without_bpm = [t for t in tracks if not t.get('bpm') or t.get('bpm') <= 0]
@@ -703,13 +804,25 @@ def auto_group_by_bpm(tracks: List[Dict], max_bpm_range: float = 25.0) -> List[L
     return merged_groups
 
 
-def smooth_bpm_sequence(tracks: List[Dict]) -> List[Dict]:
+def _key_edge(a: Dict, b: Dict) -> float:
+    """【V13.1】排序后各道工序共用的序列边分：相邻两首的调性兼容分"""
+    return get_key_compatibility_flexible(a.get('key', ''), b.get('key', ''))
+
+
+def smooth_bpm_sequence(tracks) -> List[Dict]:
     """
     平滑BPM序列，避免大幅度跳跃
     
     策略：使用贪心算法，每次选择BPM最接近的下一首歌
     同时考虑调性兼容性作为次要因素
+    
+    【V11.5】候选按BPM排序后从当前BPM向两侧扩展，BPM差已超过当前最优分即停止
+    （调性惩罚非负，更远的候选不可能更优），结果与逐个扫描一致
+    【V13.1】可直接传入排序阶段的 TrackSequence：调性分走其边分缓存，结果原地写回序列
     """
+    seq = tracks if HAS_SEQUENCE_MODEL and isinstance(tracks, TrackSequence) else None
+    if seq is not None:
+        tracks = seq.tracks
     if len(tracks) <= 2:
         return tracks
     
@@ -726,39 +839,50 @@ def smooth_bpm_sequence(tracks: List[Dict]) -> List[Dict]:
     result = [start_track]
     remaining = [t for t in tracks if t != start_track]
     
-    while remaining:
+    # BPM有序索引：(bpm, 原始顺序)，同分时保持原逐个扫描“先到先得”的选择
+    order = sorted(range(len(remaining)), key=lambda k: remaining[k].get('bpm', 0))
+    sorted_bpms = [remaining[k].get('bpm', 0) for k in order]
+    
+    while order:
         current = result[-1]
         current_bpm = current.get('bpm', 0)
         current_key = current.get('key', '')
         
-        # 找BPM最接近的歌曲，调性作为次要因素
-        best_track = None
-        best_score = float('inf')
-        
-        for track in remaining:
-            track_bpm = track.get('bpm', 0)
-            track_key = track.get('key', '')
-            
-            # BPM差距（主要因素）
-            bpm_diff = abs(track_bpm - current_bpm)
+        best = None  # (score, 原始顺序, 有序下标)
+        pos = bisect.bisect_left(sorted_bpms, current_bpm)
+        lo, hi = pos - 1, pos
+        while lo >= 0 or hi < len(order):
+            # 取BPM差更小的一侧
+            if hi >= len(order) or (lo >= 0 and current_bpm - sorted_bpms[lo] <= sorted_bpms[hi] - current_bpm):
+                p = lo
+                lo -= 1
+            else:
+                p = hi
+                hi += 1
+            bpm_diff = abs(sorted_bpms[p] - current_bpm)
+            if best is not None and bpm_diff > best[0]:
+                break
             
+            track = remaining[order[p]]
             # 调性兼容性（次要因素，0-100分转换为0-10的惩罚）
-            key_score = get_key_compatibility_flexible(current_key, track_key)
+            if seq is not None:
+                key_score = seq.pair(current, track)
+            else:
+                key_score = get_key_compatibility_flexible(current_key, track.get('key', ''))
             key_penalty = (100 - key_score) / 10  # 0-10
             
             # 综合分数（BPM差距 + 调性惩罚）
             score = bpm_diff + key_penalty
-            
-            if score < best_score:
-                best_score = score
-                best_track = track
+            if best is None or (score, order[p]) < best[:2]:
+                best = (score, order[p], p)
         
-        if best_track:
-            result.append(best_track)
-            remaining.remove(best_track)
-        else:
-            break
+        result.append(remaining[best[1]])
+        order.pop(best[2])
+        sorted_bpms.pop(best[2])
     
+    if seq is not None:
+        seq.reorder(result)
+        return seq.tracks
     return result
 
 
@@ -811,6 +935,9 @@ def get_key_compatibility_flexible(current_key: str, next_key: str) -> int:
     if not current_key or current_key == "未知" or not next_key or next_key == "未知":
         return 50  # 未知调性给中等分数，允许使用
     
+    if HAS_KEY_CODES:
+        return KEY_COMPAT_ROWS[key_code(current_key)][key_code(next_key)]
+    
     # Open Key System兼容：自动转换Open Key格式到Camelot格式
     current_key = convert_open_key_to_camelot(current_key)
     next_key = convert_open_key_to_camelot(next_key)
@@ -1296,12 +1423,18 @@ def compare_rhythm_similarity(track_a: dict, track_b: dict) -> float:
     """[V11.0 DNA Sync] 计算律动相似度"""
     if not DNA_SYNC_ENABLED: return 0.5
     
+    if HAS_DNA_VECTOR:
+        # 【V12.4】直接读缓存的 DNA 向量，不再逐对映射整份分析结果
+        v1 = dna_vector(track_a.get('analysis', track_a))
+        v2 = dna_vector(track_b.get('analysis', track_b))
+        sw, gd = DNA_FIELD_INDEX['swing_dna'], DNA_FIELD_INDEX['groove_density']
+        swing_match = 1.0 - abs(float(v1[sw]) - float(v2[sw]))
+        density_match = 1.0 - abs(float(v1[gd]) - float(v2[gd]))
+        return swing_match * 0.7 + density_match * 0.3
+    
     dna1 = map_dna_features(track_a.get('analysis', track_a))
     dna2 = map_dna_features(track_b.get('analysis', track_b))
     
-    # 提取律动维度得分 (0-100 -> 0.0-1.0)
-    affinity, tags = calculate_dna_affinity(dna1, dna2)
-    
     # 专门针对律动进行加权
     swing_match = 1.0 - abs(dna1.get('swing_dna', 0.5) - dna2.get('swing_dna', 0.5))
     density_match = 1.0 - abs(dna1.get('groove_density', 0.5) - dna2.get('groove_density', 0.5))
@@ -1615,12 +1748,22 @@ def get_energy_phase_target(current_position: float, total_tracks: int,
     
     return (base_min, base_max, phase_name)
 
-def _calculate_candidate_score(track_data: tuple) -> tuple:
+# 【V12.2】排序诊断级别
+TRACE_OFF = 'off'          # 不收集任何诊断
+TRACE_CHOSEN = 'chosen'    # 只由每轮选中曲目的评分指标生成审计追踪（默认）
+TRACE_SAMPLED = 'sampled'  # 每 TRACE_SAMPLE_EVERY 轮记录一次完整候选明细
+TRACE_FULL = 'full'        # 每轮全部候选明细（挂载 debug_reporter 时的默认值）
+TRACE_LEVELS = (TRACE_OFF, TRACE_CHOSEN, TRACE_SAMPLED, TRACE_FULL)
+TRACE_SAMPLE_EVERY = 10
+
+
+def _calculate_candidate_score(track_data: tuple, trace: bool = True) -> tuple:
     """
     计算单个候选歌曲的得分（用于并行处理）
     
     参数:
         track_data: (track, current_track, current_bpm, min_energy, max_energy, phase_name, sorted_tracks, is_boutique)
+        trace: 是否生成 audit_trace（现场选歌 _live_transition_score 以 False 调用）
     
     返回:
         (score, track, metrics)
@@ -1654,11 +1797,16 @@ def _calculate_candidate_score(track_data: tuple) -> tuple:
         "ae_details": {},
         "narrative_score": 0.0,
         "narrative_details": {},
-        "audit_trace": []  # 【V6.0 Audit】审计追踪
     }
-    
-    def add_trace(key, val, impact, msg=""):
-        metrics["audit_trace"].append({"dim": key, "val": val, "score": impact, "reason": msg})
+    if trace:
+        metrics["audit_trace"] = []  # 【V6.0 Audit】审计追踪
+        
+        def add_trace(key, val, impact, msg=""):
+            metrics["audit_trace"].append({"dim": key, "val": val, "score": impact, "reason": msg})
+    else:
+        # 【V13.1】不追踪时（现场选歌逐候选评分）审计记录整体关闭，各评分点照常调用 add_trace
+        def add_trace(key, val, impact, msg=""):
+            pass
     
     # ========== 【V7-PRO】微观维度注入：Mashup 兼容性评分 (30% 权重调节) ==========
     if MASHUP_ENABLED and current_track:
@@ -2298,12 +2446,7 @@ def _calculate_candidate_score(track_data: tuple) -> tuple:
         # 【防负优化】置信度门控：只有在风格标签足够可信时才启用“冲突扣分”
         # - 你现在的主流程会对缺失风格做 filename 兜底，但默认置信度较低（0.6）
         # - update_genre_cache 批量写入的标签可设置更高置信度（建议 0.85+）
-        try:
-            from split_config import get_config as _get_cfg
-            _cfg = _get_cfg() or {}
-            min_conf = float(((_cfg.get("genre_profile") or {}).get("min_confidence_for_sort", 0.85)))
-        except Exception:
-            min_conf = 0.85
+        min_conf = GENRE_MIN_CONFIDENCE
         try:
             curr_conf = float(current_track.get("detected_genre_confidence", 0.0) or 0.0)
         except Exception:
@@ -2580,12 +2723,151 @@ def _calculate_candidate_score(track_data: tuple) -> tuple:
     
     return (score, track, metrics)
 
+def _live_transition_score(current_track: Dict, track: Dict, band: tuple, placed: List[Dict]) -> float:
+    """【V13.1】现场选歌的过渡分：与 enhanced_harmonic_sort 单轮贪心同一套候选评分"""
+    if track.get('_used'):
+        # 曲目对象可能刚参加过一次整单排序，带着 _used 标记
+        track = dict(track)
+        track.pop('_used', None)
+    min_energy, max_energy, phase_name = band
+    score, _, _ = _calculate_candidate_score(
+        (track, current_track, current_track.get('bpm', 0) or 0, min_energy, max_energy, phase_name, placed, False),
+        trace=False)
+    return score
+
+
+_LIVE_SEQUENCERS: Dict[str, 'LiveSequencer'] = {}
+
+
+def get_live_sequencer(playlist_key: str, tracks: List[Dict]) -> Optional['LiveSequencer']:
+    """【V13.1】按播放列表常驻的现场选歌引擎；曲目列表换了（重新加载/成员变化）才重建"""
+    if not HAS_LIVE_SEQUENCER:
+        return None
+    split_cfg = DJ_RULES.get('split', {}) if DJ_RULES else {}
+    engine = _LIVE_SEQUENCERS.get(playlist_key)
+    if engine is None or engine.source is not tracks or len(engine.tracks) != len(tracks):
+        engine = LiveSequencer(tracks, set_minutes=split_cfg.get('target_duration_minutes', 90.0),
+                               score_fn=_live_transition_score)
+        _LIVE_SEQUENCERS[playlist_key] = engine
+    return engine
+
+
+def _find_live_track(tracks: List[Dict], query: str) -> Optional[Dict]:
+    """按文件路径 / 完整标题 / 标题片段定位曲目（现场模式命令行参数用）"""
+    q = (query or '').strip().lower().replace('\\', '/')
+    if not q:
+        return None
+    for t in tracks:
+        if str(t.get('file_path', '')).lower().replace('\\', '/') == q:
+            return t
+    for t in tracks:
+        if str(t.get('title', '')).strip().lower() == q:
+            return t
+    for t in tracks:
+        if q in str(t.get('title', '')).lower():
+            return t
+    return None
+
+
+def suggest_live_next(playlist_key: str, tracks: List[Dict], now_playing: str, played: List[str] = (),
+                      time_remaining_minutes: Optional[float] = None, top_n: int = 10,
+                      deadline_ms: float = 50.0) -> List[Dict]:
+    """
+    【V13.1】现场模式（--live --now-playing）：限时返回下一首候选，不重跑整条批处理流水线
+    Returns:
+        LiveSequencer.suggest_next 的结果；找不到正在播放的曲目或引擎不可用时返回空列表
+    """
+    engine = get_live_sequencer(playlist_key, tracks)
+    current = _find_live_track(tracks, now_playing)
+    if engine is None or current is None:
+        print(f"[Live] 无法给出建议：{'现场引擎不可用' if engine is None else '未找到正在播放的曲目 ' + now_playing}")
+        return []
+    history = [t for t in (_find_live_track(tracks, q) for q in played) if t is not None and t is not current]
+    start = time.perf_counter()
+    suggestions = engine.suggest_next(current, history, time_remaining_minutes=time_remaining_minutes,
+                                      top_n=top_n, deadline_ms=deadline_ms)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    try:
+        print(f"\n[Live] 正在播放: {current.get('title', '')} ({current.get('bpm', 0):.0f} BPM, {current.get('key', '')})")
+        print(f"[Live] 下一首候选 ({elapsed_ms:.0f}ms, 阶段 {suggestions[0]['stage'] if suggestions else 0}/3):")
+        for rank, s in enumerate(suggestions, 1):
+            t = s['track']
+            print(f"  {rank:>2}. {t.get('title', '')} - {t.get('artist', '')} "
+                  f"({t.get('bpm', 0):.0f} BPM, {t.get('key', '')}, 能量 {t.get('energy', 50)}) 得分 {s['score']}")
+    except Exception:
+        pass
+    return suggestions
+
+
+# 【V12.2】chosen 级别的审计追踪：直接由本轮胜出候选的 metrics 生成，不重放评分
+# (metrics 键, 维度名, 计分系数: None 表示仅作参考不直接计分, 说明)
+_TRACE_FIELDS = (
+    ("bpm_diff", "BPM Compatibility", None, "BPM 差"),
+    ("key_score", "Key Harmony", None, "调性兼容分"),
+    ("key_distance_penalty", "Key Distance", None, "5 度圈距离较远，需技巧过渡"),
+    ("boutique_penalty", "Boutique Tier", -1, "精品模式分级扣分"),
+    ("beat_alignment_score", "Beat Alignment", None, "强拍对齐分"),
+    ("mix_compatibility_score", "Mix Compatibility", 0.08, "混音兼容性综合分"),
+    ("vocal_conflict_penalty", "Vocal Conflict", 1, "人声冲突"),
+    ("aesthetic_score", "Aesthetic Match", None, "审美匹配分"),
+    ("mashup_score", "Mashup Synergy", None, "Mashup 兼容分"),
+    ("phrase_parity_bonus", "Phrase Parity", 1, "乐句长度契合"),
+    ("vocal_synergy_bonus", "Stem Synergy", 1, "人声/伴奏互补"),
+    ("drop_align_bonus", "Drop Alignment", 1, "Drop 可由上一首 Outro 引出"),
+)
+
+
+def _trace_from_metrics(metrics: Dict) -> List[Dict]:
+    """把胜出候选的评分指标整理成审计追踪条目（只在选中曲目上调用一次）"""
+    trace = []
+    for key, dim, weight, reason in _TRACE_FIELDS:
+        val = metrics.get(key)
+        if not isinstance(val, (int, float)) or isinstance(val, bool):
+            continue
+        if weight is not None and not val:
+            continue  # 未触发的加减分项不列出
+        impact = round(val * weight, 2) if weight is not None else 0
+        trace.append({"dim": dim, "val": val, "score": impact, "reason": reason})
+    return trace
+
+
+def _transition_reasons(metrics: Dict) -> List[str]:
+    """【V13.1】由过渡指标整理告警原因（单轮贪心落位与增量修复共用）"""
+    reasons = []
+    bpm_diff = metrics.get("bpm_diff")
+    if bpm_diff is not None and bpm_diff > 12:
+        reasons.append(f"BPM跨度 {bpm_diff:.1f}")
+    key_score = metrics.get("key_score")
+    if key_score is not None and key_score < 45:
+        reasons.append(f"调性兼容度低({key_score:.0f})")
+    percussive_diff = metrics.get("percussive_diff")
+    if percussive_diff is not None and percussive_diff > 0.45:
+        reasons.append("快慢歌差异大")
+    dyn_var_diff = metrics.get("dyn_var_diff")
+    if dyn_var_diff is not None and dyn_var_diff > 0.35:
+        reasons.append("动态变化差异大")
+    if metrics.get("style_penalty"):
+        reasons.append("风格不匹配")
+    if metrics.get("rhythm_penalty"):
+        reasons.append("节奏型不匹配")
+    if metrics.get("phase_penalty"):
+        reasons.append("能量阶段与手动标注冲突")
+    if metrics.get("structure_warning"):
+        reasons.append("混音点在Verse中间（不推荐）")
+    return reasons
+
+
 # [V7.5] Remix Guard (Collision Detection)
 def is_remix_collision(track_a: Dict, track_b: Dict) -> bool:
     """
     Check if two tracks are essentially the same song (e.g., Original vs Remix).
     Logic: Tokenize title, remove feat/remix/edit, check overlap.
     """
+    if HAS_TITLE_IDENTITY:
+        # [V11.6] 分词结果全局缓存，逻辑见 title_identity.remix_tokens
+        return tokens_collide(remix_tokens(track_a.get('title', '') or ''),
+                              remix_tokens(track_b.get('title', '') or ''))
+    
     def tokenize(title):
         t = title.lower()
         for kw in ['feat', 'ft.', 'remix', 'edit', 'mix', 'bootleg', 'vip', 'dub', 'flip', 'refix', 'mashup']:
@@ -2607,7 +2889,7 @@ def is_remix_collision(track_a: Dict, track_b: Dict) -> bool:
     # This targets "Same Song Title" variations
     return len(intersection) >= min(len(tokens_a), len(tokens_b)) * 0.8
 
-def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_logger=None, debug_reporter=None, is_boutique: bool = False, is_live: bool = False) -> Tuple[List[Dict], List[Dict], Dict]:
+def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_logger=None, debug_reporter=None, is_boutique: bool = False, is_live: bool = False, trace_level: Optional[str] = None) -> Tuple[List[Dict], List[Dict], Dict]:
     """
     增强版调性和谐排序（灵活版 + 能量曲线管理 + 时长平衡 + 艺术家分布）
     注重调性兼容性，但允许一定灵活性
@@ -2616,6 +2898,9 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     - 限制候选池大小（只计算BPM最接近的N首）
     - 使用堆维护候选（避免全量排序）
     - 早期剪枝（快速排除不合适候选）
+    
+    trace_level: 【V12.2】诊断级别 off / chosen / sampled / full；
+                 默认挂载 debug_reporter 时为 full，否则为 chosen
     """
     if not tracks:
         return [], [], {}
@@ -2646,7 +2931,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     
     # 准备数据
     for track in tracks:
-        track['_used'] = False
+        track.pop('_used', None)
         track['transition_hint'] = None
         track['transition_warnings'] = track.get('transition_warnings') or []
         if 'assigned_phase' in track:
@@ -2657,6 +2942,34 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     junk_drawer = []  # 【最强大脑】质量屏障：记录那些实在不知道怎么排的歌
     remaining_tracks = tracks.copy()
     
+    # [V11.6] 标题身份索引：每首歌只分词一次，Remix Guard 查表代替逐对比较
+    remix_guard = TitleIdentityIndex(tracks).new_set_guard() if HAS_TITLE_IDENTITY else None
+    remix_guard_marked = 0
+    
+    # [V12.0] 调性在加载时统一编码一次，后续按整数查表
+    if HAS_KEY_CODES:
+        assign_key_codes(tracks)
+    
+    # [V12.5] 热路径标量特征建成列式表；表内行号对应 tracks 下标，track dict 仍是报告/导出边界的记录
+    track_table = TrackTable(tracks) if HAS_TRACK_TABLE else None
+    
+    # [V13.1] 已用标记只存一处：有列式表时只写 used 列，track dict 不再带 _used
+    if track_table is not None:
+        is_used = track_table.is_used
+        mark_used = track_table.mark_used
+    else:
+        def is_used(track: Dict) -> bool:
+            return bool(track.get('_used'))
+        
+        def mark_used(track: Dict):
+            track['_used'] = True
+    
+    def unused_count() -> int:
+        """未使用曲目数：未用曲目都还在 remaining_tracks 中，有列式表时直接读计数"""
+        if track_table is not None:
+            return track_table.unused_count
+        return sum(1 for t in remaining_tracks if not is_used(t))
+    
     # 选择起始点：使用全局中位能量/BPM，避免固定Warm-up曲目开场
     energies = [t.get('energy') for t in remaining_tracks if isinstance(t.get('energy'), (int, float))]
     bpms = [t.get('bpm') for t in remaining_tracks if isinstance(t.get('bpm'), (int, float)) and t.get('bpm')]
@@ -2671,7 +2984,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     )
     sorted_tracks.append(start_track)
     remaining_tracks.remove(start_track)
-    start_track['_used'] = True
+    mark_used(start_track)
     start_bpm = start_track.get('bpm', 0)
     start_energy = start_track.get('energy', 50)
     start_key = start_track.get('key', '')  # 记录起始调性（用于尾曲选择）
@@ -2713,6 +3026,13 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     else:
         CANDIDATE_POOL_SIZE = min(30, len(tracks) // 2)  # 小歌单用较小的候选池
     
+    # [V11.8] 大歌单：每轮只把特征空间中最近的若干首送入完整评分（小歌单仍全量遍历，结果不变）
+    CANDIDATE_INDEX_MIN_TRACKS = 300
+    CANDIDATE_PREFILTER_K = CANDIDATE_POOL_SIZE * 3
+    candidate_index = None
+    if HAS_CANDIDATE_INDEX and len(tracks) > CANDIDATE_INDEX_MIN_TRACKS:
+        candidate_index = TrackFeatureIndex(tracks, is_dead=is_used)
+    
     # 完全移除冲突阈值，确保所有歌曲都能排进去
     CONFLICT_SCORE_THRESHOLD = -999999  # 设置为极低值，永不触发
     SEVERE_SCORE_THRESHOLD = -999999
@@ -2720,7 +3040,10 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     # 修复：确保处理所有歌曲，循环条件改为检查是否有未使用的歌曲
     def has_unused_tracks():
         """检查是否还有未使用的歌曲"""
-        return any(not t.get('_used') for t in remaining_tracks)
+        if track_table is not None:
+            # 移出 remaining_tracks 的曲目都已标记使用，未用计数 > 0 与逐首扫描等价
+            return track_table.unused_count > 0
+        return any(not is_used(t) for t in remaining_tracks)
     
     # ========== FULL DEBUG: 初始化调试数据收集 ==========
     debug_rounds = []
@@ -2731,6 +3054,11 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     debug_selection_score_details = []
     debug_fallback_logs = []
     
+    # 【V12.2】诊断级别：sampled/full 才收集逐轮候选明细，且只在挂载 debug_reporter 时有意义
+    if trace_level not in TRACE_LEVELS:
+        trace_level = TRACE_FULL if debug_reporter else TRACE_CHOSEN
+    trace_events = bool(debug_reporter) and trace_level in (TRACE_SAMPLED, TRACE_FULL)
+    
     # 【Boutique】精品模式：设置硬性长度限制
     actual_target = target_count if is_boutique else len(tracks)
     
@@ -2745,20 +3073,23 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             break
         
         # ========== FULL DEBUG: 记录当前轮次信息 ==========
-        round_debug = {
-            'round': iteration,
-            'current_track': {
-                'title': current_track.get('title', 'Unknown'),
-                'bpm': current_track.get('bpm', 0),
-                'key': current_track.get('key', 'Unknown'),
-                'energy': current_track.get('energy', 50),
-                'phase': current_track.get('assigned_phase', 'Unknown'),
-                'file_path': current_track.get('file_path', 'Unknown')
-            },
-            'remaining_count': len([t for t in remaining_tracks if not t.get('_used')]),
-            'sorted_count': len(sorted_tracks),
-            'candidates': []
-        }
+        trace_round = trace_events and (trace_level == TRACE_FULL or iteration % TRACE_SAMPLE_EVERY == 0)
+        round_debug = None
+        if trace_round:
+            round_debug = {
+                'round': iteration,
+                'current_track': {
+                    'title': current_track.get('title', 'Unknown'),
+                    'bpm': current_track.get('bpm', 0),
+                    'key': current_track.get('key', 'Unknown'),
+                    'energy': current_track.get('energy', 50),
+                    'phase': current_track.get('assigned_phase', 'Unknown'),
+                    'file_path': current_track.get('file_path', 'Unknown')
+                },
+                'remaining_count': unused_count(),
+                'sorted_count': len(sorted_tracks),
+                'candidates': []
+            }
         
         # 获取当前阶段的能量目标（考虑当前BPM和能量值）
         current_bpm = current_track.get('bpm', 0)
@@ -2773,66 +3104,115 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         if current_track.get('assigned_phase'):
             current_phase_num = get_phase_number(current_track.get('assigned_phase'))
         
+        # [V11.6] Remix Guard 位图：把上一轮新放入 Set 的曲目登记为已占用身份
+        if remix_guard is not None:
+            for placed in sorted_tracks[remix_guard_marked:]:
+                remix_guard.mark(placed)
+            remix_guard_marked = len(sorted_tracks)
+        
         # 修复：大幅放宽候选池筛选，确保所有歌曲都能参与排序
         # 移除BPM限制，所有未使用的歌曲都可以进入候选池
         bpm_candidates = []
         
-        for track in remaining_tracks:
-            if track.get('_used'):
-                continue
-            next_bpm = track.get('bpm', 0)
-            bpm_diff = abs(current_bpm - next_bpm) if current_bpm > 0 and next_bpm > 0 else 0
+        candidate_source = remaining_tracks
+        if candidate_index is not None:
+            # 存活计数为惰性删除后的上界；不足 K 首时 nearest 会返回全部存活曲目
+            if len(candidate_index) > CANDIDATE_PREFILTER_K * 2:
+                candidate_source = candidate_index.nearest(current_track, CANDIDATE_PREFILTER_K) or remaining_tracks
+        
+        candidate_rows = None
+        source_rows = track_table.rows(candidate_source) if track_table is not None and HAS_KEY_CODES else None
+        if source_rows is not None and (source_rows >= 0).all():
+            # [V12.5] 列式预筛：BPM差 / 风格匹配 / 能量差 / 调性分整批计算，按同一优先级稳定排序（与逐首排序结果一致）
+            rows = source_rows[~track_table.column('used', source_rows)]
+            next_bpms = track_table.column('bpm', rows)
+            bpm_diffs = np.where((next_bpms > 0) & (current_bpm > 0), np.abs(current_bpm - next_bpms), 0.0)
+            energy_diffs = np.abs(track_table.column('energy', rows) - current_track.get('energy', 50))
+            current_row = track_table.row(current_track)
+            current_style_code = track_table.data['style_block'][current_row] if current_row >= 0 else -1
+            style_match = (track_table.column('style_block', rows) == current_style_code) & (current_style_code >= 0)
+            key_scores = KEY_COMPAT_TABLE[track_key_code(current_track), track_table.column('key_code', rows)]
+            order = np.lexsort((-key_scores, energy_diffs, -style_match.astype(np.int8), bpm_diffs))
+            candidate_rows = rows[order]
+        else:
+            # [V12.0] 整批候选的调性分一次查表
+            if HAS_KEY_CODES:
+                candidate_key_scores = KEY_COMPAT_TABLE[track_key_code(current_track),
+                                                        assign_key_codes(candidate_source)].tolist()
+            else:
+                candidate_key_scores = [None] * len(candidate_source)
+        
+            for track, key_score in zip(candidate_source, candidate_key_scores):
+                if is_used(track):
+                    continue
+                next_bpm = track.get('bpm', 0)
+                bpm_diff = abs(current_bpm - next_bpm) if current_bpm > 0 and next_bpm > 0 else 0
             
-            # 完全移除BPM限制，所有歌曲都可以进入候选池
-            # 计算能量匹配度（第2优先级）
-            energy = track.get('energy', 50)
-            energy_diff = abs(energy - current_track.get('energy', 50))
+                # 完全移除BPM限制，所有歌曲都可以进入候选池
+                # 计算能量匹配度（第2优先级）
+                energy = track.get('energy', 50)
+                energy_diff = abs(energy - current_track.get('energy', 50))
             
-            # 检查调性兼容性（第3优先级，使用5度圈和T字法）
-            key_score = get_key_compatibility_flexible(
-                current_track.get('key', ''),
-                track.get('key', '')
-            )
+                # 检查调性兼容性（第3优先级，使用5度圈和T字法）
+                if key_score is None:
+                    key_score = get_key_compatibility_flexible(
+                        current_track.get('key', ''),
+                        track.get('key', '')
+                    )
             
-            # 【V5优化 - 阶段2】检查风格段落匹配（如果当前歌曲有风格标记）
-            # 增强优先级：同风格段落歌曲优先（提升到第2优先级）
-            style_match = 0
-            current_style_block = current_track.get('_style_block')
-            track_style_block = track.get('_style_block')
-            if current_style_block and track_style_block:
-                if current_style_block == track_style_block:
-                    style_match = 1  # 同风格段落，优先
+                # 【V5优化 - 阶段2】检查风格段落匹配（如果当前歌曲有风格标记）
+                # 增强优先级：同风格段落歌曲优先（提升到第2优先级）
+                style_match = 0
+                current_style_block = current_track.get('_style_block')
+                track_style_block = track.get('_style_block')
+                if current_style_block and track_style_block:
+                    if current_style_block == track_style_block:
+                        style_match = 1  # 同风格段落，优先
             
-            # 存储：BPM差、风格匹配（提升优先级）、能量差、调性分、歌曲
-            bpm_candidates.append((bpm_diff, -style_match, energy_diff, key_score, track))
+                # 存储：BPM差、风格匹配（提升优先级）、能量差、调性分、歌曲
+                bpm_candidates.append((bpm_diff, -style_match, energy_diff, key_score, track))
         
-        # 排序：第1优先级BPM差小，第2优先级风格匹配（提升），第3优先级能量差小，第4优先级调性分高
-        bpm_candidates.sort(key=lambda x: (x[0], x[1], x[2], -x[3]))  # BPM差小 > 风格匹配 > 能量差小 > 调性分高
+            # 排序：第1优先级BPM差小，第2优先级风格匹配（提升），第3优先级能量差小，第4优先级调性分高
+            bpm_candidates.sort(key=lambda x: (x[0], x[1], x[2], -x[3]))  # BPM差小 > 风格匹配 > 能量差小 > 调性分高
         
-        # 修复：移除候选池大小限制，使用所有剩余歌曲（确保所有歌曲都能参与排序）
-        # 候选池：使用所有剩余歌曲，不再限制数量，但排除已使用的歌曲
-        candidate_tracks = [t for _, _, _, _, t in bpm_candidates if not t.get('_used')]
+            # 修复：移除候选池大小限制，使用所有剩余歌曲（确保所有歌曲都能参与排序）
+            # 候选池：使用所有剩余歌曲，不再限制数量，但排除已使用的歌曲
+            candidate_tracks = [t for _, _, _, _, t in bpm_candidates if not is_used(t)]
         
         # 【V5优化 - 阶段2】优先选择同风格段落歌曲（如果存在）
         # 如果当前歌曲有风格标记，优先从同风格段落中选择
         current_style_block = current_track.get('_style_block')
-        if current_style_block and candidate_tracks:
+        if candidate_rows is not None:
+            # [V13.1] 列式路径：按风格编码稳定分区，候选评分所需的 BPM/能量/调性分同样按行取列
+            if current_style_code >= 0:
+                same_style = track_table.column('style_block', candidate_rows) == current_style_code
+                candidate_rows = np.concatenate((candidate_rows[same_style], candidate_rows[~same_style]))
+            candidate_tracks = [track_table.tracks[r] for r in candidate_rows]
+            candidate_bpms = track_table.column('bpm', candidate_rows).tolist()
+            candidate_energies = track_table.column('energy', candidate_rows).tolist()
+            candidate_key_scores = KEY_COMPAT_TABLE[track_key_code(current_track),
+                                                    track_table.column('key_code', candidate_rows)].tolist()
+        elif current_style_block and candidate_tracks:
             same_style_tracks = [t for t in candidate_tracks if t.get('_style_block') == current_style_block]
             if same_style_tracks:
                 # 如果同风格段落有候选歌曲，优先使用它们（但保留其他歌曲作为备选）
                 # 将同风格歌曲放在前面
                 other_tracks = [t for t in candidate_tracks if t.get('_style_block') != current_style_block]
                 candidate_tracks = same_style_tracks + other_tracks
+        if candidate_rows is None:
+            candidate_bpms = [t.get('bpm', 0) for t in candidate_tracks]
+            candidate_energies = [t.get('energy', 50) for t in candidate_tracks]
+            candidate_key_scores = [None] * len(candidate_tracks)
         
         candidate_results = []
         
         # 计算每个候选的得分
         # 注意：LRU缓存已优化兼容性计算（重复生成Set时提升50-70%）
-        for track in candidate_tracks:
-            if track.get('_used'):
+        for track, next_bpm, next_energy, key_score in zip(candidate_tracks, candidate_bpms,
+                                                           candidate_energies, candidate_key_scores):
+            if is_used(track):
                 continue
             
-            next_bpm = track.get('bpm', 0)
             bpm_diff = abs(current_bpm - next_bpm)
             
             metrics = {
@@ -2856,11 +3236,17 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
 
             # [V7.5] Remix Guard: Check against ALL tracks currently in the set
             has_remix_conflict = False
-            for used_track in sorted_tracks:
-                if is_remix_collision(track, used_track):
+            if remix_guard is not None:
+                # [V11.6] 身份位图 O(1) 查表
+                if remix_guard.collides(track):
                     has_remix_conflict = True
                     metrics["remix_conflict"] = True
-                    break
+            else:
+                for used_track in sorted_tracks:
+                    if is_remix_collision(track, used_track):
+                        has_remix_conflict = True
+                        metrics["remix_conflict"] = True
+                        break
             
             if has_remix_conflict:
                 candidate_results.append({
@@ -2870,12 +3256,18 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                 })
                 continue
             
+            # 调性兼容度（列式路径已整批查表）
+            if key_score is None:
+                key_score = get_key_compatibility_flexible(
+                    current_track.get('key', ''),
+                    track.get('key', '')
+                )
+            
             # ========== 【Boutique】精品模式多级评分机制 (代替硬性拦截) ==========
             boutique_penalty = 0
             if is_boutique:
-                # 调性兼容度预计算
-                k_score = get_key_compatibility_flexible(current_track.get('key', ''), track.get('key', ''))
-                energy_diff = abs(track.get('energy', 50) - current_track.get('energy', 50))
+                k_score = key_score
+                energy_diff = abs(next_energy - current_track.get('energy', 50))
                 
                 # Tier 1 (Gold): 极致平滑 (BPM diff <= 8, Key Score >= 90, Energy Jump <= 25)
                 # Tier 2 (Silver): 专业标准 (BPM diff <= 12, Key Score >= 75) -> 扣 150 分
@@ -2900,7 +3292,6 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             
             # 获取能量变化（用于判断是否是breakdown过渡）
             current_energy = current_track.get('energy', 50)
-            next_energy = track.get('energy', 50)
             energy_diff = next_energy - current_energy  # 正数=能量上升，负数=能量下降
             
             # 判断是否是breakdown过渡（BPM下降且能量也下降）
@@ -2972,10 +3363,6 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                 else:
                     score -= 300  # BPM下降且跨度极大：极严重惩罚
             
-            key_score = get_key_compatibility_flexible(
-                current_track.get('key', ''),
-                track.get('key', '')
-            )
             metrics["key_score"] = key_score
             
             # 根据歌曲类型动态调整调性权重
@@ -2992,7 +3379,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             if any(keyword in current_genre or keyword in next_genre for keyword in ['tech house', 'hard trance', 'hardstyle']):
                 is_fast_switch = True
             # 高能量歌曲通常可以快速切换
-            if current_track.get('energy', 50) > 70 or track.get('energy', 50) > 70:
+            if current_track.get('energy', 50) > 70 or next_energy > 70:
                 is_fast_switch = True
             
             # ========== 第2优先级：调性兼容性（修复版，降低权重确保BPM优先） ==========
@@ -3074,7 +3461,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                         pass
             
             # 第2优先级：能量（根据阶段动态调整权重）
-            energy = track.get('energy', 50)
+            energy = next_energy
             current_energy = current_track.get('energy', 50)
             energy_diff = abs(energy - current_energy)
             
@@ -3676,7 +4063,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             })
             
             # ========== FULL DEBUG: 收集每个候选的完整评分信息 ==========
-            if debug_reporter:
+            if trace_round:
                 candidate_debug = {
                     'track': {
                         'title': track.get('title', 'Unknown'),
@@ -3740,13 +4127,13 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                 # 找到第一个未使用的歌曲
                 fallback_track = None
                 for t in remaining_tracks:
-                    if not t.get('_used'):
+                    if not is_used(t):
                         fallback_track = t
                         break
                 
                 if fallback_track:
                     # ========== FULL DEBUG: 记录Fallback ==========
-                    if debug_reporter:
+                    if trace_events:
                         debug_fallback_logs.append({
                             'tier': 'Tier1',
                             'round': iteration,
@@ -3759,11 +4146,11 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                             },
                             'details': {
                                 'candidate_count': len(candidate_results),
-                                'remaining_count': len([t for t in remaining_tracks if not t.get('_used')])
+                                'remaining_count': unused_count()
                             }
                         })
                     
-                    fallback_track['_used'] = True
+                    mark_used(fallback_track)
                     # 【优化1】强制基于实际能量值分配阶段
                     fallback_energy = fallback_track.get('energy', 50)
                     progress = len(sorted_tracks) / max(len(tracks), 1)
@@ -3795,7 +4182,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             break
         
         # 尾曲选择优化：如果是尾曲阶段，给尾曲候选额外加分
-        remaining_count_check = len(remaining_tracks) - sum(1 for t in remaining_tracks if t.get('_used'))
+        remaining_count_check = unused_count()
         is_closure_phase_check = (len(sorted_tracks) >= target_count - 2) or (remaining_count_check <= 2)
         
         if is_closure_phase_check:
@@ -3817,7 +4204,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         best_result = None
         # 首先寻找及格的候选
         for result in candidate_results:
-            if not result["track"].get('_used'):
+            if not is_used(result["track"]):
                 if result["score"] >= QUALITY_FLOOR:
                     best_result = result
                     break
@@ -3826,7 +4213,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         if best_result is None and is_boutique:
             # 在精品模式下，如果找不到及格的，尝试寻找分数最高的一个
             for result in candidate_results:
-                if not result["track"].get('_used'):
+                if not is_used(result["track"]):
                     best_result = result
                     if progress_logger:
                         progress_logger.log(f"⚠️ [精品降级] 为了连贯性接受次优解: {best_result['track'].get('title', 'Unknown')[:30]} (分数: {best_result['score']:.1f})", console=False)
@@ -3844,8 +4231,8 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             # 在直播模式下，我们不能终止，需要将当前无法匹配的歌曲暂时挂起或强行排入
             # 这里采取策略：如果连保底都没有（即candidate_results为空），则将剩余曲目中最违和的一首扔进 junk_drawer
             if not candidate_results:
-                misfit = next(t for t in remaining_tracks if not t.get('_used'))
-                misfit['_used'] = True
+                misfit = next(t for t in remaining_tracks if not is_used(t))
+                mark_used(misfit)
                 junk_drawer.append(misfit)
                 remaining_tracks.remove(misfit)
                 if progress_logger:
@@ -3856,7 +4243,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         if best_result is None and candidate_results:
             # 找到最高分的未使用歌曲
             for result in candidate_results:
-                if not result["track"].get('_used'):
+                if not is_used(result["track"]):
                     best_result = result
                     if progress_logger:
                         progress_logger.log(f"[降级衔接] 质量不足但强制链入: {best_result['track'].get('title', 'Unknown')[:30]} (分数: {best_result['score']:.1f})", console=False)
@@ -3894,27 +4281,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             best_track.pop('_is_closure_candidate', None)
             best_track.pop('_closure_score', None)
         
-        reasons = []
-        bpm_diff = metrics.get("bpm_diff")
-        if bpm_diff is not None and bpm_diff > 12:
-            reasons.append(f"BPM跨度 {bpm_diff:.1f}")
-        key_score = metrics.get("key_score")
-        if key_score is not None and key_score < 45:
-            reasons.append(f"调性兼容度低({key_score:.0f})")
-        percussive_diff = metrics.get("percussive_diff")
-        if percussive_diff is not None and percussive_diff > 0.45:
-            reasons.append("快慢歌差异大")
-        dyn_var_diff = metrics.get("dyn_var_diff")
-        if dyn_var_diff is not None and dyn_var_diff > 0.35:
-            reasons.append("动态变化差异大")
-        if metrics.get("style_penalty"):
-            reasons.append("风格不匹配")
-        if metrics.get("rhythm_penalty"):
-            reasons.append("节奏型不匹配")
-        if metrics.get("phase_penalty"):
-            reasons.append("能量阶段与手动标注冲突")
-        if metrics.get("structure_warning"):
-            reasons.append("混音点在Verse中间（不推荐）")
+        reasons = _transition_reasons(metrics)
         # 移除冲突检测，不再因为分数低而标记为冲突
         # if best_score < CONFLICT_SCORE_THRESHOLD:
         #     reasons.append(f"综合得分偏低({best_score:.1f})")
@@ -3942,7 +4309,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                 
                 # 在当前候选池中寻找与回溯位置调性兼容性更好的歌曲
                 for candidate in candidate_tracks:
-                    if candidate.get('_used') or candidate == best_track:
+                    if is_used(candidate) or candidate == best_track:
                         continue
                     
                     candidate_bpm = candidate.get('bpm', 0)
@@ -4009,7 +4376,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             # 如果回溯找到了更好的选择，使用回溯结果
             if best_backtrack_track != best_track and best_backtrack_metrics.get("backtracked"):
                 # ========== FULL DEBUG: 记录回溯信息 ==========
-                if debug_reporter:
+                if trace_events:
                     backtrack_debug = {
                         'round': iteration,
                         'reason': f'调性兼容性不足 (key_score={key_score_val:.0f} < 85)',
@@ -4049,7 +4416,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                     progress_logger.log(f"局部回溯：选择调性兼容性更好的歌曲（调性分提升 {best_backtrack_metrics.get('key_score', 0) - key_score_val:.0f}分）", console=False)
         
         # 修复：防止重复添加同一首歌曲
-        if best_track.get('_used'):
+        if is_used(best_track):
             if progress_logger:
                 progress_logger.log(f"警告：尝试添加已使用的歌曲 {best_track.get('title', 'Unknown')[:40]}，跳过", console=True)
             # 跳过已使用的歌曲，继续下一轮
@@ -4057,7 +4424,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         
         if best_track in remaining_tracks:
             remaining_tracks.remove(best_track)
-        best_track['_used'] = True
+        mark_used(best_track)
 
         force_accept = bool(metrics.get("force_accept"))
         bpm_diff = metrics.get("bpm_diff")
@@ -4089,7 +4456,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                 reasons.append(f"BPM超大跨度 {bpm_diff:.1f}（无法直接混音）")
         
         # ========== FULL DEBUG: 记录冲突信息（如果有） ==========
-        if debug_reporter and (major_penalties >= 3 or bpm_diff is not None and bpm_diff > 30 or key_score_val is not None and key_score_val < 40):
+        if trace_events and (major_penalties >= 3 or bpm_diff is not None and bpm_diff > 30 or key_score_val is not None and key_score_val < 40):
             conflict_debug = {
                 'round': iteration,
                 'reason': ' | '.join(reasons) if reasons else '综合评分低',
@@ -4168,7 +4535,9 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         # ========== 【进化战略】注入雷达报告指标 ==========
         best_track['_transition_score'] = best_score
         best_track['_transition_metrics'] = metrics.copy()
-        best_track['audit_trace'] = metrics.get('audit_trace', [])  # 【V6.0 Audit】审计追踪持久化
+        if trace_level != TRACE_OFF:
+            # 【V6.0 Audit】审计追踪持久化；候选评分不生成追踪，只由胜出候选的 metrics 整理一次
+            best_track['audit_trace'] = metrics.get('audit_trace') or _trace_from_metrics(metrics)
         
         # 【最强大脑修复】将排序时优化的混音点持久化到音轨对象中
         # 这确保了 TXT 报告与 XML Hotcue 能够对齐“专家推荐”位
@@ -4192,7 +4561,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         current_track = best_track
         
         # ========== FULL DEBUG: 记录本轮最终选择 ==========
-        if debug_reporter:
+        if trace_round:
             round_debug['selected_track'] = {
                 'title': best_track.get('title', 'Unknown'),
                 'bpm': best_track.get('bpm', 0),
@@ -4209,7 +4578,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             debug_candidate_pool_sizes.append({
                 'round': iteration,
                 'pool_size': len(candidate_tracks),
-                'remaining': len([t for t in remaining_tracks if not t.get('_used')]),
+                'remaining': unused_count(),
                 'selected_track': {
                     'title': best_track.get('title', 'Unknown'),
                     'bpm': best_track.get('bpm', 0),
@@ -4240,7 +4609,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             })
         
         # 尾曲选择优化：在最后2-3首时特殊处理
-        remaining_count = len(remaining_tracks) - sum(1 for t in remaining_tracks if t.get('_used'))
+        remaining_count = unused_count()
         is_closure_phase = (len(sorted_tracks) >= target_count - 2) or (remaining_count <= 2)
         
         if is_closure_phase and remaining_count > 0:
@@ -4250,7 +4619,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
             current_energy = current_track.get('energy', 50)
             
             # 从剩余歌曲中选择最适合的尾曲
-            closure_candidates = [t for t in remaining_tracks if not t.get('_used')]
+            closure_candidates = [t for t in remaining_tracks if not is_used(t)]
             
             if closure_candidates:
                 best_closure_track = None
@@ -4332,7 +4701,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     # 修复：添加所有剩余未使用的歌曲（确保所有歌曲都被排进去）
     # 【Boutique】精品模式下，不再强制添加不满足条件的歌曲
     if not is_boutique:
-        unused_remaining = [t for t in remaining_tracks if not t.get('_used')]
+        unused_remaining = [t for t in remaining_tracks if not is_used(t)]
         total_input = len(tracks)
         total_sorted = len(sorted_tracks)
         total_unused = len(unused_remaining)
@@ -4354,7 +4723,7 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
                 unused_remaining.sort(key=lambda t: t.get('bpm', 0))
             
             for idx, track in enumerate(unused_remaining, start=len(sorted_tracks)):
-                track['_used'] = True
+                mark_used(track)
                 track_bpm = track.get('bpm', 0)
                 track_energy = track.get('energy', 50)
                 progress = idx / max(len(tracks), 1)
@@ -4531,7 +4900,13 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
     if len(sorted_tracks) > 10 and progress_logger:
         progress_logger.log("开始全局调性优化...", console=False)
     
-    optimized_tracks = optimize_key_connections_global(sorted_tracks, progress_logger)
+    # 【V13.1】调性微调 / 追加备选 / 能量曲线修正共用同一个序列对象，并随 metrics 交给后续 BPM 平滑
+    seq = TrackSequence(sorted_tracks, _key_edge) if HAS_SEQUENCE_MODEL else None
+    if seq is not None:
+        optimize_key_connections_global(seq, progress_logger)
+        optimized_tracks = seq.tracks
+    else:
+        optimized_tracks = optimize_key_connections_global(sorted_tracks, progress_logger)
     
     # 修改：返回标记了冲突的歌曲列表（用于报告标注）
     marked_conflicts = [t for t in optimized_tracks if t.get('_is_conflict', False)]
@@ -4541,12 +4916,15 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         if progress_logger:
             progress_logger.log(f"[质量屏障] 正在追加 {len(junk_drawer)} 首低兼容度歌曲到末尾备选区...", console=True)
         
-        for misfit in junk_drawer:
+        for k, misfit in enumerate(junk_drawer):
             misfit['assigned_phase'] = "Extra (Misfit)"
             # 给最后一首歌加点衔接标记
-            if optimized_tracks:
+            if optimized_tracks or k > 0:
                 misfit['_transition_score'] = -50  # 标记为极差连接
-            optimized_tracks.append(misfit)
+        if seq is not None:
+            seq.extend(junk_drawer)
+        else:
+            optimized_tracks.extend(junk_drawer)
 
     # 返回排序结果、冲突列表和调试指标
     # 验证：确保所有输入歌曲都被包含在输出中
@@ -4561,13 +4939,16 @@ def enhanced_harmonic_sort(tracks: List[Dict], target_count: int = 40, progress_
         'backtrack_count': len(debug_backtrack_logs),
         'conflict_count_debug': len(debug_conflict_logs)
     }
+    if seq is not None:
+        metrics['sequence'] = seq
     
     # ========== 【V6优化P3.1】能量曲线验证和修正 ==========
     if len(optimized_tracks) > 10:  # 只有歌曲数>10才验证能量曲线
-        if not validate_energy_curve(optimized_tracks):
+        target = seq if seq is not None else optimized_tracks
+        if not validate_energy_curve(target):
             if progress_logger:
                 progress_logger.log("⚠️ 能量曲线验证失败，进行自动修正", console=True)
-            optimized_tracks = fix_energy_curve(optimized_tracks, progress_logger)
+            fix_energy_curve(target, progress_logger)
     
     return optimized_tracks, marked_conflicts, metrics
 
@@ -4579,6 +4960,8 @@ def validate_energy_curve(sorted_tracks: List[Dict]) -> bool:
     Returns:
         bool: True表示能量曲线完整，False表示需要修正
     """
+    if HAS_SEQUENCE_MODEL and isinstance(sorted_tracks, TrackSequence):
+        sorted_tracks = sorted_tracks.tracks
     if len(sorted_tracks) < 5:
         return True  # 歌曲太少，不验证
     
@@ -4608,16 +4991,18 @@ def fix_energy_curve(tracks: List[Dict], progress_logger=None) -> List[Dict]:
     1. 找到能量最高的歌曲，强制标记为Peak
     2. 最后10%的歌曲，强制标记为Cool-down（除非能量极高>85）
     3. 前20%的歌曲，如果没有Warm-up，标记为Warm-up或Build-up
+    
+    【V13.1】只改曲目的阶段标签、不改顺序，原地修正并返回传入的列表/序列对象
     """
-    if len(tracks) < 5:
+    fixed_tracks = tracks.tracks if HAS_SEQUENCE_MODEL and isinstance(tracks, TrackSequence) else tracks
+    if len(fixed_tracks) < 5:
         return tracks  # 歌曲太少，不修正
     
-    fixed_tracks = tracks.copy()
     total = len(fixed_tracks)
     
     # 1. 找到能量最高的歌曲，强制标记为Peak（如果还没标记）
-    max_energy_track = max(fixed_tracks, key=lambda t: t.get('energy', 50))
-    max_energy_idx = fixed_tracks.index(max_energy_track)
+    max_energy_idx = max(range(total), key=lambda k: fixed_tracks[k].get('energy', 50))
+    max_energy_track = fixed_tracks[max_energy_idx]
     if max_energy_track.get('assigned_phase') not in ['Peak', 'Sustain', 'Intense', 'Bang']:
         max_energy_track['assigned_phase'] = 'Peak'
         if progress_logger:
@@ -4625,8 +5010,9 @@ def fix_energy_curve(tracks: List[Dict], progress_logger=None) -> List[Dict]:
     
     # 2. 最后10%的歌曲，强制标记为Cool-down（除非能量极高>85）
     last_10_percent = fixed_tracks[-max(1, total//10):]
+    last_offset = total - len(last_10_percent)
     for i, track in enumerate(last_10_percent):
-        track_idx = fixed_tracks.index(track)
+        track_idx = last_offset + i
         if track.get('energy', 50) < 85:  # 能量<85才标记为Cool-down
             if track.get('assigned_phase') not in ['Cool-down', 'Reset', 'Outro']:
                 track['assigned_phase'] = 'Cool-down'
@@ -4636,7 +5022,7 @@ def fix_energy_curve(tracks: List[Dict], progress_logger=None) -> List[Dict]:
     # 3. 前20%的歌曲，如果没有Warm-up，标记为Warm-up或Build-up
     first_20_percent = fixed_tracks[:max(1, total//5)]
     for i, track in enumerate(first_20_percent):
-        track_idx = fixed_tracks.index(track)
+        track_idx = i
         if track.get('assigned_phase') not in ['Warm-up', 'Build-up']:
             # 根据能量值决定是Warm-up还是Build-up
             if track.get('energy', 50) < 55:
@@ -4646,7 +5032,7 @@ def fix_energy_curve(tracks: List[Dict], progress_logger=None) -> List[Dict]:
             if progress_logger:
                 progress_logger.log(f"✅ 修正：第{track_idx+1}首（能量{track.get('energy', 0)}）标记为{track['assigned_phase']}", console=False)
     
-    return fixed_tracks
+    return tracks
 
 
 def optimize_key_connections_global(tracks: List[Dict], progress_logger=None) -> List[Dict]:
@@ -4658,17 +5044,52 @@ def optimize_key_connections_global(tracks: List[Dict], progress_logger=None) ->
     - 限制优化窗口大小（每次只检查5-10首歌曲）
     - 限制调整距离（最多移动2-3个位置）
     - 只在调性兼容性明显提升时才调整
+    
+    【V13.1】默认不调整顺序（sequence_refine.key_swaps=False）：旧实现把窗口副本写回列表，
+    交换从未真正生效，开启后才会改变主排序结果。传入 TrackSequence 时原地交换并返回该序列
     """
+    refine_cfg = DJ_RULES.get('sequence_refine', {}) if DJ_RULES else {}
+    if not refine_cfg.get('key_swaps', False):
+        return tracks
     if len(tracks) <= 3:
         return tracks
     
-    optimized = list(tracks)
+    given_seq = HAS_SEQUENCE_MODEL and isinstance(tracks, TrackSequence)
+    optimized = tracks.tracks if given_seq else list(tracks)
     window_size = min(10, len(optimized) // 4)  # 优化窗口大小
     if window_size < 3:
         return tracks  # 窗口太小，不需要优化
     max_move_distance = 2  # 最多移动2个位置
     improvements = 0
     
+    # 【V11.5】序列模型：边分缓存 + O(1) 交换增量，交换直接落在序列上
+    # （旧实现把窗口副本写回列表，会覆盖掉本轮已执行的交换）
+    if HAS_SEQUENCE_MODEL:
+        seq = tracks if given_seq else TrackSequence(optimized, _key_edge)
+        for i in range(1, len(seq) - 1):
+            current_bpm = seq[i].get('bpm', 0)
+            best_swap_idx = None
+            best_gain = 20  # 调性连接需明显改善（提升>=20分，考虑BPM降权后）
+            for swap_offset in range(-max_move_distance, max_move_distance + 1):
+                swap_idx = i + swap_offset
+                if swap_offset == 0 or swap_idx < 0 or swap_idx >= len(seq):
+                    continue
+                # 软降权：BPM差每超过4，降权5分
+                swap_bpm_diff = abs(current_bpm - seq[swap_idx].get('bpm', 0))
+                bpm_swap_penalty = (swap_bpm_diff - 4) * 5 if swap_bpm_diff > 4 else 0
+                gain = seq.delta_swap(i, swap_idx) - bpm_swap_penalty
+                if gain > best_gain:
+                    best_gain = gain
+                    best_swap_idx = swap_idx
+            if best_swap_idx is not None:
+                seq.swap(i, best_swap_idx)
+                improvements += 1
+                if progress_logger and improvements % 5 == 0:
+                    progress_logger.log(f"全局优化：已优化 {improvements} 处调性连接", console=False)
+        if progress_logger and improvements > 0:
+            progress_logger.log(f"全局调性优化完成：共优化 {improvements} 处调性连接", console=False)
+        return seq if given_seq else seq.tracks
+    
     # 滑动窗口优化
     step_size = max(1, window_size // 2)  # 确保步长至少为1
     for start_idx in range(0, len(optimized) - window_size, step_size):
@@ -5363,6 +5784,88 @@ def generate_mixing_advice(tracks: List[Dict]) -> str:
     
     return "\n".join(advice)
 
+def _incremental_pair_score(track_a: dict, track_b: dict) -> float:
+    """[V11.1] 增量修复用的轻量过渡分（调性/BPM/能量），0-100"""
+    key_score = get_key_compatibility_flexible(track_a.get('key', ''), track_b.get('key', ''))
+    bpm_score = get_bpm_compatibility_flexible(track_a.get('bpm', 0) or 0, track_b.get('bpm', 0) or 0)
+    energy_diff = abs((track_a.get('energy', 50) or 50) - (track_b.get('energy', 50) or 50))
+    energy_score = max(0, 100 - energy_diff * 2)
+    return key_score * 0.5 + bpm_score * 0.35 + energy_score * 0.15
+
+
+def _incremental_signature(is_master: bool, is_live: bool, songs_per_set: int) -> dict:
+    """快照签名：模式或分割参数变化时快照失效，必须走完整流水线"""
+    split_cfg = DJ_RULES.get('split', {}) if DJ_RULES else {}
+    return {
+        'is_master': bool(is_master),
+        'is_live': bool(is_live),
+        'songs_per_set': songs_per_set,
+        'target_duration_minutes': split_cfg.get('target_duration_minutes', 90.0),
+        'min_songs': split_cfg.get('min_songs', 20),
+        'max_songs': split_cfg.get('max_songs', 60),
+    }
+
+
+def _restore_transition_metrics(sets: List[List[Dict]]) -> None:
+    """
+    【V13.1】增量修复后按新的相邻关系重算每首的过渡指标
+    报告读取的 _transition_metrics / audit_trace / transition_warnings / 混音点与完整排序同一套候选评分，
+    _transition_score 与 assigned_phase 仍沿用 repair_sets 的结果
+    """
+    for seq in sets:
+        for i in range(1, len(seq)):
+            prev, track = seq[i - 1], seq[i]
+            prev_bpm = prev.get('bpm', 0) or 0
+            min_energy, max_energy, phase_name = get_energy_phase_target(
+                i - 1, len(seq), prev_bpm, prev.get('energy', 50), seq[:i], prev)
+            # 曲目对象可能带着上次排序的 _used 标记
+            candidate = dict(track, _used=False) if track.get('_used') else track
+            _, _, metrics = _calculate_candidate_score(
+                (candidate, prev, prev_bpm, min_energy, max_energy, phase_name, seq[:i], False), trace=False)
+
+            warnings = _transition_reasons(metrics)
+            bpm_diff = metrics.get("bpm_diff")
+            if bpm_diff is not None and bpm_diff > 30:
+                warnings.append(f"BPM超大跨度 {bpm_diff:.1f}（无法直接混音）")
+            mix_gap_val = metrics.get("mix_gap")
+            if mix_gap_val is not None and not (-8.0 <= mix_gap_val <= 16.0):
+                warnings.append(f"混音点间隔 {mix_gap_val:.1f}s")
+            track['_is_conflict'] = False
+            track['transition_warnings'] = warnings
+            track['_transition_metrics'] = metrics.copy()
+            track['audit_trace'] = _trace_from_metrics(metrics)
+            if metrics.get("mix_points_optimized"):
+                if metrics.get("optimized_mix_out") is not None:
+                    prev['mix_out_point'] = metrics["optimized_mix_out"]
+                if metrics.get("optimized_mix_in") is not None:
+                    track['mix_in_point'] = metrics["optimized_mix_in"]
+
+
+def _try_incremental_resort(playlist_name: str, tracks: List[Dict], signature: dict) -> Optional[List[List[Dict]]]:
+    """[V11.1] 成员差异足够小时基于上次快照修复 Set；否则返回 None 走完整流水线"""
+    if not HAS_INCREMENTAL_RESORT:
+        return None
+    try:
+        snapshot = PlaylistOrderStore(ORDER_STORE_FILE).load(playlist_name)
+        if not snapshot or snapshot.get('signature') != signature:
+            return None
+        added, removed, n_previous = diff_membership(snapshot, tracks)
+        if not is_small_change(len(added), len(removed), n_previous):
+            print(f"[增量排序] 成员变动较大 (+{len(added)}/-{len(removed)})，执行完整排序")
+            return None
+        t0 = time.time()
+        repaired = repair_sets(snapshot, tracks, _incremental_pair_score,
+                               max_set_size=signature.get('max_songs', 60))
+        if repaired:
+            _restore_transition_metrics(repaired)
+            print(f"[增量排序] 基于上次排列修复完成 (+{len(added)}/-{len(removed)})，"
+                  f"耗时 {time.time() - t0:.2f}s，跳过分组/全排序/平滑/全局优化")
+        return repaired
+    except Exception as e:
+        print(f"[增量排序] 修复失败，回退完整排序: {e}")
+        return None
+
+
 async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room",
                                         songs_per_set: int = 40,  # 每个Set 40首歌曲
                                         min_songs: int = 25,
@@ -5372,13 +5875,21 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                                         is_boutique: bool = False,
                                         is_master: bool = False,
                                         is_live: bool = False,
-                                        progress_logger=None):
+                                        progress_logger=None,
+                                        incremental: bool = False,
+                                        now_playing: Optional[str] = None,
+                                        played: Optional[List[str]] = None,
+                                        time_remaining_minutes: Optional[float] = None):
     """创建增强版调性和谐Set
     
     Args:
         enable_bridge: 启用桥接模式，从曲库补充同风格歌曲（仅限电子乐风格）
         enable_bridge_track: 启用桥接曲自动插入（BPM跨度>15时插入桥接曲）
                             华语/K-Pop/J-Pop播放列表自动禁用
+        incremental: 【V11.1】播放列表小幅变动时基于上次排列增量修复（默认关闭，需显式开启；精品/桥接模式不启用）
+        now_playing: 【V13.1】现场模式下正在播放的曲目（路径或标题），给出时只返回限时下一首候选
+        played: 【V13.1】现场模式已播曲目（路径或标题），按播放顺序
+        time_remaining_minutes: 【V13.1】现场模式 Set 剩余分钟数
     """
     
     # 检测是否是华语/亚洲流行播放列表，自动禁用桥接曲
@@ -6222,6 +6733,7 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
             try:
                 from genre_compatibility import (
                     detect_genre_from_filename,
+                    detect_genres_batch,
                     get_compatible_genres,
                     GENRE_FAMILIES,
                     CROSS_FAMILY_COMPATIBILITY
@@ -6236,8 +6748,7 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                 
                 # 检测播放列表主导风格
                 style_counts = {}
-                for track in tracks:
-                    style = detect_genre_from_filename(Path(track.get('file_path', '')).stem)
+                for style in detect_genres_batch(Path(t.get('file_path', '')).stem for t in tracks):
                     style_counts[style] = style_counts.get(style, 0) + 1
                 
                 dominant_style = max(style_counts.items(), key=lambda x: x[1])[0] if style_counts else 'electronic'
@@ -6263,7 +6774,10 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                         
                         # 从缓存中筛选兼容风格的歌曲
                         bridge_candidates = []
-                        for hash_key, data in all_cache.items():
+                        # [V12.1] 整库风格一次批量识别（自动机 + 缓存）
+                        cache_entries = list(all_cache.values())
+                        cache_styles = detect_genres_batch(Path(d.get('file_path', '')).stem for d in cache_entries)
+                        for data, style in zip(cache_entries, cache_styles):
                             file_path = data.get('file_path', '')
                             if file_path.lower().replace('\\', '/') in existing_paths:
                                 continue  # 跳过已有歌曲
@@ -6271,7 +6785,6 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                             if not analysis or 'bpm' not in analysis:
                                 continue  # 跳过无分析数据的条目
                                 
-                            style = detect_genre_from_filename(Path(file_path).stem)
                             if style in compatible_styles:
                                 bridge_candidates.append({
                                     'file_path': file_path,
@@ -6304,7 +6817,22 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
             except Exception as e:
                 print(f"[桥接模式] 错误: {e}")
         
-        if is_boutique:
+        # 【V13.1】现场模式：给出正在播放的曲目时只做限时下一首查询，不跑分组/排序/导出
+        if is_live and now_playing:
+            suggestions = suggest_live_next(playlist_name, tracks, now_playing, played or [],
+                                            time_remaining_minutes=time_remaining_minutes)
+            await db.disconnect()
+            return suggestions
+        
+        # 【V11.1】增量重排：命中时跳过分组/全排序/平滑/全局优化，直接进入桥接曲与导出
+        incremental_sets = None
+        incremental_signature = _incremental_signature(is_master, is_live, songs_per_set)
+        if incremental and not is_boutique and not enable_bridge:
+            incremental_sets = _try_incremental_resort(playlist_name, tracks, incremental_signature)
+        
+        if incremental_sets is not None:
+            bpm_groups = []
+        elif is_boutique:
             print("\n[Boutique] 精品单体模式：跳过BPM自动分组，强制合并为单个精品Set")
             # 在精品模式下，我们不分组，直接把所有歌曲当成一条长轴
             # 但我们会先按BPM初排一下，给排序引擎一个好的起始点
@@ -6318,13 +6846,14 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
             
             bpm_groups = auto_group_by_bpm(tracks, max_bpm_range=25.0)
         
-        try:
-            print(f"[BPM分组] 自动分成 {len(bpm_groups)} 个BPM区间:")
-            for i, group in enumerate(bpm_groups, 1):
-                label = get_bpm_group_label(group)
-                print(f"  - 区间{i}: {label} ({len(group)}首)")
-        except:
-            print(f"[BPM Grouping] Split into {len(bpm_groups)} BPM ranges")
+        if bpm_groups:
+            try:
+                print(f"[BPM分组] 自动分成 {len(bpm_groups)} 个BPM区间:")
+                for i, group in enumerate(bpm_groups, 1):
+                    label = get_bpm_group_label(group)
+                    print(f"  - 区间{i}: {label} ({len(group)}首)")
+            except:
+                print(f"[BPM Grouping] Split into {len(bpm_groups)} BPM ranges")
         
         # 【Phase 8】获取分割配置
         split_cfg = DJ_RULES.get('split', {}) if DJ_RULES else {}
@@ -6334,6 +6863,7 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
         
         # 对每个BPM组进行排序，生成Set
         sets = []
+        set_sequences = {}  # 【V13.1】id(Set 列表) -> 排序阶段的 TrackSequence，交给 BPM 平滑复用
         set_idx = 0
         
         # [PRO UPGRADE] 精品模式探测：如果歌单很大且未显式指定 Master，自动提升为 Master 逻辑以实现全局最优切分
@@ -6367,6 +6897,13 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                     if len(global_sorted_tracks) <= max_target:
                         print(f"   - 候选不足 {max_target} 首，保留全量 {len(global_sorted_tracks)} 首")
                         final_cut = global_sorted_tracks
+                    elif HAS_DP_SEGMENTATION:
+                        # 【V11.2】与 DP 切分共用代价模型：完结感优先，时长偏差作决胜项
+                        best_cut_idx, max_tail_score = select_boutique_cut(
+                            global_sorted_tracks, min_target, max_target,
+                            target_seconds=max(90 * 60, target_minutes * 60))
+                        print(f"   - 智能截断：选定 {best_cut_idx} 首 (Score: {max_tail_score})")
+                        final_cut = global_sorted_tracks[:best_cut_idx]
                     else:
                         # 智能截断：在 30-45 之间寻找最佳 Outro 点
                         # 扫描区间 [30, 45] (索引 29 到 44)
@@ -6409,55 +6946,74 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
 
                 # 开始智能切分 (普通 Live 模式)
                 print(f"[Master] 正在寻找最佳切分点 (Pivots)...")
-                current_ptr = 0
-                while current_ptr < len(global_sorted_tracks):
-                    chunk = []
-                    dur = 0
-                    
-                    # 寻找目标长度
+                if HAS_DP_SEGMENTATION:
+                    # 【V11.2】DP 全局最优切分：切点衔接 + 时长偏差 + 首数惩罚，O(N·W)
                     if is_boutique:
-                        # [V6.1.3] 双模优化：凡是开启了精品精选，全量分段自动进入"大块模式" (每段 25-35 首)
-                        # 避免产生过多细碎的 Part
+                        # [V6.1.3] 双模优化：全量分段进入"大块模式"，避免产生过多细碎的 Part
                         target_s = max(25, min_s)
                         target_d = max(90 * 60, target_minutes * 60)
                     else:
                         target_s = min_s
                         target_d = target_minutes * 60
+                    cut_points = segment_tracks_dp(global_sorted_tracks, min_s, max(max_s, target_s),
+                                                   target_d, target_songs=target_s)
+                    prev_cut = 0
+                    chunk_sizes = []
+                    for cut in cut_points:
+                        sets.append(global_sorted_tracks[prev_cut:cut])
+                        chunk_sizes.append(str(cut - prev_cut))
+                        prev_cut = cut
+                    print(f"[Master] DP 切分完成：{len(cut_points)} 个 Set ({'/'.join(chunk_sizes)} 首)")
+                else:
+                    current_ptr = 0
+                    while current_ptr < len(global_sorted_tracks):
+                        chunk = []
+                        dur = 0
                     
-                    # 预估歌曲数量
-                    est_songs = 0
-                    temp_dur = 0
-                    for k in range(current_ptr, len(global_sorted_tracks)):
-                        temp_dur += global_sorted_tracks[k].get('duration', 180)
-                        est_songs += 1
-                        if temp_dur >= target_d and est_songs >= min_s:
-                            break
+                        # 寻找目标长度
+                        if is_boutique:
+                            # [V6.1.3] 双模优化：凡是开启了精品精选，全量分段自动进入"大块模式" (每段 25-35 首)
+                            # 避免产生过多细碎的 Part
+                            target_s = max(25, min_s)
+                            target_d = max(90 * 60, target_minutes * 60)
+                        else:
+                            target_s = min_s
+                            target_d = target_minutes * 60
                     
-                    # 如果剩余歌曲太少，直接打包
-                    if len(global_sorted_tracks) - (current_ptr + est_songs) < min_s // 2:
-                        est_songs = len(global_sorted_tracks) - current_ptr
+                        # 预估歌曲数量
+                        est_songs = 0
+                        temp_dur = 0
+                        for k in range(current_ptr, len(global_sorted_tracks)):
+                            temp_dur += global_sorted_tracks[k].get('duration', 180)
+                            est_songs += 1
+                            if temp_dur >= target_d and est_songs >= min_s:
+                                break
                     
-                    # 在 est_songs 附近寻找最佳切分点 (窗口 +/- 5)
-                    pivot_idx = current_ptr + est_songs
-                    if pivot_idx < len(global_sorted_tracks):
-                        window_start = max(current_ptr + min_s, pivot_idx - 5)
-                        window_end = min(len(global_sorted_tracks) - min_s // 2, pivot_idx + 5)
+                        # 如果剩余歌曲太少，直接打包
+                        if len(global_sorted_tracks) - (current_ptr + est_songs) < min_s // 2:
+                            est_songs = len(global_sorted_tracks) - current_ptr
+                    
+                        # 在 est_songs 附近寻找最佳切分点 (窗口 +/- 5)
+                        pivot_idx = current_ptr + est_songs
+                        if pivot_idx < len(global_sorted_tracks):
+                            window_start = max(current_ptr + min_s, pivot_idx - 5)
+                            window_end = min(len(global_sorted_tracks) - min_s // 2, pivot_idx + 5)
                         
-                        best_p = pivot_idx
-                        max_p_score = -9999
-                        for w in range(window_start, window_end):
-                            # _transition_score 记录的是当前首歌与前一首歌的兼容度
-                            # 我们希望切分点之后的 第一首歌 与 切分点之前的 最后一首歌 兼容度最高
-                            s_val = global_sorted_tracks[w].get('_transition_score', 0)
-                            if s_val > max_p_score:
-                                max_p_score = s_val
-                                best_p = w
-                        pivot_idx = best_p
-                    else:
-                        pivot_idx = len(global_sorted_tracks)
+                            best_p = pivot_idx
+                            max_p_score = -9999
+                            for w in range(window_start, window_end):
+                                # _transition_score 记录的是当前首歌与前一首歌的兼容度
+                                # 我们希望切分点之后的 第一首歌 与 切分点之前的 最后一首歌 兼容度最高
+                                s_val = global_sorted_tracks[w].get('_transition_score', 0)
+                                if s_val > max_p_score:
+                                    max_p_score = s_val
+                                    best_p = w
+                            pivot_idx = best_p
+                        else:
+                            pivot_idx = len(global_sorted_tracks)
                     
-                    sets.append(global_sorted_tracks[current_ptr:pivot_idx])
-                    current_ptr = pivot_idx
+                        sets.append(global_sorted_tracks[current_ptr:pivot_idx])
+                        current_ptr = pivot_idx
             else:
                 # [普通模式] 原有的逐个切分排序逻辑
                 current_sub_group = []
@@ -6487,8 +7043,10 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                         except:
                             pass
                             
-                        sorted_tracks, _, _ = enhanced_harmonic_sort(current_sub_group, len(current_sub_group), is_boutique=is_boutique)
+                        sorted_tracks, _, sort_metrics = enhanced_harmonic_sort(current_sub_group, len(current_sub_group), is_boutique=is_boutique)
                         sets.append(sorted_tracks)
+                        if sort_metrics.get('sequence') is not None:
+                            set_sequences[id(sorted_tracks)] = sort_metrics['sequence']
                         
                         # 重置计数，准备下一个子组
                         current_sub_group = []
@@ -6497,17 +7055,19 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
             if is_boutique:
                 break
         
+        if incremental_sets is not None:
+            sets = incremental_sets
+        
         # ========== BPM平滑处理：确保每个Set内BPM序列平滑 ==========
-        try:
-            print("\n[BPM平滑] 正在优化每个Set的BPM序列...")
-        except:
-            print("\n[BPM Smoothing] Optimizing BPM sequence for each set...")
+        # 增量修复的排列已是 DJ 排练过的顺序，不再重新平滑
+        if incremental_sets is None:
+            try:
+                print("\n[BPM平滑] 正在优化每个Set的BPM序列...")
+            except:
+                print("\n[BPM Smoothing] Optimizing BPM sequence for each set...")
         
         smoothed_sets = []
-        for i, set_tracks in enumerate(sets):
-            smoothed = smooth_bpm_sequence(set_tracks)
-            smoothed_sets.append(smoothed)
-            
+        for i, set_tracks in enumerate(sets if incremental_sets is None else []):
             # 计算平滑前后的BPM跳跃次数
             def count_bpm_jumps(tracks, threshold=15):
                 jumps = 0
@@ -6517,7 +7077,15 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                         jumps += 1
                 return jumps
             
+            # 平滑会原地改写序列，先记下平滑前的跳跃次数
             before_jumps = count_bpm_jumps(set_tracks)
+            # 【V13.1】沿用排序阶段的序列对象（调性边分已缓存）；Master 切片等新列表则新建
+            seq = set_sequences.get(id(set_tracks)) if HAS_SEQUENCE_MODEL else None
+            if seq is None or seq.tracks is not set_tracks:
+                seq = TrackSequence(set_tracks, _key_edge) if HAS_SEQUENCE_MODEL else set_tracks
+            smoothed = smooth_bpm_sequence(seq)
+            smoothed_sets.append(smoothed)
+            
             after_jumps = count_bpm_jumps(smoothed)
             
             if before_jumps > after_jumps:
@@ -6526,10 +7094,11 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                 except:
                     print(f"  Set {i+1}: BPM jumps {before_jumps} -> {after_jumps}")
         
-        sets = smoothed_sets
+        if incremental_sets is None:
+            sets = smoothed_sets
         
         # ========== Phase 3: 全局退火优化 (Simulated Annealing) ==========
-        if len(sets) > 0:
+        if len(sets) > 0 and incremental_sets is None:
             try:
                 print(f"\n[进化启动] 正在进行全局退火优化 (Phase 3)...")
             except:
@@ -6538,7 +7107,9 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
             opt_config = {
                 'max_bpm_jump': 8.0,
                 'min_key_score': 60.0,
-                'active_profile': ACTIVE_PROFILE
+                'active_profile': ACTIVE_PROFILE,
+                'min_songs': min_s,
+                'max_songs': max_s,
             }
             improved_count = optimize_global_sets(sets, opt_config, progress_logger)
             
@@ -6837,6 +7408,15 @@ async def create_enhanced_harmonic_sets(playlist_name: str = "流行Boiler Room"
                     print("[桥接曲] 无需插入桥接曲（所有BPM跨度都在合理范围内）")
         except Exception as e:
             print(f"[桥接曲] 处理时出错: {e}")
+        
+        # 【V11.1】保存本次排列快照（物理隔离会改写路径，必须在此之前）
+        if HAS_INCREMENTAL_RESORT and not is_boutique and not enable_bridge:
+            try:
+                PlaylistOrderStore(ORDER_STORE_FILE).save(
+                    playlist_name, sets, incremental_signature, _incremental_pair_score)
+            except Exception as e:
+                print(f"[增量排序] 保存排列快照失败: {e}")
+        
         output_dir = Path(r"D:\生成的set")
         output_dir.mkdir(parents=True, exist_ok=True)
                 # 确定显示名称
@@ -7728,17 +8308,20 @@ def is_key_transition_allowed(current_key: str, next_key: str,
         return (True, "segment boundary -> allow")
     
     try:
-        # 解析调性数字（支持 "1A", "12B" 等格式）
-        curr_num = int(''.join(ch for ch in current_key if ch.isdigit()))
-        next_num = int(''.join(ch for ch in next_key if ch.isdigit()))
-        
-        def circle_distance(a, b):
-            """计算5度圈距离（考虑轮盘循环）"""
-            direct = abs(a - b)
-            wrap = 12 - direct
-            return min(direct, wrap)
-        
-        diff = circle_distance(curr_num, next_num)
+        # 【V12.0】编码可识别时直接查 5 度圈距离表（音名 / Open Key 同样适用）
+        diff = int(KEY_DISTANCE_TABLE[key_code(current_key), key_code(next_key)]) if HAS_KEY_CODES else -1
+        if diff < 0:
+            # 解析调性数字（支持 "1A", "12B" 等格式）
+            curr_num = int(''.join(ch for ch in current_key if ch.isdigit()))
+            next_num = int(''.join(ch for ch in next_key if ch.isdigit()))
+            
+            def circle_distance(a, b):
+                """计算5度圈距离（考虑轮盘循环）"""
+                direct = abs(a - b)
+                wrap = 12 - direct
+                return min(direct, wrap)
+            
+            diff = circle_distance(curr_num, next_num)
         
         # 详细日志
         reason = ""
@@ -7973,11 +8556,30 @@ def find_stems_mashup_pairs(playlist_name: str, min_score: float = 75.0, max_res
     
     # 实例化统一评分模型
     from skills.mashup_intelligence.scripts.core import MashupIntelligence
+    mi = MashupIntelligence()
     
     candidates = []
     total_pairs = len(tracks) * (len(tracks) - 1) // 2
-    checked = 0
     
+    try:
+        from skills.mashup_intelligence.scripts.core import MashupDiscoveryEngine
+    except ImportError:
+        MashupDiscoveryEngine = None
+    
+    if MashupDiscoveryEngine is not None:
+        # [V12.6] BPM 分块 + 多进程评分，只保留前 max_results 个组合，入选后再逐对展开 details
+        engine = MashupDiscoveryEngine(tracks, mode='standard', min_score=min_score, global_k=max_results)
+        result = engine.run()
+        stats = result['stats']
+        print(f"   共 {total_pairs} 对，BPM 分块后实际评分 {stats['pairs_scored']} 对（{stats['seconds']}s）")
+        for m in engine.expand(result['top_pairs']):
+            m['mashup_type'] = m['details'].get('mashup_type', '标准Stems混搭')
+            m['mi_instance'] = mi  # 供后续生成指南使用
+            candidates.append(m)
+        print(f"=> 找到 {stats['matches']} 个高质量匹配对")
+        return candidates
+    
+    checked = 0
     for i, track1 in enumerate(tracks):
         for j, track2 in enumerate(tracks[i+1:], i+1):
             checked += 1
@@ -8130,6 +8732,14 @@ if __name__ == "__main__":
                            help='Master总线模式：全局连贯排序，在最优点智能切分Set，并导出统一的Master M3U/XML')
         parser.add_argument('--live', action='store_true',
                            help='直播长Set模式：完整度优先，确保所有歌曲都排进去，无法和谐衔接的歌曲放在Set末尾')
+        parser.add_argument('--now-playing', type=str, default=None,
+                           help='[V13.1] 配合 --live：正在播放的曲目（路径或标题），只返回限时下一首候选')
+        parser.add_argument('--played', type=str, default='',
+                           help='[V13.1] 配合 --now-playing：已播曲目（路径或标题），用 | 分隔，按播放顺序')
+        parser.add_argument('--time-left', type=float, default=None,
+                           help='[V13.1] 配合 --now-playing：Set 剩余分钟数')
+        parser.add_argument('--incremental', action='store_true',
+                           help='[V11.1] 播放列表小幅变动时基于上次排列快照增量修复（默认完整重排）')
         parser.add_argument('--theme', type=str, default='',
                            help='[Intelligence-V5] 设定 Set 的叙事主题（如：“探索 Y2K 怀旧背景下的女团力量”）')
         parser.add_argument('--mode', type=str, default='set',
@@ -8183,5 +8793,9 @@ if __name__ == "__main__":
             enable_bridge=args.bridge,
             is_boutique=args.boutique,
             is_master=args.master,
-            is_live=args.live
+            is_live=args.live,
+            incremental=args.incremental,
+            now_playing=args.now_playing,
+            played=[p for p in args.played.split('|') if p.strip()],
+            time_remaining_minutes=args.time_left
         ))
\ No newline at end of file
@@ -30,12 +30,26 @@ except ImportError as e:
     print(f"❌ 导入失败: {e}")
     sys.exit(1)
 
+try:
+    # [V12.6] 分块 + 多进程的全库组合发现
+    from skills.mashup_intelligence.scripts.core import MashupDiscoveryEngine
+    HAS_DISCOVERY_ENGINE = True
+except ImportError:
+    HAS_DISCOVERY_ENGINE = False
+
+try:
+    # [V12.7] 持久化全库搭档索引
+    from skills.mashup_intelligence.scripts.core import MashupPartnerIndex
+    HAS_PARTNER_INDEX = True
+except ImportError:
+    HAS_PARTNER_INDEX = False
+
 def format_duration(seconds: float) -> str:
     mins = int(seconds // 60)
     secs = int(seconds % 60)
     return f"{mins}:{secs:02d}"
 
-async def recommend_mashups(playlist_name: str, threshold: float = 75.0, top_n: int = 15):
+async def recommend_mashups(playlist_name: str, threshold: float = 75.0, top_n: int = 15, use_index: bool = False):
     print(f"\n{'='*60}")
     print(f"🚀 AI DJ Mashup 推荐引擎 - 正在扫描: {playlist_name}")
     print(f"{'='*60}")
@@ -97,32 +111,67 @@ async def recommend_mashups(playlist_name: str, threshold: float = 75.0, top_n:
     # 3. 联动 Mashup Intelligence 进行矩阵对比
     mi = MashupIntelligence()
     matches = []
+    report_path = Path("D:/生成的set/MASHUP_RECOMMENDATIONS.md")
     
     print(f"🔎 正在执行 {len(analyzed_tracks) * (len(analyzed_tracks)-1) // 2} 次维度冲突审计...")
     
-    for i in range(len(analyzed_tracks)):
-        for j in range(i + 1, len(analyzed_tracks)):
-            t1 = analyzed_tracks[i]
-            t2 = analyzed_tracks[j]
-            
+    if use_index and HAS_PARTNER_INDEX:
+        # [V12.7] 全库搭档索引：只为新分析/变化的曲目评分，歌单内组合直接从索引读出
+        index = MashupPartnerIndex(mode='mashup_discovery')
+        stats = index.update(MashupPartnerIndex.tracks_from_cache(cache))
+        index.save()
+        print(f"   📇 搭档索引已更新：新增 {stats['added']}，变化 {stats['changed']}（{stats['seconds']}s）")
+        by_key = {MashupPartnerIndex.track_key(t): t for t in analyzed_tracks}
+        pairs = index.best_pairs(list(by_key), top_n=top_n, min_score=threshold)
+        for _, key_a, key_b in pairs:
+            t1, t2 = by_key[key_a], by_key[key_b]
             score, details = mi.calculate_mashup_score(t1, t2, mode='mashup_discovery')
-            
-            if score >= threshold:
-                matches.append({
-                    'score': score,
-                    'details': details,
-                    'track1': t1,
-                    'track2': t2
-                })
+            matches.append({'score': score, 'details': details, 'track1': t1, 'track2': t2})
+        match_count = len(matches)
+    elif HAS_DISCOVERY_ENGINE:
+        # [V12.6] BPM 分块剪掉必被拒绝的组合，块间并行；命中组合边算边写入 JSONL，报告只展开前 top_n
+        engine = MashupDiscoveryEngine(analyzed_tracks, mode='mashup_discovery', min_score=threshold, global_k=top_n)
+        stream_path = report_path.with_name("MASHUP_MATCHES.jsonl")
+        with open(stream_path, "w", encoding="utf-8") as stream:
+            def on_matches(block):
+                for i, j, score in block:
+                    stream.write(json.dumps({
+                        'score': round(score, 2),
+                        'track1': analyzed_tracks[i]['track_info'],
+                        'track2': analyzed_tracks[j]['track_info'],
+                    }, ensure_ascii=False) + "\n")
+                stream.flush()
+            result = engine.run(on_matches=on_matches)
+        stats = result['stats']
+        print(f"   ⚡ 实际评分 {stats['pairs_scored']} 对（{stats['blocks']} 个 BPM 块，{stats['seconds']}s），"
+              f"全部命中已写入 {stream_path}")
+        matches = engine.expand(result['top_pairs'])
+        match_count = stats['matches']
+    else:
+        for i in range(len(analyzed_tracks)):
+            for j in range(i + 1, len(analyzed_tracks)):
+                t1 = analyzed_tracks[i]
+                t2 = analyzed_tracks[j]
+                
+                score, details = mi.calculate_mashup_score(t1, t2, mode='mashup_discovery')
+                
+                if score >= threshold:
+                    matches.append({
+                        'score': score,
+                        'details': details,
+                        'track1': t1,
+                        'track2': t2
+                    })
+        matches.sort(key=lambda m: m['score'], reverse=True)
+        match_count = len(matches)
 
     from datetime import datetime
     generation_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     
-    report_path = Path("D:/生成的set/MASHUP_RECOMMENDATIONS.md")
     with open(report_path, "w", encoding="utf-8") as f:
         f.write(f"# Mashup 推荐报告: {playlist_name}\n\n")
         f.write(f"- **总音轨数**: {len(analyzed_tracks)}\n")
-        f.write(f"- **匹配对数**: {len(matches)}\n")
+        f.write(f"- **匹配对数**: {match_count}\n")
         f.write(f"- **推荐门限**: {threshold}\n")
         f.write(f"- **生成时间**: {generation_time}\n\n")
         
@@ -150,7 +199,7 @@ async def recommend_mashups(playlist_name: str, threshold: float = 75.0, top_n:
 
     await db.disconnect()
     
-    print(f"\n🎉 推荐完成！发现 {len(matches)} 个极品组合。")
+    print(f"\n🎉 推荐完成！发现 {match_count} 个极品组合。")
     print(f"📝 报告已生成至: {report_path}")
     print(f"{'='*60}\n")
 
@@ -159,7 +208,8 @@ if __name__ == "__main__":
     parser.get_default("playlist")
     parser.add_argument("--playlist", type=str, default="House", help="Rekordbox Playlist Name")
     parser.add_argument("--threshold", type=float, default=70.0, help="Mashup score threshold")
+    parser.add_argument("--index", action="store_true", help="Answer from the persistent library partner index")
     
     args = parser.parse_args()
     
-    asyncio.run(recommend_mashups(args.playlist, args.threshold))
+    asyncio.run(recommend_mashups(args.playlist, args.threshold, use_index=args.index))
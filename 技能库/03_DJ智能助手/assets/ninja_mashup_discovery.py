@@ -9,7 +9,8 @@ BASE_DIR = Path("d:/anti")
 sys.path.append(str(BASE_DIR))
 sys.path.append(str(BASE_DIR / "core"))
 
-from skills.mashup_intelligence.scripts.core import MashupIntelligence
+# [V12.7] MashupPartnerIndex：持久化全库搭档索引
+from skills.mashup_intelligence.scripts.core import MashupIntelligence, MashupPartnerIndex
 from core.common_utils import load_cache, normalize_path
 
 # Fix Windows encoding for Chinese/Korean characters
@@ -37,32 +38,24 @@ def find_ninja_matches():
     # 2. Scan library for candidates
     print(f"Scanning library for '忍者' (BPM: {ninja_track['analysis']['bpm']}, Key: {ninja_track['analysis']['key']}) Mashups...")
     
+    # [V12.7] 索引只为新分析的曲目评分，忍者的搭档直接从索引读出，只展开前 10 名的 details
+    # Use V7.1 Discovery Mode, filtering for relevance (score > 70)
+    library = MashupPartnerIndex.tracks_from_cache(cache)
+    index = MashupPartnerIndex(mode='mashup_discovery')
+    index.update(library)
+    index.save()
+    by_key = {MashupPartnerIndex.track_key(t): t for t in library}
     results = []
-    
-    for path, entry in cache.items():
-        if path == ninja_path:
-            continue
-            
-        candidate_track = {
-            'track_info': {'title': Path(path).stem, 'artist': entry.get('artist', 'Unknown')},
-            'analysis': entry['analysis']
-        }
-        
-        # Use V7.1 Discovery Mode
-        score, details = mi.calculate_mashup_score(ninja_track, candidate_track, mode='mashup_discovery')
-        
-        # Filtering for relevance
-        if score > 70:
-            results.append({
-                'score': score,
-                'title': candidate_track['track_info']['title'],
-                'artist': candidate_track['track_info']['artist'],
-                'details': details
-            })
-            
-    # Sort and Print Top 10
-    results.sort(key=lambda x: x['score'], reverse=True)
-    
+    for p in index.partners(ninja_path, k=10, min_score=70):
+        if p['score'] <= 70:
+            continue  # partners 的门限含 70 本身（非精英组合的封顶分），这里保持严格大于
+        candidate_track = by_key[p['key']]
+        score, details = mi.calculate_mashup_score(by_key[ninja_path], candidate_track, mode='mashup_discovery')
+        results.append({'score': score, 'title': p['title'], 'artist': p['artist'], 'details': details})
+    print_results(results)
+
+
+def print_results(results):
     print("\n" + "="*80)
     print(f" TOP MASHUP PICKS FOR: 忍者 (Jay Chou) - V7.1 Contrast Engine")
     print("="*80)
@@ -7,10 +7,17 @@ Skill: Mashup Intelligence (V4 Core)
 - Stems Compatibility Engine
 """
 
+import hashlib
+import heapq
+import json
+import math
 import os
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Dict, Tuple, Optional
 
 # 【Neural Linkage】添加核心库路径支持
 # 当前路径为 skills/mashup_intelligence/scripts/core.py，目标指向 d:/anti/core
@@ -19,13 +26,38 @@ sys.path.insert(0, str(BASE_DIR / "core"))
 
 try:
     from common_utils import get_advanced_harmonic_score, get_smart_pitch_shift
-    from audio_dna import map_dna_features
+    from audio_dna import DNA_FIELD_INDEX, dna_vector
+    from title_identity import normalize_mashup_title
 except ImportError:
     # 路径自动补全兜底
     sys.path.insert(0, str(BASE_DIR / "core"))
-    from audio_dna import map_dna_features
+    from audio_dna import DNA_FIELD_INDEX, dna_vector
     from common_utils import get_advanced_harmonic_score, get_smart_pitch_shift
-    def map_dna_features(a): return a
+    from title_identity import normalize_mashup_title
+
+_SWING_IDX = DNA_FIELD_INDEX['swing_dna']
+
+
+def _swing_dna(analysis: Dict) -> float:
+    """[V12.4] 律动 DNA 取自随分析缓存的 DNA 向量（每首只算一次，不再逐对复制整份 analysis）"""
+    return float(dna_vector(analysis)[_SWING_IDX])
+
+import numpy as np
+
+try:
+    from key_codes import ADVANCED_HARMONIC_TABLE, UNKNOWN_KEY_CODE, key_code
+    HAS_KEY_CODES = True
+except ImportError:
+    HAS_KEY_CODES = False
+
+# 文化矩阵关键词（单对评分与批量评分共用）
+CULTURE_URBAN_KEYS = ["kanye", "travis", "scott", "hiphop", "trap", "afro", "jersey", "remix", "edit", "club", "banger", "urban", "k-pop", "kpop"]
+CULTURE_MANDARIN_KEYS = ['mandarin', 'c-pop', 'chinese', '华语', '中文']
+CULTURE_KPOP_KEYS = ['k-pop', 'kpop', 'korean']
+CULTURE_WESTERN_KEYS = ['pop', 'hip hop', 'rap', 'r&b', 'billboard']
+CULTURE_REMIX_KEYS = ['remix', 'edit', 'bootleg', 'rework', 'vip']
+CULTURE_PURE_ELEC_KEYS = ['techno', 'minimal', 'tech house', 'psytrance', 'trance']
+HIGH_ENERGY_MOOD_KEYS = ['aggressive', 'energetic', 'vibrant', 'power', 'happy', 'bright']
 
 class SonicMatcher:
     """
@@ -34,6 +66,11 @@ class SonicMatcher:
     """
     
     # 核心音色字典 (Mirror of Mediator Knowledge Base)
+    YAMNET_PLUCK_TAGS = ["Zither", "Plucked string instrument", "Koto", "Shamisen"]
+    URBAN_WORDS = ["rap", "hip hop", "electronic", "trap", "urban", "r&b", "banger"]
+    ENERGY_POP_WORDS = ["pop", "k-pop", "dance", "remix", "techno", "club"]
+    BALLAD_WORDS = ["independent music", "folk", "acoustic", "singing", "ballad"]
+
     SONIC_GALLERY = {
         # Oriental Pluck Cluster
         "忍者": ["Oriental_Pluck", "Staccato_Rap", "Metallic_Transients", "100-110_Groove"],
@@ -160,7 +197,7 @@ class SonicMatcher:
         
         # Rule 1: Pluck Synergy (Oriental <-> Pizzicato)
         # Expanded for YAMNet Tags: 'Zither', 'Plucked string instrument'
-        yamnet_pluck_tags = ["Zither", "Plucked string instrument", "Koto", "Shamisen"]
+        yamnet_pluck_tags = SonicMatcher.YAMNET_PLUCK_TAGS
         
         # [V35.6 Fix] Strict Cross-Track Matching
         t1_has_oriental = any(t == "Oriental_Pluck" or t in yamnet_pluck_tags for t in tags1)
@@ -181,16 +218,16 @@ class SonicMatcher:
             # [V35.6] Refined Vibe Check (Ballad vs Urban)
             g1, g2 = str(tags1).lower(), str(tags2).lower()
             
-            is_urban1 = any(x in g1 for x in ["rap", "hip hop", "electronic", "trap", "urban", "r&b", "banger"])
-            is_urban2 = any(x in g2 for x in ["rap", "hip hop", "electronic", "trap", "urban", "r&b", "banger"])
+            is_urban1 = any(x in g1 for x in SonicMatcher.URBAN_WORDS)
+            is_urban2 = any(x in g2 for x in SonicMatcher.URBAN_WORDS)
             
             # A ballad is something that sounds acoustic/independent AND DOES NOT have rap/banger energy
             # [V35.6] Exempt Pop/Dance/K-Pop from ballad classification
-            is_energy_pop = any(x in g1 for x in ["pop", "k-pop", "dance", "remix", "techno", "club"])
-            is_ballad1 = any(x in g1 for x in ["independent music", "folk", "acoustic", "singing", "ballad"]) and not (is_urban1 or is_energy_pop)
+            is_energy_pop = any(x in g1 for x in SonicMatcher.ENERGY_POP_WORDS)
+            is_ballad1 = any(x in g1 for x in SonicMatcher.BALLAD_WORDS) and not (is_urban1 or is_energy_pop)
             
-            is_energy_pop2 = any(x in g2 for x in ["pop", "k-pop", "dance", "remix", "techno", "club"])
-            is_ballad2 = any(x in g2 for x in ["independent music", "folk", "acoustic", "singing", "ballad"]) and not (is_urban2 or is_energy_pop2)
+            is_energy_pop2 = any(x in g2 for x in SonicMatcher.ENERGY_POP_WORDS)
+            is_ballad2 = any(x in g2 for x in SonicMatcher.BALLAD_WORDS) and not (is_urban2 or is_energy_pop2)
             
             # Find the specific tags that triggered the match
             match_tags1 = [t for t in tags1 if t == "Oriental_Pluck" or t in yamnet_pluck_tags or t == "Pizzicato_Pluck"]
@@ -228,6 +265,203 @@ class SonicMatcher:
             
         return bonus, reasons
 
+# ==============================================================================
+# 【V12.3】一对多批量评分 (Seed x Candidates)
+# 候选曲目一次性编码为列式数组（DNA 映射、标题标准化、调性编码、标签关键词判定都只做一次），
+# 评分时一个种子对整批候选用 NumPy 向量化求出分数与拒绝码，结果与 calculate_mashup_score 逐对一致。
+# 只有最终入选的前几名才回到逐对评分生成 details。
+# ==============================================================================
+REJECT_NONE = 0
+REJECT_BPM = 1
+REJECT_IDENTITY = 2
+REJECT_SAME_TRACK = 3
+REJECT_AMBIENCE = 4
+REJECT_MISSING_BPM = 5
+REJECTION_REASONS = ["", "BPM deviation > 12%", "Identity Collision: Same Song", "Same track", "Ambience Only", "Missing BPM Data"]
+
+CULTURE_MODES = ('standard', 'mashup_discovery')
+
+
+def _num(value, default):
+    return default if value is None else value
+
+
+def _has_any(text: str, words) -> bool:
+    return any(w in text for w in words)
+
+
+def _encode_mashup_track(track: Dict) -> Dict:
+    """单曲编码：与 calculate_mashup_score / SonicMatcher.calculate_bonus 读取的字段口径一致"""
+    s = track.get('analysis', track)
+    info = track.get('track_info', {})
+
+    bands = s.get('spectral_bands', {})
+    vibe = s.get('vibe_analysis', {})
+    vocal = _num(s.get('vocal_ratio', 0.5), 0.5)
+    tags_str = (str(s.get('tags', [])) + " " + str(s.get('genre', ''))).lower()
+    is_c = _has_any(tags_str, CULTURE_MANDARIN_KEYS)
+    is_k = _has_any(tags_str, CULTURE_KPOP_KEYS)
+    is_w = _has_any(tags_str, CULTURE_WESTERN_KEYS)
+    arousal = s.get('arousal_proxy') or s.get('arousal_window_mean', vibe.get('arousal', 0.5))
+    mood = str(s.get('vocal_mood', '')).lower()
+
+    # Sonic DNA：神经标签 + 标题启发式标签
+    sonic_info = info or track
+    sonic_analysis = track.get('analysis', {})
+    sonic_tags = list(set(sonic_analysis.get('sonic_dna', []) + SonicMatcher.get_sonic_tags(sonic_info.get('title', ''))))
+    g = str(sonic_tags).lower()
+    pluck = SonicMatcher.YAMNET_PLUCK_TAGS
+    sonic_urban = _has_any(g, SonicMatcher.URBAN_WORDS)
+
+    return {
+        'bpm': float(_num(s.get('bpm', 0), 0)),
+        'title_norm': normalize_mashup_title(info.get('title', '')),
+        'path': info.get('file_path', track.get('file_path', '')),
+        'key': s.get('key', ''),
+        'vocal': vocal,
+        'onset': _num(s.get('onset_density', 0.5), 0.5),
+        'busy': _num(s.get('busy_score', 0.5), 0.5),
+        'energy': _num(s.get('energy', 50), 50),
+        'tb_low': _num(s.get('tonal_balance_low', 0.5), 0.5),
+        'tb_mid': _num(s.get('tonal_balance_mid', 0.3), 0.3),
+        'tb_high': _num(s.get('tonal_balance_high', 0.2), 0.2),
+        'has_bands': bool(bands),
+        'sub_bass': _num(bands.get('sub_bass', 0.1), 0.1) if bands else 0.1,
+        'mid_range': _num(bands.get('mid_range', 0.4), 0.4) if bands else 0.4,
+        'high_presence': _num(bands.get('high_presence', 0.2), 0.2) if bands else 0.2,
+        'drum_pattern': s.get('drum_pattern', ''),
+        'genre': s.get('genre', ''),
+        'swing': _swing_dna(s),
+        'has_bars32': bool(s.get('phrase_markers', {}).get('bars_32', [])),
+        'valence': _num(s.get('valence_window_mean', 0.5), 0.5),
+        'arousal_mean': _num(s.get('arousal_window_mean', 0.5), 0.5),
+        'conf': _num(s.get('bpm_confidence', 1.0), 1.0) * _num(s.get('key_confidence', 1.0), 1.0),
+        'beat_stability': _num(s.get('beat_stability', 1.0), 1.0),
+        'mod_keys': {m.get('key') for m in s.get('key_modulations', []) if isinstance(m, dict)},
+        # 文化矩阵
+        'urban': _has_any(tags_str, CULTURE_URBAN_KEYS),
+        'mandarin': is_c,
+        'kpop': is_k,
+        'western': is_w,
+        'pop': is_c or is_k or is_w,
+        'remix': _has_any(tags_str, CULTURE_REMIX_KEYS),
+        'vocal_soul': (is_c or is_k or is_w) and vocal > 0.6,
+        'pure_machine': _has_any(tags_str, CULTURE_PURE_ELEC_KEYS) and vocal < 0.3,
+        'arousal': _num(arousal, 0.5),
+        'high_energy': _has_any(mood, HIGH_ENERGY_MOOD_KEYS) or _num(arousal, 0.5) > 0.65,
+        'complex': s.get('timbre_texture', {}).get('complexity', 0) > 0.12,
+        # Sonic DNA
+        'oriental': any(t == "Oriental_Pluck" or t in pluck for t in sonic_tags),
+        'pizzicato': any(t == "Pizzicato_Pluck" or t in pluck for t in sonic_tags),
+        'staccato': "Staccato_Rap" in sonic_tags,
+        'kungfu': any(t in ["Kung_Fu_Vibe", "Oriental_Percussion"] for t in sonic_tags),
+        'gangsta': any(t in ["Gangsta_Flow", "West_Coast"] for t in sonic_tags),
+        'aggressive': "Aggressive_Flow" in sonic_tags,
+        'aggressive_or_numetal': "Aggressive_Flow" in sonic_tags or "Nu_Metal_Rap" in sonic_tags,
+        'sonic_urban': sonic_urban,
+        'ballad': _has_any(g, SonicMatcher.BALLAD_WORDS) and not (sonic_urban or _has_any(g, SonicMatcher.ENERGY_POP_WORDS)),
+        'sonic_arousal': _num(sonic_analysis.get('arousal_proxy') or sonic_analysis.get('arousal_window_mean', 0.5), 0.5),
+    }
+
+
+def _rejection_codes(f: Dict, batch: 'MashupCandidateBatch') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    拒绝门（倒序写入，使优先级与逐对评分的判断顺序一致）
+    只读取种子的 bpm / vocal / path / title_norm；各条件对两首歌对称，故 (a, b) 与 (b, a) 的拒绝码相同
+    Returns:
+        (rejections, best_diff, best_idx)：拒绝码、0.5x/1x/2x 中最小的 BPM 偏差及其倍率下标
+    """
+    n = len(batch)
+    b1, b2 = f['bpm'], batch.cols['bpm']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diffs = np.stack([np.abs(b1 * r - b2) / np.maximum(b1 * r, b2) for r in (0.5, 1.0, 2.0)])
+    best_diff = diffs.min(axis=0)
+    best_idx = diffs.argmin(axis=0)
+    missing = (b2 == 0) | (b1 == 0)
+    too_far = best_diff > 0.12
+
+    rejections = np.zeros(n, dtype=np.int8)
+    rejections[~missing & too_far] = REJECT_BPM
+    rejections[missing] = REJECT_MISSING_BPM
+    if f['vocal'] < 0.05:
+        rejections[batch.cols['vocal'] < 0.05] = REJECT_AMBIENCE
+    if f['path']:
+        rejections[batch.paths.get(f['path'], [])] = REJECT_SAME_TRACK
+    t1 = f['title_norm']
+    if t1:
+        same_song = [i for i, t2 in enumerate(batch.title_norms) if t2 and (t1 == t2 or t1 in t2 or t2 in t1)]
+        rejections[same_song] = REJECT_IDENTITY
+    if b1 > 0:
+        rejections[(b2 > 0) & too_far] = REJECT_BPM
+    return rejections, best_diff, best_idx
+
+
+class MashupCandidateBatch:
+    """[V12.3] 预编码候选集（列式存储），供 MashupIntelligence.score_batch 复用"""
+
+    _FLOAT_COLUMNS = ('bpm', 'vocal', 'onset', 'busy', 'energy', 'tb_low', 'tb_mid', 'tb_high',
+                      'sub_bass', 'mid_range', 'high_presence', 'swing', 'valence', 'arousal_mean',
+                      'conf', 'beat_stability', 'arousal', 'sonic_arousal')
+    _BOOL_COLUMNS = ('has_bands', 'has_bars32', 'urban', 'mandarin', 'kpop', 'western', 'pop', 'remix',
+                     'vocal_soul', 'pure_machine', 'high_energy', 'complex', 'oriental', 'pizzicato',
+                     'staccato', 'kungfu', 'gangsta', 'aggressive', 'aggressive_or_numetal', 'sonic_urban', 'ballad')
+
+    def __init__(self, tracks: List[Dict], features: Optional[List[Dict]] = None, vocab: Optional[Dict[str, Dict]] = None):
+        self.tracks = list(tracks)
+        feats = features if features is not None else [_encode_mashup_track(t) for t in self.tracks]
+        self.features = feats
+        self.cols: Dict[str, np.ndarray] = {}
+        for name in self._FLOAT_COLUMNS:
+            self.cols[name] = np.array([f[name] for f in feats], dtype=np.float64)
+        for name in self._BOOL_COLUMNS:
+            self.cols[name] = np.array([f[name] for f in feats], dtype=bool)
+
+        # 类别字段编码为整数，空值为 -1
+        self.vocab: Dict[str, Dict] = vocab if vocab is not None else {'drum_pattern': {}, 'genre': {}}
+        for name, vocab in self.vocab.items():
+            codes = np.empty(len(feats), dtype=np.int32)
+            for i, f in enumerate(feats):
+                codes[i] = self._category_code(vocab, f[name], grow=True)
+            self.cols[name] = codes
+
+        self.key_codes = np.array([key_code(f['key']) for f in feats], dtype=np.intp) if HAS_KEY_CODES else None
+        self.keys = [f['key'] for f in feats]
+        self.title_norms = [f['title_norm'] for f in feats]
+        self.paths: Dict[str, List[int]] = {}
+        self.modulations: Dict[str, List[int]] = {}   # 倒排：转调经过的调性 -> 候选下标
+        for i, f in enumerate(feats):
+            if f['path']:
+                self.paths.setdefault(f['path'], []).append(i)
+            for k in f['mod_keys']:
+                try:
+                    self.modulations.setdefault(k, []).append(i)
+                except TypeError:
+                    continue
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def take(self, rows) -> 'MashupCandidateBatch':
+        """[V12.6] 取子集（复用已编码特征与类别词表，不重新编码曲目）"""
+        return MashupCandidateBatch([self.tracks[r] for r in rows], features=[self.features[r] for r in rows],
+                                    vocab=self.vocab)
+
+    @staticmethod
+    def _category_code(vocab: Dict, value, grow: bool = False) -> int:
+        if value == '':
+            return -1
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
+        code = vocab.get(value)
+        if code is None:
+            if not grow:
+                return -2  # 种子的取值不在候选集中，不与任何候选相等
+            code = len(vocab)
+            vocab[value] = code
+        return code
+
 class MashupIntelligence:
     def __init__(self, config: Dict = None):
         self.config = config or {}
@@ -252,9 +486,9 @@ class MashupIntelligence:
         score = 0.0
         details = {}
         
-        # [V11.0] 使用全局 DNA 映射逻辑
-        s1 = map_dna_features(track1.get('analysis', track1))
-        s2 = map_dna_features(track2.get('analysis', track2))
+        # [V11.0] 使用全局 DNA 映射逻辑（[V12.4] 原始字段直接读 analysis，派生的律动 DNA 取缓存向量）
+        s1 = track1.get('analysis', track1)
+        s2 = track2.get('analysis', track2)
         
         # --- [V16.2 Precision Restoration] 混音师 10-BPM 准则 ---
         bpm1_gate = s1.get('bpm', 0)
@@ -273,17 +507,9 @@ class MashupIntelligence:
         
         # [V35.8] Identity Collision Guard (Anti-Self-Recommendation)
         # Prevent recommending the same song (e.g. "Foot Fungus" vs "Foot Fungus (Edit)")
-        def _normalize_title(t):
-            if not t: return ""
-            # Remove content in brackets/parentheses
-            import re
-            t = re.sub(r'\(.*?\)|\[.*?\]', '', str(t))
-            # Remove symbols and extra spaces
-            t = re.sub(r'[^\w\s]', '', t)
-            return t.lower().strip()
-
-        t1_norm = _normalize_title(track1.get('track_info', {}).get('title', ''))
-        t2_norm = _normalize_title(track2.get('track_info', {}).get('title', ''))
+        # [V11.6] 标题标准化结果全局缓存（每个标题只跑一次正则）
+        t1_norm = normalize_mashup_title(track1.get('track_info', {}).get('title', ''))
+        t2_norm = normalize_mashup_title(track2.get('track_info', {}).get('title', ''))
         
         # Check if the core title is a subset of the other or very similar
         if t1_norm and t2_norm and (t1_norm == t2_norm or t1_norm in t2_norm or t2_norm in t1_norm):
@@ -442,7 +668,7 @@ class MashupIntelligence:
         if g1 == g2 and g1 != '': style_val += 8
         
         # [V9.0 精准化：律动深度同步 (Groove DNA)]
-        s_dna1, s_dna2 = s1.get('swing_dna', 0.0), s2.get('swing_dna', 0.0)
+        s_dna1, s_dna2 = _swing_dna(s1), _swing_dna(s2)
         
         groove_bonus = 0.0
         if s_dna1 and s_dna2:
@@ -513,7 +739,7 @@ class MashupIntelligence:
             
             # 6.1 [V7.0] 爆破力 (Banger Discovery)
             # 6.1 [V7.0] 爆破力 (Banger Discovery)
-            urban_keys = ["kanye", "travis", "scott", "hiphop", "trap", "afro", "jersey", "remix", "edit", "club", "banger", "urban", "k-pop", "kpop"]
+            urban_keys = CULTURE_URBAN_KEYS
             is_urban_match = any(w in tags1 or w in tags2 for w in urban_keys)
             if is_urban_match:
                 cultural_bonus += 15.0 
@@ -521,10 +747,10 @@ class MashupIntelligence:
 
             # 6.2 [V17.0] 流行阶梯与专业 Remix 对齐 (Pop Symmetry & Remix Synergy)
             # 定义：华语 <-> K-Pop <-> 欧美流行/Hip-Hop 之间的强连接
-            keys_mandarin = ['mandarin', 'c-pop', 'chinese', '华语', '中文']
-            keys_kpop = ['k-pop', 'kpop', 'korean']
-            keys_western = ['pop', 'hip hop', 'rap', 'r&b', 'billboard']
-            keys_remix = ['remix', 'edit', 'bootleg', 'rework', 'vip']
+            keys_mandarin = CULTURE_MANDARIN_KEYS
+            keys_kpop = CULTURE_KPOP_KEYS
+            keys_western = CULTURE_WESTERN_KEYS
+            keys_remix = CULTURE_REMIX_KEYS
 
             def has_tag(t_str, keys): return any(k in t_str for k in keys)
 
@@ -562,7 +788,7 @@ class MashupIntelligence:
 
             # 6.3 [V7.1] 电子隔离墙 (Anti-Machine Barrier)
             # 拒绝：人声主要曲目 (Vocal Pop) x 纯冷电子 (Techno/Minimal)
-            keys_pure_elec = ['techno', 'minimal', 'tech house', 'psytrance', 'trance']
+            keys_pure_elec = CULTURE_PURE_ELEC_KEYS
             
             def is_pure_machine(t_str, v_ratio):
                 # 只有当人声比例极低 (<0.3) 且包含冷电子标签时
@@ -600,7 +826,7 @@ class MashupIntelligence:
             # 情绪对齐加分 (Synergy)
             mood1 = str(s1.get('vocal_mood', '')).lower()
             mood2 = str(s2.get('vocal_mood', '')).lower()
-            aggressive_keywords = ['aggressive', 'energetic', 'vibrant', 'power', 'happy', 'bright']
+            aggressive_keywords = HIGH_ENERGY_MOOD_KEYS
             
             is_high_energy1 = any(k in mood1 for k in aggressive_keywords) or arousal1 > 0.65
             is_high_energy2 = any(k in mood2 for k in aggressive_keywords) or arousal2 > 0.65
@@ -657,6 +883,157 @@ class MashupIntelligence:
         
         return min(120.0, final_total), details
 
+    # ---------- [V12.3] 一对多批量评分 ----------
+    def encode_candidates(self, tracks: List[Dict]) -> MashupCandidateBatch:
+        """把候选曲目编码为 MashupCandidateBatch（整个歌单/曲库编码一次，可反复用于不同种子）"""
+        return MashupCandidateBatch(tracks)
+
+    def score_batch(self, seed: Dict, batch: MashupCandidateBatch, mode: str = 'standard',
+                    seed_features: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        [V12.3] 一个种子对整批候选评分（seed 即 calculate_mashup_score 的 track1）
+        seed_features: 种子已编码的特征（如 batch.features[i]），省去重复编码
+        Returns:
+            (scores, rejections)：与 batch.tracks 对齐的 float64 分数数组与拒绝码数组
+            （REJECT_*，0 表示未拒绝；被拒绝的分数为 0，原因文本见 REJECTION_REASONS）
+        """
+        n = len(batch)
+        if n == 0:
+            return np.zeros(0), np.zeros(0, dtype=np.int8)
+        f = seed_features if seed_features is not None else _encode_mashup_track(seed)
+        c = batch.cols
+
+        # --- 拒绝门 ---
+        rejections, best_diff, best_idx = _rejection_codes(f, batch)
+        v1, v2 = f['vocal'], c['vocal']
+
+        # --- 1. BPM & Perceptual Speed ---
+        base_bpm = np.where(best_diff <= 0.04, 10.0, np.where(best_diff <= 0.08, 5.0, -10.0))
+        base_bpm = np.where(best_idx != 1, base_bpm - 5.0, base_bpm)
+        perceptual = (1.0 - np.abs(f['onset'] - c['onset'])) * 4 + (1.0 - np.abs(f['busy'] - c['busy'])) * 4
+        score = np.maximum(0.0, base_bpm) + perceptual
+
+        # --- 2. 调性和谐度 ---
+        if batch.key_codes is not None:
+            h_score = ADVANCED_HARMONIC_TABLE[key_code(f['key']), batch.key_codes].astype(np.float64)
+        else:
+            h_score = np.array([get_advanced_harmonic_score(f['key'], k)[0] for k in batch.keys], dtype=np.float64)
+        score += (h_score / 100.0) * 10
+
+        # --- 3. Stems ---
+        overlay = ((v1 > 0.6) & (v2 < 0.3)) | ((v2 > 0.6) & (v1 < 0.3))
+        alternation = ~overlay & (v1 >= 0.45) & (v2 >= 0.45)
+        stems = np.where(overlay, 25.0, np.where(alternation, 15.0, np.maximum(5.0, 20 * np.abs(v1 - v2))))
+        score += stems
+
+        # --- 4. Vibe ---
+        vibe = np.where(1.0 - np.abs(f['energy'] - c['energy']) / 100.0 > 0.8, 5.0, 0.0)
+        tonal_dist = ((f['tb_low'] - c['tb_low']) ** 2 + (f['tb_mid'] - c['tb_mid']) ** 2
+                      + (f['tb_high'] - c['tb_high']) ** 2) ** 0.5
+        vibe += np.maximum(0.0, 1.0 - tonal_dist * 2.0) * 10
+        if f['has_bands']:
+            bands = c['has_bands']
+            sb1, sb2 = f['sub_bass'], c['sub_bass']
+            vibe -= np.where(bands & (sb1 > 0.6) & (sb2 > 0.6), 8.0,
+                             np.where(bands & (sb1 > 0.4) & (sb2 > 0.4), 3.0, 0.0))
+            masking = np.maximum(-5.0, 7.0 * (1.0 - f['mid_range'] * c['mid_range'] * 2.5))
+            vibe += np.where(bands, masking, 0.0)
+            vibe += np.where(bands & (np.abs(f['high_presence'] - c['high_presence']) < 0.1), 2.0, 0.0)
+        score += vibe
+
+        # --- 5. 律动与风格 ---
+        style = np.zeros(n)
+        for name, points in (('drum_pattern', 7.0), ('genre', 8.0)):
+            code = MashupCandidateBatch._category_code(batch.vocab[name], f[name])
+            if code >= 0:
+                style += np.where(c[name] == code, points, 0.0)
+        if f['swing']:
+            s2 = c['swing']
+            style += np.where((s2 != 0) & (1.0 - np.abs(f['swing'] - s2) > 0.85), 5.0, 0.0)
+        score += style
+
+        # --- 6. True-DNA ---
+        dna = np.where(c['has_bars32'], 10.0, 0.0) if f['has_bars32'] else np.zeros(n)
+        emo_dist = ((f['valence'] - c['valence']) ** 2 + (f['arousal_mean'] - c['arousal_mean']) ** 2) ** 0.5
+        dna += np.where(emo_dist < 0.15, 15.0, np.where(emo_dist > 0.6, -15.0, 0.0))
+        risk = f['conf'] * c['conf'] * (f['beat_stability'] * c['beat_stability'])
+        dna += np.where(risk < 0.4, -20.0, np.where(risk > 0.8, 5.0, 0.0))
+        if f['key']:
+            try:
+                hidden = batch.modulations.get(f['key'], [])
+            except TypeError:
+                hidden = []
+            dna[hidden] += 10.0
+
+        # --- 7. 文化矩阵（仅 standard / mashup_discovery） ---
+        cultural = np.zeros(n)
+        if mode in CULTURE_MODES:
+            cultural += np.where(f['urban'] | c['urban'], 15.0, 0.0)
+            p1, p2 = f['pop'], c['pop']
+            if p1:
+                clusters = ((f['mandarin'] | c['mandarin']).astype(int) + (f['kpop'] | c['kpop'])
+                            + (f['western'] | c['western']))
+                pop_pop = np.where(clusters >= 2, 30.0, 10.0)
+                cultural += np.where(p2, pop_pop, np.where(c['remix'], 15.0, -30.0))
+            else:
+                cultural += np.where(p2, 15.0 if f['remix'] else -30.0, 0.0)
+            anti = (f['vocal_soul'] & c['pure_machine']) | (c['vocal_soul'] & f['pure_machine'])
+            cultural -= np.where(anti, 20.0, 0.0)
+            a1, a2 = f['arousal'], c['arousal']
+            arousal_diff = np.abs(a1 - a2)
+            cultural += np.where(arousal_diff > 0.35, -15.0, np.where(arousal_diff < 0.12, 5.0, 0.0))
+            he1, he2 = f['high_energy'], c['high_energy']
+            mismatch = (he1 & (a2 < 0.45)) | (he2 & (a1 < 0.45))
+            cultural += np.where(he1 & he2, 10.0, np.where(mismatch, -12.0, 0.0))
+            if f['complex']:
+                cultural += np.where(c['complex'], 5.0, 0.0)
+
+        # --- 8. Sonic DNA ---
+        sonic = np.zeros(n)
+        synergy = (f['oriental'] & c['pizzicato']) | (f['pizzicato'] & c['oriental'])
+        if synergy.any():
+            clash = (f['ballad'] & c['sonic_urban']) | (c['ballad'] & f['sonic_urban'])
+            a_diff = np.abs(f['sonic_arousal'] - c['sonic_arousal'])
+            sonic += np.where(synergy, np.where(clash, -15.0, np.where(a_diff > 0.3, 2.0, 30.0)), 0.0)
+        if f['staccato']:
+            sonic += np.where(c['staccato'], 15.0, 0.0)
+        sonic += np.where((f['kungfu'] | c['kungfu']) & (f['gangsta'] | c['gangsta']), 25.0, 0.0)
+        if f['aggressive']:
+            sonic += np.where(c['aggressive_or_numetal'], 15.0, 0.0)
+        has_sonic = sonic > 0
+        score += np.where(has_sonic, sonic, 0.0)
+
+        # --- 封顶 ---
+        final = score + cultural + dna
+        final -= np.where((h_score < 10.0) & ~has_sonic, 20.0, 0.0)
+        elite = overlay | alternation
+        final = np.where(~elite & (final > 70.0) & ~has_sonic, 70.0, final)
+        final = np.minimum(120.0, final)
+        final[rejections != REJECT_NONE] = 0.0
+        return final, rejections
+
+    def top_matches(self, seed: Dict, batch: MashupCandidateBatch, k: int = 10, mode: str = 'standard',
+                    min_score: Optional[float] = None) -> List[Tuple[Dict, float, Dict]]:
+        """
+        [V12.3] 批量评分后只展开前 k 名的 details（逐对评分，与 calculate_mashup_score 输出一致）
+        Returns:
+            [(candidate_track, score, details)]，按分数降序
+        """
+        scores, rejections = self.score_batch(seed, batch, mode=mode)
+        eligible = rejections == REJECT_NONE
+        if min_score is not None:
+            eligible &= scores > min_score
+        idx = np.flatnonzero(eligible)
+        if k < len(idx):
+            idx = idx[np.argpartition(-scores[idx], k - 1)[:k]]
+        idx = idx[np.lexsort((idx, -scores[idx]))]
+        results = []
+        for i in idx:
+            cand = batch.tracks[i]
+            score, details = self.calculate_mashup_score(seed, cand, mode=mode)
+            results.append((cand, score, details))
+        return results
+
     def generate_unified_guide(self, track1: Dict, track2: Dict, score: float, details: Dict) -> List[str]:
         """生成基于统一标准的 Stems / DDJ-800 操作指南。"""
         s1 = track1.get('analysis', track1)
@@ -785,3 +1162,432 @@ class MashupIntelligence:
             }
             
         return None
+
+
+# ==============================================================================
+# 【V12.6】全库 Mashup 发现引擎 (Blocked All-Pairs Discovery)
+# - 分块：BPM 按八度折叠到 log2 空间的环上（位置 = log2(bpm) mod 1）。评分器只接受 0.5x/1x/2x 下偏差
+#   <= 12% 的组合，这样的两首歌环距离不超过 -log2(0.88)；种子按环位置连续切块，每块只与门宽内的
+#   窗口评分，其余组合必被 BPM 门拒绝，无需评分（无损）
+# - 可选调性邻域：只保留同调/相邻/关系大小调（或调性未知）的组合（有损，默认关闭）
+# - 每个块用 score_batch 向量化评分，块之间在进程池中并行
+# - 每首歌与全局各维护一个有界 top-K 堆；命中结果按块流式回调
+# ==============================================================================
+DISCOVERY_BPM_GATE = 0.12
+DISCOVERY_SEEDS_PER_BLOCK = 128  # 每块（每个进程任务）的种子数
+DISCOVERY_MIN_PARALLEL = 800     # 曲目数低于此值时在当前进程内评分
+
+_DISCOVERY_STATE: Dict = {}
+
+
+def _discovery_init(batch: 'MashupCandidateBatch', mode: str, min_score: float, key_neighbourhood: bool):
+    _DISCOVERY_STATE.update(mi=MashupIntelligence(), batch=batch, mode=mode, min_score=min_score,
+                            key_neighbourhood=key_neighbourhood)
+
+
+def _discovery_score_block(task: Tuple[List[int], List[int]]) -> Tuple[int, List[Tuple[int, int, float]]]:
+    """对一个块评分：seeds 中每首歌只与窗口内下标更大的曲目组成 (i, j) 对，保持与逐对双循环相同的方向"""
+    seeds, window = task
+    st = _DISCOVERY_STATE
+    batch, mi = st['batch'], st['mi']
+    window = np.asarray(window, dtype=np.intp)
+    sub = batch.take(window)
+    matches = []
+    scored = 0
+    for i in seeds:
+        later = window > i
+        if st['key_neighbourhood'] and batch.key_codes is not None:
+            seed_code = batch.key_codes[i]
+            if seed_code != UNKNOWN_KEY_CODE:
+                cand_codes = sub.key_codes
+                later &= (ADVANCED_HARMONIC_TABLE[seed_code, cand_codes] > 0) | (cand_codes == UNKNOWN_KEY_CODE)
+        if not later.any():
+            continue
+        scored += int(later.sum())
+        scores, rejections = mi.score_batch(batch.tracks[i], sub, mode=st['mode'], seed_features=batch.features[i])
+        hit = later & (rejections == REJECT_NONE) & (scores >= st['min_score'])
+        for k in np.flatnonzero(hit):
+            matches.append((i, int(window[k]), float(scores[k])))
+    return scored, matches
+
+
+class MashupDiscoveryEngine:
+    """[V12.6] 全库 Mashup 组合发现"""
+
+    def __init__(self, tracks: List[Dict], mode: str = 'mashup_discovery', min_score: float = 75.0,
+                 per_track_k: int = 5, global_k: int = 50, key_neighbourhood: bool = False,
+                 workers: Optional[int] = None):
+        self.mi = MashupIntelligence()
+        self.tracks = list(tracks)
+        self.mode = mode
+        self.min_score = min_score
+        self.per_track_k = per_track_k
+        self.global_k = global_k
+        self.key_neighbourhood = key_neighbourhood
+        self.workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+        self.batch = self.mi.encode_candidates(self.tracks)
+        self.stats: Dict = {}
+
+    # ---------- 分块 ----------
+    def blocks(self) -> List[Tuple[List[int], List[int]]]:
+        """
+        返回 [(种子下标, 窗口下标)]
+        种子按八度环位置排序后连续切块，窗口为与块内位置区间的环距离不超过 BPM 门宽的全部曲目；
+        无 BPM 的曲目必被评分器拒绝，不参与分块
+        """
+        bpm = self.batch.cols['bpm']
+        valid = np.flatnonzero(bpm > 0)
+        if len(valid) < 2:
+            return []
+        gate = -math.log2(1.0 - DISCOVERY_BPM_GATE) * (1 + 1e-9)
+        pos = np.mod(np.log2(bpm[valid]), 1.0)
+        order = np.argsort(pos, kind='stable')
+        tasks = []
+        for start in range(0, len(order), DISCOVERY_SEEDS_PER_BLOCK):
+            chunk = order[start:start + DISCOVERY_SEEDS_PER_BLOCK]
+            lo, hi = pos[chunk[0]], pos[chunk[-1]]
+            inside = (pos >= lo) & (pos <= hi)
+            d_lo = np.mod(lo - pos, 1.0)     # 位置在区间左侧时到 lo 的环距离
+            d_hi = np.mod(pos - hi, 1.0)     # 位置在区间右侧时到 hi 的环距离
+            window = valid[inside | (np.minimum(d_lo, d_hi) <= gate)]
+            tasks.append((sorted(valid[chunk].tolist()), window.tolist()))
+        return tasks
+
+    # ---------- 执行 ----------
+    def _iter_block_results(self, tasks):
+        if self.workers <= 1 or len(self.tracks) < DISCOVERY_MIN_PARALLEL:
+            _discovery_init(self.batch, self.mode, self.min_score, self.key_neighbourhood)
+            for task in tasks:
+                yield _discovery_score_block(task)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_discovery_init,
+                                 initargs=(self.batch, self.mode, self.min_score, self.key_neighbourhood)) as pool:
+            yield from pool.map(_discovery_score_block, tasks)
+
+    def run(self, on_matches: Optional[Callable[[List[Tuple[int, int, float]]], None]] = None) -> Dict:
+        """
+        执行发现
+        Args:
+            on_matches: 每完成一个块回调一次，参数为该块内达到门限的 [(i, j, score)]（流式写报告用）
+        Returns:
+            {'top_pairs': [(score, i, j)] 降序, 'per_track': {i: [(score, j)] 降序}, 'stats': {...}}
+        """
+        t0 = time.perf_counter()
+        tasks = self.blocks()
+        top_heap: List[Tuple[float, int, int]] = []          # (score, -i, -j)：同分时保留先出现的组合
+        track_heaps: Dict[int, List[Tuple[float, int]]] = {}
+        scored = found = 0
+        for block_scored, matches in self._iter_block_results(tasks):
+            scored += block_scored
+            found += len(matches)
+            for i, j, score in matches:
+                item = (score, -i, -j)
+                if len(top_heap) < self.global_k:
+                    heapq.heappush(top_heap, item)
+                elif item > top_heap[0]:
+                    heapq.heapreplace(top_heap, item)
+                for a, b in ((i, j), (j, i)):
+                    h = track_heaps.setdefault(a, [])
+                    if len(h) < self.per_track_k:
+                        heapq.heappush(h, (score, -b))
+                    elif (score, -b) > h[0]:
+                        heapq.heapreplace(h, (score, -b))
+            if on_matches and matches:
+                on_matches(matches)
+
+        n_valid = int((self.batch.cols['bpm'] > 0).sum())
+        self.stats = {
+            'tracks': len(self.tracks),
+            'pairs_total': len(self.tracks) * (len(self.tracks) - 1) // 2,
+            'pairs_valid': n_valid * (n_valid - 1) // 2,
+            'pairs_scored': scored,
+            'matches': found,
+            'blocks': len(tasks),
+            'seconds': round(time.perf_counter() - t0, 2),
+        }
+        return {
+            'top_pairs': [(s, -ni, -nj) for s, ni, nj in sorted(top_heap, reverse=True)],
+            'per_track': {i: [(s, -nb) for s, nb in sorted(h, reverse=True)] for i, h in track_heaps.items()},
+            'stats': self.stats,
+        }
+
+    def expand(self, pairs: List[Tuple[float, int, int]]) -> List[Dict]:
+        """只对入选组合逐对评分生成 details（报告边界）"""
+        out = []
+        for _, i, j in pairs:
+            t1, t2 = self.tracks[i], self.tracks[j]
+            score, details = self.mi.calculate_mashup_score(t1, t2, mode=self.mode)
+            out.append({'score': score, 'details': details, 'track1': t1, 'track2': t2})
+        return out
+
+
+# ==============================================================================
+# 【V12.7】全库 Mashup 搭档索引 (Persistent Partner Index)
+# - 每首已分析曲目保存全库 top-K 搭档（有向：以该曲为 track1 的 calculate_mashup_score）及拒绝原因计数
+# - 增量更新：只对 新曲 × 全库 评分；拒绝门对称，反向 (旧曲, 新曲) 只需对未被拒绝的旧曲补算
+# - 曲目重新分析（特征指纹变化）或删除时，从各搭档列表中摘除；列表原本已满的曲目整行重算补位
+# - 查询“某曲最佳搭档 / 某歌单内最佳组合”直接读索引，毫秒级返回
+# - 同分按曲目键排序，增量结果与整库重建完全一致
+# ==============================================================================
+PARTNER_INDEX_VERSION = 1
+DEFAULT_PARTNER_INDEX_PATH = r"d:\anti\scripts\mashup_partner_index.json"
+PARTNER_INDEX_K = 20
+PARTNER_INDEX_MIN_SCORE = 40.0
+
+_GATE_FIELDS = ('bpm', 'vocal', 'path', 'title_norm')
+
+
+def _feature_fingerprint(features: Dict) -> str:
+    payload = json.dumps(features, sort_keys=True, ensure_ascii=False,
+                         default=lambda o: sorted(map(str, o)) if isinstance(o, (set, frozenset)) else str(o))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _partner_sort_key(item) -> Tuple[float, str]:
+    return (-item[1], item[0])
+
+
+class MashupPartnerIndex:
+    """[V12.7] 持久化的全库搭档索引（JSON，原子写入）"""
+
+    def __init__(self, path: str = DEFAULT_PARTNER_INDEX_PATH, mode: str = 'mashup_discovery',
+                 k: int = PARTNER_INDEX_K, min_score: float = PARTNER_INDEX_MIN_SCORE):
+        self.path = path
+        self.mode = mode
+        self.k = k
+        self.min_score = min_score
+        self.mi = MashupIntelligence()
+        self.entries: Dict[str, Dict] = {}
+        self.load()
+
+    # ---------- 持久化 ----------
+    def _header(self) -> Dict:
+        return {'version': PARTNER_INDEX_VERSION, 'mode': self.mode, 'k': self.k, 'min_score': self.min_score}
+
+    def load(self) -> bool:
+        """读取索引；版本/模式/K/门限不一致时视为空索引（下次 update 整库重建）"""
+        self.entries = {}
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"  [PartnerIndex] Failed to load index: {e}")
+            return False
+        if data.get('header') != self._header():
+            return False
+        self.entries = data.get('tracks', {})
+        return True
+
+    def save(self) -> bool:
+        """原子写入：临时文件 + os.replace"""
+        folder = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=folder, prefix="partner_index_", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'header': self._header(), 'tracks': self.entries}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            return True
+        except Exception as e:
+            print(f"  [PartnerIndex] Save failed: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+    # ---------- 曲目键 ----------
+    @staticmethod
+    def track_key(track: Dict, features: Optional[Dict] = None) -> str:
+        """文件路径（统一斜杠、小写）；无路径时退化为 标题::艺人"""
+        path = features['path'] if features is not None else track.get('track_info', {}).get('file_path', track.get('file_path', ''))
+        if path:
+            return str(path).replace('\\', '/').lower()
+        info = track.get('track_info', track)
+        title = str(info.get('title', '') or '').strip().lower()
+        return f"{title}::{str(info.get('artist', '') or '').strip().lower()}" if title else ''
+
+    @staticmethod
+    def tracks_from_cache(cache: Dict) -> List[Dict]:
+        """分析缓存（哈希或路径 -> {file_path, analysis, ...}）转为评分用曲目"""
+        tracks = []
+        for key, entry in cache.items():
+            if not isinstance(entry, dict):
+                continue
+            path = entry.get('file_path') or key
+            analysis = entry.get('analysis') or entry
+            tracks.append({
+                'track_info': {
+                    'title': entry.get('title') or Path(str(path).replace('\\', '/')).stem,
+                    'artist': entry.get('artist', 'Unknown'),
+                    'file_path': path,
+                },
+                'analysis': analysis,
+            })
+        return tracks
+
+    # ---------- 增量更新 ----------
+    def _top_k(self, pairs) -> List[List]:
+        return [[key, score] for key, score in sorted(pairs, key=_partner_sort_key)[:self.k]]
+
+    def _scan(self, row: int, batch: MashupCandidateBatch, keys: List[str]) -> Tuple[List[List], Dict[str, int], np.ndarray]:
+        """一首歌对全库评分：返回 top-K 搭档、拒绝原因计数（不含自身）与拒绝码数组"""
+        scores, rejections = self.mi.score_batch(batch.tracks[row], batch, mode=self.mode,
+                                                 seed_features=batch.features[row])
+        counts = np.bincount(np.delete(rejections, row), minlength=len(REJECTION_REASONS))
+        hit = (rejections == REJECT_NONE) & (scores >= self.min_score)
+        hit[row] = False
+        partners = self._top_k((keys[j], float(scores[j])) for j in np.flatnonzero(hit))
+        reasons = {REJECTION_REASONS[c]: int(n) for c, n in enumerate(counts) if c != REJECT_NONE and n}
+        return partners, reasons, rejections
+
+    def update(self, tracks: List[Dict], prune: bool = False) -> Dict:
+        """
+        用全库已分析曲目更新索引
+        Args:
+            tracks: 全库曲目（{'track_info', 'analysis'} 或扁平 dict）；旧曲的特征从这里读取，
+                    只传部分曲目时，未传入的旧曲不会获得与新曲的反向分数与拒绝计数
+            prune: 索引中存在但 tracks 里没有的曲目视为已删除
+        Returns:
+            {'added', 'changed', 'removed', 'refilled', 'seconds'}
+        """
+        t0 = time.perf_counter()
+        features, keys, rows = [], [], []
+        seen = set()
+        for t in tracks:
+            f = _encode_mashup_track(t)
+            key = self.track_key(t, f)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            features.append(f)
+            keys.append(key)
+            rows.append(t)
+        fingerprints = [_feature_fingerprint(f) for f in features]
+
+        new_rows = [i for i, key in enumerate(keys) if key not in self.entries]
+        changed_rows = [i for i, key in enumerate(keys)
+                        if key in self.entries and self.entries[key]['fingerprint'] != fingerprints[i]]
+        removed = [key for key in self.entries if prune and key not in seen]
+        stale = removed + [keys[i] for i in changed_rows]
+        stats = {'added': len(new_rows), 'changed': len(changed_rows), 'removed': len(removed), 'refilled': 0}
+        if not new_rows and not stale:
+            stats['seconds'] = round(time.perf_counter() - t0, 3)
+            return stats
+
+        batch = MashupCandidateBatch(rows, features=features)
+        row_of = {key: i for i, key in enumerate(keys)}
+
+        # 1. 摘除删除/变化的曲目：按旧的拒绝门签名扣减计数，列表原本已满的曲目之后整行重算
+        refill = set()
+        stale_set = set(stale)
+        for key in stale:
+            entry = self.entries.pop(key)
+            gate_codes, _, _ = _rejection_codes(entry['gate'], batch)
+            for other, other_entry in self.entries.items():
+                if other in stale_set:
+                    continue
+                code = int(gate_codes[row_of[other]]) if other in row_of else REJECT_NONE
+                if code != REJECT_NONE:
+                    reason = REJECTION_REASONS[code]
+                    left = other_entry['rejections'].get(reason, 0) - 1
+                    if left > 0:
+                        other_entry['rejections'][reason] = left
+                    else:
+                        other_entry['rejections'].pop(reason, None)
+                partners = other_entry['partners']
+                if any(p[0] == key for p in partners):
+                    if len(partners) >= self.k:
+                        refill.add(other)
+                    other_entry['partners'] = [p for p in partners if p[0] != key]
+
+        # 2. 新曲（含重新分析的曲目）对全库评分
+        fresh = sorted(new_rows + changed_rows)
+        old = np.array([key in self.entries for key in keys], dtype=bool)
+        added_codes = np.zeros((len(keys), len(REJECTION_REASONS)), dtype=np.int64)
+        accepted = np.zeros(len(keys), dtype=bool)   # 至少被一首新曲的拒绝门接受的旧曲（拒绝门对称）
+        for i in fresh:
+            partners, reasons, codes = self._scan(i, batch, keys)
+            f = features[i]
+            self.entries[keys[i]] = {
+                'title': batch.tracks[i].get('track_info', batch.tracks[i]).get('title', ''),
+                'artist': batch.tracks[i].get('track_info', batch.tracks[i]).get('artist', ''),
+                'fingerprint': fingerprints[i],
+                'gate': {name: f[name] for name in _GATE_FIELDS},
+                'partners': partners,
+                'rejections': reasons,
+            }
+            rejected = old & (codes != REJECT_NONE)
+            np.add.at(added_codes, (np.flatnonzero(rejected), codes[rejected]), 1)
+            accepted |= old & (codes == REJECT_NONE)
+        for j in np.flatnonzero(added_codes.any(axis=1)):
+            reasons_j = self.entries[keys[j]]['rejections']
+            for c in np.flatnonzero(added_codes[j]):
+                reason = REJECTION_REASONS[c]
+                reasons_j[reason] = reasons_j.get(reason, 0) + int(added_codes[j, c])
+
+        # 3. 旧曲补算以自己为 track1 的 (旧曲, 新曲) 分数，合并进 top-K
+        fresh_batch = batch.take(fresh)
+        for j in np.flatnonzero(accepted):
+            key = keys[j]
+            if key in refill:
+                continue
+            scores, rejections = self.mi.score_batch(rows[j], fresh_batch, mode=self.mode, seed_features=features[j])
+            extra = [(keys[i], float(sc)) for i, sc, rj in zip(fresh, scores, rejections)
+                     if rj == REJECT_NONE and sc >= self.min_score]
+            if extra:
+                entry = self.entries[key]
+                entry['partners'] = self._top_k([tuple(p) for p in entry['partners']] + extra)
+
+        # 4. 搭档列表曾满员且失去成员的曲目整行重算
+        for key in sorted(refill):
+            if key in self.entries and key in row_of:
+                self.entries[key]['partners'] = self._scan(row_of[key], batch, keys)[0]
+                stats['refilled'] += 1
+
+        stats['seconds'] = round(time.perf_counter() - t0, 3)
+        return stats
+
+    # ---------- 查询 ----------
+    def partners(self, track, k: Optional[int] = None, min_score: Optional[float] = None) -> List[Dict]:
+        """某曲的最佳搭档（track 可为曲目 dict 或曲目键）"""
+        key = track if isinstance(track, str) else self.track_key(track)
+        entry = self.entries.get(key)
+        if not entry:
+            return []
+        floor = self.min_score if min_score is None else min_score
+        out = []
+        for other, score in entry['partners'][:k or self.k]:
+            if score < floor:
+                break
+            meta = self.entries.get(other, {})
+            out.append({'key': other, 'title': meta.get('title', ''), 'artist': meta.get('artist', ''), 'score': score})
+        return out
+
+    def rejections(self, track) -> Dict[str, int]:
+        key = track if isinstance(track, str) else self.track_key(track)
+        return dict(self.entries.get(key, {}).get('rejections', {}))
+
+    def best_pairs(self, tracks, top_n: int = 15, min_score: Optional[float] = None) -> List[Tuple[float, str, str]]:
+        """
+        歌单内最佳组合：只看索引里双方互在对方（或一方在另一方）top-K 内的组合，两方向取高分
+        Returns:
+            [(score, key_a, key_b)] 降序，key_a 为该分数对应方向的 track1
+        """
+        keys = [t if isinstance(t, str) else self.track_key(t) for t in tracks]
+        inside = set(keys)
+        floor = self.min_score if min_score is None else min_score
+        best: Dict[frozenset, Tuple[float, str, str]] = {}
+        for key in keys:
+            for other, score in self.entries.get(key, {}).get('partners', []):
+                if score < floor:
+                    break
+                if other not in inside or other == key:
+                    continue
+                pair = frozenset((key, other))
+                item = (score, key, other)
+                cur = best.get(pair)
+                if cur is None or (-score, key) < (-cur[0], cur[1]):
+                    best[pair] = item
+        return sorted(best.values(), key=lambda x: (-x[0], x[1], x[2]))[:top_n]
@@ -12,11 +12,13 @@ sys.path.insert(0, str(BASE_DIR))
 try:
     from core.cache_manager import load_cache, save_cache_atomic
     from core.audio_cortex import cortex
+    from core.audio_dna import dna_vector
 except ImportError:
     # Fallback if core is treated as a top-level module (if d:/anti/core is in path)
     sys.path.insert(0, str(BASE_DIR / "core"))
     from cache_manager import load_cache, save_cache_atomic
     from audio_cortex import cortex
+    from audio_dna import dna_vector
 
 def enrich_cache(file_list: List[str] = None, force_refresh: bool = False):
     """
@@ -72,6 +74,8 @@ def enrich_cache(file_list: List[str] = None, force_refresh: bool = False):
                 analysis.update(tags_data) # Sync all DSP fields (sonic_dna, arousal_proxy, bpm, etc.)
                 if 'instruments' in tags_data:
                     analysis['sonic_dna'] = tags_data['instruments']
+                # [V12.4] 分析结果已原地更新，随缓存一起刷新 DNA 向量
+                dna_vector(analysis, refresh=True)
                 
                 entry['analysis'] = analysis
                 enriched_count += 1